@@ -0,0 +1,151 @@
+"""
+Load test for the read API in src/api.py: p50/p99 latency at several concurrency levels.
+
+    python benchmarks/bench_api.py                          # in-process, synthetic database
+    python benchmarks/bench_api.py --url http://127.0.0.1:8000 --topics UK NATO
+
+In-process runs drive the ASGI app through httpx without a socket, once with
+the response cache and once with it disabled (TTL 0), over a synthetic
+database of --articles articles. With --url the requests go to a running
+server (e.g. `uvicorn src.api:app`) and its own database.
+
+The request mix is the pages' traffic: latest watchlist, a page of a topic's
+articles, and a full-text search.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from datetime import date
+from itertools import accumulate
+
+import httpx
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+warnings.filterwarnings("ignore", message="Using slow pure-python SequenceMatcher")
+from src.api import create_app
+from src.db import Database
+from src.initialize_db import LEGACY_TOPIC_TABLES, create_database_and_tables
+
+VOCABULARY_SIZE = 20000
+_vocab_rng = random.Random(7)
+# Zipf-distributed vocabulary, so search terms are about as selective as in real news text
+WORDS = ["".join(_vocab_rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(_vocab_rng.randint(3, 10)))
+         for _ in range(VOCABULARY_SIZE)]
+CUM_WEIGHTS = list(accumulate(1 / (rank + 1) for rank in range(VOCABULARY_SIZE)))
+QUERY_WORDS = WORDS[100:3000]  # neither stop-word common nor vanishingly rare
+
+
+def words(rng, k):
+    return " ".join(rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=k))
+
+
+def build_db(path: str, n_articles: int, body_words: int):
+    create_database_and_tables(path)
+    db = Database(path)
+    rng = random.Random(11)
+    today = date.today().isoformat()
+    rows = []
+    for i in range(n_articles):
+        topic = LEGACY_TOPIC_TABLES[i % len(LEGACY_TOPIC_TABLES)]
+        rows.append((topic, f"https://news.example/{i}", words(rng, 8), rng.random(), today,
+                     words(rng, body_words), words(rng, 80)))
+    db.executemany('''
+    INSERT INTO articles (topic, url, title, relevance_score, date_added, news_body, summary_en)
+    VALUES (?, ?, ?, ?, ?, ?, ?)''', rows)
+    db.executemany("INSERT INTO watchlist (country, date_added, watchlist, urls_used) VALUES (?, ?, ?, ?)",
+                   [(topic, today, words(rng, 600), json.dumps([])) for topic in LEGACY_TOPIC_TABLES])
+    return db
+
+
+def request_mix(topics, rng):
+    kind = rng.random()
+    topic = rng.choice(topics)
+    if kind < 0.5:
+        return f"/topics/{topic}/watchlist/latest", {}
+    if kind < 0.8:
+        return f"/topics/{topic}/articles", {"page": rng.randint(1, 5)}
+    return "/search", {"q": " ".join(rng.sample(QUERY_WORDS[:300], 2)), "topic": topic}
+
+
+async def run_level(client, topics, concurrency, requests_per_worker, seed=0):
+    latencies = []
+    errors = 0
+
+    async def worker(worker_id):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        for _ in range(requests_per_worker):
+            path, params = request_mix(topics, rng)
+            start = time.perf_counter()
+            response = await client.get(path, params=params)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400 and response.status_code != 404:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'errors': errors,
+    }
+
+
+async def run(client, label, args, topics):
+    rows = []
+    for concurrency in args.concurrency:
+        row = {'setup': label, **await run_level(client, topics, concurrency, args.requests_per_worker)}
+        rows.append(row)
+        print(f"{label:<14} c={concurrency:<4} {row['requests']:>6} req {row['rps']:>8.0f} req/s  "
+              f"p50 {row['p50_ms']:>7.2f} ms  p99 {row['p99_ms']:>7.2f} ms  errors {row['errors']}")
+    return rows
+
+
+async def main_async(args):
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=30) as client:
+            return await run(client, 'server', args, args.topics)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = build_db(os.path.join(tmp, 'bench.db'), args.articles, args.body_words)
+        for label, ttl in (('cache on', 60), ('cache off', 0)):
+            transport = httpx.ASGITransport(app=create_app(db, cache_ttl_seconds=ttl))
+            async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+                rows += await run(client, label, args, args.topics)
+        db.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running API server")
+    parser.add_argument("--topics", nargs="+", default=LEGACY_TOPIC_TABLES)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests-per-worker", type=int, default=50)
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--body-words", type=int, default=400)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    rows = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Database size and query times with article bodies inline vs in the compressed body store.
+
+    python benchmarks/bench_body_store.py --articles 20000
+    python benchmarks/bench_body_store.py --db src/sensusmundi.db   # measure a copy of a real database
+
+Builds a synthetic database (or copies --db) with bodies inline in
+`articles.news_body`, then runs src/migrate_bodies.py on a copy and times the
+same queries against both files, each on a fresh connection:
+
+- listing:   one day's articles across topics, metadata only (full scan of articles)
+- domains:   article count per domain (full scan of articles)
+- summaries: one topic's summaries for a day (idx_articles_topic_date)
+- bodies:    200 random bodies by id (inline column vs BodyStore.get_many)
+- search:    full-text search with a body snippet
+
+Also reports the compression ratio of zlib with and without the trained dictionary.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from datetime import date, timedelta
+from itertools import accumulate
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+warnings.filterwarnings("ignore", message="Using slow pure-python SequenceMatcher")
+from src.api import search_articles
+from src.body_store import BodyStore, deflate_body
+from src.db import Database
+from src.initialize_db import LEGACY_TOPIC_TABLES, create_database_and_tables
+from src.migrate_bodies import database_size, migrate_bodies
+
+VOCABULARY_SIZE = 20000
+_vocab_rng = random.Random(7)
+WORDS = ["".join(_vocab_rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(_vocab_rng.randint(3, 10)))
+         for _ in range(VOCABULARY_SIZE)]
+CUM_WEIGHTS = list(accumulate(1 / (rank + 1) for rank in range(VOCABULARY_SIZE)))
+BOILERPLATE = [
+    "Sign up for our morning briefing to get the day's top stories in your inbox.",
+    "We use cookies to personalise content and ads and to analyse our traffic.",
+    "Reporting by our correspondents; editing by the foreign desk.",
+    "Copyright {domain}. All rights reserved. This material may not be published or redistributed.",
+    "Read more: the latest news, analysis and opinion from {domain}.",
+]
+
+
+def make_body(rng, domain, words):
+    paragraphs = [" ".join(rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=60)).capitalize() + "."
+                  for _ in range(max(words // 60, 1))]
+    footer = [line.format(domain=domain) for line in rng.sample(BOILERPLATE, 3)]
+    return "\n\n".join(paragraphs + footer)
+
+
+def build_db(path, n_articles, body_words, days):
+    create_database_and_tables(path)
+    rng = random.Random(11)
+    start = date.today() - timedelta(days=days - 1)
+    conn = sqlite3.connect(path)
+    rows = []
+    for i in range(n_articles):
+        topic = LEGACY_TOPIC_TABLES[i % len(LEGACY_TOPIC_TABLES)]
+        domain = f"news{rng.randrange(200)}.example"
+        day = (start + timedelta(days=i * days // n_articles)).isoformat()
+        body = make_body(rng, domain, body_words)
+        rows.append((topic, f"https://{domain}/{i}", " ".join(rng.choices(WORDS, k=8)), domain, rng.random(), day,
+                     body, len(body), "short", " ".join(rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=60)), "neutral"))
+    conn.executemany('''
+    INSERT INTO articles (topic, url, title, domain, relevance_score, date_added, news_body, body_length,
+                          short_title_en, summary_en, sentiment)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+    conn.execute("INSERT INTO articles_fts (articles_fts) VALUES ('optimize')")
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    return start.isoformat()
+
+
+def timed(path, run, repeat):
+    timings = []
+    for _ in range(repeat):
+        db = Database(path)
+        db.query("SELECT COUNT(*) FROM sqlite_master")  # load the schema outside the timing
+        start = time.perf_counter()
+        run(db)
+        timings.append(time.perf_counter() - start)
+        db.close()
+    return statistics.median(timings) * 1000
+
+
+def measure(path, day, args, store_bodies):
+    rng = random.Random(5)
+    ids = [row[0] for row in sqlite3.connect(path).execute("SELECT id FROM articles").fetchall()]
+    sample = rng.sample(ids, min(200, len(ids)))
+    term = WORDS[500]
+
+    def bodies(db):
+        if store_bodies:
+            BodyStore(db).get_many(sample)
+        else:
+            db.query(f"SELECT id, news_body FROM articles WHERE id IN ({', '.join('?' * len(sample))})", sample)
+
+    queries = {
+        'listing': lambda db: db.query("SELECT id, url, title, relevance_score FROM articles WHERE date_added = ?", (day,)),
+        'domains': lambda db: db.query("SELECT domain, COUNT(*) FROM articles GROUP BY domain"),
+        'summaries': lambda db: db.query('''
+            SELECT id, url, summary_en FROM articles WHERE topic = 'UK' AND date_added = ? AND summary_en != ''
+            ''', (day,)),
+        'bodies': bodies,
+        'search': lambda db: search_articles(db, term, limit=20),
+    }
+    return {name: timed(path, run, args.repeat) for name, run in queries.items()}
+
+
+def table_pages(path):
+    """Pages of the articles table, i.e. what a full scan reads when the file is not in the OS cache."""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM dbstat WHERE name = 'articles'").fetchone()[0]
+    except sqlite3.OperationalError:  # SQLite built without the dbstat table
+        return None
+    finally:
+        conn.close()
+
+
+def dictionary_gain(path):
+    db = Database(path)
+    store = BodyStore(db, codec='zlib')
+    samples = store.sample(500)
+    _, dictionary = store.current_dictionary()
+    db.close()
+    raw = sum(len(s.encode('utf-8')) for s in samples)
+    plain = sum(len(deflate_body(s, 'zlib')) for s in samples)
+    primed = sum(len(deflate_body(s, 'zlib', dictionary)) for s in samples) if dictionary else plain
+    return raw / plain, raw / primed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="measure a copy of this database instead of a synthetic one")
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--body-words", type=int, default=500)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before = os.path.join(tmp, 'before.db')
+        after = os.path.join(tmp, 'after.db')
+        if args.db:
+            shutil.copy(args.db, before)
+            create_database_and_tables(before)
+            day = sqlite3.connect(before).execute("SELECT MAX(date_added) FROM articles").fetchone()[0]
+        else:
+            day = build_db(before, args.articles, args.body_words, args.days)
+        shutil.copy(before, after)
+        start = time.perf_counter()
+        report = migrate_bodies(after)
+        migration_s = time.perf_counter() - start
+
+        results = {
+            'size_before': database_size(before),
+            'size_after': database_size(after),
+            'pages_before': table_pages(before),
+            'pages_after': table_pages(after),
+            'migration_s': migration_s,
+            'before_ms': measure(before, day, args, store_bodies=False),
+            'after_ms': measure(after, day, args, store_bodies=True),
+        }
+        results['ratio_zlib'], results['ratio_zlib_dictionary'] = dictionary_gain(after)
+        results['bodies'] = report['bodies']
+
+    mib = 1024 * 1024
+    print(f"\n{results['bodies']} bodies, migrated in {migration_s:.1f} s")
+    print(f"database  {results['size_before'] / mib:>8.1f} MiB -> {results['size_after'] / mib:>8.1f} MiB")
+    if results['pages_before']:
+        print(f"articles  {results['pages_before']:>8} pages -> {results['pages_after']:>8} pages")
+    print(f"zlib      {results['ratio_zlib']:>8.1f}x, with dictionary {results['ratio_zlib_dictionary']:.1f}x")
+    for name in results['before_ms']:
+        b, a = results['before_ms'][name], results['after_ms'][name]
+        print(f"{name:<10}{b:>8.2f} ms -> {a:>8.2f} ms  ({b / a:.1f}x)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
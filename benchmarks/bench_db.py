@@ -0,0 +1,132 @@
+"""
+Rows-per-second benchmark for src/db.py against the previous persistence code.
+
+    python benchmarks/bench_db.py --rows 2000
+
+Measured on a throwaway database in a temp directory:
+
+- insert, old: one execute per row (the old insert_data loop), default journal
+- insert, new: Database.executemany in WAL mode
+- update, old: a fresh connection and commit per article (the old update_database),
+  run from concurrent coroutines like process_articles did
+- update, new: Database.write from concurrent coroutines, group-committed
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from src.db import Database
+
+SCHEMA = '''
+CREATE TABLE UK (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT,
+    seendate TEXT,
+    domain TEXT,
+    language TEXT,
+    sourcecountry TEXT,
+    relevance_score REAL,
+    date_added DATE DEFAULT CURRENT_DATE,
+    news_body TEXT,
+    short_title_en TEXT,
+    summary_en TEXT,
+    sentiment TEXT
+)
+'''
+INSERT = '''
+INSERT INTO UK (url, title, content, seendate, domain, language, sourcecountry, relevance_score,
+                short_title_en, summary_en, sentiment)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+UPDATE = "UPDATE UK SET news_body = ?, short_title_en = ?, summary_en = ?, sentiment = ? WHERE id = ?"
+BODY = "Lorem ipsum dolor sit amet. " * 150  # ~4 KB, a typical article body
+
+
+def rows(n):
+    return [(f"https://example.com/{i}", f"Title {i}", "", "20240101T000000Z", "example.com", "English",
+             "UK", 0.5, "", "", "") for i in range(n)]
+
+
+def fresh_db(tmp, name):
+    path = os.path.join(tmp, name)
+    conn = sqlite3.connect(path)
+    conn.execute(SCHEMA)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def insert_old(path, data):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    for item in data:
+        cursor.execute(INSERT, item)
+    conn.commit()
+    conn.close()
+
+
+async def update_old(path, n):
+    async def one(i):
+        conn = sqlite3.connect(path, timeout=30)
+        cursor = conn.cursor()
+        cursor.execute(UPDATE, (BODY, "t", "summary", "neutral", i))
+        conn.commit()
+        conn.close()
+    await asyncio.gather(*[one(i) for i in range(1, n + 1)])
+
+
+async def update_new(db, n):
+    await asyncio.gather(*[db.write(UPDATE, (BODY, "t", "summary", "neutral", i)) for i in range(1, n + 1)])
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    if asyncio.iscoroutine(result):
+        asyncio.run(result)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    n = args.rows
+    data = rows(n)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = fresh_db(tmp, "old.db")
+        results["insert_old"] = n / timed(insert_old, old_path, data)
+        results["update_old"] = n / timed(update_old, old_path, n)
+
+        db = Database(fresh_db(tmp, "new.db"))
+        results["insert_new"] = n / timed(db.executemany, INSERT, data)
+        results["update_new"] = n / timed(update_new, db, n)
+        results["update_new_commits"] = db.stats["commits"] - 1
+        db.close()
+
+    print(f"{'operation':<10} {'old rows/s':>12} {'new rows/s':>12} {'speedup':>8}")
+    for op in ("insert", "update"):
+        old, new = results[f"{op}_old"], results[f"{op}_new"]
+        print(f"{op:<10} {old:>12.0f} {new:>12.0f} {new / old:>7.1f}x")
+    print(f"{n} updates took {results['update_new_commits']} group commits")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
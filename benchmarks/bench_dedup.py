@@ -0,0 +1,109 @@
+"""
+Scaling benchmark for the near-duplicate title engine in src/dedup.py.
+
+    python benchmarks/bench_dedup.py
+    python benchmarks/bench_dedup.py --sizes 250 1000 5000 --bruteforce-max 1000
+
+Titles are synthetic GDELT-like headlines drawn from a Zipf-distributed
+vocabulary, where roughly a third of the rows are light edits of another row (word swaps, inserted words, "- Outlet" suffixes).
+The pairwise reference is only run up to --bruteforce-max titles because it is
+quadratic; above that its time is extrapolated from the largest measured size.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import warnings
+from itertools import accumulate
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+warnings.filterwarnings("ignore", message="Using slow pure-python SequenceMatcher")
+from src.dedup import NearDuplicateIndex, find_near_duplicates_bruteforce
+
+
+def make_titles(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    # Zipf-distributed vocabulary: a few very common words, a long tail of names.
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10))) for _ in range(200000)]
+    cum_weights = list(accumulate(1 / (rank + 1) ** 1.1 for rank in range(len(words))))
+
+    def word():
+        return rng.choices(words, cum_weights=cum_weights)[0]
+
+    outlets = ["Reuters", "BBC News", "The Guardian", "AP", "Al Jazeera", "DW"]
+    n_base = int(n * 0.7)
+    base = [" ".join(word() for _ in range(rng.randint(6, 14))).capitalize() for _ in range(n_base)]
+    titles = list(base)
+    while len(titles) < n:
+        tokens = rng.choice(base).split()
+        for _ in range(rng.randint(1, 2)):
+            op = rng.random()
+            if op < 0.4:
+                tokens[rng.randrange(len(tokens))] = word()
+            elif op < 0.7:
+                tokens.insert(rng.randrange(len(tokens)), word())
+            elif len(tokens) > 4:
+                tokens.pop(rng.randrange(len(tokens)))
+        title = " ".join(tokens)
+        if rng.random() < 0.4:
+            title += f" - {rng.choice(outlets)}"
+        titles.append(title)
+    rng.shuffle(titles)
+    return titles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 1000, 5000, 10000, 25000, 50000])
+    parser.add_argument("--bruteforce-max", type=int, default=1000)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = []
+    brute_rate = None  # seconds per pairwise comparison, from the largest measured run
+    print(f"{'titles':>8} {'indexed_s':>10} {'us/title':>9} {'ratio_calls':>12} {'dropped':>8} {'pairwise_s':>11} {'recall':>7}")
+    for n in args.sizes:
+        titles = make_titles(n)
+        engine = NearDuplicateIndex()
+        start = time.perf_counter()
+        pairs = engine.find_duplicates(titles)
+        indexed = time.perf_counter() - start
+
+        row = {
+            "titles": n,
+            "indexed_seconds": indexed,
+            "microseconds_per_title": indexed / n * 1e6,
+            "ratio_calls": engine.comparisons,
+            "dropped": len(pairs),
+        }
+        if n <= args.bruteforce_max:
+            start = time.perf_counter()
+            expected = find_near_duplicates_bruteforce(titles)
+            row["pairwise_seconds"] = time.perf_counter() - start
+            brute_rate = row["pairwise_seconds"] / (n * (n - 1) / 2)
+            expected_dropped = {p.dropped for p in expected}
+            found = expected_dropped & {p.dropped for p in pairs}
+            row["recall"] = len(found) / len(expected_dropped) if expected_dropped else 1.0
+        elif brute_rate is not None:
+            row["pairwise_seconds_estimated"] = brute_rate * n * (n - 1) / 2
+
+        pairwise = row.get("pairwise_seconds", row.get("pairwise_seconds_estimated"))
+        pairwise_text = "-" if pairwise is None else f"{pairwise:.1f}" + ("" if "pairwise_seconds" in row else "*")
+        recall_text = f"{row['recall']:.3f}" if "recall" in row else "-"
+        print(f"{n:>8} {indexed:>10.3f} {row['microseconds_per_title']:>9.1f} {engine.comparisons:>12} "
+              f"{len(pairs):>8} {pairwise_text:>11} {recall_text:>7}")
+        results.append(row)
+
+    print("* extrapolated from the largest pairwise run")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
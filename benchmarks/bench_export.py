@@ -0,0 +1,171 @@
+"""
+Payload size and time to first render: whole SQLite file vs static JSON export.
+
+    python benchmarks/bench_export.py --days 90
+
+Builds a synthetic database (10 topics, N days of scraped articles with
+bodies and one watchlist per topic and day), exports it with
+src/export_static.py, and serves both over a local aiohttp server.
+
+before: fetch the .db file and run the page's watchlist query on it
+        (sqlite3 here, sql.js in the browser, which also downloads its ~1 MB
+        wasm runtime on top)
+after:  fetch manifest.json, then the latest watchlist file, gzip-encoded
+
+Each is measured on loopback, and modelled for a 10 Mbit/s link with 50 ms
+round trips, which is closer to what a visitor sees.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from datetime import date, timedelta
+
+import aiohttp
+from aiohttp import web
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+warnings.filterwarnings("ignore", message="Using slow pure-python SequenceMatcher")
+from src.db import Database
+from src.export_static import export_static
+from src.initialize_db import LEGACY_TOPIC_TABLES, create_database_and_tables
+
+LINK_BYTES_PER_S = 10e6 / 8
+RTT_S = 0.05
+
+
+def build_db(path: str, days: int, articles_per_day: int, body_bytes: int):
+    create_database_and_tables(path)
+    rng = random.Random(5)
+    words = "government minister talks border economy election court protest summit trade".split()
+    conn = sqlite3.connect(path)
+    start = date.today() - timedelta(days=days - 1)
+    for d in range(days):
+        day = (start + timedelta(days=d)).isoformat()
+        for topic in LEGACY_TOPIC_TABLES:
+            rows = []
+            for i in range(articles_per_day):
+                body = " ".join(rng.choices(words, k=body_bytes // 8))
+                rows.append((topic, f"https://news.example/{topic}/{day}/{i}", f"Title {i}", day, body,
+                             "short", " ".join(rng.choices(words, k=120)), "neutral"))
+            conn.executemany('''
+            INSERT INTO articles (topic, url, title, date_added, news_body, short_title_en, summary_en, sentiment)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+            watchlist = " ".join(rng.choices(words, k=600))
+            urls = json.dumps([row[1] for row in rows])
+            conn.execute("INSERT INTO watchlist (country, date_added, watchlist, urls_used) VALUES (?, ?, ?, ?)",
+                         (topic, day, watchlist, urls))
+    conn.commit()
+    conn.close()
+
+
+async def before(session, base_url, tmp):
+    requests = wire = 0
+    async with session.get(f"{base_url}/sensusmundi.db") as response:
+        data = await response.read()
+    requests, wire = 1, len(data)
+    copy = os.path.join(tmp, 'downloaded.db')
+    with open(copy, 'wb') as f:
+        f.write(data)
+    conn = sqlite3.connect(copy)
+    row = conn.execute('''
+    SELECT watchlist, country, date_added, urls_used FROM watchlist
+    WHERE country = 'UK' ORDER BY date_added DESC LIMIT 1''').fetchone()
+    conn.close()
+    assert row
+    return requests, wire
+
+
+async def after(session, base_url, tmp):
+    wire = 0
+    headers = {'Accept-Encoding': 'gzip'}
+    async with session.get(f"{base_url}/data/manifest.json", headers=headers) as response:
+        manifest = await response.json()
+        wire += int(response.headers.get('Content-Length', 0))
+    async with session.get(f"{base_url}/data/{manifest['countries']['UK']['latest']}", headers=headers) as response:
+        watchlist = await response.json()
+        wire += int(response.headers.get('Content-Length', 0))
+    assert watchlist['watchlist']
+    return 2, wire
+
+
+def static_handler(root: str):
+    async def handle(request):
+        path = os.path.join(root, request.match_info['path'])
+        # Serve the precompressed copy when there is one, like nginx gzip_static
+        if 'gzip' in request.headers.get('Accept-Encoding', '') and os.path.exists(path + '.gz'):
+            return web.FileResponse(path + '.gz', headers={'Content-Encoding': 'gzip', 'Content-Type': 'application/json'})
+        return web.FileResponse(path)
+    return handle
+
+
+async def measure(root, tmp, repeat):
+    app = web.Application()
+    app.router.add_get('/{path:.*}', static_handler(root))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    results = {}
+    try:
+        for name, scenario in (('before', before), ('after', after)):
+            timings = []
+            for _ in range(repeat):
+                async with aiohttp.ClientSession() as session:
+                    start = time.perf_counter()
+                    requests, wire = await scenario(session, base_url, tmp)
+                    timings.append(time.perf_counter() - start)
+            local = statistics.median(timings)
+            results[name] = {
+                'requests': requests,
+                'wire_bytes': wire,
+                'local_ms': local * 1000,
+                'modelled_ms': (local + requests * RTT_S + wire / LINK_BYTES_PER_S) * 1000,
+            }
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--articles-per-day", type=int, default=20)
+    parser.add_argument("--body-bytes", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'site')
+        os.makedirs(root)
+        db_path = os.path.join(root, 'sensusmundi.db')
+        build_db(db_path, args.days, args.articles_per_day, args.body_bytes)
+        db = Database(db_path)
+        export_static(os.path.join(root, 'data'), db)
+        db.close()
+        results = asyncio.run(measure(root, tmp, args.repeat))
+
+    for name, row in results.items():
+        print(f"{name:<7} {row['requests']} request(s) {row['wire_bytes'] / 1024:>10.1f} KiB on the wire  "
+              f"{row['local_ms']:>8.1f} ms loopback  {row['modelled_ms']:>8.0f} ms at 10 Mbit/s + 50 ms RTT")
+    print(f"payload {results['before']['wire_bytes'] / results['after']['wire_bytes']:.0f}x smaller, "
+          f"first render {results['before']['modelled_ms'] / results['after']['modelled_ms']:.0f}x sooner (modelled)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
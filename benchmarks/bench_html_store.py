@@ -0,0 +1,137 @@
+"""
+Re-fetching article pages through the raw HTML store, and reparsing from it.
+
+    python benchmarks/bench_html_store.py --articles 1000
+    python benchmarks/bench_html_store.py --articles 2000 --latency 0.1 --workers 8
+
+Serves `--articles` pages from a FakeNewsFarm that answers each request after
+`--latency` seconds, and fetches them all with one ArticleFetcher, first
+without a store (what every re-scrape cost before it):
+
+- no store:    every page downloaded, nothing kept
+
+then with an empty store in a temporary directory, three times:
+
+- cold:        every page downloaded and stored (a first scrape)
+- revalidate:  stored copies are stale, so each page is a conditional GET
+               the farm answers with a 304 (what a re-scrape costs now)
+- fresh:       inside the freshness window, served without any request
+
+then rebuilds every article's body from the store with src/reparse.py, as
+`--workers` parse processes. Reported per pass: wall time, pages per second,
+requests the farm answered, store hit rate, MB downloaded and MB served from
+the store instead; for the reparse, articles per second; and the store's
+size on disk against the HTML it holds.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import aiohttp
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+warnings.filterwarnings("ignore", message="Using slow pure-python SequenceMatcher")
+from src.ScrapeNews import PARSE_WORKERS, ArticleFetcher
+from src.db import Database
+from src.fake_servers import FakeNewsFarm, ServerThread
+from src.html_store import HtmlStore
+from src.initialize_db import create_database_and_tables
+from src.reparse import reparse
+
+# (name, store freshness in seconds, or None to fetch without the store)
+PASSES = (('no store', None), ('cold', 0), ('revalidate', 0), ('fresh', 3600))
+
+
+def store_bytes(store: HtmlStore) -> int:
+    objects = os.path.join(store.root, 'objects')
+    return sum(os.path.getsize(os.path.join(d, name)) for d, _, files in os.walk(objects) for name in files)
+
+
+async def fetch_passes(farm: FakeNewsFarm, urls, store: HtmlStore):
+    results = {}
+    async with aiohttp.ClientSession() as session:
+        for name, fresh_seconds in PASSES:
+            fetcher = ArticleFetcher(session, store=store)
+            if fresh_seconds is None:
+                fetcher.store = None
+            else:
+                store.fresh_seconds = fresh_seconds
+            stats, requests = dict(store.stats), farm.requests
+            start = time.perf_counter()
+            await asyncio.gather(*[fetcher.fetch(url) for url in urls])
+            seconds = time.perf_counter() - start
+            hits = sum(store.stats[k] - stats[k] for k in ('fresh', 'not_modified'))
+            results[name] = {
+                'seconds': seconds,
+                'pages_per_second': len(urls) / seconds,
+                'requests': farm.requests - requests,
+                'hit_rate': hits / len(urls),
+                'mb_downloaded': fetcher.bytes_fetched / 1e6,
+                'mb_saved': (store.stats['bytes_saved'] - stats['bytes_saved']) / 1e6,
+            }
+    return results
+
+
+def reparse_all(tmp: str, urls, store: HtmlStore, workers: int):
+    db_path = os.path.join(tmp, 'bench.db')
+    create_database_and_tables(db_path)
+    db = Database(db_path)
+    db.executemany("INSERT INTO articles (topic, url, title, body_length) VALUES ('UK', ?, ?, 0)",
+                   [(url, f"Story {i}") for i, url in enumerate(urls)])
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = reparse('2000-01-01', '2100-01-01', workers=workers, db=db, store=store)
+    db.close()
+    assert report['reparsed'] == len(urls), report
+    return {'seconds': report['seconds'], 'articles_per_second': len(urls) / report['seconds'],
+            'changed': report['changed']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the farm takes per request")
+    parser.add_argument("--sites", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=PARSE_WORKERS, help="parse processes for the reparse")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args()
+
+    farm = FakeNewsFarm(sites=args.sites, latency=args.latency)
+    with ServerThread(farm), tempfile.TemporaryDirectory() as tmp:
+        urls = [farm.article_url(f"news{i % 200}.example", i) for i in range(args.articles)]
+        store = HtmlStore(os.path.join(tmp, 'html_store'))
+        results = {'articles': args.articles, 'latency': args.latency}
+        results['passes'] = asyncio.run(fetch_passes(farm, urls, store))
+        results['reparse'] = reparse_all(tmp, urls, store, args.workers)
+        results['store'] = {'html_mb': store.stats['bytes_downloaded'] / 1e6, 'disk_mb': store_bytes(store) / 1e6}
+        store.close()
+
+    print(f"{args.articles} articles, {args.latency * 1000:.0f} ms per request")
+    print(f"{'pass':>11} {'seconds':>8} {'pages/s':>8} {'requests':>9} {'hit rate':>9} {'MB down':>8} {'MB saved':>9}")
+    for name, r in results['passes'].items():
+        print(f"{name:>11} {r['seconds']:>8.2f} {r['pages_per_second']:>8.0f} {r['requests']:>9} "
+              f"{r['hit_rate']:>9.0%} {r['mb_downloaded']:>8.1f} {r['mb_saved']:>9.1f}")
+    r = results['reparse']
+    print(f"reparse: {r['seconds']:.2f}s, {r['articles_per_second']:.0f} articles/s with {args.workers} workers, "
+          f"no requests")
+    s = results['store']
+    print(f"store: {s['html_mb']:.1f} MB of HTML in {s['disk_mb']:.1f} MB on disk "
+          f"({s['html_mb'] / max(s['disk_mb'], 1e-9):.1f}x)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
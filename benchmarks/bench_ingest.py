@@ -0,0 +1,194 @@
+"""
+GDELT response -> records ready for insert_data: the streaming record path
+against the DataFrame path it replaced.
+
+    python benchmarks/bench_ingest.py --sizes 250 5000 20000
+    python benchmarks/bench_ingest.py --recordings benchmarks/fixtures/gdelt
+
+Both paths take the same DOC API response body and end with the top 20
+articles as insert_data records, through the same dedup and a BM25 rerank:
+
+- dataframe: json.loads of the whole body, pd.json_normalize, clean_dataframe's
+  copies and masks, iloc of the top rows, new columns, to_dict('records')
+  (the code as it was before src/gdelt_records.py, kept here as the reference)
+- stream: ArticleStreamParser over 64 KiB chunks into GdeltArticle records,
+  GdeltSearcher.clean_articles, then the top records themselves
+
+Per size and path the report has, for the parse alone (body to DataFrame or
+to a list of records), the wall time, the tracemalloc peak and the memory and
+allocated blocks per article the parsed articles keep; and for the whole path
+the wall time and peak. Dedup takes most of the whole path's time and is the
+same code in both. The body itself is built beforehand and not counted. Responses are synthetic GDELT articles, or
+with --recordings the articles saved by record_gdelt_responses (see
+bench_offline.py), repeated with distinct URLs and titles up to each size.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+warnings.filterwarnings("ignore", message="Using slow pure-python SequenceMatcher")
+from src.SearchGdelt import GdeltSearcher
+from src.dedup import find_near_duplicates
+from src.fake_servers import load_recordings, synthetic_gdelt_articles
+from src.gdelt_records import CHUNK_BYTES, parse_articles
+from src.rerank import BM25Reranker
+
+QUESTION = "government policy elections economy security"
+TOP_N = 20
+
+
+def make_body(n: int, recordings=None) -> bytes:
+    if recordings:
+        articles = []
+        while len(articles) < n:
+            for a in recordings[:n - len(articles)]:
+                copy = len(articles) // len(recordings)
+                articles.append({**a, 'url': f"{a['url']}#{copy}", 'title': f"{a.get('title', '')} {copy}"})
+    else:
+        articles = synthetic_gdelt_articles('bench', n, lambda domain, i: f"https://{domain}/articles/{i}")
+    return json.dumps({"articles": articles}, ensure_ascii=False).encode('utf-8')
+
+
+def chunks(body: bytes):
+    for i in range(0, len(body), CHUNK_BYTES):
+        yield body[i:i + CHUNK_BYTES]
+
+
+def dataframe_parse(body: bytes):
+    import pandas as pd
+    data = json.loads(body.decode('utf-8'), strict=False)["articles"]  # what requests' response.json() does
+    df = pd.json_normalize(data)
+    df = df.dropna(subset=['title'])
+    if 'content' not in df.columns:
+        df['content'] = ''
+    return df
+
+
+def dataframe_path(body: bytes):
+    df = dataframe_parse(body)
+    df.drop_duplicates(subset=['title'], inplace=True)
+    df = df[df['title'] != '']
+    pairs = find_near_duplicates(df['title'].tolist(), threshold=80)
+    df = df.drop(index=[df.index[p.dropped] for p in pairs])
+    docs = (df['title'] + ' ' + df['content'].fillna('')).str.strip().tolist()
+    reranked = BM25Reranker().rerank(QUESTION, docs, top_n=TOP_N)
+    top = df.iloc[[r.index for r in reranked.results[:TOP_N]]].copy()
+    top['relevance_score'] = [r.relevance_score for r in reranked.results[:TOP_N]]
+    top['date_added'] = datetime.now().strftime('%Y-%m-%d')
+    for col in ['short_title_en', 'summary_en', 'sentiment']:
+        top[col] = ''
+    return top.to_dict('records')
+
+
+def stream_parse(body: bytes):
+    return parse_articles(chunks(body))
+
+
+def stream_path(body: bytes):
+    articles = GdeltSearcher.clean_articles(stream_parse(body))
+    docs = [f"{a.title} {a.content}".strip() for a in articles]
+    reranked = BM25Reranker().rerank(QUESTION, docs, top_n=TOP_N)
+    top = []
+    for r in reranked.results[:TOP_N]:
+        article = articles[r.index]
+        article.relevance_score = r.relevance_score
+        top.append(article)
+    return top
+
+
+PATHS = {'dataframe': (dataframe_parse, dataframe_path), 'stream': (stream_parse, stream_path)}
+
+
+def timed(fn, body: bytes, repeat: int):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn(body)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def peak_mb(fn, body: bytes) -> float:
+    gc.collect()
+    tracemalloc.start()
+    fn(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def measure(name: str, body: bytes, n: int, repeat: int):
+    parse, path = PATHS[name]
+    with contextlib.redirect_stdout(io.StringIO()):  # clean_articles prints what it dropped
+        path(make_body(10))  # warm up: imports, caches
+        parse_seconds, _ = timed(parse, body, repeat)
+        path_seconds, result = timed(path, body, repeat)
+        assert len(result) == min(TOP_N, n)
+        parse_peak, path_peak = peak_mb(parse, body), peak_mb(path, body)
+
+    # What the parsed articles themselves hold on to, after the parse's temporaries are gone
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    parsed = parse(body)
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    diff = [s for s in after.compare_to(before, 'filename') if s.size_diff > 0]
+    del parsed
+    return {
+        'parse_seconds': parse_seconds,
+        'parse_peak_mb': parse_peak,
+        'bytes_per_article': sum(s.size_diff for s in diff) / n,
+        'blocks_per_article': sum(s.count_diff for s in diff) / n,
+        'seconds': path_seconds,
+        'peak_mb': path_peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 5000, 20000],
+                        help="articles per response (dedup grows faster than linearly, so large sizes take a while)")
+    parser.add_argument("--recordings", help="directory of recorded DOC API responses to replay instead of synthetic ones")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args()
+
+    recordings = None
+    if args.recordings:
+        recordings = [a for articles in load_recordings(args.recordings).values() for a in articles]
+
+    results = {}
+    print(f"{'articles':>9} {'path':>10} {'body MB':>8} | {'parse s':>8} {'peak MB':>8} {'B/article':>10} "
+          f"{'blocks/article':>15} | {'total s':>8} {'peak MB':>8}")
+    for n in args.sizes:
+        body = make_body(n, recordings)
+        results[n] = {}
+        for name in PATHS:
+            r = results[n][name] = measure(name, body, n, args.repeat)
+            print(f"{n:>9} {name:>10} {len(body) / 1e6:>8.1f} | {r['parse_seconds']:>8.3f} {r['parse_peak_mb']:>8.1f} "
+                  f"{r['bytes_per_article']:>10.0f} {r['blocks_per_article']:>15.1f} | {r['seconds']:>8.3f} {r['peak_mb']:>8.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Cost of the instrumentation in src/metrics.py.
+
+    python benchmarks/bench_metrics.py --articles 20000
+
+- micro: nanoseconds per span, counter increment and histogram observation
+- pipeline: an asyncio run shaped like the article stages (fetch, parse,
+  summarize, persist per article, concurrent workers, a little CPU work per
+  stage) with metrics on and off, plus the size of the exported report
+
+The real stages wait milliseconds to seconds on the network or OpenAI, so
+the pipeline figure is an upper bound on the relative overhead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import warnings
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+warnings.filterwarnings("ignore", message="Using slow pure-python SequenceMatcher")
+from src.metrics import Metrics
+
+STAGES = ('fetch', 'parse', 'summarize', 'persist')
+TOPICS = ('UK', 'NATO', 'China', 'USA')
+
+
+def per_call_ns(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e9
+
+
+def micro(n):
+    metrics = Metrics(max_spans=10000)
+
+    def span():
+        with metrics.span('fetch', topic='UK', article_id=1):
+            pass
+
+    def bare():
+        pass
+
+    return {
+        'span_ns': per_call_ns(span, n) - per_call_ns(bare, n),
+        'inc_ns': per_call_ns(lambda: metrics.inc('fetch_bytes_total', 100), n),
+        'observe_ns': per_call_ns(lambda: metrics.observe('db_write_wait_seconds', 0.01), n),
+    }
+
+
+async def pipeline(metrics: Metrics, articles: int, workers: int, work: int):
+    queue = asyncio.Queue()
+    for i in range(articles):
+        queue.put_nowait((TOPICS[i % len(TOPICS)], i))
+
+    async def worker():
+        while not queue.empty():
+            topic, article_id = queue.get_nowait()
+            for stage in STAGES:
+                with metrics.span(stage, topic=topic, article_id=article_id):
+                    sum(range(work))  # stand-in for the stage's own CPU work
+                    await asyncio.sleep(0)
+            metrics.inc('fetch_bytes_total', 50000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--work", type=int, default=2000, help="CPU work per stage (range length summed)")
+    parser.add_argument("--calls", type=int, default=200000, help="iterations for the micro benchmarks")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = micro(args.calls)
+    print(f"span {results['span_ns']:.0f} ns, counter {results['inc_ns']:.0f} ns, histogram {results['observe_ns']:.0f} ns")
+
+    timings = {}
+    for label, enabled in (('off', False), ('on', True)):
+        runs = []
+        for _ in range(args.repeat):
+            metrics = Metrics(enabled=enabled)
+            runs.append(asyncio.run(pipeline(metrics, args.articles, args.workers, args.work)))
+        timings[label] = statistics.median(runs)
+        print(f"metrics {label:<3} {args.articles} articles x {len(STAGES)} stages in {timings[label]:.3f}s")
+    report = json.dumps(metrics.report())
+    results.update(off_s=timings['off'], on_s=timings['on'], overhead=timings['on'] / timings['off'] - 1,
+                   report_bytes=len(report), prometheus_bytes=len(metrics.prometheus()))
+    print(f"overhead {results['overhead']:.1%}; report {results['report_bytes'] / 1024:.0f} KiB JSON, "
+          f"{results['prometheus_bytes'] / 1024:.1f} KiB Prometheus text")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
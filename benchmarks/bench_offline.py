@@ -0,0 +1,322 @@
+"""
+End-to-end run of search, scrape and watchlist against local fake services.
+
+    python benchmarks/bench_offline.py --articles 1000
+    python benchmarks/bench_offline.py --articles 1000 10000 50000 --output bench-$(git rev-parse --short HEAD).json
+    python benchmarks/bench_offline.py --articles 10000 --compare bench-main.json
+    python benchmarks/bench_offline.py --record recordings/      # save the live GDELT answers once
+    python benchmarks/bench_offline.py --recordings recordings/  # and replay them
+
+Starts the stand-ins from src/fake_servers.py and src/fake_openai.py in a
+background thread, gives each run a fresh database, seen index, HTML store and
+LLM cache (off) in a temporary directory, and runs the real code for every topic in
+src/query_parameters.json:
+
+- search:    GdeltSearcher.search_gdelt on each topic's share of the articles
+             (near-duplicate and seen filtering, Cohere rerank, insert of the top 20)
+- scrape:    run_news_scraper per topic. The articles search did not select are
+             inserted as pending first, as if earlier runs had selected them, so
+             the scraper fetches, parses, summarises and stores all of them
+- watchlist: run_watchlist_generator over all topics, map-reducing the summaries
+
+For each size it reports every stage's wall time, items per second and the
+peak RSS so far (the process, which includes the fake servers, and the parse
+workers), the end-to-end wall time, and the span latencies from src/metrics.py.
+--tracemalloc adds the peak Python heap per stage, at a large cost in speed.
+Peak RSS only grows, so give sizes in increasing order or one per invocation.
+--output writes the results as JSON with the git commit; --compare prints
+the change against an earlier --output file. Recorded GDELT answers are
+padded with synthetic articles up to the requested size.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+from unittest import mock
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+warnings.filterwarnings("ignore", message="Using slow pure-python SequenceMatcher")
+from src import body_store as body_store_module
+from src import db as db_module
+from src import html_store as html_store_module
+from src import llm_cache as llm_cache_module
+from src import openai_client as openai_client_module
+from src import preprocess as preprocess_module
+from src import seen_index as seen_index_module
+from src.GetWatchlist import run_watchlist_generator
+from src.ScrapeNews import run_news_scraper
+from src.SearchGdelt import GdeltSearcher
+from src.db import Database
+from src.fake_openai import FakeOpenAIServer
+from src.fake_servers import (
+    FakeCohereServer,
+    FakeGdeltServer,
+    FakeNewsFarm,
+    ServerThread,
+    load_recordings,
+    record_gdelt_responses,
+    synthetic_gdelt_articles,
+)
+from src.html_store import HtmlStore
+from src.initialize_db import create_database_and_tables, insert_data
+from src.llm_cache import LLMCache
+from src.metrics import get_metrics
+from src.openai_client import OPENAI_MAX_CONCURRENCY, OpenAIClient
+from src.seen_index import SeenIndex
+
+QUERY_PARAMS_PATH = os.path.join(project_root, 'src', 'query_parameters.json')
+STAGES = ('search', 'scrape', 'watchlist')
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF) -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=project_root, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=project_root,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def write_query_params(path, gdelt, topics):
+    with open(QUERY_PARAMS_PATH) as f:
+        params = json.load(f)
+    params['topics'] = [t for t in params['topics'] if t['topic'] in topics]
+    for topic in params['topics']:
+        topic['gdelt_query_string'] = gdelt.query_url(topic['topic'])
+    with open(path, 'w') as f:
+        json.dump(params, f)
+
+
+def gdelt_articles(n, topics, farm, recordings, seed):
+    per_topic = {topic: n // len(topics) + (i < n % len(topics)) for i, topic in enumerate(topics)}
+    articles = {}
+    for topic, count in per_topic.items():
+        recorded = recordings.get(topic, [])[:count]
+        synthetic = synthetic_gdelt_articles(
+            topic, count - len(recorded), lambda domain, i, topic=topic: farm.article_url(f"{domain}/{topic.lower()}", i),
+            seed=seed)
+        articles[topic] = recorded + synthetic
+    return articles
+
+
+class Stage:
+    """Times one stage and records items/s, peak RSS and (with tracemalloc on) the peak Python heap."""
+
+    def __init__(self, results, name):
+        self.results = results
+        self.name = name
+
+    def __enter__(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        row = self.results.setdefault(self.name, {})
+        row.update(seconds=round(seconds, 3), peak_rss_mb=round(peak_rss_mb(), 1),
+                   workers_peak_rss_mb=round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1))
+        if 'items' in row:
+            row['items_per_s'] = round(row['items'] / seconds, 2) if seconds else None
+        if tracemalloc.is_tracing():
+            row['python_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 1)
+        return False
+
+
+def run_size(n, args, topics, services, recordings):
+    gdelt, farm, cohere, openai = services
+    stages = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        params_path = os.path.join(tmp, 'query_parameters.json')
+        write_query_params(params_path, gdelt, topics)
+        db_path = os.path.join(tmp, 'bench.db')
+        create_database_and_tables(db_path)
+        db = Database(db_path)
+        seen = SeenIndex(os.path.join(tmp, 'seen_index.db'))
+        cache = LLMCache(os.path.join(tmp, 'llm_cache.db'), mode='off')
+        html_store = HtmlStore(os.path.join(tmp, 'html_store'))
+        client = OpenAIClient("bench-key", base_url=openai.base_url, requests_per_minute=10 ** 7,
+                              tokens_per_minute=10 ** 12, max_concurrency=args.openai_concurrency)
+        gdelt.articles = gdelt_articles(n, topics, farm, recordings, seed=n)
+        searcher = GdeltSearcher(params_path, "bench-key", args.rerank, cohere_base_url=cohere.base_url)
+        metrics = get_metrics()
+        metrics.reset()
+        counters = {'gdelt': gdelt.requests, 'pages': farm.requests, 'page_errors': farm.errors,
+                    'cohere': cohere.requests, 'openai': openai.requests}
+
+        patches = [
+            mock.patch.object(db_module, '_database', db),
+            mock.patch.object(seen_index_module, '_seen_index', seen),
+            mock.patch.object(llm_cache_module, '_llm_cache', cache),
+            mock.patch.object(openai_client_module, '_client', client),
+            mock.patch.object(body_store_module, '_body_store', None),
+            mock.patch.object(html_store_module, '_html_store', html_store),
+            mock.patch.object(preprocess_module, '_preprocessor', None),
+        ]
+        quiet = contextlib.redirect_stdout(open(os.devnull, 'w')) if not args.verbose else contextlib.nullcontext()
+        with contextlib.ExitStack() as stack:
+            for patch in patches:
+                stack.enter_context(patch)
+            start = time.perf_counter()
+            with stack.enter_context(quiet):
+                stages['search'] = {'items': n}
+                with Stage(stages, 'search'):
+                    for topic in topics:
+                        searcher.search_gdelt(topic)
+                stages['search']['ok'] = db.query("SELECT COUNT(*) FROM articles")[0][0]
+
+                for topic in topics:
+                    insert_data(topic, gdelt.articles[topic])
+                stages['scrape'] = {'items': db.query("SELECT COUNT(*) FROM articles WHERE body_length IS NULL")[0][0]}
+                with Stage(stages, 'scrape'):
+                    for topic in topics:
+                        asyncio.run(run_news_scraper(topic))
+                stages['scrape']['ok'] = db.query("SELECT COUNT(*) FROM articles WHERE summary_en != ''")[0][0]
+
+                stages['watchlist'] = {'items': stages['scrape']['ok']}  # summaries condensed
+                with Stage(stages, 'watchlist'):
+                    asyncio.run(run_watchlist_generator(topics))
+                stages['watchlist']['ok'] = db.query("SELECT COUNT(*) FROM watchlist")[0][0]
+            wall = time.perf_counter() - start
+        db.close()
+        seen.close()
+        cache.close()
+        html_store.close()
+
+    spans = {stage: {'count': h.count, 'seconds': round(h.sum, 3), 'p50': h.quantile(0.5),
+                     'p90': h.quantile(0.9), 'p99': h.quantile(0.99)}
+             for stage, h in sorted(metrics.stages().items())}
+    calls = {'gdelt': gdelt.requests, 'pages': farm.requests, 'page_errors': farm.errors,
+             'cohere': cohere.requests, 'openai': openai.requests}
+    return {
+        'articles': n,
+        'topics': len(topics),
+        'wall_seconds': round(wall, 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'stages': stages,
+        'spans': spans,
+        'requests': {name: calls[name] - counters[name] for name in calls},
+    }
+
+
+def print_run(run):
+    print(f"\n{run['articles']} articles, {run['topics']} topics: {run['wall_seconds']:.1f}s end to end, "
+          f"peak RSS {run['peak_rss_mb']:.0f} MB")
+    for name in STAGES:
+        row = run['stages'][name]
+        heap = f", heap {row['python_peak_mb']:.0f} MB" if 'python_peak_mb' in row else ""
+        print(f"  {name:<10} {row['seconds']:>8.1f}s {row['items']:>7} items {row['items_per_s'] or 0:>9.1f}/s "
+              f"{row['ok']:>7} ok  RSS {row['peak_rss_mb']:.0f} MB, workers {row['workers_peak_rss_mb']:.0f} MB{heap}")
+    for stage, span in run['spans'].items():
+        print(f"    {stage:<16} {span['count']:>7} spans p50 {span['p50']:.3f}s p99 {span['p99']:.3f}s")
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {run['articles']: run for run in baseline['runs']}
+    print(f"\nAgainst {baseline_path} ({(baseline.get('commit') or 'unknown')[:10]}):")
+    differing = sorted(k for k in set(results['settings']) | set(baseline.get('settings', {}))
+                       if k != 'articles' and results['settings'].get(k) != baseline.get('settings', {}).get(k))
+    if differing:
+        print(f"  settings differ: {', '.join(differing)}")
+    for run in results['runs']:
+        old = before.get(run['articles'])
+        if old is None:
+            print(f"  {run['articles']} articles: not in the baseline")
+            continue
+
+        def change(new, prev):
+            return f"{(new / prev - 1) * 100:+.1f}%" if prev else "n/a"
+
+        print(f"  {run['articles']} articles: wall {old['wall_seconds']:.1f}s -> {run['wall_seconds']:.1f}s "
+              f"({change(run['wall_seconds'], old['wall_seconds'])}), peak RSS "
+              f"{old['peak_rss_mb']:.0f} -> {run['peak_rss_mb']:.0f} MB ({change(run['peak_rss_mb'], old['peak_rss_mb'])})")
+        for name in STAGES:
+            new_rate, old_rate = run['stages'][name]['items_per_s'], old['stages'][name]['items_per_s']
+            if new_rate and old_rate:
+                print(f"    {name:<10} {old_rate:>9.1f}/s -> {new_rate:>9.1f}/s ({change(new_rate, old_rate)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, nargs="+", default=[1000], help="GDELT articles per run, over all topics")
+    parser.add_argument("--topics", nargs="+", help="topics to run (default: all in src/query_parameters.json)")
+    parser.add_argument("--rerank", default='hybrid', help="rerank backend for GdeltSearcher")
+    parser.add_argument("--sites", type=int, default=50, help="publisher sites in the news farm")
+    parser.add_argument("--page-latency", type=float, default=0.02, help="seconds per article page")
+    parser.add_argument("--page-jitter", type=float, default=0.05, help="extra random seconds per page, up to")
+    parser.add_argument("--page-error-rate", type=float, default=0.01, help="share of pages answered with a 503")
+    parser.add_argument("--page-words", type=int, default=600)
+    parser.add_argument("--openai-latency", type=float, default=0.05, help="seconds per fake OpenAI call")
+    parser.add_argument("--openai-concurrency", type=int, default=OPENAI_MAX_CONCURRENCY)
+    parser.add_argument("--cohere-latency", type=float, default=0.05, help="seconds per fake Cohere rerank call")
+    parser.add_argument("--recordings", help="replay recorded GDELT answers (<topic>.json) from this directory")
+    parser.add_argument("--record", metavar="DIR", help="save the live GDELT answer for every topic to DIR and exit")
+    parser.add_argument("--tracemalloc", action="store_true", help="also record the peak Python heap per stage (slow)")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own output")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="print the change against an earlier --output file")
+    args = parser.parse_args()
+
+    if args.record:
+        record_gdelt_responses(QUERY_PARAMS_PATH, args.record)
+        return
+
+    with open(QUERY_PARAMS_PATH) as f:
+        topics = args.topics or [t['topic'] for t in json.load(f)['topics']]
+    gdelt = FakeGdeltServer()
+    farm = FakeNewsFarm(sites=args.sites, latency=args.page_latency, jitter=args.page_jitter,
+                        error_rate=args.page_error_rate, words=args.page_words)
+    cohere = FakeCohereServer(latency=args.cohere_latency)
+    openai = FakeOpenAIServer(latency=args.openai_latency, keep_payloads=False)
+    commit, dirty = git_commit()
+    results = {
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'settings': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'record', 'verbose')},
+        'runs': [],
+    }
+    if args.tracemalloc:
+        tracemalloc.start()
+    with ServerThread(gdelt, farm, cohere, openai):
+        recordings = load_recordings(args.recordings, farm.article_url) if args.recordings else {}
+        for n in args.articles:
+            run = run_size(n, args, topics, (gdelt, farm, cohere, openai), recordings)
+            results['runs'].append(run)
+            print_run(run)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Prompt tokens, latency and cost of article summaries with and without pre-processing.
+
+    python benchmarks/bench_preprocess.py
+    python benchmarks/bench_preprocess.py --articles 1000 --budget 800 --latency-per-1k 0.5
+
+Builds a corpus of `--articles` synthetic bodies across `--domains` publishers
+in a temporary database. Every publisher wraps its stories in its own
+recurring paragraphs (newsletter and support notices, a standard footer) and
+the generic "Read more"/"Advertisement" lines; story lengths are log-normal,
+so a few run to many thousands of words. Boilerplate is learned from the
+corpus (src/preprocess.py), then every article is summarised with
+ScrapeNews.get_completion against the local fake OpenAI server
+(src/fake_openai.py), whose latency grows with the prompt, twice:
+
+- raw:       the body as newspaper extracted it (pre-processing disabled)
+- prepared:  boilerplate dropped, cut to `--budget` tokens around the topic
+
+Reported per pass: estimated article tokens, the prompt tokens the server
+counted, mean/p50/p95 request latency, wall time and cost at gpt-4o-mini
+list prices; for the prepared pass also the pre-processing time per article,
+the boilerplate paragraphs that got through and the story paragraphs wrongly
+dropped as boilerplate.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from unittest import mock
+
+import aiohttp
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+warnings.filterwarnings("ignore", message="Using slow pure-python SequenceMatcher")
+from src import ScrapeNews
+from src.db import Database
+from src.fake_openai import FakeOpenAIServer
+from src.fake_servers import STOPWORDS, WORDS
+from src.initialize_db import create_database_and_tables
+from src.llm_cache import LLMCache
+from src.openai_client import OpenAIClient
+from src.preprocess import ArticlePreprocessor, BoilerplateModel, learn_boilerplate, split_paragraphs
+from src.body_store import BodyStore
+from src.topics import get_topic_registry
+
+INPUT_USD_PER_M = 0.15  # gpt-4o-mini
+OUTPUT_USD_PER_M = 0.60
+TOPICS = ('UK', 'Climate')
+
+
+def make_corpus(articles: int, domains: int, seed: int = 0):
+    """[(topic, url, body, boilerplate paragraphs)] with per-publisher boilerplate around each story."""
+    rng = random.Random(seed)
+    terms = {topic: get_topic_registry().get(topic).question_string.replace(',', ' ').split() for topic in TOPICS}
+
+    def sentence(topic=None):
+        words = [rng.choice(STOPWORDS) if rng.random() < 0.4 else rng.choice(WORDS[:2000]) for _ in range(rng.randint(12, 30))]
+        if topic:
+            words[rng.randrange(len(words))] = rng.choice(terms[topic])
+        return " ".join(words).capitalize() + "."
+
+    sites = [f"news{d}.example" for d in range(domains)]
+    footers = {site: [f"Sign up to the {site} morning briefing and get the day's top stories in your inbox.",
+                      f"You can support independent journalism at {site} from as little as 1 a month. "
+                      f"Every contribution, however big or small, powers our reporting for the long term.",
+                      f"{site} is not responsible for the content of external sites. Find out about our approach "
+                      f"to external linking and our editorial guidelines."] for site in sites}
+    corpus = []
+    for i in range(articles):
+        topic, site = TOPICS[i % len(TOPICS)], rng.choice(sites)
+        words = min(int(rng.lognormvariate(math.log(700), 0.8)), 20000)
+        story = []
+        while sum(len(p.split()) for p in story) < words:
+            story.append(" ".join(sentence(topic if rng.random() < 0.25 else None) for _ in range(rng.randint(2, 5))))
+        boilerplate = ["Advertisement", f"Read more: {sentence()}"] + footers[site]
+        paragraphs = story[:2] + boilerplate[:2] + story[2:] + boilerplate[2:]
+        corpus.append((topic, f"https://{site}/{topic.lower()}/{i}", "\n\n".join(paragraphs), boilerplate))
+    return corpus
+
+
+async def summarise_all(corpus, preprocessor, args):
+    server = FakeOpenAIServer(latency=args.latency, latency_per_1k_tokens=args.latency_per_1k, keep_payloads=False)
+    await server.start()
+    try:
+        client = OpenAIClient("bench-key", base_url=server.base_url, requests_per_minute=10 ** 7,
+                              tokens_per_minute=10 ** 12, max_concurrency=args.concurrency)
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(ScrapeNews, 'get_openai_client', return_value=client), \
+                mock.patch.object(ScrapeNews, 'get_llm_cache', return_value=LLMCache(os.path.join(tmp, 'cache.db'), mode='off')), \
+                mock.patch.object(ScrapeNews, 'get_preprocessor', return_value=preprocessor):
+            async with aiohttp.ClientSession() as session:
+                start = time.perf_counter()
+                await asyncio.gather(*[ScrapeNews.get_completion(session, body, topic, url) for topic, url, body, _ in corpus])
+                elapsed = time.perf_counter() - start
+    finally:
+        await server.stop()
+    latencies = sorted(seconds for _, seconds in preprocessor._requests)
+    s = preprocessor.stats
+    return {
+        'seconds': elapsed,
+        'article_tokens': s['tokens_out'],
+        'prompt_tokens': server.prompt_tokens,
+        'mean_latency': statistics.mean(latencies),
+        'p50_latency': latencies[len(latencies) // 2],
+        'p95_latency': latencies[int(len(latencies) * 0.95)],
+        'usd': server.prompt_tokens * INPUT_USD_PER_M / 1e6 + server.completion_tokens * OUTPUT_USD_PER_M / 1e6,
+        'prepare_ms_per_article': 1000 * s['seconds'] / max(s['articles'], 1),
+    }
+
+
+def boilerplate_accuracy(corpus, preprocessor):
+    """(boilerplate paragraphs kept, story paragraphs dropped as boilerplate) over the corpus."""
+    kept = wrongly_dropped = 0
+    for topic, url, body, boilerplate in corpus:
+        domain = url.split('/')[2]
+        for paragraph in split_paragraphs(body):
+            is_boilerplate = preprocessor.boilerplate.is_boilerplate(domain, paragraph)
+            if paragraph in boilerplate:
+                kept += not is_boilerplate
+            else:
+                wrongly_dropped += is_boilerplate
+    return kept, wrongly_dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=500)
+    parser.add_argument("--domains", type=int, default=20)
+    parser.add_argument("--budget", type=int, default=1200, help="article tokens per prompt in the prepared pass")
+    parser.add_argument("--latency", type=float, default=0.2, help="fixed seconds per fake OpenAI request")
+    parser.add_argument("--latency-per-1k", type=float, default=0.3, help="extra seconds per 1k prompt tokens")
+    parser.add_argument("--concurrency", type=int, default=1000, help="OpenAI client concurrency; below --articles, requests queue")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.articles, args.domains)
+    results = {'articles': args.articles, 'domains': args.domains, 'budget': args.budget}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        create_database_and_tables(db_path)
+        db = Database(db_path)
+        db.executemany("INSERT INTO articles (topic, url, title, body_length) VALUES (?, ?, 'Story', ?)",
+                       [(topic, url, len(body)) for topic, url, body, _ in corpus])
+        ids = dict(db.query("SELECT url, id FROM articles"))
+        BodyStore(db).put_many([(ids[url], body) for _, url, body, _ in corpus])
+        start = time.perf_counter()
+        boilerplate = learn_boilerplate(db)
+        results['learn_seconds'] = time.perf_counter() - start
+        db.close()
+
+    raw = ArticlePreprocessor(BoilerplateModel({}, None), enabled=False)
+    prepared = ArticlePreprocessor(boilerplate, budget_tokens=args.budget)
+    results['passes'] = {'raw': asyncio.run(summarise_all(corpus, raw, args)),
+                         'prepared': asyncio.run(summarise_all(corpus, prepared, args))}
+    results['boilerplate_kept'], results['story_dropped'] = boilerplate_accuracy(corpus, prepared)
+
+    print(f"{args.articles} articles from {args.domains} publishers, budget {args.budget} tokens, "
+          f"fake latency {args.latency:.2f} s + {args.latency_per_1k:.2f} s per 1k prompt tokens")
+    print(f"{'pass':>9} {'art. tokens':>12} {'prompt tokens':>14} {'mean s':>7} {'p50 s':>6} {'p95 s':>6} "
+          f"{'wall s':>7} {'USD':>8}")
+    for name, r in results['passes'].items():
+        print(f"{name:>9} {r['article_tokens']:>12} {r['prompt_tokens']:>14} {r['mean_latency']:>7.3f} "
+              f"{r['p50_latency']:>6.3f} {r['p95_latency']:>6.3f} {r['seconds']:>7.2f} {r['usd']:>8.4f}")
+    before, after = results['passes']['raw'], results['passes']['prepared']
+    print(f"prepared: {1 - after['prompt_tokens'] / before['prompt_tokens']:.0%} fewer prompt tokens, "
+          f"{1 - after['mean_latency'] / before['mean_latency']:.0%} lower mean latency, "
+          f"{after['prepare_ms_per_article']:.2f} ms pre-processing per article")
+    print(f"boilerplate: learned in {results['learn_seconds']:.2f}s, {results['boilerplate_kept']} boilerplate "
+          f"paragraphs kept, {results['story_dropped']} story paragraphs dropped as boilerplate")
+    print(prepared.report())
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
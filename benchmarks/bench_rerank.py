@@ -0,0 +1,157 @@
+"""
+Latency and ranking agreement of the rerank backends in src/rerank.py.
+
+    python benchmarks/bench_rerank.py --record   # fetch GDELT + Cohere once per topic, save fixtures
+    python benchmarks/bench_rerank.py            # replay the fixtures, no network
+
+A fixture (benchmarks/fixtures/rerank/<topic>.json) holds one topic's cleaned
+GDELT documents, its question_string, and the full Cohere ranking with the
+latency Cohere took. Replaying reports, per topic, the median latency of each
+local backend, the recorded Cohere latency, and how many of Cohere's top 20
+each backend also puts in its top 20. The hybrid row is BM25's top-K
+shortlist reranked by the recorded Cohere scores, i.e. what hybrid mode returns.
+
+Recording needs COHERE_API_KEY in src/config.py. Without fixtures the
+benchmark falls back to synthetic documents and only reports local latency
+and BM25/TF-IDF agreement.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import warnings
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+warnings.filterwarnings("ignore", message="Using slow pure-python SequenceMatcher")
+from src.rerank import BM25Reranker, RerankResponse, RerankResult, TfidfReranker, ranking_overlap
+
+FIXTURES_DIR = os.path.join(current_dir, 'fixtures', 'rerank')
+TOP_N = 20
+
+
+def record(topics, prefilter_k):
+    from src.config import COHERE_API_KEY, QUERY_PARAMS_PATH
+    from src.SearchGdelt import GdeltSearcher
+    searcher = GdeltSearcher(QUERY_PARAMS_PATH, COHERE_API_KEY, 'cohere')
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for topic in topics or [t['topic'] for t in searcher.query_params['topics']]:
+        articles = searcher.clean_articles(searcher.fetch_gdelt_articles(searcher.get_gdelt_query_string(topic)))
+        documents = [f"{a.title} {a.content}".strip() for a in articles]
+        query = searcher.get_question_string(topic)
+        start = time.perf_counter()
+        response = searcher.reranker.rerank(query, documents, top_n=len(documents))
+        latency = time.perf_counter() - start
+        fixture = {
+            'topic': topic,
+            'query': query,
+            'documents': documents,
+            'cohere': {'latency_s': latency, 'results': [[r.index, r.relevance_score] for r in response.results]},
+        }
+        with open(os.path.join(FIXTURES_DIR, f"{topic}.json"), 'w') as f:
+            json.dump(fixture, f, ensure_ascii=False)
+        print(f"Recorded {topic}: {len(documents)} documents, Cohere {latency * 1000:.0f} ms")
+
+
+def synthetic_fixtures(n_docs: int = 250, seed: int = 7):
+    with open(os.path.join(project_root, 'src', 'query_parameters.json')) as f:
+        topics = json.load(f)['topics']
+    rng = random.Random(seed)
+    filler = "report says officials week new city local market talks plan group after amid over".split()
+    for t in topics:
+        query_words = [w.strip(",.") for w in t['question_string'].split()]
+        documents = []
+        for _ in range(n_docs):
+            words = rng.choices(filler, k=rng.randint(6, 12))
+            words += rng.sample(query_words, k=min(len(query_words), rng.randint(0, 3)))
+            rng.shuffle(words)
+            documents.append(" ".join(words).capitalize())
+        yield {'topic': t['topic'], 'query': t['question_string'], 'documents': documents, 'cohere': None}
+
+
+def load_fixtures():
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.json'))):
+        with open(path) as f:
+            yield json.load(f)
+
+
+def median_latency(reranker, query, documents, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = reranker.rerank(query, documents, TOP_N)
+        timings.append(time.perf_counter() - start)
+    return response, statistics.median(timings)
+
+
+def hybrid_from_recording(shortlist: RerankResponse, cohere: RerankResponse) -> RerankResponse:
+    """Hybrid mode's answer: the shortlist, ordered by Cohere's scores for those documents."""
+    scores = {r.index: r.relevance_score for r in cohere.results}
+    ranked = sorted(shortlist.results, key=lambda r: -scores.get(r.index, 0.0))
+    return RerankResponse([RerankResult(r.index, scores.get(r.index, 0.0)) for r in ranked[:TOP_N]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="fetch GDELT and Cohere and write fixtures")
+    parser.add_argument("--topics", nargs="*", help="topics to record (default: all)")
+    parser.add_argument("--prefilter-k", type=int, default=50, help="hybrid shortlist size")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.topics, args.prefilter_k)
+        return
+
+    fixtures = list(load_fixtures())
+    if not fixtures:
+        print(f"No fixtures in {FIXTURES_DIR}, using synthetic documents (run with --record to capture real ones)\n")
+        fixtures = list(synthetic_fixtures())
+
+    bm25, tfidf = BM25Reranker(), TfidfReranker()
+    rows = []
+    for fixture in fixtures:
+        query, documents = fixture['query'], fixture['documents']
+        bm25_response, bm25_s = median_latency(bm25, query, documents, args.repeat)
+        tfidf_response, tfidf_s = median_latency(tfidf, query, documents, args.repeat)
+        row = {
+            'topic': fixture['topic'],
+            'documents': len(documents),
+            'bm25_ms': bm25_s * 1000,
+            'tfidf_ms': tfidf_s * 1000,
+            'bm25_vs_tfidf': ranking_overlap(bm25_response, tfidf_response, TOP_N),
+        }
+        if fixture['cohere']:
+            cohere = RerankResponse([RerankResult(i, s) for i, s in fixture['cohere']['results']])
+            shortlist = bm25.rerank(query, documents, args.prefilter_k)
+            row.update({
+                'cohere_ms': fixture['cohere']['latency_s'] * 1000,
+                'bm25_vs_cohere': ranking_overlap(bm25_response, cohere, TOP_N),
+                'tfidf_vs_cohere': ranking_overlap(tfidf_response, cohere, TOP_N),
+                'hybrid_vs_cohere': ranking_overlap(hybrid_from_recording(shortlist, cohere), cohere, TOP_N),
+            })
+        rows.append(row)
+
+    print(f"{'topic':<18}{'docs':>6}{'bm25 ms':>10}{'tfidf ms':>10}{'cohere ms':>11}"
+          f"{'bm25/tfidf':>12}{'bm25/coh':>10}{'tfidf/coh':>11}{'hybrid/coh':>12}")
+    for row in rows:
+        def fmt(key, width, pattern):
+            return f"{pattern.format(row[key]):>{width}}" if key in row else f"{'-':>{width}}"
+        print(f"{row['topic']:<18}{row['documents']:>6}{fmt('bm25_ms', 10, '{:.2f}')}{fmt('tfidf_ms', 10, '{:.2f}')}"
+              f"{fmt('cohere_ms', 11, '{:.0f}')}{fmt('bm25_vs_tfidf', 12, '{:.0%}')}{fmt('bm25_vs_cohere', 10, '{:.0%}')}"
+              f"{fmt('tfidf_vs_cohere', 11, '{:.0%}')}{fmt('hybrid_vs_cohere', 12, '{:.0%}')}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+GDELT calls, summaries and coverage of the volume-adaptive scheduler against the fixed daily loop.
+
+    python benchmarks/bench_scheduler.py
+    python benchmarks/bench_scheduler.py --days 14 --burst-rate 300 --output scheduler.json
+
+Simulates `--days` of news for every topic in query_parameters.json on a
+simulated clock (src/scheduler.py: SyntheticNews, simulate): log-normal base
+rates around `--median-rate` articles an hour, 30% duplicates, and a
+`--burst-hours` breaking story of `--burst-rate` extra articles an hour in
+Russia_Ukraine and Israel_Palestine. Each policy runs on the same news:
+
+- daily:    what daily_run.py does from cron, every topic once a day with the
+            query's maxrecords (75) and the top 20 reranked articles
+- adaptive: the scheduler, with the LLM budget set to the daily loop's spend
+            (20 summaries per topic a day) so both summarise about as much
+
+Reported per policy: GDELT requests, polls that found nothing new, summaries
+in total and for the breaking topics during their burst, the share of new,
+non-duplicate articles that got summarised (coverage) and the mean wait of
+an article until it was ingested.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import warnings
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+warnings.filterwarnings("ignore", message="Using slow pure-python SequenceMatcher")
+from src.scheduler import Burst, Scheduler, SyntheticNews, TopicPlan, simulate
+from src.topics import get_topic_registry
+
+START = 1704067200.0  # 2024-01-01 00:00 UTC
+BREAKING = ('Russia_Ukraine', 'Israel_Palestine')
+
+
+def make_news(topics, args) -> SyntheticNews:
+    rng = random.Random(args.seed)
+    rates = {topic: rng.lognormvariate(math.log(args.median_rate), 1.0) for topic in topics}
+    bursts = [Burst(topic, 24 * (1 + i) + 7, args.burst_hours, args.burst_rate)
+              for i, topic in enumerate(t for t in BREAKING if t in rates)]
+    return SyntheticNews(rates, bursts, start=START, seed=args.seed)
+
+
+def run_policy(scheduler: Scheduler, topics, args) -> dict:
+    news = make_news(topics, args)
+    hours = args.days * 24
+    # The burst, on its own, so its coverage is not diluted by the quiet days around it
+    first = min((b.start_hour for b in news.bursts), default=hours)
+    last = max((b.start_hour + b.hours for b in news.bursts), default=hours)
+    phases = [simulate(scheduler, news, first, START),
+              simulate(scheduler, news, last - first, START + first * 3600),
+              simulate(scheduler, news, hours - last, START + last * 3600)]
+    totals = {}
+    for field in ('polls', 'empty_polls', 'requests', 'ingested', 'candidates', 'selected', 'truncated'):
+        totals[field] = sum(t.get(field, 0) for phase in phases for t in phase['topics'].values())
+    wait = sum((t.get('mean_wait_minutes') or 0) * t.get('ingested', 0) for phase in phases for t in phase['topics'].values())
+    burst = [phases[1]['topics'][topic] for topic in BREAKING if topic in phases[1]['topics']]
+    burst_candidates = sum(t.get('candidates', 0) for t in burst)
+    return {
+        **totals,
+        'coverage': totals['selected'] / max(totals['candidates'], 1),
+        'mean_wait_minutes': wait / max(totals['ingested'], 1),
+        'burst_selected': sum(t.get('selected', 0) for t in burst),
+        'burst_coverage': sum(t.get('selected', 0) for t in burst) / max(burst_candidates, 1),
+        'summaries_per_day': totals['selected'] / args.days,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--median-rate", type=float, default=3.0, help="median base articles per topic and hour")
+    parser.add_argument("--burst-rate", type=float, default=200.0, help="extra articles per hour during a burst")
+    parser.add_argument("--burst-hours", type=float, default=10.0)
+    parser.add_argument("--max-concurrent", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args()
+
+    topics = get_topic_registry().names()
+    budget = 20 * len(topics) / 24  # what the daily loop summarises per hour
+    policies = {
+        'daily': Scheduler(topics, clock=lambda: START, max_concurrent=args.max_concurrent, watchlist_hour=None,
+                           fixed=TopicPlan(24 * 3600, 75, 20)),
+        'adaptive': Scheduler(topics, clock=lambda: START, max_concurrent=args.max_concurrent, watchlist_hour=None,
+                              max_summaries_per_hour=budget),
+    }
+    results = {'topics': len(topics), 'days': args.days, 'summaries_per_hour_budget': budget, 'policies': {}}
+    stdout = sys.stdout
+    for name, scheduler in policies.items():
+        sys.stdout = open(os.devnull, 'w')  # the scheduler prints every decision
+        try:
+            results['policies'][name] = run_policy(scheduler, topics, args)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    print(f"{len(topics)} topics, {args.days:g} days, bursts of {args.burst_rate:g}/h for {args.burst_hours:g}h "
+          f"in {', '.join(t for t in BREAKING if t in topics) or '-'}")
+    print(f"{'policy':>9} {'requests':>9} {'polls':>6} {'empty':>6} {'summaries':>10} {'/day':>6} {'coverage':>9} "
+          f"{'burst sum.':>11} {'burst cov.':>11} {'wait min':>9} {'truncated':>10}")
+    for name, r in results['policies'].items():
+        print(f"{name:>9} {r['requests']:>9} {r['polls']:>6} {r['empty_polls']:>6} {r['selected']:>10} "
+              f"{r['summaries_per_day']:>6.0f} {r['coverage']:>9.1%} {r['burst_selected']:>11} "
+              f"{r['burst_coverage']:>11.1%} {r['mean_wait_minutes']:>9.0f} {r['truncated']:>10}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Query plans and timings for the per-country tables vs the unified `articles` table.
+
+    python benchmarks/bench_schema.py --days 365 --rows-per-day 75
+
+Builds a synthetic year of data for the ten topics in both layouts (in a temp
+directory), with every article scraped and summarised except the last day's,
+then times the two hot queries of the pipeline:
+
+- pending:   articles still waiting for a body (ScrapeNews.get_urls_from_database)
+- summaries: one topic's summaries for a day (GetWatchlist.get_summaries_from_database)
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from src.initialize_db import LEGACY_TOPIC_TABLES, create_database_and_tables
+
+LEGACY_SCHEMA = '''
+CREATE TABLE {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT,
+    seendate TEXT,
+    domain TEXT,
+    language TEXT,
+    sourcecountry TEXT,
+    relevance_score REAL,
+    date_added DATE DEFAULT CURRENT_DATE,
+    news_body TEXT,
+    short_title_en TEXT,
+    summary_en TEXT,
+    sentiment TEXT
+)
+'''
+
+QUERIES = {
+    "pending": (
+        "SELECT id, url FROM {topic} WHERE news_body IS NULL",
+        "SELECT id, url FROM articles WHERE topic = ? AND news_body IS NULL",
+    ),
+    "summaries": (
+        "SELECT id, url, summary_en FROM {topic} WHERE date(date_added) = ? AND summary_en IS NOT NULL GROUP BY url",
+        "SELECT id, url, summary_en FROM articles WHERE topic = ? AND date_added = ? AND summary_en IS NOT NULL AND summary_en != ''",
+    ),
+}
+
+
+def synthetic_rows(days: int, rows_per_day: int, body_bytes: int, seed: int = 1):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=days - 1)
+    body = "x" * body_bytes
+    for d in range(days):
+        day = (start + timedelta(days=d)).isoformat()
+        last_day = d == days - 1
+        for topic in LEGACY_TOPIC_TABLES:
+            for i in range(rows_per_day):
+                url = f"https://news{rng.randrange(500)}.example/{topic}/{day}/{i}"
+                yield (topic, url, f"Title {i}", "", day.replace("-", "") + "T000000Z", "example", "English", "UK",
+                       rng.random(), day, None if last_day else body, "" if last_day else "short",
+                       "" if last_day else "A summary of the article. " * 5, "neutral")
+
+
+def build(tmp: str, days: int, rows_per_day: int, body_bytes: int):
+    legacy_path = os.path.join(tmp, "legacy.db")
+    unified_path = os.path.join(tmp, "unified.db")
+    legacy = sqlite3.connect(legacy_path)
+    for table in LEGACY_TOPIC_TABLES:
+        legacy.execute(LEGACY_SCHEMA.format(table=table))
+    create_database_and_tables(unified_path)
+    unified = sqlite3.connect(unified_path)
+    columns = "url, title, content, seendate, domain, language, sourcecountry, relevance_score, date_added, news_body, short_title_en, summary_en, sentiment"
+    batch = []
+    for row in synthetic_rows(days, rows_per_day, body_bytes):
+        batch.append(row)
+        if len(batch) >= 10000:
+            flush(legacy, unified, columns, batch)
+            batch = []
+    flush(legacy, unified, columns, batch)
+    for conn in (legacy, unified):
+        conn.execute("ANALYZE")
+        conn.commit()
+    return legacy, unified, legacy_path, unified_path
+
+
+def flush(legacy, unified, columns, batch):
+    by_topic = {}
+    for row in batch:
+        by_topic.setdefault(row[0], []).append(row[1:])
+    for topic, rows in by_topic.items():
+        legacy.executemany(f"INSERT INTO {topic} ({columns}) VALUES ({', '.join('?' * 13)})", rows)
+    unified.executemany(f"INSERT INTO articles (topic, {columns}) VALUES ({', '.join('?' * 14)})", batch)
+
+
+def median_ms(conn, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def plan(conn, sql, params):
+    return "; ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--rows-per-day", type=int, default=75, help="articles per topic per day")
+    parser.add_argument("--body-bytes", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        legacy, unified, legacy_path, unified_path = build(tmp, args.days, args.rows_per_day, args.body_bytes)
+        total = args.days * args.rows_per_day * len(LEGACY_TOPIC_TABLES)
+        print(f"Built {total} rows per layout in {time.perf_counter() - start:.1f}s "
+              f"(legacy {os.path.getsize(legacy_path) / 1e6:.0f} MB, unified {os.path.getsize(unified_path) / 1e6:.0f} MB)\n")
+
+        target_day = (date.today() - timedelta(days=args.days // 2)).isoformat()
+        topic = "UK"
+        for name, (legacy_sql, unified_sql) in QUERIES.items():
+            legacy_sql = legacy_sql.format(topic=topic)
+            legacy_params = (target_day,) if "?" in legacy_sql else ()
+            unified_params = (topic, target_day) if unified_sql.count("?") == 2 else (topic,)
+            legacy_ms = median_ms(legacy, legacy_sql, legacy_params, args.repeat)
+            unified_ms = median_ms(unified, unified_sql, unified_params, args.repeat)
+            results[name] = {
+                "legacy_ms": legacy_ms,
+                "unified_ms": unified_ms,
+                "legacy_plan": plan(legacy, legacy_sql, legacy_params),
+                "unified_plan": plan(unified, unified_sql, unified_params),
+            }
+            print(f"{name}: {legacy_ms:.2f} ms -> {unified_ms:.2f} ms ({legacy_ms / unified_ms:.0f}x)")
+            print(f"  legacy plan:  {results[name]['legacy_plan']}")
+            print(f"  unified plan: {results[name]['unified_plan']}")
+        legacy.close()
+        unified.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
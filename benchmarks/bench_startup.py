@@ -0,0 +1,84 @@
+"""
+Startup cost of the pipeline's entry points, from `python -X importtime`.
+
+    python benchmarks/bench_startup.py --runs 7
+    python benchmarks/bench_startup.py --modules src.GetWatchlist --top 15
+
+Each module is imported in a fresh interpreter `--runs` times; the report has
+the median cumulative import time per module and the slowest top-level
+imports it pulled in (third-party packages and src modules), so a heavy
+dependency that a stage does not need shows up by name. Python's own startup
+(`site`, encodings) is not included.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+MODULES = ('src.daily_run', 'src.pipeline', 'src.SearchGdelt', 'src.ScrapeNews', 'src.GetWatchlist',
+           'src.initialize_db', 'src.openai_batch', 'src.export_static')
+
+
+def import_times(module: str):
+    """(total_us, {top-level import: cumulative_us}) for one import of `module` in a new interpreter."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-W', 'ignore', '-c', f"import {module}"],
+                            cwd=project_root, capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append(((len(name) - len(name.lstrip())) // 2, name.strip(), int(cumulative)))
+    # A module is reported after everything it imported, so its subtree is the run of deeper lines before it
+    end = next(i for i, (depth, name, _) in enumerate(entries) if depth == 0 and name == module)
+    start = end
+    while start > 0 and entries[start - 1][0] > 0:
+        start -= 1
+    total = entries[end][2]
+    children = {name: us for depth, name, us in entries[start:end] if depth == 1}
+    return total, children
+
+
+def measure(module: str, runs: int, top: int):
+    totals, children = [], defaultdict(list)
+    for _ in range(runs):
+        total, child_times = import_times(module)
+        totals.append(total)
+        for name, us in child_times.items():
+            children[name].append(us)
+    slowest = sorted(((statistics.median(us), name) for name, us in children.items()), reverse=True)[:top]
+    return {
+        'import_ms': statistics.median(totals) / 1000,
+        'slowest_imports_ms': {name: us / 1000 for us, name in slowest},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=list(MODULES))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="slowest imports listed per module")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        results[module] = measure(module, args.runs, args.top)
+        slowest = ", ".join(f"{name} {ms:.0f}" for name, ms in results[module]['slowest_imports_ms'].items())
+        print(f"{module:<20} {results[module]['import_ms']:7.1f} ms   ({slowest})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
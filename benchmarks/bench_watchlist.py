@@ -0,0 +1,118 @@
+"""
+Latency and cost of single-shot vs map-reduce watchlist generation.
+
+    python benchmarks/bench_watchlist.py
+    python benchmarks/bench_watchlist.py --sizes 20 200 2000 --prompt-tokens 12000
+
+Runs GetWatchlist.generate_watchlist against the local fake OpenAI server
+(src/fake_openai.py) with the LLM cache off. The fake answers after a fixed
+latency plus a per-prompt-token latency and rejects prompts over its context
+window, like gpt-4o-mini's 128k. Cost uses gpt-4o-mini list prices and the
+token counts the fake reports.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+from unittest import mock
+
+import aiohttp
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+warnings.filterwarnings("ignore", message="Using slow pure-python SequenceMatcher")
+from src import GetWatchlist
+from src.fake_openai import FakeOpenAIServer
+from src.llm_cache import LLMCache
+from src.openai_client import OpenAIClient, OpenAIRequestError
+
+INPUT_USD_PER_M = 0.15
+OUTPUT_USD_PER_M = 0.60
+
+
+def make_summaries(n: int, chars: int, seed: int = 3):
+    rng = random.Random(seed)
+    words = "minister talks sanctions election budget strike troops border summit inflation parliament court".split()
+    summaries = []
+    for i in range(n):
+        text = ""
+        while len(text) < chars:
+            text += " ".join(rng.choices(words, k=12)) + ". "
+        summaries.append({"id": i, "url": f"https://news.example/{i}", "summary": text[:chars]})
+    return summaries
+
+
+async def run_once(summaries, prompt_tokens, args, cache):
+    server = FakeOpenAIServer(latency=args.latency, latency_per_1k_tokens=args.latency_per_1k,
+                              context_tokens=args.context_tokens, completion_chars=args.completion_chars)
+    await server.start()
+    try:
+        client = OpenAIClient("bench-key", base_url=server.base_url, requests_per_minute=100000,
+                              tokens_per_minute=10 ** 9, max_concurrency=32)
+        with mock.patch.object(GetWatchlist, 'get_openai_client', return_value=client), \
+                mock.patch.object(GetWatchlist, 'get_llm_cache', return_value=cache):
+            async with aiohttp.ClientSession() as session:
+                start = time.perf_counter()
+                try:
+                    result = await GetWatchlist.generate_watchlist(session, "UK", summaries, prompt_tokens)
+                    error = result.get('error')
+                    urls = len(result.get('urls', []))
+                except OpenAIRequestError as e:
+                    error, urls = str(e).split(': ', 1)[-1][:60], 0
+                elapsed = time.perf_counter() - start
+    finally:
+        await server.stop()
+    cost = server.prompt_tokens * INPUT_USD_PER_M / 1e6 + server.completion_tokens * OUTPUT_USD_PER_M / 1e6
+    return {
+        'seconds': elapsed,
+        'calls': server.requests,
+        'prompt_tokens': server.prompt_tokens,
+        'completion_tokens': server.completion_tokens,
+        'usd': cost,
+        'urls_attributed': urls,
+        'error': error,
+    }
+
+
+async def main_async(args):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMCache(os.path.join(tmp, 'cache.db'), mode='off')
+        for n in args.sizes:
+            summaries = make_summaries(n, args.summary_chars)
+            for mode, budget in (('single-shot', 10 ** 12), ('map-reduce', args.prompt_tokens)):
+                row = {'summaries': n, 'mode': mode, **await run_once(summaries, budget, args, cache)}
+                rows.append(row)
+                status = f"FAILED ({row['error']})" if row['error'] else f"{row['urls_attributed']} urls"
+                print(f"{n:>6} {mode:<12} {row['seconds']:>7.2f}s {row['calls']:>5} calls "
+                      f"{row['prompt_tokens']:>9} in / {row['completion_tokens']:>7} out tokens  ${row['usd']:.4f}  {status}")
+        cache.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 200, 2000])
+    parser.add_argument("--summary-chars", type=int, default=1600, help="length of each article summary (~400 tokens)")
+    parser.add_argument("--prompt-tokens", type=int, default=GetWatchlist.WATCHLIST_PROMPT_TOKENS, help="map-reduce budget")
+    parser.add_argument("--latency", type=float, default=0.5, help="fixed seconds per fake LLM call")
+    parser.add_argument("--latency-per-1k", type=float, default=0.05, help="extra seconds per 1k prompt tokens")
+    parser.add_argument("--context-tokens", type=int, default=128000)
+    parser.add_argument("--completion-chars", type=int, default=2000, help="length of each fake answer (~500 tokens)")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    rows = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
-import sqlite3
 import json
 import aiohttp
 import asyncio
 from datetime import date
-from typing import List, Dict
+from typing import List, Dict, Optional
 import os
 import sys
 import time
@@ -12,101 +11,169 @@ import time
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
 sys.path.append(project_root)
-from src.config import DATABASE_PATH, OPENAI_API_KEY
+from src import config
+from src.db import get_database
+from src.export_static import export_static
+from src.llm_cache import CacheMissError, get_llm_cache
+from src.metrics import get_metrics
+from src.openai_client import (
+    OpenAIRequestError,
+    get_dead_letters,
+    get_openai_client,
+    parse_tool_arguments,
+    record_dead_letter,
+    resolve_dead_letter,
+)
+from src.token_budget import chunk_by_budget, estimate_tokens, truncate_to_tokens
+from src.topics import get_topic_registry
 
-async def get_summaries_from_database(country: str, target_date: date = date.today()) -> List[Dict]:
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute(f"""
-    SELECT id, url, summary_en 
-    FROM {country} 
-    WHERE date(date_added) = ? AND summary_en IS NOT NULL
-    GROUP BY url  -- This line deduplicates based on the url column
-    """, (target_date.isoformat(),))
-    results = [{"id": row[0], "url": row[1], "summary": row[2]} for row in cursor.fetchall()]
-    conn.close()
-    return results
+WATCHLIST_PROMPT_TEMPLATE = "Summarize the key points from these news summaries about {country}: {combined_summary}"
+WATCHLIST_MAP_PROMPT_TEMPLATE = ("Always write in english. Condense these news summaries about {country} into their key points. "
+                                 "Keep every distinct development and who is involved, merge repeated stories: {combined_summary}")
 
-async def generate_watchlist(session, country: str, summaries: List[Dict]) -> Dict:
-    if not summaries:
-        return {"error": "No summaries found for the given date"}
+# Summaries that fit in one prompt go straight to the watchlist call; larger days are map-reduced
+WATCHLIST_PROMPT_TOKENS = getattr(config, 'WATCHLIST_PROMPT_TOKENS', 12000)
+WATCHLIST_MAP_MAX_TOKENS = 1000  # length of each condensed chunk
+WATCHLIST_MAX_LEVELS = 6
 
-    combined_summary = " ".join([item["summary"] for item in summaries])
-    urls = [item["url"] for item in summaries]
+WATCHLIST_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "WatchlistGenerator",
+        "description": "Generate BBC news monitoring style executive summary of the major and most important points from multiple news summaries.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "watchlist": {"type": "string", "description": "1-2 pager (3-6 paragraphs) well structured, not markdown, no lists, no numbered points, just a narrative flow executive summary. Priority order:Geopolitical, economic, and military points, local politics."}
+            },
+            "required": ["watchlist"]
+        }
+    }
+}
+
+KEY_POINTS_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "KeyPointsExtractor",
+        "description": "Condense several news summaries into the key points a monitoring analyst needs, without losing distinct developments.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "key_points": {"type": "string", "description": "Dense narrative of the key points, most important first, no markdown."}
+            },
+            "required": ["key_points"]
+        }
+    }
+}
 
-    url = "https://api.openai.com/v1/chat/completions"
-    
+async def get_summaries_from_database(country: str, target_date: Optional[date] = None) -> List[Dict]:
+    target_date = target_date or date.today()
+    # date_added is stored as YYYY-MM-DD, so compare it directly to use idx_articles_topic_date;
+    # (topic, url) is unique, so no GROUP BY url is needed to deduplicate
+    rows = await get_database().fetch_all("""
+    SELECT id, url, summary_en 
+    FROM articles 
+    WHERE topic = ? AND date_added = ? AND summary_en IS NOT NULL AND summary_en != ''
+    """, (country, target_date.isoformat()))
+    results = [{"id": row[0], "url": row[1], "summary": row[2]} for row in rows]
+    return results
+
+async def complete_with_tool(session, country: str, prompt_template: str, tool: Dict, combined_summary: str,
+                             max_tokens: int, temperature: float) -> Dict:
+    """One cached tool-call completion; returns the parsed tool arguments or {"error": ...}."""
     payload = {
         "model": "gpt-4o-mini",
-        "max_tokens": 6000,
-        "temperature": 0.45,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
         "messages": [
             {
                 "role": "user",
-                "content": f"Summarize the key points from these news summaries about {country}: {combined_summary}"
+                "content": prompt_template.format(country=country, combined_summary=combined_summary)
             }
         ],
-        "tools": [
-            {
-                "type": "function",
-                "function": {
-                    "name": "WatchlistGenerator",
-                    "description": "Generate BBC news monitoring style executive summary of the major and most important points from multiple news summaries.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "watchlist": {"type": "string", "description": "1-2 pager (3-6 paragraphs) well structured, not markdown, no lists, no numbered points, just a narrative flow executive summary. Priority order:Geopolitical, economic, and military points, local politics."}
-                        },
-                        "required": ["watchlist"]
-                    }
-                }
-            }
-        ]
+        "tools": [tool]
     }
-    
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "Authorization": f"Bearer {OPENAI_API_KEY}"
-    }
-    
-    async with session.post(url, json=payload, headers=headers) as response:
-        result = await response.json()
-        if 'choices' in result and result['choices'] and 'message' in result['choices'][0] and 'tool_calls' in result['choices'][0]['message']:
-            try:
-                response_text = json.loads(result['choices'][0]['message']['tool_calls'][0]['function']['arguments'])
-                response_text['urls'] = urls
-                return response_text
-            except json.JSONDecodeError as e:
-                print(f"Error decoding JSON response from OpenAI: {e}")
-                response_text = {"error": "Invalid JSON response from OpenAI"}
-        else:
-            print(f"Unexpected response format from OpenAI: {result}")
-            response_text = {"error": "Unexpected response format from OpenAI"}
-    
+
+    cache = get_llm_cache()
+    key = cache.make_key(payload['model'], prompt_template, payload['tools'], combined_summary, country=country,
+                         max_tokens=payload['max_tokens'], temperature=payload['temperature'])
+    response_text = cache.get(key)
+    if response_text is None:
+        result = await get_openai_client().chat_completion(session, payload)
+        response_text = parse_tool_arguments(result)
+        if 'error' not in response_text:
+            cache.put(key, response_text)
     return response_text
 
-async def update_watchlist_database(country: str, watchlist_data: Dict, target_date: date = date.today()):
+def _notes_tokens(notes: List[Dict]) -> int:
+    return sum(estimate_tokens(note["summary"]) + 1 for note in notes)
+
+async def condense_chunk(session, country: str, chunk: List[Dict], budget: int) -> Dict:
+    """Map step: key points of one chunk, attributed to every URL the chunk's notes came from."""
+    combined_summary = " ".join(truncate_to_tokens(note["summary"], budget) for note in chunk)
+    with get_metrics().span('watchlist_map', topic=country, notes=len(chunk)):
+        response_text = await complete_with_tool(session, country, WATCHLIST_MAP_PROMPT_TEMPLATE, KEY_POINTS_TOOL,
+                                                 combined_summary, WATCHLIST_MAP_MAX_TOKENS, 0.3)
+    if 'error' in response_text:
+        return response_text
+    urls = list(dict.fromkeys(url for note in chunk for url in note["urls"]))
+    return {"summary": response_text.get("key_points", ""), "urls": urls}
+
+async def reduce_notes(session, country: str, notes: List[Dict], budget: int = WATCHLIST_PROMPT_TOKENS) -> Dict:
+    """
+    Condense notes ({"summary", "urls"}) level by level until they fit in one
+    prompt of `budget` tokens: each level packs the notes into chunks under the
+    budget and condenses all chunks concurrently. Every condensed note keeps the
+    URLs of the notes it was made from, so the final notes still cover every
+    source. Returns {"notes": [...], "levels": n, "calls": n} or {"error": ...}.
+    """
+    levels = calls = 0
+    while len(notes) > 1 and _notes_tokens(notes) > budget and levels < WATCHLIST_MAX_LEVELS:
+        chunks = chunk_by_budget(notes, budget, lambda note: estimate_tokens(note["summary"]) + 1)
+        if len(chunks) == len(notes) and len(notes) > 1:
+            # Every note fills a prompt on its own; pair them up so the level still shrinks
+            chunks = [notes[i:i + 2] for i in range(0, len(notes), 2)]
+        condensed = await asyncio.gather(*(condense_chunk(session, country, chunk, budget // len(chunk)) for chunk in chunks))
+        calls += len(chunks)
+        levels += 1
+        errors = [c for c in condensed if 'error' in c]
+        if errors:
+            return errors[0]
+        notes = condensed
+    return {"notes": notes, "levels": levels, "calls": calls}
+
+async def generate_watchlist(session, country: str, summaries: List[Dict],
+                             prompt_tokens: int = WATCHLIST_PROMPT_TOKENS) -> Dict:
+    if not summaries:
+        return {"error": "No summaries found for the given date"}
+
+    notes = [{"summary": item["summary"], "urls": [item["url"]]} for item in summaries]
+    reduced = await reduce_notes(session, country, notes, prompt_tokens)
+    if 'error' in reduced:
+        return reduced
+    if reduced["levels"]:
+        print(f"Watchlist for {country}: {len(summaries)} summaries condensed to {len(reduced['notes'])} "
+              f"in {reduced['levels']} level(s), {reduced['calls']} map calls")
+    notes = reduced["notes"]
+
+    # Past WATCHLIST_MAX_LEVELS the notes may still exceed the budget together; cap the whole prompt, not each note
+    combined_summary = truncate_to_tokens(" ".join(note["summary"] for note in notes), prompt_tokens)
+    urls = list(dict.fromkeys(url for note in notes for url in note["urls"]))
+
+    response_text = await complete_with_tool(session, country, WATCHLIST_PROMPT_TEMPLATE, WATCHLIST_TOOL,
+                                             combined_summary, 6000, 0.45)
+    if 'error' not in response_text:
+        response_text['urls'] = urls
+    return response_text
+
+async def update_watchlist_database(country: str, watchlist_data: Dict, target_date: Optional[date] = None):
     if 'error' in watchlist_data:
         print(f"Skipping database update for {country} due to error in watchlist data")
         return
+    target_date = target_date or date.today()
 
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Create watchlist table if it doesn't exist
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS watchlist (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        country TEXT NOT NULL,
-        date_added DATE NOT NULL,
-        watchlist TEXT NOT NULL,
-        urls_used TEXT NOT NULL
-    )
-    ''')
-
-    # Insert or update the watchlist for the given country and date
-    cursor.execute('''
+    # Insert or update the watchlist for the given country and date (table created in initialize_db)
+    await get_database().write('''
     INSERT OR REPLACE INTO watchlist (country, date_added, watchlist, urls_used)
     VALUES (?, ?, ?, ?)
     ''', (
@@ -115,24 +182,50 @@ async def update_watchlist_database(country: str, watchlist_data: Dict, target_d
         watchlist_data.get('watchlist', ''),
         json.dumps(watchlist_data.get('urls', []))
     ))
-
-    conn.commit()
-    conn.close()
     print(f"Updated watchlist for {country} on {target_date}")
 
-async def generate_and_store_watchlist(country: str, target_date: date = date.today()):
+async def generate_and_store_watchlist(country: str, target_date: Optional[date] = None) -> bool:
+    # Defaults are resolved per call: a long-running process must not keep the day it was started on
+    target_date = target_date or date.today()
+    with get_metrics().span('watchlist', topic=country, date=target_date.isoformat()) as span:
+        span['stored'] = await _generate_and_store_watchlist(country, target_date)
+        return span['stored']
+
+async def _generate_and_store_watchlist(country: str, target_date: date) -> bool:
     async with aiohttp.ClientSession() as session:
         summaries = await get_summaries_from_database(country, target_date)
         if summaries:
-            watchlist_data = await generate_watchlist(session, country, summaries)
+            try:
+                watchlist_data = await generate_watchlist(session, country, summaries)
+            except CacheMissError as e:
+                print(f"Skipping watchlist for {country} on {target_date}: {e}")
+                return False
+            except OpenAIRequestError as e:
+                # Re-queued by the next run_watchlist_generator call
+                await record_dead_letter('watchlist', country, target_date.isoformat(), e.payload, str(e))
+                print(f"Dead-lettered watchlist for {country} on {target_date}: {e}")
+                return False
             await update_watchlist_database(country, watchlist_data, target_date)
+            return 'error' not in watchlist_data
         else:
             print(f"No summaries found for {country} on {target_date}")
+            return False
+
+async def retry_dead_letters(countries: List[str]):
+    """Regenerate watchlists whose OpenAI request failed in an earlier run, for the date they were meant for."""
+    for country in countries:
+        for letter in await get_dead_letters('watchlist', country):
+            print(f"Retrying dead-lettered watchlist for {country} on {letter['ref']}")
+            if await generate_and_store_watchlist(country, date.fromisoformat(letter['ref'])):
+                await resolve_dead_letter('watchlist', country, letter['ref'])
 
-async def run_watchlist_generator(countries: List[str], target_date: date = date.today()):
+async def run_watchlist_generator(countries: List[str], target_date: Optional[date] = None):
+    target_date = target_date or date.today()
+    await retry_dead_letters(countries)
     tasks = [generate_and_store_watchlist(country, target_date) for country in countries]
     await asyncio.gather(*tasks)
 
 if __name__ == "__main__":
-    countries = ['Climate', 'UK', 'China', 'Russia_Ukraine', 'Israel_Palestine', 'USA', 'Turkey', 'Germany', 'France', 'NATO']
+    countries = get_topic_registry().names()
     asyncio.run(run_watchlist_generator(countries))
+    export_static()
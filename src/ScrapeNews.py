@@ -4,51 +4,120 @@ import asyncio
 import aiohttp
 import time
 import os
-from newspaper import Article
-from newspaper.article import ArticleException
-from src.config import DATABASE_PATH, OPENAI_API_KEY
-from typing import List, Dict
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+from src import config
+from src.body_store import get_body_store
+from src.db import get_database
+from src.html_store import HTML_STORE_ENABLED, HtmlStore, decode_html, get_html_store
+from src.llm_cache import CacheMissError, get_llm_cache
+from src.metrics import get_metrics
+from src.preprocess import get_preprocessor
+from src.openai_client import (
+    OpenAIRequestError,
+    get_dead_letters,
+    get_openai_client,
+    parse_tool_arguments,
+    record_dead_letter,
+    resolve_dead_letter,
+)
+from src.seen_index import get_seen_index
+from src.topics import get_topic_registry
+from typing import List, Dict, Optional
+
+# Fetch/parse tuning; each can be overridden in config.py
+MAX_INFLIGHT_FETCHES = getattr(config, 'MAX_INFLIGHT_FETCHES', 32)  # concurrent downloads overall
+MAX_FETCHES_PER_HOST = getattr(config, 'MAX_FETCHES_PER_HOST', 4)  # concurrent downloads per publisher
+FETCH_TIMEOUT_SECONDS = getattr(config, 'FETCH_TIMEOUT_SECONDS', 20)
+PARSE_WORKERS = getattr(config, 'PARSE_WORKERS', None) or os.cpu_count() or 1
+# 'realtime' summarises each article as it is scraped; 'batch' queues it for an OpenAI batch (src.openai_batch)
+SUMMARY_MODE = getattr(config, 'SUMMARY_MODE', 'realtime')
+SUMMARY_MODES = ('realtime', 'batch')
 
 async def get_urls_from_database(country: str) -> List[Dict]:
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT id, url FROM {country} WHERE news_body IS NULL")
-    results = [{"id": row[0], "url": row[1]} for row in cursor.fetchall()]
-    conn.close()
+    rows = await get_database().fetch_all("SELECT id, url FROM articles WHERE topic = ? AND body_length IS NULL", (country,))
+    results = [{"id": row[0], "url": row[1]} for row in rows]
     print(f"Found {len(results)} articles to process for {country}")  # Debug print
     return results
 
-def scrape_article(url: str) -> str:
+class ParseError(Exception):
+    """newspaper's ArticleException, re-raised so callers need not import newspaper to catch it."""
+
+def preload_parser():
+    """
+    Import newspaper (about a quarter of a second) only once a stage starts scraping. Called before the
+    parse pool starts, so the forked workers inherit the module instead of each importing it again.
+    """
+    import newspaper  # noqa: F401
+
+def parse_html(url: str, html: str) -> str:
+    """Extract the article text from already-downloaded HTML. Runs in the parse process pool."""
+    from newspaper import Article
+    from newspaper.article import ArticleException
     article = Article(url)
-    article.download()  # Remove the timeout parameter
-    article.parse()
+    article.download(input_html=html)
+    try:
+        article.parse()
+    except ArticleException as e:
+        raise ParseError(str(e)) from None
     return article.text
 
-async def get_completion(session, article_text: str, topic: str) -> Dict:
-    topic_params_path = os.path.join(os.path.dirname(__file__), 'topic_params.json')
-    with open(topic_params_path) as f:
-        data = json.load(f)
-    
-    prompt = None
-    for t in data['topics']:
-        if t['topic'] == topic:
-            prompt = t["prompt"]
-            topic_name = t["topic_name"]
-            break
-
-    if prompt is None:
-        raise ValueError(f"Topic '{topic}' not found in the JSON data.")
-    
-    url = "https://api.openai.com/v1/chat/completions"
-
-    payload = {
+class ArticleFetcher:
+    """
+    Downloads article HTML over a shared aiohttp session, with at most
+    `max_inflight` requests in flight overall and `per_host` per publisher.
+    Every page goes into the raw HTML store (src.html_store); a page already
+    there is re-fetched with a conditional GET, or not at all while fresh.
+    """
+
+    def __init__(self, session, max_inflight: int = MAX_INFLIGHT_FETCHES, per_host: int = MAX_FETCHES_PER_HOST,
+                 timeout: float = FETCH_TIMEOUT_SECONDS, store: Optional[HtmlStore] = None):
+        self.session = session
+        self.store = store or (get_html_store() if HTML_STORE_ENABLED else None)
+        self.per_host = per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.inflight = asyncio.Semaphore(max_inflight)
+        self.host_limits = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        from newspaper import Config
+        self.headers = {"User-Agent": Config().browser_user_agent}
+        self.bytes_fetched = 0
+
+    async def fetch(self, url: str) -> str:
+        stored = self.store.lookup(url) if self.store else None
+        if stored and self.store.is_fresh(stored):
+            return await asyncio.to_thread(self.store.hit, stored)
+        headers = {**self.headers, **HtmlStore.conditional_headers(stored)} if stored else self.headers
+        host = urlsplit(url).hostname or ''
+        async with self.host_limits[host], self.inflight:
+            async with self.session.get(url, headers=headers, timeout=self.timeout) as response:
+                if response.status == 304 and stored:
+                    return await asyncio.to_thread(self.store.hit, stored, True)
+                response.raise_for_status()
+                body = await response.read()
+                encoding = response.get_encoding()
+                etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        self.bytes_fetched += len(body)
+        get_metrics().inc('fetch_bytes_total', len(body))
+        if self.store:
+            await asyncio.to_thread(self.store.put, url, body, encoding, etag, last_modified, stored)
+        return decode_html(body, encoding)
+
+SUMMARY_PROMPT_TEMPLATE = "You receive news articles. They are centered around the {topic_name}. Your task is to summarise: {article_text}."
+
+def build_summary_payload(article_text: str, topic: str) -> Dict:
+    topic_name = get_topic_registry().get(topic).topic_name
+    if topic_name is None:
+        raise ValueError(f"Topic '{topic}' not found in topic_params.json.")
+
+    return {
         "model": "gpt-4o-mini",
         "max_tokens": 700,
         "temperature": 0.7,
         "messages": [
             {
                 "role": "user",
-                "content": f"""You receive news articles. They are centered around the {topic_name}. Your task is to summarise: {article_text}."""
+                "content": SUMMARY_PROMPT_TEMPLATE.format(topic_name=topic_name, article_text=article_text)
             }
         ],
         "tools": [
@@ -70,67 +139,170 @@ async def get_completion(session, article_text: str, topic: str) -> Dict:
             }
         ]
     }
-    
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "Authorization": f"Bearer {OPENAI_API_KEY}"
-    }
-    
-    start = time.time()
-    async with session.post(url, json=payload, headers=headers) as response:
-        result = await response.json()
-        if 'choices' in result and result['choices'] and 'message' in result['choices'][0] and 'tool_calls' in result['choices'][0]['message']:
-            try:
-                response_text = json.loads(result['choices'][0]['message']['tool_calls'][0]['function']['arguments'])
-            except json.JSONDecodeError as e:
-                print(f"Error decoding JSON response from OpenAI: {e}")
-                response_text = {"error": "Invalid JSON response from OpenAI"}
-        else:
-            print(f"Unexpected response format from OpenAI: {result}")
-            response_text = {"error": "Unexpected response format from OpenAI"}
-    end = time.time()
-    
-    print(f"Time taken: {end-start} seconds")
-    
+
+def summary_cache_key(payload: Dict, body: str, topic: str, preprocess_version: str) -> str:
+    """
+    LLM cache key of a summary, shared by the real-time and batch paths. It is
+    made from the raw body and the preprocessor's cache_version rather than the
+    prepared text, which changes whenever the boilerplate is relearned.
+    """
+    return get_llm_cache().make_key(payload['model'], SUMMARY_PROMPT_TEMPLATE, payload['tools'], body, topic=topic,
+                                    max_tokens=payload['max_tokens'], temperature=payload['temperature'],
+                                    preprocess=preprocess_version)
+
+async def get_completion(session, article_text: str, topic: str, url: Optional[str] = None) -> Dict:
+    """
+    Summarise one article, from the LLM cache when the same text was summarised
+    before. The body is pre-processed first (src.preprocess; `url` selects the
+    publisher's learned boilerplate). Raises OpenAIRequestError if the request
+    keeps failing after retries, and CacheMissError on a miss in replay mode.
+    The first call may learn the boilerplate; async callers warm up
+    get_preprocessor in a thread before calling this from the event loop.
+    """
+    preprocessor = get_preprocessor()
+    prepared = preprocessor.prepare(article_text, topic, url)
+    payload = build_summary_payload(prepared.text, topic)
+    cache = get_llm_cache()
+    key = summary_cache_key(payload, article_text, topic, preprocessor.cache_version)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    start = time.perf_counter()
+    result = await get_openai_client().chat_completion(session, payload)
+    preprocessor.record_request(prepared.tokens_out, time.perf_counter() - start)
+    response_text = parse_tool_arguments(result)
+    if 'error' not in response_text:
+        cache.put(key, response_text)
     return response_text
 
+async def summarize_article(session, country: str, article_id: int, news_body: str, url: Optional[str] = None) -> Dict:
+    """get_completion, but a request that exhausts its retries goes to the dead-letter table instead of being lost."""
+    try:
+        return await get_completion(session, news_body, country, url)
+    except OpenAIRequestError as e:
+        await record_dead_letter('summary', country, article_id, e.payload, str(e), {'news_body': news_body})
+        print(f"Dead-lettered article {article_id} in {country}: {e}")
+        return {"error": str(e)}
+    except CacheMissError as e:
+        print(f"Skipping article {article_id} in {country}: {e}")
+        return {"error": str(e)}
+
+async def retry_dead_letters(session, country: str) -> set:
+    """
+    Re-send summaries that failed in earlier runs, using the stored payload so the
+    article is not scraped again. Like get_completion, a retry is answered from
+    the LLM cache when it can be, stored there when it succeeds, and skipped in
+    replay mode when the cache has no answer. Returns the ids of every
+    dead-lettered article, whether or not it succeeded this time, so callers can
+    skip re-scraping them.
+    """
+    letters = await get_dead_letters('summary', country)
+    cache = get_llm_cache()
+    preprocessor = await asyncio.to_thread(get_preprocessor) if letters else None
+
+    async def retry(letter):
+        article_id = int(letter['ref'])
+        news_body = letter['context']['news_body']
+        key = summary_cache_key(letter['payload'], news_body, country, preprocessor.cache_version)
+        try:
+            summaries = cache.get(key)
+        except CacheMissError as e:
+            print(f"Not retrying dead-lettered article {article_id} in {country}: {e}")
+            return
+        if summaries is None:
+            try:
+                result = await get_openai_client().chat_completion(session, letter['payload'])
+            except OpenAIRequestError as e:
+                await record_dead_letter('summary', country, article_id, letter['payload'], str(e), letter['context'])
+                return
+            summaries = parse_tool_arguments(result)
+            if 'error' not in summaries:
+                cache.put(key, summaries)
+        if 'error' not in summaries:
+            await update_database(country, article_id, news_body, summaries)
+            await resolve_dead_letter('summary', country, article_id)
+
+    await asyncio.gather(*[retry(letter) for letter in letters])
+    if letters:
+        print(f"Retried {len(letters)} dead-lettered summaries for {country}")
+    return {int(letter['ref']) for letter in letters}
+
 async def update_database(country: str, article_id: int, news_body: str, summaries: Dict):
     if not summaries or 'error' in summaries:
         print(f"Skipping database update for article {article_id} in {country} due to empty or error in summaries")
         return
 
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute(f"""
-    UPDATE {country}
-    SET news_body = ?, 
+    await store_body(article_id, news_body)
+    await get_database().write("""
+    UPDATE articles
+    SET body_length = ?, 
         short_title_en = ?, 
         summary_en = ?, 
         sentiment = ?
     WHERE id = ?
     """, (
-        news_body, 
+        len(news_body), 
         summaries.get('short_title_en', ''), 
         summaries.get('summary_en', ''),
         summaries.get('sentiment', ''),
         article_id
     ))
-    conn.commit()
-    conn.close()
     print(f"Updated database for article {article_id} in {country}")
 
-async def process_article(session, country: str, article: Dict):
+async def store_body(article_id: int, news_body: str):
+    """Compress and index the body in article_bodies; the article only counts as scraped once body_length is set."""
+    await asyncio.to_thread(get_body_store().put, article_id, news_body)
+
+async def mark_duplicate_body(country: str, article_id: int, news_body: str):
+    """Store the body of a near-duplicate article without a summary so it is neither re-scraped nor summarised."""
+    await store_body(article_id, news_body)
+    await get_database().write("UPDATE articles SET body_length = ? WHERE id = ?", (len(news_body), article_id))
+    print(f"Skipped article {article_id} in {country}: body already seen in an earlier run")
+
+async def queue_summary(country: str, article_id: int, news_body: str):
+    """Batch mode: store the body now and leave the summary to the next OpenAI batch (src.openai_batch)."""
+    db = get_database()
+    await db.write("INSERT OR IGNORE INTO summary_queue (article_id, topic, queued_at) VALUES (?, ?, ?)",
+                   (article_id, country, time.time()))
+    await store_body(article_id, news_body)
+    await db.write("UPDATE articles SET body_length = ? WHERE id = ?", (len(news_body), article_id))
+
+async def process_article(session, country: str, article: Dict, fetcher: ArticleFetcher, parse_pool,
+                          summary_mode: str = SUMMARY_MODE) -> bool:
     try:
         print(f"Processing article {article['id']} for {country}")  # Debug print
-        news_body = scrape_article(article['url'])
-        summaries = await get_completion(session, news_body, country)
-        await update_database(country, article['id'], news_body, summaries)
+        metrics = get_metrics()
+        with metrics.span('fetch', topic=country, article_id=article['id']) as span:
+            html = await fetcher.fetch(article['url'])
+            span['chars'] = len(html)  # decoded text; the downloaded bytes are in the html_store stats
+        loop = asyncio.get_running_loop()
+        with metrics.span('parse', topic=country, article_id=article['id']):
+            news_body = await loop.run_in_executor(parse_pool, parse_html, article['url'], html)
+        seen_index = get_seen_index()
+        if seen_index.is_seen_body(country, news_body):
+            with metrics.span('persist', topic=country, article_id=article['id'], duplicate=True):
+                await mark_duplicate_body(country, article['id'], news_body)
+            return True
+        if summary_mode == 'batch':
+            with metrics.span('persist', topic=country, article_id=article['id'], queued=True):
+                await queue_summary(country, article['id'], news_body)
+            seen_index.register_body(country, news_body)
+            return True
+        with metrics.span('summarize', topic=country, article_id=article['id']):
+            summaries = await summarize_article(session, country, article['id'], news_body, article['url'])
+        with metrics.span('persist', topic=country, article_id=article['id']):
+            await update_database(country, article['id'], news_body, summaries)
+        if summaries and 'error' not in summaries:
+            seen_index.register_body(country, news_body)
         print(f"Processed article {article['id']} for {country}")
-    except ArticleException as e:
+        return True
+    except ParseError as e:
         print(f"ArticleException for article {article['id']} in {country}: {str(e)}")
     except aiohttp.ClientError as e:
         print(f"Network error for article {article['id']} in {country}: {str(e)}")
+    except asyncio.TimeoutError:
+        print(f"Timed out fetching article {article['id']} in {country}")
     except sqlite3.Error as e:
         print(f"Database error for article {article['id']} in {country}: {str(e)}")
     except json.JSONDecodeError as e:
@@ -138,24 +310,39 @@ async def process_article(session, country: str, article: Dict):
     except Exception as e:
         print(f"Unexpected error processing article {article['id']} for {country}: {str(e)}")
         print(f"Error type: {type(e).__name__}")
+    return False
 
-async def process_articles(country: str):
+async def process_articles(country: str, summary_mode: str = SUMMARY_MODE):
     articles = await get_urls_from_database(country)
     if articles:  # Check if there are any articles to process
-        async with aiohttp.ClientSession() as session:
-            tasks = [process_article(session, country, article) for article in articles]
-            await asyncio.gather(*tasks)
+        start = time.time()
+        preload_parser()
+        preprocessor = await asyncio.to_thread(get_preprocessor)  # may relearn the boilerplate first
+        with ProcessPoolExecutor(max_workers=PARSE_WORKERS) as parse_pool:
+            async with aiohttp.ClientSession() as session:
+                dead_lettered = await retry_dead_letters(session, country)
+                articles = [article for article in articles if article['id'] not in dead_lettered]
+                fetcher = ArticleFetcher(session)
+                tasks = [process_article(session, country, article, fetcher, parse_pool, summary_mode) for article in articles]
+                results = await asyncio.gather(*tasks)
+        elapsed = time.time() - start
+        processed = sum(results)
+        print(f"Processed {processed}/{len(articles)} articles for {country} in {elapsed:.1f}s "
+              f"({processed / elapsed:.2f} articles/s, {fetcher.bytes_fetched / 1e6:.1f} MB fetched)")
+        if fetcher.store:
+            print(fetcher.store.report())
+        if summary_mode == 'realtime':
+            print(preprocessor.report())
     else:
         print(f"No articles found to process for {country}")
 
-async def run_news_scraper(country: str):
-    async with aiohttp.ClientSession() as session:
-        await process_articles(country)
-        print(f"Completed processing for {country}")
+async def run_news_scraper(country: str, summary_mode: str = SUMMARY_MODE):
+    await process_articles(country, summary_mode)
+    print(f"Completed processing for {country}")
 
 if __name__ == "__main__":
     # For testing purposes, you can still run it for all countries if needed
-    countries = ['Climate', 'UK', 'China', 'Russia_Ukraine', 'Israel_Palestine', 'USA', 'Turkey', 'Germany', 'France', 'NATO']
+    countries = get_topic_registry().names()
     for country in countries:
         asyncio.run(run_news_scraper(country))
 
@@ -1,114 +1,139 @@
-import json
-import pandas as pd
-import requests
-import cohere
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional
+from src.gdelt_records import CHUNK_BYTES, ArticleStreamParser, GdeltArticle, as_articles, parse_articles
 from src.initialize_db import insert_data
-from datetime import datetime
-from fuzzywuzzy import fuzz  # Import fuzzywuzzy
+from src.seen_index import get_seen_index
+from src.dedup import find_near_duplicates
+from src.metrics import get_metrics
+from src.rerank import COHERE_BASE_URL, RERANK_BACKEND, RerankResponse, get_reranker
+from src.topics import QUERY_PARAMS_PATH, TopicRegistry, get_topic_registry
 
-class GdeltSearcher:
-    def __init__(self, query_params_file: str, cohere_api_key: str):
-        self.query_params = self._load_query_parameters(query_params_file)
-        self.cohere_client = cohere.Client(api_key=cohere_api_key)  # Ensure the API key is properly set
+SEARCH_TOP_N = 20  # articles kept per search unless the scheduler (src/scheduler.py) asks for another number
 
-    @staticmethod
-    def _load_query_parameters(file_path: str) -> Dict:
-        """Load query parameters from a JSON file."""
-        with open(file_path, 'r') as f:
-            return json.load(f)
+# requests and cohere take a noticeable share of a second to import; they are imported
+# where they are used, so runs that never search do not pay for them
+
+class GdeltSearcher:
+    def __init__(self, query_params_file: str, cohere_api_key: str, rerank_backend: str = RERANK_BACKEND,
+                 cohere_base_url: Optional[str] = COHERE_BASE_URL):
+        self.topics = get_topic_registry() if query_params_file == QUERY_PARAMS_PATH else TopicRegistry(query_params_file)
+        self.query_params: Dict = self.topics.query_params
+        self.cohere_client = None
+        if rerank_backend in ('cohere', 'hybrid'):
+            import cohere
+            self.cohere_client = cohere.Client(api_key=cohere_api_key, base_url=cohere_base_url)  # Ensure the API key is properly set
+        self.reranker = get_reranker(rerank_backend, self.cohere_client)
 
     def get_gdelt_query_string(self, topic: str) -> str:
         """Retrieve the GDELT query string for a given topic."""
-        for t in self.query_params['topics']:
-            if t['topic'] == topic:
-                return t["gdelt_query_string"]
-        raise ValueError(f"Topic '{topic}' not found in the query parameters.")
+        return self.topics.get(topic).gdelt_query_string
+
+    def get_question_string(self, topic: str) -> str:
+        """Retrieve the question string the topic's articles are ranked against."""
+        return self.topics.get(topic).question_string
 
     @staticmethod
-    def fetch_gdelt_data(gdelt_query_string: str) -> pd.DataFrame:
-        """Fetch data from GDELT API and return as a DataFrame."""
-        response = requests.get(gdelt_query_string)
-        response.raise_for_status()  # Raise an error for bad responses
-        data = response.json()["articles"]
-        print(f"Fetched {len(data)} articles from GDELT API")  # Debug print
-        df = pd.json_normalize(data)
-        
-        # Drop rows with empty title
-        df = df.dropna(subset=['title'])
-        
-        # Check if 'content' column exists, if not, create it with empty strings
-        if 'content' not in df.columns:
-            df['content'] = ''
-        
-        print(f"DataFrame columns: {df.columns}")  # Debug print
-        print(f"Sample data: {df.head()}")  # Debug print
-        
-        return df
+    def fetch_gdelt_articles(gdelt_query_string: str) -> List[GdeltArticle]:
+        """Fetch the query's articles from the GDELT API, decoding them as the response streams in."""
+        import requests
+        parser = ArticleStreamParser()
+        with get_metrics().span('gdelt_request') as span:
+            with requests.get(gdelt_query_string, stream=True) as response:
+                response.raise_for_status()  # Raise an error for bad responses
+                articles = parse_articles(response.iter_content(CHUNK_BYTES), parser)
+            span.update(bytes=parser.bytes, articles=len(articles))
+        get_metrics().inc('gdelt_bytes_total', parser.bytes)
+        print(f"Fetched {len(articles)} articles from GDELT API")
+        return articles
 
     @staticmethod
-    def clean_dataframe(dataframe: pd.DataFrame) -> pd.DataFrame:
-        """Clean the DataFrame by dropping duplicates and empty rows."""
-        initial_shape = dataframe.shape[0]
-        dataframe.drop_duplicates(subset=['title'], inplace=True)
-        dataframe = dataframe[dataframe['title'] != '']
+    def clean_articles(articles: Iterable[GdeltArticle], return_report: bool = False):
+        """
+        Drop articles without a title, repeated titles and near-duplicate titles.
+
+        Near-duplicate titles (fuzz.ratio >= 80 against any earlier title) are
+        dropped using the indexed engine in src.dedup. With return_report=True a
+        (articles, report) tuple is returned, where report lists the dropped
+        pairs as {"dropped": ..., "kept": ..., "score": ...} with positions in `articles`.
+        """
+        positions, kept, titles = [], [], set()
+        received = 0
+        for i, article in enumerate(articles):
+            received += 1
+            if article.title and article.title not in titles:
+                titles.add(article.title)
+                positions.append(i)
+                kept.append(article)
 
         # Fuzzy matching to remove near-duplicates
         threshold = 80  # Threshold for considering strings as duplicates
-        rows_to_drop = set()  # Use a set to store unique indices
-        for i in range(len(dataframe['title'])):
-            for j in range(i + 1, len(dataframe['title'])):
-                similarity_score = fuzz.ratio(dataframe['title'].iloc[i], dataframe['title'].iloc[j])
-                if similarity_score >= threshold:
-                    rows_to_drop.add(dataframe.index[j])  # Add the original index to the set
-
-        dataframe.drop(index=list(rows_to_drop), inplace=True)  # Convert set to list before dropping
-
-        after_shape = dataframe.shape[0]
-        print(f"{initial_shape - after_shape} elements dropped")
-        return dataframe
-
-    def search_gdelt(self, topic: str) -> pd.DataFrame:
-        """Main function to search GDELT for a specific topic and save to database."""
-        gdelt_query_string = self.get_gdelt_query_string(topic)
-        dataframe = self.fetch_gdelt_data(gdelt_query_string)
-        cleaned_df = self.clean_dataframe(dataframe)
-        
-        # Rerank the documents
-        docs = cleaned_df['title'].tolist()
-        reranked = self.rerank_documents(topic, docs)
-        
-        # Create a new DataFrame with only the top 20 reranked documents
-        top_20_indices = [result.index for result in reranked.results[:20]]
-        top_20_df = cleaned_df.iloc[top_20_indices].copy()
-        
-        # Add relevance scores and current date to the DataFrame
-        relevance_scores = [result.relevance_score for result in reranked.results[:20]]
-        top_20_df['relevance_score'] = relevance_scores
-        top_20_df['date_added'] = datetime.now().strftime('%Y-%m-%d')
-        
-        # Initialize new columns with empty strings (excluding news_body)
-        new_columns = ['short_title_en', 'summary_en', 'sentiment']
-        for col in new_columns:
-            top_20_df[col] = ''
-        
-        # Insert new data without clearing the existing data
-        data_to_insert = top_20_df.to_dict('records')
-        insert_data(topic, data_to_insert)
-        
-        return top_20_df
-
-    def rerank_documents(self, question_string: str, docs: List[str]) -> Dict:
-        """Rerank documents using Cohere's API."""
-        # Filter out empty strings or whitespace-only strings
-        docs = [doc for doc in docs if doc.strip()]
-        if not docs:
-            return {"ranked_documents": []}
-        response = self.cohere_client.rerank(
-            model='rerank-multilingual-v3.0',
-            query=question_string,
-            documents=docs,
-            top_n=min(len(docs), 20),
-        )
-        return response
+        pairs = find_near_duplicates([article.title for article in kept], threshold=threshold)
+        report = [{"dropped": positions[p.dropped], "kept": positions[p.kept], "score": p.score} for p in pairs]
+        dropped = {p.dropped for p in pairs}
+        kept = [article for j, article in enumerate(kept) if j not in dropped]
+
+        print(f"{received - len(kept)} elements dropped")
+        if return_report:
+            return kept, report
+        return kept
+
+    def search_gdelt(self, topic: str, articles: Optional[Iterable] = None, top_n: int = SEARCH_TOP_N,
+                     stats: Optional[Dict] = None) -> List[GdeltArticle]:
+        """
+        Main function to search GDELT for a specific topic and save to database.
+
+        `articles` are records already fetched by the incremental ingester
+        (src.gdelt_ingest); without them the topic's full query is fetched.
+        Returns the `top_n` articles stored, best first, with their
+        relevance_score. `stats`, if given, receives the counts the search
+        span records (received, near_duplicates, seen, selected).
+        """
+        with get_metrics().span('search', topic=topic) as span:
+            try:
+                return self._search_gdelt(topic, articles, span, top_n)
+            finally:
+                if stats is not None:
+                    stats.update(span)
+
+    def _search_gdelt(self, topic: str, articles: Optional[Iterable], span: Dict, top_n: int) -> List[GdeltArticle]:
+        if articles is None:
+            articles = self.fetch_gdelt_articles(self.get_gdelt_query_string(topic))
+        else:
+            articles = as_articles(articles)
+        span['received'] = len(articles)
+        if not articles:
+            return []
+        cleaned = self.clean_articles(articles)
+
+        # Skip stories already ingested for this topic in an earlier run, before paying for the rerank
+        keep = get_seen_index().filter_new(topic, cleaned)
+        cleaned = [article for article, new in zip(cleaned, keep) if new]
+        print(f"{keep.count(False)} articles already seen in earlier runs")
+        span.update(near_duplicates=span['received'] - len(keep), seen=keep.count(False))
+        if not cleaned:
+            return []
+
+        # Rerank the documents (title plus whatever content GDELT returned) against the topic's question
+        docs = [f"{article.title} {article.content}".strip() for article in cleaned]
+        with get_metrics().span('rerank', topic=topic, backend=type(self.reranker).__name__, documents=len(docs)):
+            reranked = self.rerank_documents(self.get_question_string(topic), docs, top_n)
+
+        # Keep the top reranked articles with their relevance scores
+        top = []
+        for result in reranked.results[:top_n]:
+            article = cleaned[result.index]
+            article.relevance_score = result.relevance_score
+            top.append(article)
+
+        # Insert new data without clearing the existing data (summaries are filled in by the scraper)
+        insert_data(topic, top)
+        span['selected'] = len(top)
+
+        return top
+
+    def rerank_documents(self, question_string: str, docs: List[str], top_n: int = SEARCH_TOP_N) -> RerankResponse:
+        """
+        Rerank documents with the configured backend (src.rerank: cohere, bm25,
+        tfidf or hybrid). `.results[i].index` refers to `docs`, best first, top `top_n`.
+        """
+        return self.reranker.rerank(question_string, docs, top_n=top_n)
 
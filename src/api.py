@@ -0,0 +1,221 @@
+"""
+Read-only HTTP API over the SensusMundi database.
+
+    uvicorn src.api:app --port 8000
+
+    GET /topics/{topic}/watchlist/latest
+    GET /topics/{topic}/articles?date=YYYY-MM-DD&page=1&page_size=20
+    GET /search?q=...&topic=...&limit=20&offset=0
+
+Responses carry an ETag and honour If-None-Match. They are also kept in an
+in-process TTL cache that is dropped as soon as anything writes to the
+database, from this process or from the pipeline in another one: SQLite bumps
+`PRAGMA data_version` on a connection whenever another connection commits.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+
+from src import config
+from src.body_store import BodyStore
+from src.db import Database, get_database
+
+API_CACHE_TTL_SECONDS = getattr(config, 'API_CACHE_TTL_SECONDS', 60)
+API_CACHE_MAX_ENTRIES = getattr(config, 'API_CACHE_MAX_ENTRIES', 2048)
+MAX_PAGE_SIZE = 100
+_SEARCH_TERM = re.compile(r"\w+", re.UNICODE)
+
+ARTICLE_COLUMNS = ('id', 'topic', 'url', 'title', 'seendate', 'domain', 'language', 'sourcecountry',
+                   'relevance_score', 'date_added', 'short_title_en', 'summary_en', 'sentiment')
+
+
+class ResponseCache:
+    """
+    Encoded responses keyed by request, valid for `ttl_seconds` and only while
+    the database is unchanged. A dedicated connection reads `PRAGMA data_version`,
+    which changes whenever any other connection commits; on a change the whole
+    cache is dropped.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = API_CACHE_TTL_SECONDS, max_entries: int = API_CACHE_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[float, bytes, str]] = {}
+        self._version = None
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def _check_version(self):
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._version:
+            if self._entries:
+                self.stats['invalidations'] += 1
+            self._entries.clear()
+            self._version = version
+
+    def get_or_build(self, key: str, build: Callable[[], object]) -> Tuple[bytes, str]:
+        """(body, etag) for `key`, calling `build` for the payload on a miss."""
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry and entry[0] > self.clock():
+                self.stats['hits'] += 1
+                return entry[1], entry[2]
+        self.stats['misses'] += 1
+        body = json.dumps(build(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        etag = '"' + hashlib.sha256(body).hexdigest()[:20] + '"'
+        if self.ttl_seconds > 0:
+            with self._lock:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))  # oldest insert first
+                self._entries[key] = (self.clock() + self.ttl_seconds, body, etag)
+        return body, etag
+
+    def close(self):
+        self._conn.close()
+
+
+# Titles, summaries and inline bodies are in articles_fts, stored bodies (with their title) in the
+# contentless article_bodies_fts; an article matches if either index matches it. Only articles_fts
+# keeps text for snippet(), so a hit on a stored body gets its snippet from body_snippet.
+SEARCH_SQL = f'''
+WITH hits (id, snippet, rank) AS (
+    SELECT rowid, snippet(articles_fts, -1, '[', ']', ' ... ', 12), bm25(articles_fts)
+    FROM articles_fts WHERE articles_fts MATCH :match
+    UNION ALL
+    SELECT rowid, NULL, bm25(article_bodies_fts) FROM article_bodies_fts WHERE article_bodies_fts MATCH :match
+)
+SELECT {", ".join("a." + c for c in ARTICLE_COLUMNS)}, max(h.snippet), min(h.rank)
+FROM hits h JOIN articles a ON a.id = h.id
+WHERE :topic IS NULL OR a.topic = :topic
+GROUP BY a.id
+ORDER BY min(h.rank), a.id
+LIMIT :limit OFFSET :offset
+'''
+
+
+def fts_query(text: str) -> str:
+    """User input as an FTS5 query: every word must match, operators and syntax are taken literally."""
+    terms = _SEARCH_TERM.findall(text)
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def body_snippet(text: str, terms, tokens: int = 12) -> str:
+    """snippet() for a stored body: about `tokens` words around the first searched word, which is bracketed."""
+    wanted = {term.lower() for term in terms}
+    words = list(_SEARCH_TERM.finditer(text))
+    hits = [i for i, word in enumerate(words) if word.group().lower() in wanted]
+    if not hits:
+        return ''
+    start = max(min(hits[0] - tokens // 4, len(words) - tokens), 0)
+    end = min(start + tokens, len(words))
+    parts = [' ... '] if start else []
+    position = words[start].start()
+    for word in words[start:end]:
+        parts.append(text[position:word.start()])
+        parts.append(f"[{word.group()}]" if word.group().lower() in wanted else word.group())
+        position = word.end()
+    if end < len(words):
+        parts.append(' ... ')
+    return "".join(parts)
+
+
+def search_articles(db: Database, q: str, topic: Optional[str] = None, limit: int = 20, offset: int = 0) -> List[Dict]:
+    """Articles matching every word of `q`, best first, each with a `snippet` and its bm25 `rank`."""
+    rows = db.query(SEARCH_SQL, {'match': fts_query(q), 'topic': topic, 'limit': limit, 'offset': offset})
+    items = []
+    for row in rows:
+        item = dict(zip(ARTICLE_COLUMNS, row))
+        item["snippet"], item["rank"] = row[-2], row[-1]
+        items.append(item)
+    # Stored bodies are only decompressed for the hits on this page that need a snippet from them
+    missing = [item["id"] for item in items if item["snippet"] is None]
+    bodies = BodyStore(db).get_many(missing) if missing else {}
+    terms = _SEARCH_TERM.findall(q)
+    for item in items:
+        if item["snippet"] is None:
+            item["snippet"] = body_snippet(bodies.get(item["id"], ''), terms)
+    return items
+
+
+def create_app(db: Optional[Database] = None, cache_ttl_seconds: float = API_CACHE_TTL_SECONDS) -> FastAPI:
+    app = FastAPI(title="SensusMundi API")
+    state = {'db': db, 'cache': None}
+
+    def database() -> Database:
+        if state['db'] is None:
+            state['db'] = get_database()
+        return state['db']
+
+    def cache() -> ResponseCache:
+        if state['cache'] is None:
+            state['cache'] = ResponseCache(database().path, ttl_seconds=cache_ttl_seconds)
+        return state['cache']
+
+    def respond(request: Request, build: Callable[[], object]) -> Response:
+        body, etag = cache().get_or_build(str(request.url.path) + '?' + str(request.url.query), build)
+        headers = {'ETag': etag, 'Cache-Control': f'public, max-age={int(cache_ttl_seconds)}'}
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type='application/json', headers=headers)
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    @app.get("/topics/{topic}/watchlist/latest")
+    def latest_watchlist(topic: str, request: Request):
+        def build():
+            rows = database().query('''
+            SELECT country, date_added, watchlist, urls_used FROM watchlist
+            WHERE country = ? ORDER BY date_added DESC, id DESC LIMIT 1
+            ''', (topic,))
+            if not rows:
+                raise HTTPException(status_code=404, detail=f"No watchlist for {topic}")
+            country, date_added, watchlist, urls_used = rows[0]
+            return {"country": country, "date": date_added, "watchlist": watchlist, "urls": json.loads(urls_used or '[]')}
+        return respond(request, build)
+
+    @app.get("/topics/{topic}/articles")
+    def articles(topic: str, request: Request, day: Optional[date] = Query(None, alias="date"),
+                 page: int = Query(1, ge=1), page_size: int = Query(20, ge=1, le=MAX_PAGE_SIZE)):
+        def build():
+            target = (day or date.today()).isoformat()
+            total = database().query("SELECT COUNT(*) FROM articles WHERE topic = ? AND date_added = ?",
+                                     (topic, target))[0][0]
+            rows = database().query(f'''
+            SELECT {", ".join(ARTICLE_COLUMNS)} FROM articles
+            WHERE topic = ? AND date_added = ?
+            ORDER BY relevance_score DESC, id
+            LIMIT ? OFFSET ?
+            ''', (topic, target, page_size, (page - 1) * page_size))
+            return {"topic": topic, "date": target, "page": page, "page_size": page_size, "total": total,
+                    "items": [dict(zip(ARTICLE_COLUMNS, row)) for row in rows]}
+        return respond(request, build)
+
+    @app.get("/search")
+    def search(request: Request, q: str = Query(..., min_length=1), topic: Optional[str] = None,
+               limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE), offset: int = Query(0, ge=0)):
+        match = fts_query(q)
+        if not match:
+            raise HTTPException(status_code=400, detail="Query has no searchable words")
+
+        def build():
+            items = search_articles(database(), q, topic, limit, offset)
+            return {"query": q, "topic": topic, "limit": limit, "offset": offset, "items": items}
+        return respond(request, build)
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,247 @@
+"""
+Compressed store for scraped article bodies.
+
+Bodies live in `article_bodies`, one compressed blob per article, instead of
+in `articles.news_body`: the metadata rows stay small, so the listing and
+summary queries scan far fewer pages, and a body is only decompressed when it
+is actually read (BodyStore.get, or a search snippet).
+
+Blobs are zlib, or zstd when the optional `zstandard` package is installed,
+compressed against a shared dictionary trained on our own bodies (see
+BodyStore.train). News bodies are short and share a lot of boilerplate, so a
+dictionary roughly doubles what zlib alone gets out of them. Every blob keeps
+the id of its dictionary in `body_dictionaries`; retraining only affects new
+writes.
+
+Bodies are searched through `article_bodies_fts`, a contentless FTS5 index
+that BodyStore writes itself with the plain text it compresses: SQLite cannot
+read the blobs, so no trigger could keep that index up to date.
+"""
+import re
+import sqlite3
+import zlib
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src import config
+
+try:
+    import zstandard
+except ImportError:  # optional: bodies are zlib-compressed without it
+    zstandard = None
+
+BODY_CODEC = getattr(config, 'BODY_CODEC', None) or ('zstd' if zstandard is not None else 'zlib')
+BODY_COMPRESSION_LEVEL = getattr(config, 'BODY_COMPRESSION_LEVEL', 9)
+BODY_DICTIONARY_BYTES = getattr(config, 'BODY_DICTIONARY_BYTES', 32 * 1024)  # zlib only uses a 32 KiB window
+BODY_DICTIONARY_SAMPLES = getattr(config, 'BODY_DICTIONARY_SAMPLES', 2000)
+MIN_TRAINING_SAMPLES = 20
+
+_SEGMENT = re.compile(r'(?<=[.!?])\s+|\n+')
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def train_zlib_dictionary(samples: Sequence[str], size: int = BODY_DICTIONARY_BYTES) -> bytes:
+    """
+    A preset dictionary for zlib: sentences that recur across bodies (bylines,
+    newsletter and cookie notices, "Read more" links), the most valuable last
+    because deflate reaches the end of the dictionary with the shortest
+    distances, preceded by the most common words.
+    """
+    segments = Counter()
+    words = Counter()
+    for sample in samples:
+        segments.update({s.strip() for s in _SEGMENT.split(sample) if 20 <= len(s.strip()) <= 400})
+        words.update(set(_WORD.findall(sample)))
+    repeated = sorted(((count * len(s), s) for s, count in segments.items() if count >= 2), reverse=True)
+    picked, used = [], 0
+    for _, segment in repeated:
+        if used + len(segment) + 1 > size:
+            break
+        picked.append(segment)
+        used += len(segment.encode('utf-8')) + 1
+    common = [w for w, count in words.most_common() if count >= 2 and len(w) > 3]
+    filler, filler_used = [], 0
+    for word in common:
+        if used + filler_used + len(word) + 1 > size:
+            break
+        filler.append(word)
+        filler_used += len(word.encode('utf-8')) + 1
+    text = " ".join(reversed(filler)) + "\n" + "\n".join(reversed(picked))
+    return text.encode('utf-8')[-size:]
+
+
+def train_dictionary(samples: Sequence[str], codec: str = BODY_CODEC, size: int = BODY_DICTIONARY_BYTES) -> bytes:
+    if codec == 'zstd':
+        return zstandard.train_dictionary(size, [s.encode('utf-8') for s in samples]).as_bytes()
+    return train_zlib_dictionary(samples, size)
+
+
+@lru_cache(maxsize=8)
+def _zstd_dictionary(data: bytes):
+    return zstandard.ZstdCompressionDict(data)
+
+
+def deflate_body(text: str, codec: str = BODY_CODEC, dictionary: Optional[bytes] = None,
+                 level: int = BODY_COMPRESSION_LEVEL) -> bytes:
+    data = text.encode('utf-8')
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("BODY_CODEC is 'zstd' but the zstandard package is not installed")
+        kwargs = {'dict_data': _zstd_dictionary(dictionary)} if dictionary else {}
+        return zstandard.ZstdCompressor(level=level, **kwargs).compress(data)
+    compressor = zlib.compressobj(level, zdict=dictionary) if dictionary else zlib.compressobj(level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def inflate_body(codec: Optional[str], dictionary: Optional[bytes], blob: Optional[bytes]) -> Optional[str]:
+    """The text of a stored body."""
+    if blob is None:
+        return None
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("body was stored with zstd but the zstandard package is not installed")
+        kwargs = {'dict_data': _zstd_dictionary(dictionary)} if dictionary else {}
+        return zstandard.ZstdDecompressor(**kwargs).decompress(blob).decode('utf-8')
+    decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+    return (decompressor.decompress(blob) + decompressor.flush()).decode('utf-8')
+
+
+UPSERT_BODY = '''
+INSERT INTO article_bodies (article_id, codec, dict_id, body) VALUES (?, ?, ?, ?)
+ON CONFLICT (article_id) DO UPDATE SET codec = excluded.codec, dict_id = excluded.dict_id, body = excluded.body
+'''
+# The body index is contentless, so replacing a row means handing it back exactly what it indexed.
+# Titles never change after insert, so the article's current title is the one that was indexed.
+UNINDEX_BODY = "INSERT INTO article_bodies_fts (article_bodies_fts, rowid, title, news_body) VALUES ('delete', ?, ?, ?)"
+INDEX_BODY = "INSERT INTO article_bodies_fts (rowid, title, news_body) SELECT id, title, ? FROM articles WHERE id = ?"
+
+
+def _stored_bodies(conn: sqlite3.Connection, article_ids: Sequence[int], dictionaries: Dict[int, Optional[bytes]]):
+    """(article_id, title, text) of the bodies already stored for `article_ids`."""
+    rows = conn.execute(f'''
+    SELECT b.article_id, a.title, b.codec, b.dict_id, b.body
+    FROM article_bodies b JOIN articles a ON a.id = b.article_id
+    WHERE b.article_id IN ({", ".join("?" * len(article_ids))})
+    ''', list(article_ids)).fetchall()
+    for article_id, title, codec, dict_id, blob in rows:
+        if dict_id is not None and dict_id not in dictionaries:
+            dictionaries[dict_id] = conn.execute("SELECT data FROM body_dictionaries WHERE id = ?", (dict_id,)).fetchone()[0]
+        yield article_id, title, inflate_body(codec, dictionaries.get(dict_id), blob)
+
+
+class BodyStore:
+    """
+    Reads and writes article bodies in `article_bodies` through a Database.
+    New bodies are compressed with the newest dictionary for the codec.
+    """
+
+    def __init__(self, db, codec: str = BODY_CODEC, level: int = BODY_COMPRESSION_LEVEL):
+        self.db = db
+        self.codec = codec
+        self.level = level
+        self._dictionaries: Dict[int, bytes] = {}
+        self._current = None
+
+    def _dictionary(self, dict_id: Optional[int]) -> Optional[bytes]:
+        if dict_id is None:
+            return None
+        if dict_id not in self._dictionaries:
+            rows = self.db.query("SELECT data FROM body_dictionaries WHERE id = ?", (dict_id,))
+            self._dictionaries[dict_id] = rows[0][0] if rows else None
+        return self._dictionaries[dict_id]
+
+    def current_dictionary(self) -> Tuple[Optional[int], Optional[bytes]]:
+        """(id, data) of the dictionary new bodies are compressed with, (None, None) before any is trained."""
+        if self._current is None:
+            rows = self.db.query("SELECT id, data FROM body_dictionaries WHERE codec = ? ORDER BY id DESC LIMIT 1",
+                                 (self.codec,))
+            self._current = rows[0] if rows else (None, None)
+            if rows:
+                self._dictionaries[rows[0][0]] = rows[0][1]
+        return self._current
+
+    def encode(self, text: str) -> Tuple[str, Optional[int], bytes]:
+        dict_id, dictionary = self.current_dictionary()
+        return self.codec, dict_id, deflate_body(text, self.codec, dictionary, self.level)
+
+    def put_many(self, bodies: Iterable[Tuple[int, str]]) -> int:
+        """Store (article_id, text) bodies, replacing earlier ones, and index their text in one transaction."""
+        bodies = list(dict(bodies).items())  # the last text of an article wins
+        if not bodies:
+            return 0
+        rows = [(article_id, *self.encode(text)) for article_id, text in bodies]
+        with self.db.transaction() as conn:
+            replaced = []
+            for start in range(0, len(bodies), 500):
+                replaced.extend(_stored_bodies(conn, [article_id for article_id, _ in bodies[start:start + 500]],
+                                               self._dictionaries))
+            conn.executemany(UNINDEX_BODY, replaced)
+            conn.executemany(UPSERT_BODY, rows)
+            conn.executemany(INDEX_BODY, [(text, article_id) for article_id, text in bodies])
+        return len(rows)
+
+    def put(self, article_id: int, text: str):
+        self.put_many([(article_id, text)])
+
+    def get_many(self, article_ids: Sequence[int]) -> Dict[int, str]:
+        found = {}
+        for start in range(0, len(article_ids), 500):
+            chunk = list(article_ids[start:start + 500])
+            rows = self.db.query(f'''
+            SELECT a.id, a.news_body, b.codec, b.dict_id, b.body
+            FROM articles a LEFT JOIN article_bodies b ON b.article_id = a.id
+            WHERE a.id IN ({", ".join("?" * len(chunk))})
+            ''', chunk)
+            for article_id, inline, codec, dict_id, blob in rows:
+                # Rows written before the body store keep their body inline until migrate_bodies.py moves it
+                text = inline if inline is not None else inflate_body(codec, self._dictionary(dict_id), blob)
+                if text is not None:
+                    found[article_id] = text
+        return found
+
+    def get(self, article_id: int) -> Optional[str]:
+        return self.get_many([article_id]).get(article_id)
+
+    def sample(self, limit: int = BODY_DICTIONARY_SAMPLES) -> List[str]:
+        """Up to `limit` random bodies, inline or stored, to train a dictionary on."""
+        rows = self.db.query('''
+        SELECT a.id FROM articles a LEFT JOIN article_bodies b ON b.article_id = a.id
+        WHERE a.news_body IS NOT NULL OR b.article_id IS NOT NULL
+        ORDER BY random() LIMIT ?
+        ''', (limit,))
+        return list(self.get_many([row[0] for row in rows]).values())
+
+    def train(self, samples: Optional[Sequence[str]] = None, size: int = BODY_DICTIONARY_BYTES) -> Optional[int]:
+        """Train a dictionary on `samples` (default: a sample of stored bodies) and use it for new writes."""
+        samples = self.sample() if samples is None else samples
+        if len(samples) < MIN_TRAINING_SAMPLES:
+            print(f"Not training a body dictionary on only {len(samples)} bodies")
+            return None
+        data = train_dictionary(samples, self.codec, size)
+        self.db.execute('''
+        INSERT INTO body_dictionaries (codec, data, samples, created_at) VALUES (?, ?, ?, datetime('now'))
+        ''', (self.codec, data, len(samples)))
+        self._current = None
+        dict_id, _ = self.current_dictionary()
+        print(f"Trained {self.codec} body dictionary {dict_id} ({len(data)} bytes) on {len(samples)} bodies")
+        return dict_id
+
+    def stats(self) -> Dict[str, int]:
+        count, raw, stored = self.db.query('''
+        SELECT COUNT(*), COALESCE(SUM(a.body_length), 0), COALESCE(SUM(length(b.body)), 0)
+        FROM article_bodies b JOIN articles a ON a.id = b.article_id
+        ''')[0]
+        return {'bodies': count, 'raw_chars': raw, 'stored_bytes': stored}
+
+
+_body_store = None
+
+
+def get_body_store() -> BodyStore:
+    """Process-wide BodyStore over get_database()."""
+    global _body_store
+    if _body_store is None:
+        from src.db import get_database
+        _body_store = BodyStore(get_database())
+    return _body_store
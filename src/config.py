@@ -0,0 +1,29 @@
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATABASE_NAME = 'news4u.db'
+DATABASE_PATH = os.path.join(BASE_DIR, 'src', DATABASE_NAME)
+QUERY_PARAMS_PATH = os.path.join(BASE_DIR, 'src', 'query_parameters.json')
+COHERE_API_KEY = 'YOUR COHERE API KEY'
+OPENAI_API_KEY = 'YOUR OPENAI API KEY'
+
+# Article fetching/parsing (optional, defaults shown)
+MAX_INFLIGHT_FETCHES = 32
+MAX_FETCHES_PER_HOST = 4
+FETCH_TIMEOUT_SECONDS = 20
+PARSE_WORKERS = None  # None = one per CPU core
+
+# OpenAI client limits (optional, defaults shown)
+OPENAI_BASE_URL = 'https://api.openai.com/v1'
+OPENAI_REQUESTS_PER_MINUTE = 500
+OPENAI_TOKENS_PER_MINUTE = 200000
+OPENAI_MAX_CONCURRENCY = 16
+OPENAI_MAX_RETRIES = 6
+
+# LLM response cache (optional, defaults shown)
+LLM_CACHE_MODE = 'readwrite'  # 'replay' serves only cached responses (offline runs), 'off' bypasses it
+LLM_CACHE_MAX_MB = 512
+LLM_CACHE_TTL_DAYS = 30
+
+print(f"Looking for query_parameters.json at: {QUERY_PARAMS_PATH}")
+print(f"Current working directory: {os.getcwd()}")
\ No newline at end of file
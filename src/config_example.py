@@ -7,5 +7,94 @@ QUERY_PARAMS_PATH = os.path.join(BASE_DIR, 'src', 'query_parameters.json')
 COHERE_API_KEY = 'YOUR COHERE API KEY'
 OPENAI_API_KEY = 'YOUR OPENAI API KEY'
 
-print(f"Looking for query_parameters.json at: {QUERY_PARAMS_PATH}")
-print(f"Current working directory: {os.getcwd()}")
\ No newline at end of file
+# Article fetching/parsing (optional, defaults shown)
+MAX_INFLIGHT_FETCHES = 32
+MAX_FETCHES_PER_HOST = 4
+FETCH_TIMEOUT_SECONDS = 20
+PARSE_WORKERS = None  # None = one per CPU core
+
+# OpenAI client limits (optional, defaults shown)
+OPENAI_BASE_URL = 'https://api.openai.com/v1'
+OPENAI_REQUESTS_PER_MINUTE = 500
+OPENAI_TOKENS_PER_MINUTE = 200000
+OPENAI_MAX_CONCURRENCY = 16
+OPENAI_MAX_RETRIES = 6
+
+# Article summaries (optional, defaults shown): 'realtime' calls OpenAI per article, 'batch' uses the Batch API
+SUMMARY_MODE = 'realtime'
+OPENAI_BATCH_POLL_SECONDS = 30
+OPENAI_BATCH_MAX_WAIT_MINUTES = 360  # batches still running then are picked up by the next run
+OPENAI_BATCH_MAX_REQUESTS = 50000
+OPENAI_BATCH_MAX_ATTEMPTS = 3  # failed requests are re-submitted, then dead-lettered for the real-time path
+
+# Pre-processing of article bodies before they are summarised (optional, defaults shown)
+SUMMARY_PREPROCESS_ENABLED = True
+SUMMARY_INPUT_TOKENS = 1200  # longer bodies keep their lead and the passages closest to the topic
+SUMMARY_LEAD_PARAGRAPHS = 2
+BOILERPLATE_MIN_ARTICLES = 4  # a paragraph is a domain's boilerplate once it recurs in this many articles...
+BOILERPLATE_MIN_SHARE = 0.2  # ...and this share of the domain's articles
+BOILERPLATE_SAMPLE_ARTICLES = 20000
+BOILERPLATE_REFRESH_HOURS = 24
+
+# LLM response cache (optional, defaults shown)
+LLM_CACHE_MODE = 'readwrite'  # 'replay' serves only cached responses (offline runs), 'off' bypasses it
+LLM_CACHE_MAX_MB = 512
+LLM_CACHE_TTL_DAYS = 30
+
+# Incremental GDELT ingestion (optional, defaults shown)
+GDELT_MAX_CONCURRENCY = 4  # GDELT answers 429 when pushed harder
+GDELT_TIMEOUT_SECONDS = 30
+GDELT_MIN_WINDOW_MINUTES = 15  # full windows are split in half down to this size
+GDELT_MAX_LOOKBACK_HOURS = 72  # never request further back than this, even after a long pause
+
+# Search result ranking (optional, defaults shown)
+RERANK_BACKEND = 'hybrid'  # 'cohere', 'bm25', 'tfidf', or 'hybrid' (BM25 shortlist, Cohere reranks the top K)
+RERANK_PREFILTER_K = 50
+COHERE_RERANK_MODEL = 'rerank-multilingual-v3.0'
+COHERE_BASE_URL = None  # None = Cohere's production API
+
+# Watchlist generation (optional, default shown): days whose summaries exceed this are map-reduced
+WATCHLIST_PROMPT_TOKENS = 12000
+
+# Read API (optional, defaults shown)
+API_CACHE_TTL_SECONDS = 60
+API_CACHE_MAX_ENTRIES = 2048
+
+# Compressed article bodies (optional, defaults shown)
+BODY_CODEC = None  # None = 'zstd' when the zstandard package is installed, else 'zlib'
+BODY_COMPRESSION_LEVEL = 9
+BODY_DICTIONARY_BYTES = 32768
+BODY_DICTIONARY_SAMPLES = 2000
+
+# Raw HTML of fetched pages, for conditional re-fetches and src/reparse.py (optional, defaults shown;
+# HTML_STORE_DIR defaults to src/html_store)
+HTML_STORE_ENABLED = True
+HTML_STORE_LEVEL = 6  # zlib level of the stored pages
+HTML_STORE_FRESH_MINUTES = 60  # pages validated more recently are served without a request
+
+# Job queue and worker processes of src/workers.py (optional, defaults shown)
+JOB_LEASE_SECONDS = 120  # a job whose worker stops renewing its lease this long is taken over
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_SECONDS = 30  # wait before a failed job is retried, doubled after every attempt
+JOB_SLOTS = 8  # jobs one worker process runs at a time
+JOB_POLL_SECONDS = 1.0
+
+# Volume-adaptive scheduler of src/scheduler.py (optional, defaults shown; SCHEDULER_STATUS_PATH defaults to
+# metrics/scheduler.json)
+SCHEDULER_MIN_INTERVAL_MINUTES = 15  # busiest topics are polled this often
+SCHEDULER_MAX_INTERVAL_HOURS = 12  # quietest topics
+SCHEDULER_TARGET_ARTICLES = 40  # new, non-duplicate articles a poll should find
+SCHEDULER_SELECT_SHARE = 0.3  # of those, the share scraped and summarised ...
+SCHEDULER_MIN_SELECT = 3  # ... but at least this many
+SCHEDULER_MAX_SELECT = 60  # ... and at most this many per poll
+SCHEDULER_MAX_CONCURRENT = 2  # topics polled at once
+SCHEDULER_MAX_POLLS_PER_HOUR = 30  # GDELT budget over all topics
+SCHEDULER_MAX_SUMMARIES_PER_HOUR = 200  # LLM budget over all topics
+SCHEDULER_RISE_HALF_LIFE_HOURS = 1.0  # how fast a topic's arrival rate follows a burst
+SCHEDULER_DECAY_HALF_LIFE_HOURS = 6.0  # and how slowly it comes down again
+SCHEDULER_WATCHLIST_HOUR = 18  # UTC; a topic's first poll after it makes the day's watchlist
+SCHEDULER_METRICS_MINUTES = 5  # how often the daemon rewrites the metrics report in METRICS_DIR
+
+# Run metrics (optional, defaults shown; METRICS_DIR defaults to metrics/ in the project root)
+METRICS_ENABLED = True
+METRICS_MAX_SPANS = 50000  # trace records kept per run; histograms and counters always cover every span
@@ -1,37 +1,53 @@
 import os
 import sys
+import argparse
 import asyncio
 import json
-import newspaper
+import aiohttp
 
 # Add the project root to the Python path
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
 sys.path.append(project_root)
 
-from src.SearchGdelt import GdeltSearcher
-from src.ScrapeNews import run_news_scraper
+from typing import Dict, Optional
+
+from src.SearchGdelt import SEARCH_TOP_N, GdeltSearcher
+from src.gdelt_ingest import GdeltIngester, set_query_param
+from src.ScrapeNews import SUMMARY_MODE, SUMMARY_MODES, run_news_scraper
 from src.GetWatchlist import run_watchlist_generator
+from src.pipeline import DEFAULT_CONCURRENCY, DEFAULT_QUEUE_SIZE, run_pipeline
 from src.config import QUERY_PARAMS_PATH, COHERE_API_KEY
+from src.seen_index import get_seen_index
+from src.llm_cache import CACHE_MODES, get_llm_cache
+from src.rerank import RERANK_BACKEND, RERANK_BACKENDS
+from src.export_static import EXPORT_DIR, export_static
+from src.db import get_database
+from src.metrics import METRICS_DIR, get_metrics
+from src.openai_client import get_openai_client
+from src.openai_batch import summarize_in_batches
+from src.topics import get_topic_registry
 
-async def run_end_to_end_test(country: str):
+async def run_end_to_end_test(country: str, rerank_backend: str = RERANK_BACKEND, summary_mode: str = SUMMARY_MODE):
     print(f"Starting end-to-end test for country: {country}")
     print(f"QUERY_PARAMS_PATH: {QUERY_PARAMS_PATH}")
     print(f"File exists: {os.path.exists(QUERY_PARAMS_PATH)}")
     
     # Step 1: GDELT Search
-    searcher = GdeltSearcher(QUERY_PARAMS_PATH, COHERE_API_KEY)
-    topic = next((t for t in searcher.query_params['topics'] if t['topic'] == country), None)
+    searcher = GdeltSearcher(QUERY_PARAMS_PATH, COHERE_API_KEY, rerank_backend)
     
-    if topic:
-        print(f"Step 1: Updating data for topic: {topic['topic']}")
-        searcher.search_gdelt(topic['topic'])
+    if country in searcher.topics:
+        print(f"Step 1: Updating data for topic: {country}")
+        await search_topic(searcher, country)
         print("GDELT search completed successfully.")
         
         # Step 2: News Scraping and Summarization
         print("Step 2: Starting news scraping and summarization process...")
-        await run_news_scraper(country)
+        await run_news_scraper(country, summary_mode)
         print("News scraping and summarization completed successfully.")
+        if summary_mode == 'batch':
+            print("Summaries queued for the OpenAI batch; the watchlist follows once it is applied.")
+            return
         
         # Step 3: Watchlist Generation
         print("Step 3: Generating watchlist...")
@@ -42,11 +58,106 @@ async def run_end_to_end_test(country: str):
     else:
         print(f"Error: No topic found for country: {country}")
 
-if __name__ == "__main__":
-    countries = ['Climate', 'UK', 'China', 'Russia_Ukraine', 'Israel_Palestine', 'USA', 'Turkey', 'Germany', 'France', 'NATO']
+async def search_topic(searcher: GdeltSearcher, topic: str, maxrecords: Optional[int] = None,
+                       top_n: int = SEARCH_TOP_N) -> Dict:
+    """
+    Ingest the topic's new GDELT articles and store the best `top_n` for scraping.
+
+    `maxrecords` replaces the query's own page size (src/scheduler.py sizes it
+    per topic). Returns the counts: ingested, requests and truncated from the
+    ingest, received, near_duplicates, seen and selected from the search.
+    """
+    query_url_for = searcher.get_gdelt_query_string
+    if maxrecords:
+        query_url_for = lambda t: set_query_param(searcher.get_gdelt_query_string(t), 'maxrecords', str(maxrecords))
+    async with aiohttp.ClientSession() as session:
+        ingester = GdeltIngester(session, query_url_for)
+        batch = await ingester.ingest_topic(topic)
+    if batch.error:
+        raise batch.error
+    stats = {'ingested': len(batch.articles), 'requests': batch.requests, 'truncated': batch.truncated}
+    # Dedup, rerank and insert are blocking; keep the event loop free for the scheduler's other polls
+    await asyncio.to_thread(searcher.search_gdelt, topic, batch.articles, top_n, stats)
+    ingester.advance(batch)
+    return stats
+
+async def run_stages(args):
+    """The selected stages one after the other, each over every topic; a stage only needs what earlier runs stored."""
+    if 'search' in args.stages:
+        searcher = GdeltSearcher(QUERY_PARAMS_PATH, COHERE_API_KEY, args.rerank)
+        for topic in args.topics:
+            with get_metrics().span('search_stage', topic=topic):
+                await search_topic(searcher, topic)
+    if 'scrape' in args.stages:
+        for topic in args.topics:
+            await run_news_scraper(topic, args.summaries)
+    if 'watchlist' in args.stages:
+        if args.summaries == 'batch':
+            with get_metrics().span('batch_summaries'):
+                await summarize_in_batches()
+        await run_watchlist_generator(args.topics)
+
+STAGES = ('search', 'scrape', 'watchlist', 'export')
 
-    async def main():
-        for country in countries:
-            await run_end_to_end_test(country)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the SensusMundi search -> scrape -> summarize -> watchlist pipeline.")
+    parser.add_argument("--topics", nargs="+", default=get_topic_registry().names(),
+                        help="topics to run (default: all in query_parameters.json)")
+    parser.add_argument("--mode", choices=["pipeline", "sequential"], default="pipeline",
+                        help="pipeline: all topics stream through concurrent stages; sequential: one topic and stage at a time")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES),
+                        help="run only these stages, one after the other over all topics (default: all); e.g. "
+                             "--stages watchlist export regenerates watchlists from the summaries already stored")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="max items waiting between two stages")
+    parser.add_argument("--llm-cache", choices=CACHE_MODES, default=None,
+                        help="readwrite (default): reuse and store LLM responses; replay: only use cached responses, no API calls; off: bypass")
+    parser.add_argument("--summaries", choices=SUMMARY_MODES, default=SUMMARY_MODE,
+                        help="realtime: summarise each article as it is scraped; batch: one OpenAI Batch API job for all "
+                             "topics after scraping (half the price, can take hours), then the watchlists")
+    parser.add_argument("--rerank", choices=RERANK_BACKENDS, default=RERANK_BACKEND,
+                        help="how search results are ranked: cohere, local bm25/tfidf, or hybrid (local shortlist, Cohere for the top K)")
+    parser.add_argument("--export-dir", default=EXPORT_DIR, help="where the webapp's static JSON is written (default: webapp/data)")
+    parser.add_argument("--metrics-dir", default=METRICS_DIR,
+                        help="where the run's JSON report and metrics.prom are written (default: metrics/)")
+    for stage, default in DEFAULT_CONCURRENCY.items():
+        parser.add_argument(f"--{stage}-workers", type=int, default=default, help=f"concurrent {stage} workers")
+    return parser.parse_args(argv)
 
-    asyncio.run(main())
\ No newline at end of file
+def write_run_metrics(out_dir: str):
+    """Add the components' own counters to the run metrics, write the report and print the per-stage summary."""
+    metrics = get_metrics()
+    for component, stats in (('llm_cache', get_llm_cache().stats), ('seen_index', get_seen_index().stats),
+                             ('db', get_database().stats), ('openai', get_openai_client().stats)):
+        for name, value in stats.items():
+            metrics.inc(f"{component}_{name}_total", value)
+    path = metrics.write_report(out_dir)
+    print("\n".join(metrics.summary()))
+    print(f"Run metrics written to {path}")
+
+async def main(argv=None):
+    args = parse_args(argv)
+    if args.llm_cache:
+        get_llm_cache().mode = args.llm_cache
+    all_stages = {'search', 'scrape', 'watchlist'} <= set(args.stages)
+    if all_stages and args.mode == "sequential":
+        for country in args.topics:
+            await run_end_to_end_test(country, args.rerank, args.summaries)
+    elif all_stages:
+        searcher = GdeltSearcher(QUERY_PARAMS_PATH, COHERE_API_KEY, args.rerank)
+        concurrency = {stage: getattr(args, f"{stage}_workers") for stage in DEFAULT_CONCURRENCY}
+        await run_pipeline(args.topics, searcher, concurrency, args.queue_size, args.summaries)
+    else:
+        await run_stages(args)
+    if all_stages and args.summaries == 'batch':
+        with get_metrics().span('batch_summaries'):
+            await summarize_in_batches()
+        await run_watchlist_generator(args.topics)
+    if 'export' in args.stages:
+        with get_metrics().span('export'):
+            export_static(args.export_dir)
+    print(get_seen_index().report())
+    print(get_llm_cache().report())
+    write_run_metrics(args.metrics_dir)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,170 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from src.metrics import get_metrics
+
+GROUP_COMMIT_ROWS = 200  # commit once this many queued writes are pending...
+GROUP_COMMIT_MS = 50  # ...or once the oldest one has waited this long
+
+
+class Database:
+    """
+    Shared access to the SQLite database.
+
+    One long-lived write connection in WAL mode is guarded by a lock, so the
+    synchronous helpers (`execute`, `executemany`) can be called from any thread.
+    Async code queues writes with `write`; a single writer task per event loop
+    group-commits them every `batch_size` rows or `flush_interval_ms`, running
+    the actual SQLite work in a thread so the event loop is never blocked, and
+    `write` returns once its row is committed. Reads go through per-thread
+    connections, which WAL lets run alongside the writer.
+    """
+
+    def __init__(self, path: str, batch_size: int = GROUP_COMMIT_ROWS, flush_interval_ms: float = GROUP_COMMIT_MS):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.conn = self._connect()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._loop = None
+        self.stats = {'rows': 0, 'commits': 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")  # safe with WAL: durable at checkpoints, no fsync per commit
+        return conn
+
+    # Synchronous helpers
+
+    def execute(self, sql: str, params: Sequence = ()) -> int:
+        """Run one write statement and commit; returns the number of changed rows."""
+        with self._lock:
+            with self.conn:
+                cursor = self.conn.execute(sql, params)
+            self.stats['rows'] += 1
+            self.stats['commits'] += 1
+            return cursor.rowcount
+
+    def executemany(self, sql: str, rows: Iterable[Sequence]) -> int:
+        """Run a write statement for every row in a single transaction."""
+        with self._lock:
+            with self.conn:
+                cursor = self.conn.executemany(sql, rows)
+            self.stats['rows'] += max(cursor.rowcount, 0)
+            self.stats['commits'] += 1
+            return cursor.rowcount
+
+    @contextmanager
+    def transaction(self):
+        """Hold the write connection for several statements that are committed, or rolled back, together."""
+        with self._lock:
+            with self.conn:
+                yield self.conn
+            self.stats['commits'] += 1
+
+    def query(self, sql: str, params: Sequence = ()) -> List[Tuple]:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn.execute(sql, params).fetchall()
+
+    # Async helpers
+
+    async def fetch_all(self, sql: str, params: Sequence = ()) -> List[Tuple]:
+        """Run a read query in a worker thread."""
+        return await asyncio.to_thread(self.query, sql, params)
+
+    def _bind_loop(self):
+        # The writer task and its queue belong to one event loop; scripts call asyncio.run() per topic
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._writer_task = loop.create_task(self._writer())
+
+    async def write(self, sql: str, params: Sequence = ()):
+        """Queue a write for the next group commit and wait until it is committed."""
+        self._bind_loop()
+        future = self._loop.create_future()
+        queued = time.perf_counter()
+        await self._queue.put((sql, params, future))
+        await future
+        get_metrics().observe('db_write_wait_seconds', time.perf_counter() - queued)
+
+    async def flush(self):
+        """Wait until every write queued so far has been committed."""
+        if self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            errors = await asyncio.to_thread(self._apply_batch, [(sql, params) for sql, params, _ in batch])
+            for (_, _, future), error in zip(batch, errors):
+                if not future.done():
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+                self._queue.task_done()
+
+    def _apply_batch(self, statements: List[Tuple[str, Sequence]]) -> List[Optional[Exception]]:
+        with get_metrics().span('db_commit', rows=len(statements)):
+            return self._apply_batch_locked(statements)
+
+    def _apply_batch_locked(self, statements: List[Tuple[str, Sequence]]) -> List[Optional[Exception]]:
+        with self._lock:
+            try:
+                with self.conn:
+                    for sql, params in statements:
+                        self.conn.execute(sql, params)
+                self.stats['rows'] += len(statements)
+                self.stats['commits'] += 1
+                return [None] * len(statements)
+            except sqlite3.Error:
+                pass
+            # Something in the batch failed and was rolled back; apply one by one so only the bad row fails
+            errors = []
+            for sql, params in statements:
+                try:
+                    with self.conn:
+                        self.conn.execute(sql, params)
+                    self.stats['rows'] += 1
+                    self.stats['commits'] += 1
+                    errors.append(None)
+                except sqlite3.Error as e:
+                    errors.append(e)
+            return errors
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+_database = None
+
+
+def get_database() -> Database:
+    """Process-wide Database for the SQLite file that insert_data, the scraper and the webapp share."""
+    global _database
+    if _database is None:
+        from src.initialize_db import get_db_path, init_db
+        init_db()
+        _database = Database(get_db_path())
+    return _database
@@ -0,0 +1,238 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+TYPICAL_PAIR_LENGTH = 120  # two headlines of about 60 characters
+MIN_USEFUL_SHARED = 8  # fewer required shared grams than this prune too little to be worth indexing
+REBUILD_MIN_SIZE = 256
+
+
+class DuplicatePair(NamedTuple):
+    dropped: int  # position of the later row that gets dropped
+    kept: int  # position of the earlier row it matched
+    score: int  # fuzz.ratio between the two original titles
+
+
+def normalize_title(title: str) -> str:
+    """Lowercase a title and collapse punctuation/whitespace runs into single spaces."""
+    return _NON_WORD.sub(" ", title.lower()).strip()
+
+
+def qgrams(text: str, q: int) -> List[Tuple[str, int]]:
+    """The text's character q-grams, each numbered by its occurrence so repeated grams stay distinct."""
+    seen = Counter()
+    grams = []
+    for i in range(len(text) - q + 1):
+        gram = text[i:i + q]
+        grams.append((gram, seen[gram]))
+        seen[gram] += 1
+    return grams
+
+
+def gram_slope(q: int, threshold: int) -> float:
+    """Shared q-grams per character of the two titles' total length that a pair at `threshold` must have."""
+    ratio = (threshold - 0.5) / 100
+    return (2 * q - 1) * ratio / 2 - (q - 1)
+
+
+def gram_size(threshold: int) -> int:
+    """The longest q-gram (3, 2 or 1) whose bound still requires a useful number of shared grams at `threshold`."""
+    for q in (3, 2):
+        if gram_slope(q, threshold) * TYPICAL_PAIR_LENGTH - (q - 1) >= MIN_USEFUL_SHARED:
+            return q
+    return 1
+
+
+class NearDuplicateIndex:
+    """
+    Finds every pair of titles with fuzz.ratio >= `threshold` without comparing every pair.
+
+    fuzz.ratio is 2 * M / (len(a) + len(b)), rounded, where M (the characters
+    in SequenceMatcher's matching blocks) is at most the length L of a longest
+    common subsequence. Every character outside that subsequence breaks at most
+    q - 1 of its q-grams, so the two titles share at least
+
+        (2q - 1) * L - (q - 1) * (len(a) + len(b)) - (q - 1)
+
+    character q-grams, counted with repeats. A ratio at the threshold bounds L
+    from below, which gives the fewest q-grams a pair of a given total length
+    must share (`required`); for one title, the shortest partner the length
+    filter allows gives its own minimum. q is the longest gram for which the
+    bound is useful: bigrams at the default threshold of 80, where a 3-gram
+    bound can be negative, and 3-grams from 85 up.
+
+    Grams are ordered rarest first (by frequency in the titles the index was
+    built from), and only the prefix of each title's grams that must contain
+    one shared gram goes into the inverted index (prefix filtering): a pair
+    sharing at least the minimum always meets there, and the ranks at which
+    it meets bound how many grams it can share at most (positional filter).
+    Candidates are then
+    checked with the exact shared-gram count, the length filter and finally
+    fuzz.ratio, so the decisions are exactly those of the pairwise loop
+    (find_near_duplicates_bruteforce). Titles too short for any bound are
+    compared with every title.
+
+    `find_duplicates(titles)` handles one batch. To keep an index across calls,
+    `build(titles)` it, then `match` and `add` titles; the gram order is frozen
+    at `build` and the index rebuilds itself once it has doubled in size.
+    """
+
+    def __init__(self, threshold: int = 80):
+        self.threshold = threshold
+        self.ratio = (threshold - 0.5) / 100
+        self.q = gram_size(threshold)
+        self.slope = gram_slope(self.q, threshold)
+        self.comparisons = 0  # number of fuzz.ratio calls made since the last find_duplicates
+        self.build([])
+
+    def build(self, titles: Sequence[str]):
+        """Index `titles`, ordering grams by their frequency among them."""
+        grams = [qgrams(title, self.q) for title in titles]
+        self._frequency = Counter()
+        for title_grams in grams:
+            self._frequency.update(title_grams)
+        self.titles: List[str] = []
+        self._index: Dict[Tuple[str, int], List[Tuple[int, int]]] = defaultdict(list)  # gram -> (title, its rank)
+        self._wide: List[int] = []  # titles without a usable bound, candidates for every query
+        for title, title_grams in zip(titles, grams):
+            self._add(title, title_grams)
+        self._built_size = len(titles)
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def required(self, total_length: int) -> int:
+        """The fewest q-grams two titles of `total_length` characters share when their ratio reaches the threshold."""
+        return math.ceil(self.slope * total_length - (self.q - 1) - 1e-9)
+
+    def _length_compatible(self, a: str, b: str) -> bool:
+        # ratio = 2 * matches / (len(a) + len(b)) and matches <= min(len), so a
+        # pair whose lengths are too far apart can never reach the threshold.
+        total = len(a) + len(b)
+        return not total or 200 * min(len(a), len(b)) / total >= self.threshold - 0.5
+
+    def _prefix(self, title: str, grams: List[Tuple[str, int]]) -> Optional[List[Tuple[str, int]]]:
+        """The title's grams rarest first, cut to the prefix to index and probe; None: compare with every title."""
+        if self.slope <= 0 or not grams:
+            return None
+        shortest_partner = math.ceil(self.ratio * len(title) / (2 - self.ratio) - 1e-9)
+        need = self.required(len(title) + shortest_partner)
+        if need <= 0:
+            return None
+        ordered = sorted(grams, key=lambda gram: (self._frequency[gram], gram))
+        return ordered[:max(len(ordered) - need + 1, 1)]
+
+    def _add(self, title: str, grams: List[Tuple[str, int]]) -> int:
+        position = len(self.titles)
+        self.titles.append(title)
+        prefix = self._prefix(title, grams)
+        if prefix is None:
+            self._wide.append(position)
+        else:
+            for rank, gram in enumerate(prefix):
+                self._index[gram].append((position, rank))
+        return position
+
+    def add(self, title: str) -> int:
+        """Index one more title; returns its position."""
+        position = self._add(title, qgrams(title, self.q))
+        if len(self.titles) >= 2 * max(self._built_size, REBUILD_MIN_SIZE):
+            self.build(self.titles)
+        return position
+
+    def _candidates(self, title: str, grams: List[Tuple[str, int]]) -> Iterable[int]:
+        prefix = self._prefix(title, grams)
+        if prefix is None:
+            return range(len(self.titles))
+        # Positional filter: a title met at ranks (rank, other_rank) can share at most the grams
+        # ranked after both, so one that cannot reach its pair's minimum any more is dropped.
+        size = len(grams)
+        shared: Dict[int, int] = {}
+        for rank, gram in enumerate(prefix):
+            for i, other_rank in self._index.get(gram, ()):
+                count = shared.get(i, 0)
+                if count < 0:
+                    continue
+                other = self.titles[i]
+                reachable = count + 1 + min(size - rank - 1, len(other) - self.q - other_rank)
+                shared[i] = count + 1 if reachable >= self.required(len(title) + len(other)) else -1
+        found = {i for i, count in shared.items() if count > 0}
+        found.update(self._wide)
+        return sorted(found)
+
+    def _shares(self, counts: Dict[str, int], other: str, need: int) -> bool:
+        """Whether `other` has at least `need` of the q-grams counted in `counts`, repeats included."""
+        left = dict(counts)
+        found, q = 0, self.q
+        for i in range(len(other) - q + 1):
+            gram = other[i:i + q]
+            if left.get(gram):
+                left[gram] -= 1
+                found += 1
+                if found >= need:
+                    return True
+        return found >= need
+
+    def _match(self, title: str, grams: List[Tuple[str, int]]) -> Optional[Tuple[int, int]]:
+        from fuzzywuzzy import fuzz  # imported when titles are first compared, not by every importer
+        counts = None
+        for i in self._candidates(title, grams):
+            other = self.titles[i]
+            if not self._length_compatible(other, title):
+                continue
+            need = self.required(len(other) + len(title))
+            if need > 0:
+                if counts is None:
+                    counts = Counter(gram for gram, _ in grams)
+                if not self._shares(counts, other, need):
+                    continue
+            self.comparisons += 1
+            score = fuzz.ratio(other, title)
+            if score >= self.threshold:
+                return i, score
+        return None
+
+    def match(self, title: str) -> Optional[Tuple[int, int]]:
+        """(position, score) of the earliest indexed title with fuzz.ratio >= threshold to `title`, or None."""
+        return self._match(title, qgrams(title, self.q))
+
+    def find_duplicates(self, titles: Sequence[str]) -> List[DuplicatePair]:
+        """
+        Return one DuplicatePair for every title that is at least `threshold`
+        similar to an earlier title, paired with the earliest such title. Like
+        the original loop, a title is compared against every earlier title,
+        including ones that were themselves dropped.
+        """
+        self.comparisons = 0
+        grams = [qgrams(title, self.q) for title in titles]
+        self.build([])
+        for title_grams in grams:
+            self._frequency.update(title_grams)
+        pairs = []
+        for j, title in enumerate(titles):
+            found = self._match(title, grams[j])
+            if found is not None:
+                pairs.append(DuplicatePair(j, found[0], found[1]))
+            self._add(title, grams[j])
+        self._built_size = len(titles)
+        return pairs
+
+
+def find_near_duplicates(titles: Sequence[str], threshold: int = 80) -> List[DuplicatePair]:
+    """Convenience wrapper around NearDuplicateIndex with the default settings."""
+    return NearDuplicateIndex(threshold=threshold).find_duplicates(titles)
+
+
+def find_near_duplicates_bruteforce(titles: Sequence[str], threshold: int = 80) -> List[DuplicatePair]:
+    """The original O(n²) pairwise comparison, kept as a reference for tests and benchmarks."""
+    from fuzzywuzzy import fuzz
+    pairs = []
+    for j in range(len(titles)):
+        for i in range(j):
+            score = fuzz.ratio(titles[i], titles[j])
+            if score >= threshold:
+                pairs.append(DuplicatePair(j, i, score))
+                break
+    return pairs
@@ -0,0 +1,119 @@
+"""
+Export the watchlists as small static JSON files for the webapp.
+
+    python src/export_static.py [--out webapp/data] [--db path]
+
+Layout under the output directory:
+
+    manifest.json                        latest file per country (not content-hashed, keep its cache short)
+    <country>/index.json                 every exported date for the country
+    <country>/<date>.<hash>.json         one watchlist; the hash changes with the content, cache forever
+    ... .json.gz / .json.br              precompressed copies for gzip_static / brotli_static style serving
+
+Brotli copies are only written when the optional `brotli` package is installed.
+Files are written to a temporary name and renamed, and the manifest last, so a
+page never sees a manifest pointing at a file that is not there yet.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# Add the project root to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from src.db import Database, get_database
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip copies are written without it
+    brotli = None
+
+EXPORT_DIR = os.path.join(project_root, 'webapp', 'data')
+HASH_LENGTH = 10
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_precompressed(path: str, data: bytes) -> Dict[str, int]:
+    """Write `data` plus .gz (and .br) copies; returns the size of each variant."""
+    sizes = {'raw': len(data)}
+    _atomic_write(path, data)
+    # mtime=0 keeps the gzip bytes identical across runs for unchanged content
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    _atomic_write(f"{path}.gz", compressed)
+    sizes['gzip'] = len(compressed)
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        _atomic_write(f"{path}.br", compressed)
+        sizes['brotli'] = len(compressed)
+    return sizes
+
+
+def _urls(urls_used: str) -> List[str]:
+    try:
+        urls = json.loads(urls_used or '[]')
+    except json.JSONDecodeError:  # very old rows stored a comma-separated string
+        urls = urls_used.split(',')
+    return [url.strip() for url in urls if url and url.strip()]
+
+
+def load_watchlists(db: Database) -> List[Dict]:
+    """The newest watchlist row for every (country, date)."""
+    rows = db.query('''
+    SELECT country, date_added, watchlist, urls_used FROM watchlist
+    WHERE id IN (SELECT MAX(id) FROM watchlist GROUP BY country, date_added)
+    ORDER BY country, date_added
+    ''')
+    return [{"country": country, "date": date_added, "watchlist": watchlist, "urls": _urls(urls_used)}
+            for country, date_added, watchlist, urls_used in rows]
+
+
+def export_static(out_dir: str = EXPORT_DIR, db: Optional[Database] = None) -> Dict:
+    """Write every watchlist and the manifest; returns the manifest."""
+    db = db or get_database()
+    os.makedirs(out_dir, exist_ok=True)
+    indexes: Dict[str, Dict[str, str]] = {}
+    written = skipped = 0
+    for item in load_watchlists(db):
+        data = json.dumps(item, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        relative = f"{item['country']}/{item['date']}.{digest}.json"
+        path = os.path.join(out_dir, relative)
+        if os.path.exists(path):
+            skipped += 1  # same content already exported under this name
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_precompressed(path, data)
+            written += 1
+        indexes.setdefault(item['country'], {})[item['date']] = relative
+
+    manifest = {"generated_at": datetime.now(timezone.utc).isoformat(timespec='seconds'), "countries": {}}
+    for country, dates in indexes.items():
+        latest = max(dates)
+        index = json.dumps({"country": country, "dates": dates}, separators=(',', ':')).encode('utf-8')
+        write_precompressed(os.path.join(out_dir, country, 'index.json'), index)
+        manifest["countries"][country] = {"latest": dates[latest], "date": latest, "index": f"{country}/index.json"}
+    write_precompressed(os.path.join(out_dir, 'manifest.json'),
+                        json.dumps(manifest, indent=1).encode('utf-8'))
+    print(f"Exported watchlists for {len(indexes)} countries to {out_dir}: {written} written, {skipped} unchanged")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export watchlists as static JSON for the webapp.")
+    parser.add_argument("--out", default=EXPORT_DIR, help="output directory (default: webapp/data)")
+    parser.add_argument("--db", help="database file (default: src/sensusmundi.db)")
+    args = parser.parse_args()
+    export_static(args.out, Database(args.db) if args.db else None)
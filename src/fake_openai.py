@@ -0,0 +1,203 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint, for tests and benchmarks.
+
+    server = FakeOpenAIServer(latency=0.05, rate_limit_every=5)
+    await server.start()
+    client = OpenAIClient("test-key", base_url=server.base_url)
+    ...
+    await server.stop()
+
+Every request is answered with a tool call for the first tool in the payload,
+filling each required string property with text derived from the prompt.
+Faults can be injected: fixed latency, a 429 with Retry-After on every Nth
+request, the first N requests rate limited, or a 500 on every Nth request.
+Latency can also grow with the prompt (`latency_per_1k_tokens`), and prompts
+over `context_tokens` are rejected with a 400 like an overflowing context window.
+
+The Files and Batches endpoints are there too: an uploaded JSONL file becomes
+a batch that completes `batch_seconds` after it was created, with every line
+answered like a chat completion. With `batch_error_every`, every Nth line of a
+batch goes to the error file with a 500 instead, for the first
+`batch_error_attempts` times that custom_id is submitted.
+"""
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from aiohttp import web
+
+
+class FakeOpenAIServer:
+
+    def __init__(self, latency: float = 0.0, rate_limit_first: int = 0, rate_limit_every: int = 0,
+                 server_error_every: int = 0, retry_after: float = 0.05, latency_per_1k_tokens: float = 0.0,
+                 context_tokens: int = 0, completion_chars: int = 200, keep_payloads: bool = True,
+                 batch_seconds: float = 0.0, batch_error_every: int = 0, batch_error_attempts: int = 1,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.latency = latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.context_tokens = context_tokens
+        self.completion_chars = completion_chars
+        self.keep_payloads = keep_payloads  # off for long benchmark runs, where they would pile up in memory
+        self.rate_limit_first = rate_limit_first
+        self.rate_limit_every = rate_limit_every
+        self.server_error_every = server_error_every
+        self.retry_after = retry_after
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.completed = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.payloads = []
+        self.batch_seconds = batch_seconds
+        self.batch_error_every = batch_error_every
+        self.batch_error_attempts = batch_error_attempts
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict] = {}
+        self._batch_failures = Counter()  # custom_id -> times it was failed
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_post('/v1/chat/completions', self.chat_completions)
+        app.router.add_post('/v1/files', self.upload_file)
+        app.router.add_get('/v1/files/{file_id}/content', self.file_content)
+        app.router.add_post('/v1/batches', self.create_batch)
+        app.router.add_get('/v1/batches/{batch_id}', self.retrieve_batch)
+        return app
+
+    async def start(self):
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    @staticmethod
+    def completion_for(payload: dict, completion_chars: int = 200) -> dict:
+        """Build a successful chat completion answering the payload's first tool, each answer ~completion_chars long."""
+        prompt = " ".join(str(m.get('content', '')) for m in payload.get('messages', []))
+        tools = payload.get('tools') or []
+        if tools:
+            function = tools[0]['function']
+            arguments = {
+                name: f"{name}: {(prompt * (completion_chars // max(len(prompt), 1) + 1))[:completion_chars]}"
+                for name in function['parameters'].get('required', [])
+            }
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": "call_fake", "type": "function",
+                "function": {"name": function['name'], "arguments": json.dumps(arguments)}
+            }]}
+        else:
+            message = {"role": "assistant", "content": prompt[:completion_chars]}
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = completion_chars // 4
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "model": payload.get('model'),
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        n = self.requests
+        payload = await request.json()
+        prompt_tokens = len(" ".join(str(m.get('content', '')) for m in payload.get('messages', []))) // 4
+        if self.context_tokens and prompt_tokens + payload.get('max_tokens', 0) > self.context_tokens:
+            return web.json_response({"error": {"type": "invalid_request_error", "code": "context_length_exceeded",
+                                                "message": "This model's maximum context length was exceeded"}}, status=400)
+        if self.latency or self.latency_per_1k_tokens:
+            await asyncio.sleep(self.latency + self.latency_per_1k_tokens * prompt_tokens / 1000)
+        if n <= self.rate_limit_first or (self.rate_limit_every and n % self.rate_limit_every == 0):
+            return web.json_response({"error": {"type": "rate_limit_exceeded", "message": "Rate limit reached"}},
+                                     status=429, headers={"retry-after": str(self.retry_after)})
+        if self.server_error_every and n % self.server_error_every == 0:
+            return web.json_response({"error": {"type": "server_error", "message": "Internal error"}}, status=500)
+        self.completed += 1
+        if self.keep_payloads:
+            self.payloads.append(payload)
+        body = self.completion_for(payload, self.completion_chars)
+        self.prompt_tokens += body["usage"]["prompt_tokens"]
+        self.completion_tokens += body["usage"]["completion_tokens"]
+        return web.json_response(body)
+
+    # Batch API
+
+    def _add_file(self, data: bytes) -> str:
+        file_id = f"file-fake-{len(self.files) + 1}"
+        self.files[file_id] = data
+        return file_id
+
+    async def upload_file(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        data = form['file'].file.read()
+        file_id = self._add_file(data)
+        return web.json_response({"id": file_id, "object": "file", "bytes": len(data), "purpose": form.get('purpose')})
+
+    async def file_content(self, request: web.Request) -> web.Response:
+        data = self.files.get(request.match_info['file_id'])
+        if data is None:
+            return web.json_response({"error": {"message": "No such file"}}, status=404)
+        return web.Response(body=data, content_type='application/octet-stream')
+
+    async def create_batch(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        if payload.get('input_file_id') not in self.files:
+            return web.json_response({"error": {"message": "No such file"}}, status=400)
+        batch_id = f"batch_fake_{len(self.batches) + 1}"
+        self.batches[batch_id] = {
+            "id": batch_id, "object": "batch", "endpoint": payload['endpoint'], "status": "validating",
+            "input_file_id": payload['input_file_id'], "output_file_id": None, "error_file_id": None,
+            "completion_window": payload['completion_window'], "created_at": time.time(), "errors": None,
+            "metadata": payload.get('metadata') or {}, "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        return web.json_response(self.batches[batch_id])
+
+    async def retrieve_batch(self, request: web.Request) -> web.Response:
+        batch = self.batches.get(request.match_info['batch_id'])
+        if batch is None:
+            return web.json_response({"error": {"message": "No such batch"}}, status=404)
+        if batch['status'] == 'validating':
+            batch['status'] = 'in_progress'
+        elif batch['status'] == 'in_progress' and time.time() - batch['created_at'] >= self.batch_seconds:
+            self._run_batch(batch)
+        return web.json_response(batch)
+
+    def _run_batch(self, batch: Dict):
+        output, errors = [], []
+        for n, line in enumerate(self.files[batch['input_file_id']].splitlines(), 1):
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            custom_id = request['custom_id']
+            if (self.batch_error_every and n % self.batch_error_every == 0
+                    and self._batch_failures[custom_id] < self.batch_error_attempts):
+                self._batch_failures[custom_id] += 1
+                errors.append({"id": f"batch_req_{n}", "custom_id": custom_id, "error": None, "response": {
+                    "status_code": 500, "body": {"error": {"type": "server_error", "message": "Internal error"}}}})
+                continue
+            body = self.completion_for(request['body'], self.completion_chars)
+            self.completed += 1
+            self.prompt_tokens += body["usage"]["prompt_tokens"]
+            self.completion_tokens += body["usage"]["completion_tokens"]
+            output.append({"id": f"batch_req_{n}", "custom_id": custom_id, "error": None,
+                           "response": {"status_code": 200, "request_id": f"req_{n}", "body": body}})
+        batch['request_counts'] = {"total": len(output) + len(errors), "completed": len(output), "failed": len(errors)}
+        for key, lines in (('output_file_id', output), ('error_file_id', errors)):
+            if lines:
+                batch[key] = self._add_file(b"".join(json.dumps(line).encode('utf-8') + b"\n" for line in lines))
+        batch['status'] = 'completed'
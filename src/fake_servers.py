@@ -0,0 +1,321 @@
+"""
+Local stand-ins for the other services a run talks to, for tests and benchmarks
+(the OpenAI one is in src/fake_openai.py).
+
+    gdelt, farm, cohere = FakeGdeltServer(), FakeNewsFarm(latency=0.05, error_rate=0.01), FakeCohereServer()
+    with ServerThread(gdelt, farm, cohere, FakeOpenAIServer()):
+        gdelt.add('UK', synthetic_gdelt_articles('UK', 1000, farm.article_url))
+        searcher = GdeltSearcher(params_path, 'key', cohere_base_url=cohere.base_url)
+        ...
+
+- FakeGdeltServer: the DOC API, answering each topic's query with recorded
+  articles (`load_recordings` reads what `record_gdelt_responses` saved) or
+  synthetic ones. Unlike GDELT it does not cap the answer at 250 records.
+- FakeNewsFarm: publisher sites serving article HTML generated from the path,
+  with a fixed latency plus jitter and a share of requests failing with a 503,
+  and 304s for conditional requests. It counts the most requests it ever had
+  in flight, overall and per site.
+  Each site listens on its own loopback address (127.0.0.1, 127.0.0.2, ...),
+  so the per-host fetch limits apply as they would across real publishers;
+  this needs an OS that routes all of 127.0.0.0/8 to the loopback, like Linux.
+- FakeCohereServer: the v1 rerank endpoint, scoring documents by the share of
+  query words they contain.
+
+ServerThread runs any of these (and FakeOpenAIServer) on an event loop in a
+background thread, so blocking callers such as `requests` or the Cohere SDK
+can use them without stalling the servers.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional
+from urllib.parse import quote, urlsplit
+
+import requests
+from aiohttp import web
+
+SEENDATE_FORMAT = '%Y%m%dT%H%M%SZ'
+LAST_MODIFIED = 'Mon, 05 Oct 2026 08:00:00 GMT'
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_vocab_rng = random.Random(7)
+WORDS = ["".join(_vocab_rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(_vocab_rng.randint(3, 10)))
+         for _ in range(5000)]
+_CUM_WEIGHTS = list(accumulate(1 / (rank + 1) for rank in range(len(WORDS))))  # Zipf
+# newspaper picks the article text by its share of stopwords, so page prose needs real function words
+STOPWORDS = "the of and to in a is that for on with as was by at from it his her their has have been said".split()
+
+
+class _FakeServer(ABC):
+    """aiohttp app on host:port (port 0 picks a free one), started and stopped like FakeOpenAIServer."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @abstractmethod
+    def make_app(self) -> web.Application:
+        """The server's routes."""
+
+    async def start(self):
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+
+class FakeGdeltServer(_FakeServer):
+
+    def __init__(self, latency: float = 0.0, host: str = '127.0.0.1', port: int = 0):
+        super().__init__(host, port)
+        self.latency = latency
+        self.articles: Dict[str, List[Dict]] = {}
+
+    def query_url(self, topic: str) -> str:
+        """A DOC API URL for the topic, shaped like the query strings in query_parameters.json."""
+        return f"{self.base_url}/api/v2/doc/doc?query={quote(topic)}&mode=ArtList&maxrecords=250&format=json&timespan=8h"
+
+    def add(self, topic: str, articles: List[Dict]):
+        self.articles.setdefault(topic, []).extend(articles)
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/api/v2/doc/doc', self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        query = request.query
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        articles = self.articles.get(query.get('query'), [])
+        if 'startdatetime' in query and 'enddatetime' in query:
+            start = datetime.strptime(query['startdatetime'], '%Y%m%d%H%M%S').strftime(SEENDATE_FORMAT)
+            end = datetime.strptime(query['enddatetime'], '%Y%m%d%H%M%S').strftime(SEENDATE_FORMAT)
+            articles = [a for a in articles if start <= a.get('seendate', '') <= end]
+        return web.json_response({"articles": articles})
+
+
+def load_recordings(directory: str, url_for: Optional[Callable[[str, int], str]] = None) -> Dict[str, List[Dict]]:
+    """
+    Articles from the <topic>.json files record_gdelt_responses wrote, by topic. With
+    `url_for`, article URLs are rewritten to url_for(original_url, i), e.g. onto a FakeNewsFarm.
+    """
+    recordings = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            articles = json.load(f).get('articles', [])
+        if url_for:
+            articles = [{**a, 'url': url_for(a['url'], i)} for i, a in enumerate(articles)]
+        recordings[name[:-len('.json')]] = articles
+    return recordings
+
+
+def record_gdelt_responses(query_params_path: str, out_dir: str, timeout: float = 60) -> Dict[str, int]:
+    """Save the live DOC API answer for every topic in query_parameters.json as <out_dir>/<topic>.json."""
+    with open(query_params_path) as f:
+        topics = json.load(f)['topics']
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {}
+    for topic in topics:
+        response = requests.get(topic['gdelt_query_string'], timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        with open(os.path.join(out_dir, f"{topic['topic']}.json"), 'w') as f:
+            json.dump(data, f)
+        counts[topic['topic']] = len(data.get('articles', []))
+        print(f"Recorded {counts[topic['topic']]} articles for {topic['topic']}")
+    return counts
+
+
+def synthetic_gdelt_articles(topic: str, count: int, url_for: Callable[[str, int], str], seed: int = 0,
+                             now: Optional[datetime] = None) -> List[Dict]:
+    """DOC API article records with distinct titles, seen over the last 8 hours, URLs from url_for(domain, i)."""
+    rng = random.Random(f"{topic}/{seed}")
+    now = now or datetime.now(timezone.utc)
+    articles = []
+    for i in range(count):
+        domain = f"news{rng.randrange(200)}.example"
+        seen = now - timedelta(seconds=rng.randrange(8 * 3600))
+        articles.append({
+            "url": url_for(domain, i),
+            "url_mobile": "",
+            "title": " ".join(rng.choices(WORDS, cum_weights=_CUM_WEIGHTS, k=10)).capitalize(),
+            "seendate": seen.strftime(SEENDATE_FORMAT),
+            "socialimage": "",
+            "domain": domain,
+            "language": "English",
+            "sourcecountry": "United Kingdom",
+        })
+    return articles
+
+
+class FakeNewsFarm:
+    """
+    Publisher sites on `sites` loopback addresses. GET /<anything> returns an
+    article page (headline, ~`words` words in paragraphs, navigation and footer
+    boilerplate) generated from the path, so the same URL always gets the same page.
+    Pages carry an ETag, and a request whose If-None-Match matches gets a 304.
+    `charset` is the one the Content-Type header names (the bytes are always UTF-8).
+    """
+
+    def __init__(self, sites: int = 50, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 words: int = 600, seed: int = 0, charset: str = 'utf-8'):
+        if not 1 <= sites <= 254:
+            raise ValueError("sites must be between 1 and 254")
+        self.hosts = [f"127.0.0.{i + 1}" for i in range(sites)]
+        self.ports: List[int] = []
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.words = words
+        self.seed = seed
+        self.charset = charset
+        self.requests = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.bytes_served = 0
+        self.inflight: Counter = Counter()  # requests being answered, by site address
+        self.most_inflight = 0
+        self.most_inflight_per_site: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._runner: Optional[web.AppRunner] = None
+
+    def article_url(self, key: str, i: int) -> str:
+        """URL of article i on the site `key` (a domain or original URL) maps to."""
+        site = sum(map(ord, key)) % len(self.hosts)
+        path = urlsplit(key).path.strip('/') if '://' in key else key
+        return f"http://{self.hosts[site]}:{self.ports[site]}/{path or 'article'}/{i}"
+
+    def page(self, path: str) -> str:
+        rng = random.Random(f"{self.seed}{path}")
+        title = " ".join(rng.choices(WORDS, cum_weights=_CUM_WEIGHTS, k=8)).capitalize()
+        paragraphs = []
+        for _ in range(max(self.words // 60, 1)):
+            words = [rng.choice(STOPWORDS) if rng.random() < 0.4 else word
+                     for word in rng.choices(WORDS, cum_weights=_CUM_WEIGHTS, k=60)]
+            paragraphs.append(" ".join(words).capitalize() + ".")
+        body = "\n".join(f"<p>{p}</p>" for p in paragraphs)
+        return (f"<html><head><title>{title}</title><meta name=\"author\" content=\"Staff reporter\"></head><body>"
+                f"<nav><a href=\"/\">Home</a> <a href=\"/world\">World</a> <a href=\"/politics\">Politics</a></nav>"
+                f"<article><h1>{title}</h1>{body}</article>"
+                f"<footer><p>Sign up for our morning briefing.</p><p>Copyright. All rights reserved.</p></footer>"
+                f"</body></html>")
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/{path:.*}', self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        site = request.transport.get_extra_info('sockname')[0] if request.transport else ''
+        self.inflight[site] += 1
+        self.most_inflight = max(self.most_inflight, sum(self.inflight.values()))
+        self.most_inflight_per_site[site] = max(self.most_inflight_per_site[site], self.inflight[site])
+        try:
+            return await self._respond(request)
+        finally:
+            self.inflight[site] -= 1
+
+    async def _respond(self, request: web.Request) -> web.Response:
+        delay = self.latency + (self._rng.random() * self.jitter if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=503, text="Service Unavailable")
+        html = self.page(request.path)
+        etag = '"%s"' % hashlib.sha1(html.encode('utf-8')).hexdigest()[:16]
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        body = html.encode('utf-8')
+        self.bytes_served += len(body)
+        return web.Response(body=body, headers={'Content-Type': f'text/html; charset={self.charset}', 'ETag': etag,
+                                                'Last-Modified': LAST_MODIFIED})
+
+    async def start(self):
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        for host in self.hosts:
+            site = web.TCPSite(self._runner, host, 0)
+            await site.start()
+            self.ports.append(site._server.sockets[0].getsockname()[1])
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+
+class FakeCohereServer(_FakeServer):
+
+    def __init__(self, latency: float = 0.0, host: str = '127.0.0.1', port: int = 0):
+        super().__init__(host, port)
+        self.latency = latency
+        self.documents = 0
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 ** 2)
+        app.router.add_post('/v1/rerank', self.rerank)
+        return app
+
+    async def rerank(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        payload = await request.json()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        query = set(_WORD.findall(payload['query'].lower()))
+        documents = [d if isinstance(d, str) else d.get('text', '') for d in payload['documents']]
+        self.documents += len(documents)
+        scores = [len(query & set(_WORD.findall(doc.lower()))) / max(len(query), 1) for doc in documents]
+        order = sorted(range(len(documents)), key=lambda i: -scores[i])[:payload.get('top_n') or len(documents)]
+        return web.json_response({
+            "id": f"rerank-fake-{self.requests}",
+            "results": [{"index": i, "relevance_score": scores[i]} for i in order],
+            "meta": {"api_version": {"version": "1"}, "billed_units": {"search_units": 1}},
+        })
+
+
+class ServerThread:
+    """Start the given fake servers on an event loop in a daemon thread; stop them on exit."""
+
+    def __init__(self, *servers):
+        self.servers = servers
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self) -> 'ServerThread':
+        self._thread.start()
+        for server in self.servers:
+            asyncio.run_coroutine_threadsafe(server.start(), self.loop).result()
+        return self
+
+    def __exit__(self, *exc):
+        for server in self.servers:
+            asyncio.run_coroutine_threadsafe(server.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        return False
@@ -0,0 +1,216 @@
+import asyncio
+import re
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, List, NamedTuple, Optional, Tuple
+
+import aiohttp
+
+from src import config
+from src.db import Database, get_database
+from src.gdelt_records import CHUNK_BYTES, ArticleStreamParser, GdeltArticle, parse_articles_async
+from src.metrics import get_metrics
+
+GDELT_MAX_CONCURRENCY = getattr(config, 'GDELT_MAX_CONCURRENCY', 4)
+GDELT_TIMEOUT_SECONDS = getattr(config, 'GDELT_TIMEOUT_SECONDS', 30)
+GDELT_MIN_WINDOW_MINUTES = getattr(config, 'GDELT_MIN_WINDOW_MINUTES', 15)
+GDELT_MAX_LOOKBACK_HOURS = getattr(config, 'GDELT_MAX_LOOKBACK_HOURS', 72)
+GDELT_MAX_RETRIES = 3
+
+GDELT_TIME_FORMAT = '%Y%m%d%H%M%S'  # startdatetime / enddatetime
+SEENDATE_FORMAT = '%Y%m%dT%H%M%SZ'  # seendate of each article
+DEFAULT_MAXRECORDS = 75  # what the DOC API returns when maxrecords is not set
+WINDOW_PARAMS = ('timespan', 'startdatetime', 'enddatetime')
+_TIMESPAN = re.compile(r"^(\d+)(min|h|hours|d|days|w|weeks)$")
+_TIMESPAN_UNITS = {'min': 'minutes', 'h': 'hours', 'hours': 'hours', 'd': 'days', 'days': 'days', 'w': 'weeks', 'weeks': 'weeks'}
+
+
+def query_param(query_url: str, name: str) -> Optional[str]:
+    query = query_url.split('?', 1)[1] if '?' in query_url else ''
+    for part in query.split('&'):
+        key, _, value = part.partition('=')
+        if key == name:
+            return value
+    return None
+
+
+def set_query_param(query_url: str, name: str, value: str) -> str:
+    """The query with `name` set to `value`, the other (already encoded) parameters unchanged."""
+    base, _, query = query_url.partition('?')
+    parts = [part for part in query.split('&') if part and part.partition('=')[0] != name]
+    parts.append(f"{name}={value}")
+    return f"{base}?{'&'.join(parts)}"
+
+
+def parse_timespan(timespan: Optional[str]) -> Optional[timedelta]:
+    match = _TIMESPAN.match(timespan or '')
+    if not match:
+        return None
+    return timedelta(**{_TIMESPAN_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def window_url(query_url: str, start: datetime, end: datetime) -> str:
+    """
+    The topic's query restricted to [start, end]. Parameters are edited as raw
+    strings so the rest of the (already encoded) query is sent unchanged.
+    """
+    base, _, query = query_url.partition('?')
+    parts = [part for part in query.split('&') if part and part.partition('=')[0] not in WINDOW_PARAMS]
+    parts.append(f"startdatetime={start.strftime(GDELT_TIME_FORMAT)}")
+    parts.append(f"enddatetime={end.strftime(GDELT_TIME_FORMAT)}")
+    return f"{base}?{'&'.join(parts)}"
+
+
+def parse_seendate(seendate: str) -> datetime:
+    return datetime.strptime(seendate, SEENDATE_FORMAT).replace(tzinfo=timezone.utc)
+
+
+class IngestBatch(NamedTuple):
+    topic: str
+    articles: List[GdeltArticle]  # new articles only, newest window last
+    watermark: Optional[str]  # seendate to store once the articles are persisted (see GdeltIngester.advance)
+    requests: int = 0  # GDELT requests made, including split windows
+    truncated: int = 0  # windows that still hit maxrecords at the minimum window size
+    error: Optional[Exception] = None
+
+
+class GdeltIngester:
+    """
+    Incremental GDELT DOC API ingestion.
+
+    For every topic the newest `seendate` ingested so far is kept in the
+    `gdelt_watermarks` table, and only the window from just after it until now
+    is requested (startdatetime/enddatetime instead of the query's timespan).
+    A topic seen for the first time looks back over its query's timespan, and
+    no topic looks back further than `max_lookback`.
+
+    The DOC API silently truncates at maxrecords, so a window that comes back
+    full is split in half and both halves are requested, down to `min_window`.
+    Requests for all topics share one aiohttp session and at most
+    `max_concurrency` are in flight; GDELT answers 429 when pushed harder.
+
+    The watermark is not moved when a batch is returned: call `advance(batch)`
+    once its articles are stored, so a crash in between re-fetches them.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, query_url_for: Callable[[str], str],
+                 max_concurrency: int = GDELT_MAX_CONCURRENCY, timeout: float = GDELT_TIMEOUT_SECONDS,
+                 min_window: timedelta = timedelta(minutes=GDELT_MIN_WINDOW_MINUTES),
+                 max_lookback: timedelta = timedelta(hours=GDELT_MAX_LOOKBACK_HOURS),
+                 db: Optional[Database] = None, clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+                 retry_delay: float = 5.0):
+        self.session = session
+        self.query_url_for = query_url_for
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.min_window = min_window
+        self.max_lookback = max_lookback
+        self.db = db or get_database()
+        self.clock = clock
+        self.retry_delay = retry_delay
+
+    def get_watermark(self, topic: str) -> Optional[str]:
+        rows = self.db.query("SELECT last_seendate FROM gdelt_watermarks WHERE topic = ?", (topic,))
+        return rows[0][0] if rows else None
+
+    def advance(self, batch: IngestBatch):
+        """Store the batch's watermark; never moves a topic's watermark backwards."""
+        if batch.watermark is None:
+            return
+        self.db.execute('''
+        INSERT INTO gdelt_watermarks (topic, last_seendate, updated_at) VALUES (?, ?, datetime('now'))
+        ON CONFLICT (topic) DO UPDATE SET
+            last_seendate = max(last_seendate, excluded.last_seendate),
+            updated_at = excluded.updated_at
+        ''', (batch.topic, batch.watermark))
+
+    async def _request(self, url: str) -> List[GdeltArticle]:
+        metrics = get_metrics()
+        with metrics.span('gdelt_request') as span:
+            for attempt in range(GDELT_MAX_RETRIES + 1):
+                async with self.semaphore:
+                    async with self.session.get(url, timeout=self.timeout) as response:
+                        if response.status == 429 and attempt < GDELT_MAX_RETRIES:
+                            retry = True
+                            metrics.inc('gdelt_rate_limited_total')
+                        else:
+                            response.raise_for_status()
+                            # Articles are decoded as the body arrives, never holding the whole text
+                            parser = ArticleStreamParser()
+                            articles = await parse_articles_async(response.content.iter_chunked(CHUNK_BYTES), parser)
+                            retry = False
+                if not retry:
+                    break
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+            span.update(bytes=parser.bytes, articles=len(articles))
+            metrics.inc('gdelt_bytes_total', parser.bytes)
+            return articles
+
+    async def fetch_window(self, query_url: str, start: datetime, end: datetime,
+                           maxrecords: int) -> Tuple[List[GdeltArticle], int, int]:
+        """Articles seen in [start, end], splitting full windows; returns (articles, requests, truncated)."""
+        articles = await self._request(window_url(query_url, start, end))
+        if len(articles) < maxrecords:
+            return articles, 1, 0
+        if end - start <= self.min_window:
+            return articles, 1, 1
+        middle = start + (end - start) / 2
+        middle = middle.replace(microsecond=0)
+        (older, older_requests, older_truncated), (newer, newer_requests, newer_truncated) = await asyncio.gather(
+            self.fetch_window(query_url, start, middle, maxrecords),
+            self.fetch_window(query_url, middle + timedelta(seconds=1), end, maxrecords),
+        )
+        return older + newer, 1 + older_requests + newer_requests, older_truncated + newer_truncated
+
+    async def ingest_topic(self, topic: str) -> IngestBatch:
+        with get_metrics().span('ingest', topic=topic) as span:
+            batch = await self._ingest_topic(topic)
+            span.update(articles=len(batch.articles), requests=batch.requests, truncated=batch.truncated)
+            if batch.error:
+                span['error'] = f"{type(batch.error).__name__}: {batch.error}"
+            return batch
+
+    async def _ingest_topic(self, topic: str) -> IngestBatch:
+        watermark = None
+        try:
+            query_url = self.query_url_for(topic)
+            watermark = await asyncio.to_thread(self.get_watermark, topic)
+            now = self.clock().replace(microsecond=0)
+            if watermark:
+                start = parse_seendate(watermark) + timedelta(seconds=1)
+            else:
+                start = now - (parse_timespan(query_param(query_url, 'timespan')) or self.max_lookback)
+            start = max(start, now - self.max_lookback)
+            if start >= now:
+                return IngestBatch(topic, [], watermark)
+            maxrecords = int(query_param(query_url, 'maxrecords') or DEFAULT_MAXRECORDS)
+            articles, requests, truncated = await self.fetch_window(query_url, start, now, maxrecords)
+        except Exception as e:
+            return IngestBatch(topic, [], watermark, error=e)
+
+        new_articles = []
+        urls = set()
+        undated = 0
+        for article in articles:
+            if not article.title or article.url in urls:
+                continue
+            if not article.seendate:
+                # GDELT placed it in the requested window; without a date it cannot be compared to the watermark
+                undated += 1
+            elif watermark and article.seendate <= watermark:
+                continue
+            urls.add(article.url)
+            new_articles.append(article)
+        latest = max((a.seendate for a in new_articles if a.seendate), default=None)
+        if undated:
+            print(f"GDELT: {undated} article(s) for {topic} had no seendate and were kept")
+            get_metrics().inc('gdelt_undated_articles_total', undated, topic=topic)
+        if truncated:
+            print(f"GDELT: {truncated} window(s) for {topic} still hit maxrecords={maxrecords} at the minimum window size")
+        return IngestBatch(topic, new_articles, max(filter(None, [watermark, latest]), default=None), requests, truncated)
+
+    async def stream(self, topics: List[str]) -> AsyncIterator[IngestBatch]:
+        """Ingest every topic concurrently, yielding each topic's batch as soon as it is complete."""
+        for future in asyncio.as_completed([self.ingest_topic(topic) for topic in topics]):
+            batch = await future
+            print(f"GDELT: {len(batch.articles)} new articles for {batch.topic} in {batch.requests} request(s)")
+            yield batch
@@ -0,0 +1,161 @@
+"""
+GDELT DOC API articles as compact records, decoded while the response downloads.
+
+A DOC API answer is `{"articles": [{...}, {...}, ...]}`. ArticleStreamParser
+takes the body in chunks as they arrive and hands back each article as soon as
+its object is complete, as a GdeltArticle: one small `__slots__` object per
+article instead of a dict, and never the whole response text or its decoded
+tree in memory at once. Search keeps these records through dedup, rerank and
+the insert (SearchGdelt), so a response is never copied into a DataFrame.
+"""
+import codecs
+import json
+import re
+import sys
+from typing import AsyncIterable, Dict, Iterable, List, Optional
+
+CHUNK_BYTES = 64 * 1024
+_ARTICLES_KEY = re.compile(r'"articles"\s*:\s*\[')
+_SKIP = re.compile(r'[\s,]*')
+_NO_MATCHES = re.compile(r'\s*(\{\s*\})?\s*')
+
+
+class GdeltArticle:
+    """
+    One article of a DOC API response. `get` reads a field like dict.get, so a
+    record can go wherever the seen index and insert_data take dict records.
+    """
+
+    __slots__ = ('url', 'title', 'seendate', 'domain', 'language', 'sourcecountry', 'content', 'relevance_score')
+
+    def __init__(self, url: str = '', title: str = '', seendate: str = '', domain: str = '', language: str = '',
+                 sourcecountry: str = '', content: str = '', relevance_score: float = 0.0):
+        self.url = url
+        self.title = title
+        self.seendate = seendate
+        self.domain = domain
+        self.language = language
+        self.sourcecountry = sourcecountry
+        self.content = content
+        self.relevance_score = relevance_score
+
+    @classmethod
+    def from_json(cls, item: Dict) -> 'GdeltArticle':
+        """
+        The fields search and storage use; url_mobile, socialimage and the like are dropped.
+        Domain, language and country repeat across a response, so every article shares one copy of each.
+        """
+        return cls(item.get('url') or '', item.get('title') or '', item.get('seendate') or '',
+                   sys.intern(item.get('domain') or ''), sys.intern(item.get('language') or ''),
+                   sys.intern(item.get('sourcecountry') or ''), item.get('content') or '', item.get('relevance_score') or 0.0)
+
+    def get(self, name: str, default=None):
+        return getattr(self, name, default)
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, GdeltArticle) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"GdeltArticle(url={self.url!r}, title={self.title!r}, seendate={self.seendate!r})"
+
+
+def as_articles(items: Iterable) -> List[GdeltArticle]:
+    """Records from parsed JSON objects (or records already), e.g. articles recorded or built in tests."""
+    return [item if isinstance(item, GdeltArticle) else GdeltArticle.from_json(item) for item in items]
+
+
+class ArticleStreamParser:
+    """
+    Incremental decoder for the `articles` array of a DOC API response:
+    `feed` each chunk of the body, get back the articles it completed, then
+    `close`. Only the unfinished tail of the body is buffered. An empty body
+    or `{}` (GDELT's answer when nothing matched) yields no articles; any
+    other body without the array, such as the plain-text "Please limit
+    requests" notice or an HTML error page GDELT serves with a 200, raises.
+    """
+
+    def __init__(self):
+        self._text = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        # strict=False: titles occasionally contain raw control characters
+        self._decoder = json.JSONDecoder(strict=False)
+        self._buffer = ''
+        self._head = ''  # the start of the body, to tell `{}` from a body that is not JSON at all
+        self._in_array = False
+        self._done = False
+        self.bytes = 0
+        self.articles = 0
+
+    def feed(self, chunk: bytes) -> List[GdeltArticle]:
+        self.bytes += len(chunk)
+        if self._done:
+            return []
+        text = self._text.decode(chunk)
+        if len(self._head) <= 64:
+            self._head += text[:65 - len(self._head)]
+        self._buffer += text
+        return self._drain()
+
+    def _drain(self, final: bool = False) -> List[GdeltArticle]:
+        articles = []
+        if not self._in_array:
+            match = _ARTICLES_KEY.search(self._buffer)
+            if match is None:
+                self._buffer = self._buffer[-32:]  # the key may be split across chunks
+                return articles
+            self._in_array = True
+            self._buffer = self._buffer[match.end():]
+        position = 0
+        while True:
+            position = _SKIP.match(self._buffer, position).end()
+            if position == len(self._buffer):
+                break
+            if self._buffer[position] == ']':
+                self._done = True
+                break
+            try:
+                item, end = self._decoder.raw_decode(self._buffer, position)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break  # the object continues in the next chunk
+            articles.append(GdeltArticle.from_json(item))
+            position = end
+        self._buffer = '' if self._done else self._buffer[position:]
+        self.articles += len(articles)
+        return articles
+
+    def close(self) -> List[GdeltArticle]:
+        """
+        Decode what is left; raises json.JSONDecodeError if the body ended inside
+        the array, or had no articles array and was not empty or `{}`.
+        """
+        self._buffer += self._text.decode(b'', final=True)
+        articles = [] if self._done else self._drain(final=True)
+        if self._in_array and not self._done:
+            raise json.JSONDecodeError("Unterminated articles array", self._buffer, len(self._buffer))
+        if not self._in_array and (len(self._head) > 64 or not _NO_MATCHES.fullmatch(self._head)):
+            raise json.JSONDecodeError("No articles array in the response", self._head, 0)
+        return articles
+
+
+def parse_articles(chunks: Iterable[bytes], parser: Optional[ArticleStreamParser] = None) -> List[GdeltArticle]:
+    """All articles of a response body given as byte chunks (e.g. requests' iter_content)."""
+    parser = parser or ArticleStreamParser()
+    articles = []
+    for chunk in chunks:
+        articles.extend(parser.feed(chunk))
+    articles.extend(parser.close())
+    return articles
+
+
+async def parse_articles_async(chunks: AsyncIterable[bytes], parser: Optional[ArticleStreamParser] = None) -> List[GdeltArticle]:
+    """parse_articles for an aiohttp body, e.g. `response.content.iter_chunked(CHUNK_BYTES)`."""
+    parser = parser or ArticleStreamParser()
+    articles = []
+    async for chunk in chunks:
+        articles.extend(parser.feed(chunk))
+    articles.extend(parser.close())
+    return articles
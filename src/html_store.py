@@ -0,0 +1,190 @@
+"""
+On-disk store of the raw HTML of the article pages we fetch.
+
+ArticleFetcher (ScrapeNews) saves every page it downloads here, so the text
+can be extracted again, after a change to the extraction or when a parse
+turned out junk, without asking the publisher a second time
+(`python src/reparse.py`). Pages are compressed and content-addressed: a
+blob is named after the sha256 of the HTML, so a page syndicated under
+several URLs, or unchanged between two fetches, is stored once. The index
+(pages.db in the store directory) maps each canonical URL
+(seen_index.canonicalize_url) to its current blob, the charset it was
+decoded with and the ETag / Last-Modified the publisher sent.
+
+A stored URL is re-fetched with If-None-Match / If-Modified-Since, and a
+304 is answered from the store; a page validated less than
+`fresh_seconds` ago is served without a request at all. `stats` counts
+those hits and the bytes they did not download.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, NamedTuple, Optional
+
+from src import config
+from src.metrics import get_metrics
+from src.seen_index import canonicalize_url
+
+HTML_STORE_ENABLED = getattr(config, 'HTML_STORE_ENABLED', True)
+HTML_STORE_DIR = getattr(config, 'HTML_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'html_store'))
+HTML_STORE_LEVEL = getattr(config, 'HTML_STORE_LEVEL', 6)
+HTML_STORE_FRESH_MINUTES = getattr(config, 'HTML_STORE_FRESH_MINUTES', 60)
+
+
+class StoredPage(NamedTuple):
+    url: str  # as last fetched
+    sha256: str
+    encoding: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    size: int  # bytes as downloaded
+    fetched_at: float
+    validated_at: float  # last 200 or 304 from the publisher
+
+
+def decode_html(body: bytes, encoding: Optional[str]) -> str:
+    try:
+        return body.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:  # unknown charset in the Content-Type header
+        return body.decode('utf-8', errors='replace')
+
+
+def read_blob(path: str) -> bytes:
+    """The HTML bytes of a blob file; used by the reparse workers, which have no index connection."""
+    with open(path, 'rb') as f:
+        return zlib.decompress(f.read())
+
+
+class HtmlStore:
+    """
+    Blobs under `root`/objects, index in `root`/pages.db. Safe to share
+    between the event loop and worker threads of one process.
+    """
+
+    def __init__(self, root: Optional[str] = None, level: int = HTML_STORE_LEVEL,
+                 fresh_seconds: float = HTML_STORE_FRESH_MINUTES * 60, clock=time.time):
+        self.root = root or HTML_STORE_DIR
+        self.level = level
+        self.fresh_seconds = fresh_seconds
+        self.clock = clock
+        self.stats = {'fresh': 0, 'not_modified': 0, 'downloaded': 0, 'changed': 0, 'deduplicated': 0,
+                      'bytes_saved': 0, 'bytes_downloaded': 0, 'bytes_written': 0}
+        os.makedirs(os.path.join(self.root, 'objects'), exist_ok=True)
+        # Fetches look pages up on the event loop and store them from worker threads
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(self.root, 'pages.db'), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # a page lost in a crash is only downloaded again
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS pages (
+            url_key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            encoding TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            size INTEGER NOT NULL,
+            fetched_at REAL NOT NULL,
+            validated_at REAL NOT NULL
+        )
+        ''')
+        self.conn.commit()
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, 'objects', sha256[:2], sha256 + '.z')
+
+    def lookup(self, url: str) -> Optional[StoredPage]:
+        with self._lock:
+            row = self.conn.execute('''
+            SELECT url, sha256, encoding, etag, last_modified, size, fetched_at, validated_at FROM pages WHERE url_key = ?
+            ''', (canonicalize_url(url),)).fetchone()
+        return StoredPage(*row) if row else None
+
+    def is_fresh(self, page: StoredPage) -> bool:
+        return self.clock() - page.validated_at < self.fresh_seconds
+
+    @staticmethod
+    def conditional_headers(page: StoredPage) -> Dict[str, str]:
+        headers = {}
+        if page.etag:
+            headers['If-None-Match'] = page.etag
+        if page.last_modified:
+            headers['If-Modified-Since'] = page.last_modified
+        return headers
+
+    def read(self, page: StoredPage) -> str:
+        return decode_html(read_blob(self.blob_path(page.sha256)), page.encoding)
+
+    def hit(self, page: StoredPage, revalidated: bool = False) -> str:
+        """
+        The stored HTML of a page served instead of a download: still fresh, or
+        `revalidated` by a 304 just now.
+        """
+        outcome = 'not_modified' if revalidated else 'fresh'
+        with self._lock:
+            if revalidated:
+                with self.conn:
+                    self.conn.execute("UPDATE pages SET validated_at = ? WHERE url_key = ?",
+                                      (self.clock(), canonicalize_url(page.url)))
+            self.stats[outcome] += 1
+            self.stats['bytes_saved'] += page.size
+        get_metrics().inc('html_store_requests_total', outcome=outcome)
+        get_metrics().inc('fetch_bytes_saved_total', page.size)
+        return self.read(page)
+
+    def put(self, url: str, body: bytes, encoding: str, etag: Optional[str] = None,
+            last_modified: Optional[str] = None, previous: Optional[StoredPage] = None) -> StoredPage:
+        """Store a downloaded page; `previous` is the copy a conditional request found changed."""
+        sha256 = hashlib.sha256(body).hexdigest()
+        path = self.blob_path(sha256)
+        written = 0
+        if not os.path.exists(path):
+            data = zlib.compress(body, self.level)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)  # readers never see a partial blob
+            written = len(data)
+        now = self.clock()
+        page = StoredPage(url, sha256, encoding, etag, last_modified, len(body), now, now)
+        outcome = 'changed' if previous is not None else 'downloaded'
+        with self._lock:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  (canonicalize_url(url), *page))
+            self.stats['downloaded'] += 1
+            self.stats['changed'] += previous is not None
+            self.stats['deduplicated'] += not written
+            self.stats['bytes_downloaded'] += len(body)
+            self.stats['bytes_written'] += written
+        get_metrics().inc('html_store_requests_total', outcome=outcome)
+        return page
+
+    def hit_rate(self) -> float:
+        hits = self.stats['fresh'] + self.stats['not_modified']
+        total = hits + self.stats['downloaded']
+        return hits / total if total else 0.0
+
+    def report(self) -> str:
+        return (f"HTML store: {self.stats['fresh'] + self.stats['not_modified']} pages served locally "
+                f"({self.stats['fresh']} fresh, {self.stats['not_modified']} not modified, {self.hit_rate():.0%} hit rate), "
+                f"{self.stats['downloaded']} downloaded ({self.stats['changed']} changed, {self.stats['deduplicated']} "
+                f"already stored), {self.stats['bytes_saved'] / 1e6:.1f} MB not re-downloaded")
+
+    def close(self):
+        self.conn.close()
+
+
+_html_store = None
+
+
+def get_html_store() -> HtmlStore:
+    """Process-wide HtmlStore in HTML_STORE_DIR, created on first use."""
+    global _html_store
+    if _html_store is None:
+        _html_store = HtmlStore()
+    return _html_store
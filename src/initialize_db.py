@@ -2,6 +2,9 @@ import sqlite3
 from typing import List, Dict
 import os
 from datetime import datetime, timedelta
+from src.db import get_database
+from src.metrics import get_metrics
+from src.seen_index import get_seen_index
 
 DATABASE_NAME = 'sensusmundi.db'
 
@@ -9,46 +12,219 @@ def get_db_path():
     current_dir = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(current_dir, DATABASE_NAME)
 
-def create_database_and_tables():
-    conn = sqlite3.connect(get_db_path())
+# Topics that had their own per-country table before the unified articles table (see migrate_articles.py)
+LEGACY_TOPIC_TABLES = ['Climate', 'UK', 'China', 'Russia_Ukraine', 'Israel_Palestine', 'USA', 'Turkey', 'Germany', 'France', 'NATO']
+
+def create_database_and_tables(db_path: str = None):
+    with get_metrics().span('db_init'):
+        _create_database_and_tables(db_path)
+
+_initialized = set()
+
+def init_db(db_path: str = None):
+    """
+    Create the database and tables the first time a process uses `db_path` (default: the
+    pipeline's database). get_database() calls it, so importing a module never touches SQLite.
+    """
+    db_path = db_path or get_db_path()
+    if db_path not in _initialized:
+        create_database_and_tables(db_path)
+        _initialized.add(db_path)
+
+def _create_database_and_tables(db_path: str = None):
+    conn = sqlite3.connect(db_path or get_db_path())
     cursor = conn.cursor()
+    had_fts = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'articles_fts'").fetchone() is not None
 
-    # Create a table for each country
-    countries = ['Climate', 'UK', 'China', 'Russia_Ukraine', 'Israel_Palestine', 'USA', 'Turkey', 'Germany', 'France', 'NATO']
-    
-    for country in countries:
-        cursor.execute(f'''
-        CREATE TABLE IF NOT EXISTS {country} (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            url TEXT NOT NULL,
-            title TEXT NOT NULL,
-            content TEXT,
-            seendate TEXT,
-            domain TEXT,
-            language TEXT,
-            sourcecountry TEXT,
-            relevance_score REAL,
-            date_added DATE DEFAULT CURRENT_DATE,
-            news_body TEXT,
-            short_title_en TEXT,
-            summary_en TEXT,
-            sentiment TEXT
-        )
-        ''')
+    # One table for every topic; (topic, url) is unique so a re-fetched article is not inserted twice
+    cursor.executescript('''
+    CREATE TABLE IF NOT EXISTS articles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        topic TEXT NOT NULL,
+        url TEXT NOT NULL,
+        title TEXT NOT NULL,
+        content TEXT,
+        seendate TEXT,
+        domain TEXT,
+        language TEXT,
+        sourcecountry TEXT,
+        relevance_score REAL,
+        date_added DATE DEFAULT CURRENT_DATE,
+        news_body TEXT,
+        short_title_en TEXT,
+        summary_en TEXT,
+        sentiment TEXT,
+        body_length INTEGER,
+        UNIQUE (topic, url)
+    );
+    -- Daily summaries per topic (GetWatchlist)
+    CREATE INDEX IF NOT EXISTS idx_articles_topic_date ON articles (topic, date_added);
+    -- Articles still waiting to be scraped (ScrapeNews); only pending rows are indexed
+    CREATE INDEX IF NOT EXISTS idx_articles_unscraped ON articles (topic) WHERE body_length IS NULL;
+
+    -- Compressed article bodies (body_store.BodyStore), kept out of articles so its rows stay small.
+    -- news_body above only holds bodies written before the store existed, until migrate_bodies.py runs.
+    CREATE TABLE IF NOT EXISTS article_bodies (
+        article_id INTEGER PRIMARY KEY,
+        codec TEXT NOT NULL,
+        dict_id INTEGER,
+        body BLOB NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS body_dictionaries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        codec TEXT NOT NULL,
+        data BLOB NOT NULL,
+        samples INTEGER NOT NULL,
+        created_at TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS watchlist (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        country TEXT NOT NULL,
+        date_added DATE NOT NULL,
+        watchlist TEXT NOT NULL,
+        urls_used TEXT NOT NULL
+    );
+
+    -- Full-text search (api.py) over titles, summaries and bodies not yet moved to the body store.
+    -- External content: the index reads its text from articles, and the triggers keep it in step.
+    CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+        title, summary_en, news_body, content='articles', content_rowid='id'
+    );
+    CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+        INSERT INTO articles_fts (rowid, title, summary_en, news_body)
+        VALUES (new.id, new.title, new.summary_en, new.news_body);
+    END;
+    CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+        INSERT INTO articles_fts (articles_fts, rowid, title, summary_en, news_body)
+        VALUES ('delete', old.id, old.title, old.summary_en, old.news_body);
+        DELETE FROM article_bodies WHERE article_id = old.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title, summary_en, news_body ON articles BEGIN
+        INSERT INTO articles_fts (articles_fts, rowid, title, summary_en, news_body)
+        VALUES ('delete', old.id, old.title, old.summary_en, old.news_body);
+        INSERT INTO articles_fts (rowid, title, summary_en, news_body)
+        VALUES (new.id, new.title, new.summary_en, new.news_body);
+    END;
+    -- Stored bodies, with their title so a query can match words from both. Contentless: written by
+    -- body_store.BodyStore with the plain text it compresses. A deleted article's entry stays behind
+    -- but never matches an article again (ids are not reused).
+    CREATE VIRTUAL TABLE IF NOT EXISTS article_bodies_fts USING fts5(title, news_body, content='');
+
+    -- Newest GDELT seendate ingested per topic (gdelt_ingest.GdeltIngester)
+    CREATE TABLE IF NOT EXISTS gdelt_watermarks (
+        topic TEXT PRIMARY KEY,
+        last_seendate TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+
+    -- OpenAI requests that failed after all retries (openai_client.record_dead_letter), re-sent by the next run
+    CREATE TABLE IF NOT EXISTS llm_dead_letter (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        ref TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        context TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 1,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        UNIQUE (kind, topic, ref)
+    );
+
+    -- Batch mode (openai_batch.py): scraped articles waiting for a summary, and the batches they went into
+    CREATE TABLE IF NOT EXISTS summary_queue (
+        article_id INTEGER PRIMARY KEY,
+        topic TEXT NOT NULL,
+        batch_id TEXT,
+        cache_key TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        queued_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_summary_queue_batch ON summary_queue (batch_id);
+    CREATE TABLE IF NOT EXISTS openai_batches (
+        id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        input_file_id TEXT NOT NULL,
+        requests INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        processed_at REAL
+    );
+
+    -- Durable work queue for `workers.py` (job_queue.JobQueue): one row per search, fetch, summarize
+    -- or watchlist step, unique per (kind, key) so enqueueing the same step again is a no-op
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        state TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        run_after REAL NOT NULL,
+        lease_owner TEXT,
+        lease_expires REAL,
+        last_error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        UNIQUE (kind, key)
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, run_after);
+    CREATE INDEX IF NOT EXISTS idx_jobs_topic ON jobs (topic, state);
+
+    -- Paragraphs that recur across a domain's articles (preprocess.learn_boilerplate), left out of summary prompts
+    CREATE TABLE IF NOT EXISTS boilerplate_paragraphs (
+        domain TEXT NOT NULL,
+        hash INTEGER NOT NULL,
+        articles INTEGER NOT NULL,
+        sample TEXT NOT NULL,
+        learned_at REAL NOT NULL,
+        PRIMARY KEY (domain, hash)
+    );
+
+    -- What scheduler.py has learned about each topic's article volume, and when it polls it next
+    CREATE TABLE IF NOT EXISTS topic_schedule (
+        topic TEXT PRIMARY KEY,
+        arrival_rate REAL NOT NULL,
+        duplicate_ratio REAL NOT NULL,
+        last_polled REAL,
+        next_due REAL NOT NULL,
+        polls INTEGER NOT NULL DEFAULT 0,
+        failures INTEGER NOT NULL DEFAULT 0,
+        truncated INTEGER NOT NULL DEFAULT 0,
+        watchlist_date TEXT,
+        updated_at REAL NOT NULL
+    );
+    ''')
+    if not had_fts:
+        # Index the articles stored before the search index existed
+        cursor.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
 
     conn.commit()
     conn.close()
 
 def insert_data(country: str, data: List[Dict]):
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    # Drop articles seen in earlier runs and remember the rest
+    seen_index = get_seen_index()
+    keep = seen_index.filter_new(country, data)
+    data = [item for item, k in zip(data, keep) if k]
+    seen_index.register(country, data)
+    print(f"{keep.count(False)} previously seen articles not inserted for {country}")
+
+    with get_metrics().span('db_insert', topic=country, rows=len(data)) as span:
+        span['inserted'] = _insert_articles(country, data)
 
-    for item in data:
-        cursor.execute(f'''
-        INSERT INTO {country} (url, title, content, seendate, domain, language, sourcecountry, relevance_score, 
-                               short_title_en, summary_en, sentiment)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+def _insert_articles(country: str, data: List[Dict]) -> int:
+    return get_database().executemany('''
+    INSERT OR IGNORE INTO articles (topic, url, title, content, seendate, domain, language, sourcecountry, relevance_score, 
+                                    short_title_en, summary_en, sentiment)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (
+            country,
             item.get('url', ''),
             item.get('title', ''),
             item.get('content', ''),
@@ -61,10 +237,6 @@ def insert_data(country: str, data: List[Dict]):
             item.get('short_title_en', ''),
             item.get('summary_en', ''),
             item.get('sentiment', '')
-        ))
-
-    conn.commit()
-    conn.close()
-
-# Create the database and tables when this module is imported
-create_database_and_tables()
\ No newline at end of file
+        )
+        for item in data
+    ])
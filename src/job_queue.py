@@ -0,0 +1,248 @@
+"""
+Durable job queue in the pipeline's SQLite database, for `src/workers.py`.
+
+Every step of a run is a row in `jobs`: a topic's search, an article's fetch
+(download, parse, store the body) and summary, and a topic's watchlist. A
+job is unique per (kind, key), so queueing a step that is already queued, or
+already done, changes nothing. Its state is one of
+
+    pending -> leased -> done
+                      -> pending again (failed, `attempts` < `max_attempts`, after a backoff)
+                      -> failed (out of attempts; `last_error` says why)
+
+A worker takes a job with `claim`, which leases it for `lease_seconds`, and
+keeps the lease alive with `heartbeat` while it works. A worker that dies
+stops renewing its lease; once it expires the job can be claimed again, so a
+killed run resumes with exactly the jobs that had not completed. `complete`
+only counts for the worker that holds the lease, so a worker that stalled past
+its lease cannot mark done a job someone else has taken over. Handlers
+have to be idempotent for the same reason: a job may run twice.
+
+A watchlist job waits until no search, fetch or summarize job of its topic
+is pending or leased; articles are drained before new searches start.
+
+Each process opens its own connection, so any number of worker processes can
+share the database file; claims are serialised by SQLite's write lock
+(BEGIN IMMEDIATE). The database runs in WAL mode, which needs all of them on
+one host.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from src import config
+from src.initialize_db import get_db_path, init_db
+
+JOB_LEASE_SECONDS = getattr(config, 'JOB_LEASE_SECONDS', 120)
+JOB_MAX_ATTEMPTS = getattr(config, 'JOB_MAX_ATTEMPTS', 3)
+JOB_RETRY_SECONDS = getattr(config, 'JOB_RETRY_SECONDS', 30)  # doubled after every failed attempt
+
+JOB_KINDS = ('search', 'fetch', 'summarize', 'watchlist')
+JOB_STATES = ('pending', 'leased', 'done', 'failed')
+# Later steps first, so the articles already found are finished before more are searched for
+KIND_PRIORITY = {'watchlist': 3, 'summarize': 2, 'fetch': 1, 'search': 0}
+WAITS_FOR = {'watchlist': ('search', 'fetch', 'summarize')}  # same topic
+MAX_RETRY_SECONDS = 3600
+
+
+class Job(NamedTuple):
+    id: int
+    kind: str
+    key: str
+    topic: str
+    payload: Dict
+    attempts: int  # including the current one
+    max_attempts: int
+
+
+def worker_id(slot: int = 0) -> str:
+    """host:pid:slot, unique among the workers sharing a database."""
+    return f"{socket.gethostname()}:{os.getpid()}:{slot}"
+
+
+def _priority_sql() -> str:
+    cases = " ".join(f"WHEN '{kind}' THEN {priority}" for kind, priority in KIND_PRIORITY.items())
+    return f"CASE kind {cases} ELSE 0 END"
+
+
+def _dependency_sql() -> str:
+    clauses = []
+    for kind, waits_for in WAITS_FOR.items():
+        kinds = ", ".join(f"'{k}'" for k in waits_for)
+        clauses.append(f"(jobs.kind = '{kind}' AND EXISTS (SELECT 1 FROM jobs d WHERE d.topic = jobs.topic "
+                       f"AND d.kind IN ({kinds}) AND d.state IN ('pending', 'leased')))")
+    return "NOT (" + " OR ".join(clauses) + ")" if clauses else "1"
+
+
+class JobQueue:
+    """The `jobs` table of one database file, through this process's own connection."""
+
+    def __init__(self, db_path: Optional[str] = None, lease_seconds: float = JOB_LEASE_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, retry_seconds: float = JOB_RETRY_SECONDS, clock=time.time):
+        self.db_path = db_path or get_db_path()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.clock = clock
+        init_db(self.db_path)
+        # A worker's slots use the connection from several threads; SQLite's write lock serialises the processes
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._claim_sql = f'''
+        SELECT id, kind, key, topic, payload, state, attempts, max_attempts FROM jobs
+        WHERE ((state = 'pending' AND run_after <= :now) OR (state = 'leased' AND lease_expires <= :now))
+          AND {{kinds}} AND {_dependency_sql()}
+        ORDER BY {_priority_sql()} DESC, id LIMIT 1
+        '''
+
+    def _transaction(self) -> '_Transaction':
+        return _Transaction(self.conn, self._lock)
+
+    def enqueue(self, kind: str, key: str, topic: str, payload: Optional[Dict] = None,
+                max_attempts: Optional[int] = None, delay: float = 0) -> bool:
+        """Queue a job; False if a job with this kind and key already exists, whatever its state."""
+        return self.enqueue_many(kind, [(key, topic, payload)], max_attempts, delay) == 1
+
+    def enqueue_many(self, kind: str, jobs: Iterable[Tuple[str, str, Optional[Dict]]],
+                     max_attempts: Optional[int] = None, delay: float = 0) -> int:
+        """Queue (key, topic, payload) jobs of one kind in one transaction; returns how many were new."""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}', expected one of {JOB_KINDS}")
+        now = self.clock()
+        rows = [(kind, str(key), topic, json.dumps(payload or {}), max_attempts or self.max_attempts, now + delay, now, now)
+                for key, topic, payload in jobs]
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany('''
+            INSERT OR IGNORE INTO jobs (kind, key, topic, payload, max_attempts, run_after, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            return conn.total_changes - before
+
+    def claim(self, owner: str, kinds: Optional[Sequence[str]] = None) -> Optional[Job]:
+        """Lease the next runnable job to `owner`, or None if there is none right now."""
+        kinds = tuple(kinds or ())
+        params = {f'kind{i}': kind for i, kind in enumerate(kinds)}
+        sql = self._claim_sql.format(kinds=f"kind IN ({', '.join(':' + name for name in params)})" if kinds else "1")
+        with self._transaction() as conn:
+            while True:
+                now = self.clock()
+                row = conn.execute(sql, {'now': now, **params}).fetchone()
+                if row is None:
+                    return None
+                job_id, kind, key, topic, payload, state, attempts, max_attempts = row
+                if state == 'leased' and attempts >= max_attempts:
+                    # Its worker died on the last attempt
+                    conn.execute('''
+                    UPDATE jobs SET state = 'failed', lease_owner = NULL, lease_expires = NULL,
+                        last_error = COALESCE(last_error, 'lease expired'), updated_at = ? WHERE id = ?
+                    ''', (now, job_id))
+                    continue
+                conn.execute('''
+                UPDATE jobs SET state = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated_at = ?
+                WHERE id = ?
+                ''', (owner, now + self.lease_seconds, now, job_id))
+                return Job(job_id, kind, key, topic, json.loads(payload), attempts + 1, max_attempts)
+
+    def heartbeat(self, job: Job, owner: str) -> bool:
+        """Extend the lease; False if `owner` no longer holds it."""
+        now = self.clock()
+        with self._transaction() as conn:
+            return conn.execute('''
+            UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND state = 'leased' AND lease_owner = ?
+            ''', (now + self.lease_seconds, now, job.id, owner)).rowcount == 1
+
+    def complete(self, job: Job, owner: str) -> bool:
+        """Mark the job done. Only the lease holder can; completing twice is a no-op that returns False."""
+        with self._transaction() as conn:
+            return conn.execute('''
+            UPDATE jobs SET state = 'done', lease_owner = NULL, lease_expires = NULL, last_error = NULL, updated_at = ?
+            WHERE id = ? AND state = 'leased' AND lease_owner = ?
+            ''', (self.clock(), job.id, owner)).rowcount == 1
+
+    def fail(self, job: Job, owner: str, error: str) -> Optional[str]:
+        """
+        Give the job back after a failed attempt: pending again after a backoff, or
+        failed once it is out of attempts. Returns the new state, None if `owner`
+        had lost the lease.
+        """
+        now = self.clock()
+        state = 'failed' if job.attempts >= job.max_attempts else 'pending'
+        retry_at = now + min(self.retry_seconds * 2 ** (job.attempts - 1), MAX_RETRY_SECONDS)
+        with self._transaction() as conn:
+            changed = conn.execute('''
+            UPDATE jobs SET state = ?, run_after = ?, lease_owner = NULL, lease_expires = NULL, last_error = ?, updated_at = ?
+            WHERE id = ? AND state = 'leased' AND lease_owner = ?
+            ''', (state, retry_at, error[:1000], now, job.id, owner)).rowcount
+        return state if changed else None
+
+    def retry_failed(self, kinds: Optional[Sequence[str]] = None) -> int:
+        """Give failed jobs a fresh set of attempts."""
+        kinds_sql = f" AND kind IN ({', '.join('?' * len(kinds))})" if kinds else ""
+        with self._transaction() as conn:
+            return conn.execute(f'''
+            UPDATE jobs SET state = 'pending', attempts = 0, run_after = ?, updated_at = ? WHERE state = 'failed'{kinds_sql}
+            ''', (self.clock(), self.clock(), *(kinds or ()))).rowcount
+
+    def unfinished(self) -> int:
+        """Jobs pending or leased, runnable now or later."""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE state IN ('pending', 'leased')").fetchone()[0]
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """{kind: {state: jobs}}"""
+        with self._lock:
+            rows = self.conn.execute("SELECT kind, state, COUNT(*) FROM jobs GROUP BY kind, state").fetchall()
+        counts = {}
+        for kind, state, count in rows:
+            counts.setdefault(kind, dict.fromkeys(JOB_STATES, 0))[state] = count
+        return counts
+
+    def failures(self, limit: int = 20) -> List[Tuple[str, str, str, str]]:
+        """(kind, key, topic, last_error) of the most recently failed jobs."""
+        with self._lock:
+            return self.conn.execute('''
+            SELECT kind, key, topic, last_error FROM jobs WHERE state = 'failed' ORDER BY updated_at DESC LIMIT ?
+            ''', (limit,)).fetchall()
+
+    def report(self) -> str:
+        counts = self.counts()
+        return "Jobs: " + ", ".join(
+            f"{kind} " + "/".join(f"{counts[kind][state]} {state}" for state in JOB_STATES if counts[kind][state])
+            for kind in JOB_KINDS if kind in counts) if counts else "Jobs: none"
+
+    def close(self):
+        self.conn.close()
+
+
+class _Transaction:
+    """
+    BEGIN IMMEDIATE ... COMMIT, or ROLLBACK on an exception. IMMEDIATE takes the
+    write lock up front, so a claim's SELECT and UPDATE see no other writer in between.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+        return False
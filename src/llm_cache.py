@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+from src import config
+
+LLM_CACHE_NAME = 'llm_cache.db'
+LLM_CACHE_MODE = getattr(config, 'LLM_CACHE_MODE', 'readwrite')
+LLM_CACHE_MAX_MB = getattr(config, 'LLM_CACHE_MAX_MB', 512)
+LLM_CACHE_TTL_DAYS = getattr(config, 'LLM_CACHE_TTL_DAYS', 30)
+EVICT_TO = 0.9  # an eviction frees space down to this share of max_bytes, so the next puts need none
+
+CACHE_MODES = ('readwrite', 'replay', 'off')
+_WHITESPACE = re.compile(r"\s+")
+
+
+class CacheMissError(Exception):
+    """Raised in replay mode when a response is not in the cache, instead of calling the API."""
+
+
+def get_llm_cache_path() -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), LLM_CACHE_NAME)
+
+
+def normalize_text(text: str) -> str:
+    """Whitespace differences between two scrapes of the same article should not change the key."""
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+
+class LLMCache:
+    """
+    On-disk cache of parsed LLM responses, keyed by
+    sha256(model, prompt template, tool schema, other prompt params, normalized input text).
+
+    Entries expire after `ttl_seconds`; when the stored values exceed `max_bytes`
+    the least recently used entries are evicted. Their size is kept as a running
+    total, recounted from the table only when it crosses `max_bytes` (other
+    processes may share the file). Modes:
+
+    - readwrite: look up first, store new responses (default)
+    - replay: only serve from the cache; a miss raises CacheMissError, so runs are
+      offline and deterministic
+    - off: bypass the cache entirely
+    """
+
+    def __init__(self, path: Optional[str] = None, mode: str = LLM_CACHE_MODE, max_bytes: int = LLM_CACHE_MAX_MB * 1024 ** 2,
+                 ttl_seconds: float = LLM_CACHE_TTL_DAYS * 86400, clock=time.time):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}', expected one of {CACHE_MODES}")
+        self.path = path or get_llm_cache_path()
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'expired': 0}
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+        ''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access)")
+        self.conn.commit()
+        self.stored_bytes = self._count_stored_bytes()
+
+    @staticmethod
+    def make_key(model: str, prompt_template: str, tools: List[Dict], text: str, **params) -> str:
+        material = json.dumps([model, prompt_template, tools, params, normalize_text(text)], sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached response, None on a miss (readwrite/off), or raise CacheMissError (replay)."""
+        if self.mode == 'off':
+            return None
+        row = self.conn.execute("SELECT value, created_at, size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is not None and self.clock() - row[1] > self.ttl_seconds:
+            self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self.conn.commit()
+            self.stored_bytes -= row[2]
+            self.stats['expired'] += 1
+            row = None
+        if row is None:
+            self.stats['misses'] += 1
+            if self.mode == 'replay':
+                raise CacheMissError(f"No cached LLM response for key {key[:12]}")
+            return None
+        self.stats['hits'] += 1
+        self.conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (self.clock(), key))
+        self.conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict):
+        if self.mode != 'readwrite':
+            return
+        encoded = json.dumps(value)
+        now = self.clock()
+        replaced = self.conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        self.conn.execute('''
+        INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)
+        ''', (key, encoded, len(encoded), now, now))
+        self.stored_bytes += len(encoded) - (replaced[0] if replaced else 0)
+        self.stats['stores'] += 1
+        if self.stored_bytes > self.max_bytes:
+            self._evict()
+        self.conn.commit()
+
+    def _count_stored_bytes(self) -> int:
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+
+    def _evict(self):
+        self.stored_bytes = self._count_stored_bytes()  # includes what other processes stored or evicted
+        if self.stored_bytes <= self.max_bytes:
+            return
+        excess = self.stored_bytes - int(self.max_bytes * EVICT_TO)
+        freed = 0
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self.conn.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+        self.stored_bytes -= freed
+        self.stats['evictions'] += len(victims)
+
+    def report(self) -> str:
+        lookups = self.stats['hits'] + self.stats['misses']
+        hit_rate = self.stats['hits'] / lookups if lookups else 0.0
+        return (f"LLM cache ({self.mode}): {self.stats['hits']} hits, {self.stats['misses']} misses "
+                f"({hit_rate:.0%} hit rate), {self.stats['stores']} stored, {self.stats['evictions']} evicted")
+
+    def close(self):
+        self.conn.close()
+
+
+_llm_cache = None
+
+
+def get_llm_cache() -> LLMCache:
+    """Process-wide LLMCache stored next to the database, created on first use."""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMCache()
+    return _llm_cache
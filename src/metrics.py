@@ -0,0 +1,296 @@
+"""
+Lightweight run metrics: stage spans, latency histograms, counters and gauges.
+
+    metrics = get_metrics()
+    with metrics.span('fetch', topic='UK', article_id=42) as span:
+        html = await fetcher.fetch(url)
+        span['chars'] = len(html)
+    metrics.inc('openai_tokens_total', 512, type='prompt')
+
+Every span feeds the `stage_seconds{stage, topic}` histogram (and
+`stage_errors_total` when it raises) and is kept as a trace record with its
+attributes and parent span, so one article can be followed from fetch to
+persist. Article ids and other per-item attributes only go on the trace
+records, never on metric labels, which keeps the number of series bounded.
+
+At the end of a run `write_report` writes the whole registry as a JSON
+report and in the Prometheus text format (metrics.prom, for node_exporter's
+textfile collector or anything else that reads a file). A span costs two
+clock reads, a bisect and a few dict operations under one lock; only the
+newest METRICS_MAX_SPANS trace records are kept. METRICS_ENABLED = False
+turns the whole thing into no-ops.
+"""
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src import config
+
+METRICS_ENABLED = getattr(config, 'METRICS_ENABLED', True)
+METRICS_MAX_SPANS = getattr(config, 'METRICS_MAX_SPANS', 50000)
+METRICS_DIR = getattr(config, 'METRICS_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'metrics'))
+METRIC_PREFIX = 'sensusmundi_'
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+Labels = Tuple[Tuple[str, str], ...]
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+def _labels(labels: Dict) -> Labels:
+    if not labels:
+        return ()
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+class Histogram:
+    """Cumulative-bucket histogram, like a Prometheus histogram."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate from the buckets, interpolating linearly inside one (histogram_quantile)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def to_dict(self) -> Dict:
+        return {'count': self.count, 'sum': round(self.sum, 6),
+                'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99),
+                'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts))}
+
+
+class Span:
+    """A running span (see Metrics.span); records itself when the block exits."""
+    __slots__ = ('metrics', 'stage', 'topic', 'attrs', 'id', 'parent', 'start', '_token')
+
+    def __init__(self, metrics: 'Metrics', stage: str, topic: Optional[str], attrs: Dict):
+        self.metrics = metrics
+        self.stage = stage
+        self.topic = topic
+        self.attrs = attrs
+
+    def __enter__(self) -> Dict:
+        metrics = self.metrics
+        if metrics.enabled:
+            self.id = next(metrics._ids)
+            self.parent = _current_span.get()
+            self._token = _current_span.set(self.id)
+            self.start = metrics.clock()
+        return self.attrs
+
+    def __exit__(self, exc_type, exc, tb):
+        metrics = self.metrics
+        if metrics.enabled:
+            duration = metrics.clock() - self.start
+            _current_span.reset(self._token)
+            metrics._finish(self, duration, exc_type.__name__ if exc_type else None)
+        return False
+
+
+class Metrics:
+    """A process-wide registry; safe to use from the event loop, worker threads and to_thread calls."""
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, max_spans: int = METRICS_MAX_SPANS, clock=time.perf_counter):
+        self.enabled = enabled
+        self.max_spans = max_spans
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters: Dict[Tuple[str, Labels], float] = {}
+            self.gauges: Dict[Tuple[str, Labels], float] = {}
+            self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+            self.spans = deque(maxlen=self.max_spans)
+            self.spans_dropped = 0
+            self.started_at = datetime.now(timezone.utc)
+            self._started = self.clock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def span(self, stage: str, topic: Optional[str] = None, **attrs) -> 'Span':
+        """
+        Time a block as one `stage` span. Entering it gives the span's attribute
+        dict, so the block can add results such as bytes or tokens to the trace record.
+        """
+        return Span(self, stage, topic, attrs)
+
+    def _finish(self, span: 'Span', duration: float, error: Optional[str]):
+        record = {'id': span.id, 'parent': span.parent, 'stage': span.stage, 'topic': span.topic,
+                  'start': span.start - self._started, 'seconds': duration}
+        if span.attrs:
+            record['attrs'] = span.attrs
+        if error:
+            record['error'] = error
+        # One lock and no label sorting on this path: spans are recorded for every article and stage
+        key = ('stage_seconds', (('stage', span.stage), ('topic', span.topic)) if span.topic is not None
+               else (('stage', span.stage),))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(duration)
+            if len(self.spans) == self.max_spans:
+                self.spans_dropped += 1
+            self.spans.append(record)
+        if error:
+            self.inc('stage_errors_total', stage=span.stage, topic=span.topic, error=error)
+
+    # Export
+
+    def report(self) -> Dict:
+        """Everything recorded since the last reset, as one JSON-serialisable dict."""
+        with self._lock:
+            def rows(items):
+                return [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in items]
+            return {
+                'started_at': self.started_at.isoformat(),
+                'duration_seconds': round(self.clock() - self._started, 3),
+                'counters': rows(sorted(self.counters.items())),
+                'gauges': rows(sorted(self.gauges.items())),
+                'histograms': [{'name': name, 'labels': dict(labels), **histogram.to_dict()}
+                               for (name, labels), histogram in sorted(self.histograms.items(), key=lambda kv: kv[0])],
+                'spans': list(self.spans),
+                'spans_dropped': self.spans_dropped,
+            }
+
+    def prometheus(self) -> str:
+        """The registry in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+
+        def series(name, labels, value, extra: Labels = ()):
+            pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels + extra)
+            lines.append(f"{METRIC_PREFIX}{name}{{{pairs}}} {_number(value)}" if pairs
+                         else f"{METRIC_PREFIX}{name} {_number(value)}")
+
+        with self._lock:
+            for kind, items in (('counter', self.counters), ('gauge', self.gauges)):
+                typed = set()
+                for (name, labels), value in sorted(items.items()):
+                    if name not in typed:
+                        lines.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+                        typed.add(name)
+                    series(name, labels, value)
+            typed = set()
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda kv: kv[0]):
+                if name not in typed:
+                    lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+                    cumulative += count
+                    series(f"{name}_bucket", labels, cumulative, (('le', str(bound)),))
+                series(f"{name}_sum", labels, histogram.sum)
+                series(f"{name}_count", labels, histogram.count)
+        return "\n".join(lines) + "\n"
+
+    def stages(self) -> Dict[str, Histogram]:
+        """The stage_seconds histograms merged over topics, by stage."""
+        with self._lock:
+            stages: Dict[str, Histogram] = {}
+            for (name, labels), histogram in self.histograms.items():
+                if name != 'stage_seconds':
+                    continue
+                stage = dict(labels)['stage']
+                merged = stages.setdefault(stage, Histogram(histogram.buckets))
+                merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+                merged.count += histogram.count
+                merged.sum += histogram.sum
+        return stages
+
+    def summary(self) -> List[str]:
+        """One line per stage: spans, errors, total time and latency percentiles, over all topics."""
+        stages = self.stages()
+        with self._lock:
+            errors = {}
+            for (name, labels), value in self.counters.items():
+                if name == 'stage_errors_total':
+                    stage = dict(labels)['stage']
+                    errors[stage] = errors.get(stage, 0) + value
+        return [f"{stage:<16} {h.count:>6} spans {errors.get(stage, 0):>4.0f} errors {h.sum:>9.1f}s total "
+                f"p50 {h.quantile(0.5):.3f}s p99 {h.quantile(0.99):.3f}s"
+                for stage, h in sorted(stages.items())]
+
+    def write_report(self, out_dir: str = METRICS_DIR) -> str:
+        """Write run-<timestamp>.json and metrics.prom into `out_dir`; returns the report path."""
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"run-{self.started_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+        _atomic_write(path, json.dumps(self.report(), indent=1, default=str))
+        _atomic_write(os.path.join(out_dir, 'metrics.prom'), self.prometheus())
+        return path
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _atomic_write(path: str, text: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+_metrics = None
+
+
+def get_metrics() -> Metrics:
+    """Process-wide Metrics that every stage records into."""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,87 @@
+"""
+Move the old per-country article tables into the unified `articles` table.
+
+    python src/migrate_articles.py                # copy, keep the old tables
+    python src/migrate_articles.py --drop-legacy  # copy, then drop the old tables
+
+Safe to run more than once: each legacy table is recorded in `migrated_legacy_tables`
+once copied and skipped afterwards. When a legacy table holds the same URL several
+times, the summarised copy wins. Dead-lettered summaries are re-pointed at the new
+article ids.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+# Add the project root to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from src.initialize_db import LEGACY_TOPIC_TABLES, create_database_and_tables, get_db_path
+
+COLUMNS = ['url', 'title', 'content', 'seendate', 'domain', 'language', 'sourcecountry', 'relevance_score',
+           'date_added', 'news_body', 'short_title_en', 'summary_en', 'sentiment']
+
+
+def legacy_tables(conn: sqlite3.Connection):
+    """Legacy tables that exist and have not been migrated yet."""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    done = {row[0] for row in conn.execute("SELECT name FROM migrated_legacy_tables")}
+    return [table for table in LEGACY_TOPIC_TABLES if table in existing and table not in done]
+
+
+def migrate_table(conn: sqlite3.Connection, topic: str) -> int:
+    columns = ", ".join(COLUMNS)
+    # rowcount, not total_changes: the search index triggers' writes would be counted too
+    return conn.execute(f'''
+    INSERT OR IGNORE INTO articles (topic, {columns}, body_length)
+    SELECT ?, url, title, content, seendate, domain, language, sourcecountry, relevance_score,
+           date(COALESCE(date_added, CURRENT_DATE)), news_body, short_title_en, summary_en, sentiment, length(news_body)
+    FROM {topic}
+    ORDER BY (summary_en IS NOT NULL AND summary_en != '') DESC, id
+    ''', (topic,)).rowcount
+
+
+def repoint_dead_letters(conn: sqlite3.Connection, topic: str):
+    """Summary dead letters reference the article id, which changes when the row moves."""
+    conn.execute(f'''
+    UPDATE llm_dead_letter
+    SET ref = (
+        SELECT CAST(a.id AS TEXT) FROM {topic} legacy JOIN articles a ON a.topic = ? AND a.url = legacy.url
+        WHERE legacy.id = CAST(llm_dead_letter.ref AS INTEGER)
+    )
+    WHERE kind = 'summary' AND topic = ? AND EXISTS (
+        SELECT 1 FROM {topic} legacy WHERE legacy.id = CAST(llm_dead_letter.ref AS INTEGER)
+    )
+    ''', (topic, topic))
+
+
+def migrate(db_path: str, drop_legacy: bool = False):
+    create_database_and_tables(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE IF NOT EXISTS migrated_legacy_tables (name TEXT PRIMARY KEY, migrated_at TEXT NOT NULL)")
+    total = 0
+    with conn:
+        for topic in legacy_tables(conn):
+            count = conn.execute(f"SELECT COUNT(*) FROM {topic}").fetchone()[0]
+            moved = migrate_table(conn, topic)
+            repoint_dead_letters(conn, topic)
+            conn.execute("INSERT INTO migrated_legacy_tables (name, migrated_at) VALUES (?, datetime('now'))", (topic,))
+            total += moved
+            print(f"{topic}: {moved} of {count} rows copied ({count - moved} duplicate URLs)")
+            if drop_legacy:
+                conn.execute(f"DROP TABLE {topic}")
+                print(f"Dropped legacy table {topic}")
+    conn.execute("ANALYZE")
+    conn.close()
+    print(f"Migrated {total} rows into articles")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move per-country article tables into the unified articles table.")
+    parser.add_argument("--db", default=get_db_path(), help="database file (default: src/sensusmundi.db)")
+    parser.add_argument("--drop-legacy", action="store_true", help="drop the per-country tables after copying")
+    args = parser.parse_args()
+    migrate(args.db, args.drop_legacy)
@@ -0,0 +1,112 @@
+"""
+Move article bodies stored inline in `articles.news_body` into the compressed body store.
+
+    python src/migrate_bodies.py                # train a dictionary if there is none, move, VACUUM
+    python src/migrate_bodies.py --train --recompress
+                                                # retrain, and rewrite stored bodies with the new dictionary
+    python src/migrate_bodies.py --no-vacuum
+
+Safe to interrupt and re-run: each batch is stored in article_bodies before
+its inline copy is cleared, and only rows that still have an inline body are
+picked up. The file only shrinks after the VACUUM, which rewrites the whole
+database and needs about as much free disk space as the result.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from typing import Dict
+
+# Add the project root to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from src.body_store import BodyStore
+from src.db import Database
+from src.initialize_db import create_database_and_tables, get_db_path
+
+BATCH_SIZE = 500
+
+
+def database_size(db_path: str) -> int:
+    """Bytes on disk, including the write-ahead log."""
+    return sum(os.path.getsize(path) for path in (db_path, db_path + '-wal') if os.path.exists(path))
+
+
+def move_inline_bodies(db: Database, store: BodyStore, batch_size: int = BATCH_SIZE) -> int:
+    moved = 0
+    while True:
+        rows = db.query("SELECT id, news_body FROM articles WHERE news_body IS NOT NULL LIMIT ?", (batch_size,))
+        if not rows:
+            return moved
+        store.put_many(rows)
+        db.executemany("UPDATE articles SET news_body = NULL, body_length = ? WHERE id = ?",
+                       [(len(body), article_id) for article_id, body in rows])
+        moved += len(rows)
+        print(f"Moved {moved} bodies")
+
+
+def recompress(db: Database, store: BodyStore, batch_size: int = BATCH_SIZE) -> int:
+    """Rewrite stored bodies that were compressed without the current dictionary."""
+    dict_id, _ = store.current_dictionary()
+    rewritten, last_id = 0, 0
+    while True:
+        ids = [row[0] for row in db.query('''
+        SELECT article_id FROM article_bodies WHERE article_id > ? AND (dict_id IS NOT ? OR codec != ?)
+        ORDER BY article_id LIMIT ?
+        ''', (last_id, dict_id, store.codec, batch_size))]
+        if not ids:
+            return rewritten
+        store.put_many(store.get_many(ids).items())
+        rewritten += len(ids)
+        last_id = ids[-1]
+        print(f"Recompressed {rewritten} bodies")
+
+
+def vacuum(db_path: str):
+    conn = sqlite3.connect(db_path)
+    # Moving a body re-indexes its row; merge the search index segments and drop the superseded entries first
+    with conn:
+        conn.execute("INSERT INTO articles_fts (articles_fts) VALUES ('optimize')")
+        conn.execute("INSERT INTO article_bodies_fts (article_bodies_fts) VALUES ('optimize')")
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+def migrate_bodies(db_path: str, train: bool = False, rewrite: bool = False, compact: bool = True,
+                   batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    create_database_and_tables(db_path)
+    size_before = database_size(db_path)
+    db = Database(db_path)
+    store = BodyStore(db)
+    if train or store.current_dictionary()[0] is None:
+        store.train()
+    moved = move_inline_bodies(db, store, batch_size)
+    rewritten = recompress(db, store, batch_size) if rewrite else 0
+    report = {'moved': moved, 'recompressed': rewritten, **store.stats(), 'size_before': size_before}
+    db.close()
+    if compact:
+        vacuum(db_path)
+    report['size_after'] = database_size(db_path)
+
+    mib = 1024 * 1024
+    print(f"{report['moved']} bodies moved, {report['recompressed']} recompressed")
+    if report['bodies']:
+        print(f"Body store: {report['bodies']} bodies, {report['raw_chars'] / mib:.1f} MiB of text in "
+              f"{report['stored_bytes'] / mib:.1f} MiB ({report['raw_chars'] / max(report['stored_bytes'], 1):.1f}x)")
+    print(f"Database: {size_before / mib:.1f} MiB -> {report['size_after'] / mib:.1f} MiB")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move inline article bodies into the compressed body store.")
+    parser.add_argument("--db", default=get_db_path(), help="database file (default: src/sensusmundi.db)")
+    parser.add_argument("--train", action="store_true", help="train a new dictionary even if there is one")
+    parser.add_argument("--recompress", action="store_true", help="rewrite stored bodies with the current dictionary")
+    parser.add_argument("--no-vacuum", action="store_true", help="skip the VACUUM that gives the space back")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    migrate_bodies(args.db, train=args.train, rewrite=args.recompress, compact=not args.no_vacuum,
+                   batch_size=args.batch_size)
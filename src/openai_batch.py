@@ -0,0 +1,312 @@
+"""
+Article summaries through the OpenAI Batch API instead of one request per article.
+
+In batch mode (SUMMARY_MODE = 'batch', or `daily_run.py --summaries batch`)
+the scraper stores each body and adds the article to `summary_queue` instead
+of calling OpenAI. `summarize_in_batches` then:
+
+1. applies the summaries the LLM cache already has;
+2. writes the rest, from every topic, into a JSONL file of /v1/chat/completions
+   requests with the same Summarizer tool as the real-time path (a new file
+   every OPENAI_BATCH_MAX_REQUESTS lines), uploads it and creates the batch;
+3. polls until the batch has finished, then streams its output and error
+   files back and applies the summaries in bulk;
+4. re-submits the requests that failed (error file, non-200 response, no
+   usable tool call, or missing from an expired batch) in the next batch. After
+   OPENAI_BATCH_MAX_ATTEMPTS they go to the dead-letter table, where the
+   real-time path retries them.
+
+Batches and queue rows live in the database, so a run that stops waiting
+after OPENAI_BATCH_MAX_WAIT_MINUTES picks its open batches up next time.
+Batch requests cost half as much as real-time ones and have their own rate
+limits, but OpenAI only promises them within the 24 hour completion window.
+"""
+import asyncio
+import json
+import tempfile
+import time
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+
+from src import config
+from src.body_store import get_body_store
+from src.db import get_database
+from src.llm_cache import CacheMissError, get_llm_cache
+from src.metrics import get_metrics
+from src.preprocess import get_preprocessor
+from src.openai_client import (
+    OPENAI_BASE_URL,
+    UPSERT_DEAD_LETTER,
+    OpenAIRequestError,
+    dead_letter_row,
+    parse_tool_arguments,
+    record_usage,
+)
+from src.ScrapeNews import build_summary_payload, summary_cache_key
+
+OPENAI_BATCH_POLL_SECONDS = getattr(config, 'OPENAI_BATCH_POLL_SECONDS', 30)
+OPENAI_BATCH_MAX_WAIT_MINUTES = getattr(config, 'OPENAI_BATCH_MAX_WAIT_MINUTES', 360)
+OPENAI_BATCH_MAX_REQUESTS = getattr(config, 'OPENAI_BATCH_MAX_REQUESTS', 50000)  # OpenAI's limit per batch
+OPENAI_BATCH_MAX_ATTEMPTS = getattr(config, 'OPENAI_BATCH_MAX_ATTEMPTS', 3)
+
+COMPLETION_WINDOW = '24h'
+TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+APPLY_ROWS = 500  # summaries written per transaction while the output streams in
+
+
+class BatchClient:
+    """The Files and Batches endpoints, next to OpenAIClient's chat completions."""
+
+    def __init__(self, api_key: str, base_url: str = OPENAI_BASE_URL, timeout: float = 600.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    async def _json(self, session, method: str, path: str, **kwargs) -> Dict:
+        async with session.request(method, f"{self.base_url}{path}", headers=self.headers, timeout=self.timeout,
+                                   **kwargs) as response:
+            if response.status >= 400:
+                raise OpenAIRequestError(f"{method} {path} failed: HTTP {response.status}: {(await response.text())[:200]}",
+                                         {}, response.status)
+            return await response.json(content_type=None)
+
+    async def upload(self, session, jsonl, filename: str = 'summaries.jsonl') -> str:
+        """Upload an open JSONL file (streamed, not read into memory) for a batch; returns the file id."""
+        form = aiohttp.FormData()
+        form.add_field('purpose', 'batch')
+        form.add_field('file', jsonl, filename=filename, content_type='application/jsonl')
+        return (await self._json(session, 'POST', '/files', data=form))['id']
+
+    async def create(self, session, input_file_id: str, metadata: Optional[Dict[str, str]] = None) -> Dict:
+        return await self._json(session, 'POST', '/batches', json={
+            "input_file_id": input_file_id,
+            "endpoint": "/v1/chat/completions",
+            "completion_window": COMPLETION_WINDOW,
+            "metadata": metadata or {},
+        })
+
+    async def retrieve(self, session, batch_id: str) -> Dict:
+        return await self._json(session, 'GET', f'/batches/{batch_id}')
+
+    async def iter_lines(self, session, file_id: str) -> AsyncIterator[Dict]:
+        """Decode a result file line by line as it downloads."""
+        async with session.get(f"{self.base_url}/files/{file_id}/content", headers=self.headers,
+                               timeout=self.timeout) as response:
+            if response.status >= 400:
+                raise OpenAIRequestError(f"GET /files/{file_id}/content failed: HTTP {response.status}", {}, response.status)
+            pending = b''
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line)
+            if pending.strip():
+                yield json.loads(pending)
+
+
+def custom_id(article_id: int) -> str:
+    return f"summary-{article_id}"
+
+
+def article_id_of(request_id: str) -> Optional[int]:
+    prefix, _, number = (request_id or '').partition('-')
+    return int(number) if prefix == 'summary' and number.isdigit() else None
+
+
+def apply_summaries(rows: Sequence[Tuple[int, Dict]]):
+    """Store summaries and take their articles off the queue."""
+    if not rows:
+        return
+    db = get_database()
+    db.executemany("UPDATE articles SET short_title_en = ?, summary_en = ?, sentiment = ? WHERE id = ?",
+                   [(s.get('short_title_en', ''), s.get('summary_en', ''), s.get('sentiment', ''), article_id)
+                    for article_id, s in rows])
+    db.executemany("DELETE FROM summary_queue WHERE article_id = ?", [(article_id,) for article_id, _ in rows])
+
+
+async def submit_pending(session, client: BatchClient, max_requests: int = OPENAI_BATCH_MAX_REQUESTS) -> Counter:
+    """Apply cached summaries and submit every other queued article that is not in a batch yet."""
+    db, cache, store, preprocessor = get_database(), get_llm_cache(), get_body_store(), get_preprocessor()
+    stats = Counter()
+    rows = db.query('''
+    SELECT q.article_id, q.topic, a.url FROM summary_queue q JOIN articles a ON a.id = q.article_id
+    WHERE q.batch_id IS NULL AND a.body_length IS NOT NULL ORDER BY q.article_id
+    ''')
+    for start in range(0, len(rows), max_requests):
+        chunk = rows[start:start + max_requests]
+        bodies = store.get_many([article_id for article_id, _, _ in chunk])
+        cached, keys = [], []
+        with get_metrics().span('batch_submit', articles=len(chunk)) as span, tempfile.TemporaryFile() as jsonl:
+            for article_id, topic, url in chunk:
+                body = bodies.get(article_id)
+                if body is None:
+                    continue
+                text = preprocessor.prepare(body, topic, url).text
+                payload = build_summary_payload(text, topic)
+                key = summary_cache_key(payload, body, topic, preprocessor.cache_version)
+                try:
+                    hit = cache.get(key)
+                except CacheMissError:
+                    stats['skipped'] += 1  # replay mode: no API calls
+                    continue
+                if hit is not None:
+                    cached.append((article_id, hit))
+                    continue
+                jsonl.write(json.dumps({"custom_id": custom_id(article_id), "method": "POST",
+                                        "url": "/v1/chat/completions", "body": payload}).encode('utf-8') + b'\n')
+                keys.append((key, article_id))
+            apply_summaries(cached)
+            stats['cached'] += len(cached)
+            span.update(cached=len(cached), requests=len(keys))
+            if not keys:
+                continue
+            jsonl.seek(0)
+            file_id = await client.upload(session, jsonl)
+            batch = await client.create(session, file_id, {"kind": "summary"})
+        db.execute("INSERT INTO openai_batches (id, status, input_file_id, requests, created_at) VALUES (?, ?, ?, ?, ?)",
+                   (batch['id'], batch['status'], file_id, len(keys), time.time()))
+        db.executemany("UPDATE summary_queue SET batch_id = ?, cache_key = ? WHERE article_id = ?",
+                       [(batch['id'], key, article_id) for key, article_id in keys])
+        stats['submitted'] += len(keys)
+        print(f"Submitted batch {batch['id']} with {len(keys)} summaries")
+    return stats
+
+
+def requeue_failures(batch_id: str, errors: Dict[int, str], max_attempts: int = OPENAI_BATCH_MAX_ATTEMPTS,
+                     default_error: str = "no result in the batch output") -> Counter:
+    """
+    Articles of a finished batch that are still queued failed: give them back to
+    the next batch, or dead-letter them once they have used up their attempts.
+    """
+    db = get_database()
+    stats = Counter()
+    rows = db.query('''
+    SELECT q.article_id, q.topic, q.attempts, a.url FROM summary_queue q JOIN articles a ON a.id = q.article_id
+    WHERE q.batch_id = ?
+    ''', (batch_id,))
+    retry, dead = [], []
+    for article_id, topic, attempts, url in rows:
+        error = errors.get(article_id, default_error)
+        (dead if attempts + 1 >= max_attempts else retry).append((article_id, topic, url, error))
+    db.executemany("UPDATE summary_queue SET batch_id = NULL, attempts = attempts + 1, last_error = ? WHERE article_id = ?",
+                   [(error, article_id) for article_id, _, _, error in retry])
+    if dead:
+        bodies = get_body_store().get_many([article_id for article_id, _, _, _ in dead])
+        letters = []
+        for article_id, topic, url, error in dead:
+            body = bodies.get(article_id) or ''
+            payload = build_summary_payload(get_preprocessor().prepare(body, topic, url).text, topic)
+            letters.append(dead_letter_row('summary', topic, article_id, payload,
+                                           f"Batch request failed {max_attempts} times: {error}", {'news_body': body}))
+        db.executemany(UPSERT_DEAD_LETTER, letters)
+        db.executemany("DELETE FROM summary_queue WHERE article_id = ?", [(article_id,) for article_id, _, _, _ in dead])
+    stats['retried'] += len(retry)
+    stats['dead_lettered'] += len(dead)
+    return stats
+
+
+async def process_batch(session, client: BatchClient, batch: Dict, max_attempts: int = OPENAI_BATCH_MAX_ATTEMPTS) -> Counter:
+    """Stream a finished batch's output and error files into the database."""
+    db, cache = get_database(), get_llm_cache()
+    keys = dict(db.query("SELECT article_id, cache_key FROM summary_queue WHERE batch_id = ?", (batch['id'],)))
+    stats = Counter()
+    errors: Dict[int, str] = {}
+    done: List[Tuple[int, Dict]] = []
+    with get_metrics().span('batch_apply', batch=batch['id'], status=batch['status']) as span:
+        for file_id in (batch.get('output_file_id'), batch.get('error_file_id')):
+            if not file_id:
+                continue
+            async for line in client.iter_lines(session, file_id):
+                article_id = article_id_of(line.get('custom_id'))
+                if article_id not in keys:
+                    continue
+                response = line.get('response') or {}
+                body = response.get('body') or {}
+                if response.get('status_code') == 200:
+                    summaries = parse_tool_arguments(body)
+                    if 'error' not in summaries:
+                        record_usage(body, body.get('model'))
+                        cache.put(keys[article_id], summaries)
+                        done.append((article_id, summaries))
+                        if len(done) >= APPLY_ROWS:
+                            await asyncio.to_thread(apply_summaries, done)
+                            stats['summarized'] += len(done)
+                            done = []
+                        continue
+                    errors[article_id] = summaries['error']
+                else:
+                    error = line.get('error') or body.get('error') or {}
+                    errors[article_id] = f"HTTP {response.get('status_code')}: {error.get('message', error)}"
+        await asyncio.to_thread(apply_summaries, done)
+        stats['summarized'] += len(done)
+        batch_errors = [e.get('message', '') for e in (batch.get('errors') or {}).get('data', [])]
+        default_error = f"batch {batch['status']}" + (f": {'; '.join(batch_errors)}" if batch_errors else "")
+        stats.update(await asyncio.to_thread(requeue_failures, batch['id'], errors, max_attempts, default_error))
+        span.update(summarized=stats['summarized'], retried=stats['retried'], dead_lettered=stats['dead_lettered'])
+    db.execute("UPDATE openai_batches SET status = ?, processed_at = ? WHERE id = ?", (batch['status'], time.time(), batch['id']))
+    for outcome in ('summarized', 'retried', 'dead_lettered'):
+        get_metrics().inc('openai_batch_requests_total', stats[outcome], outcome=outcome)
+    print(f"Batch {batch['id']} {batch['status']}: {stats['summarized']} summaries, {stats['retried']} to retry, "
+          f"{stats['dead_lettered']} dead-lettered")
+    return stats
+
+
+async def summarize_in_batches(client: Optional[BatchClient] = None, poll_seconds: float = OPENAI_BATCH_POLL_SECONDS,
+                               max_wait_minutes: float = OPENAI_BATCH_MAX_WAIT_MINUTES,
+                               max_requests: int = OPENAI_BATCH_MAX_REQUESTS,
+                               max_attempts: int = OPENAI_BATCH_MAX_ATTEMPTS) -> Dict[str, int]:
+    """
+    Summarise everything in summary_queue through the Batch API, re-submitting
+    failures, until the queue is empty or `max_wait_minutes` have passed.
+    Batches still running then are left for the next call.
+    """
+    client = client or get_batch_client()
+    db = get_database()
+    deadline = time.monotonic() + max_wait_minutes * 60
+    stats = Counter()
+    async with aiohttp.ClientSession() as session:
+        while True:
+            stats.update(await submit_pending(session, client, max_requests))
+            open_batches = [row[0] for row in db.query("SELECT id FROM openai_batches WHERE processed_at IS NULL")]
+            if not open_batches:
+                break
+            finished = 0
+            for batch_id in open_batches:
+                try:
+                    batch = await client.retrieve(session, batch_id)
+                except (OpenAIRequestError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    print(f"Could not poll batch {batch_id}, trying again later: {e}")
+                    continue
+                db.execute("UPDATE openai_batches SET status = ? WHERE id = ?", (batch['status'], batch_id))
+                if batch['status'] in TERMINAL_STATUSES:
+                    stats.update(await process_batch(session, client, batch, max_attempts))
+                    finished += 1
+            if finished:
+                continue  # submit the failures again straight away
+            if time.monotonic() >= deadline:
+                print(f"Stopped waiting for {len(open_batches)} batch(es); the next run picks them up")
+                break
+            await asyncio.sleep(poll_seconds)
+    stats['open_batches'] = len(db.query("SELECT id FROM openai_batches WHERE processed_at IS NULL"))
+    stats['queued'] = db.query("SELECT COUNT(*) FROM summary_queue")[0][0]
+    print("Batch summaries: " + ", ".join(f"{k}={v}" for k, v in sorted(stats.items())))
+    print(get_preprocessor().report())
+    return dict(stats)
+
+
+_batch_client = None
+
+
+def get_batch_client() -> BatchClient:
+    """Process-wide BatchClient configured from config.py."""
+    global _batch_client
+    if _batch_client is None:
+        _batch_client = BatchClient(config.OPENAI_API_KEY)
+    return _batch_client
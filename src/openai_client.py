@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from src import config
+from src.db import get_database
+from src.metrics import get_metrics
+from src.token_budget import estimate_tokens
+
+OPENAI_BASE_URL = getattr(config, 'OPENAI_BASE_URL', 'https://api.openai.com/v1')
+OPENAI_REQUESTS_PER_MINUTE = getattr(config, 'OPENAI_REQUESTS_PER_MINUTE', 500)
+OPENAI_TOKENS_PER_MINUTE = getattr(config, 'OPENAI_TOKENS_PER_MINUTE', 200000)
+OPENAI_MAX_CONCURRENCY = getattr(config, 'OPENAI_MAX_CONCURRENCY', 16)
+OPENAI_MAX_RETRIES = getattr(config, 'OPENAI_MAX_RETRIES', 6)
+
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class OpenAIRequestError(Exception):
+    """Raised when a request still fails after all retries; carries the payload for the dead-letter table."""
+
+    def __init__(self, message: str, payload: Dict, status: Optional[int] = None):
+        super().__init__(message)
+        self.payload = payload
+        self.status = status
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute up to `capacity` (one minute's worth by default)."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now). Requests larger than the bucket are capped to it."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+def estimate_request_tokens(payload: Dict) -> int:
+    """Rough prompt + completion token count (~4 characters per token) used for the tokens-per-minute bucket."""
+    prompt = "".join(str(m.get('content', '')) for m in payload.get('messages', []))
+    prompt += json.dumps(payload.get('tools', []))
+    return estimate_tokens(prompt) + payload.get('max_tokens', 0)
+
+
+class OpenAIClient:
+    """
+    Shared client for /chat/completions used by ScrapeNews and GetWatchlist.
+
+    - requests-per-minute and tokens-per-minute token buckets plus a cap on
+      concurrent requests keep us under the account limits;
+    - 429/5xx responses and network errors are retried with exponential backoff
+      and full jitter, never sooner than the server's Retry-After, and a 429
+      pauses every caller until then so the burst does not keep hammering;
+    - identical payloads that are in flight at the same time share one request.
+
+    Requests that still fail raise OpenAIRequestError.
+    """
+
+    def __init__(self, api_key: str, base_url: str = OPENAI_BASE_URL, requests_per_minute: float = OPENAI_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = OPENAI_TOKENS_PER_MINUTE, max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+                 max_retries: int = OPENAI_MAX_RETRIES, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 timeout: float = 120.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.paused_until = 0.0
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'coalesced': 0, 'failed': 0}
+        self._loop = None
+
+    def _bind_loop(self):
+        # asyncio primitives belong to one event loop; scripts call asyncio.run() once per topic
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._bucket_lock = asyncio.Lock()
+            self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def _wait_for_capacity(self, tokens: int):
+        async with self._bucket_lock:
+            while True:
+                delay = max(self.paused_until - time.monotonic(),
+                            self.request_bucket.wait_time(1),
+                            self.token_bucket.wait_time(tokens))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            self.request_bucket.take(1)
+            self.token_bucket.take(tokens)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    @staticmethod
+    def _retry_after(response) -> Optional[float]:
+        if 'retry-after-ms' in response.headers:
+            try:
+                return float(response.headers['retry-after-ms']) / 1000
+            except ValueError:
+                pass
+        try:
+            return float(response.headers.get('retry-after', ''))
+        except ValueError:
+            return None
+
+    async def _post(self, session, path: str, payload: Dict) -> Dict:
+        with get_metrics().span('openai_request', path=path, model=payload.get('model')) as span:
+            result = await self._post_with_retries(session, path, payload)
+            record_usage(result, payload.get('model'), span)
+            return result
+
+    async def _post_with_retries(self, session, path: str, payload: Dict) -> Dict:
+        headers = {
+            "accept": "application/json",
+            "content-type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        tokens = estimate_request_tokens(payload)
+        last_error, last_status = None, None
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_capacity(tokens)
+            retry_after = None
+            async with self._semaphore:
+                self.stats['requests'] += 1
+                try:
+                    async with session.post(f"{self.base_url}{path}", json=payload, headers=headers, timeout=self.timeout) as response:
+                        if response.status < 400:
+                            return await response.json(content_type=None)
+                        last_status = response.status
+                        last_error = f"HTTP {response.status}: {(await response.text())[:200]}"
+                        if response.status not in RETRYABLE_STATUSES:
+                            break
+                        retry_after = self._retry_after(response)
+                        if response.status == 429:
+                            self.stats['rate_limited'] += 1
+                            get_metrics().inc('openai_rate_limited_total')
+                            self.paused_until = max(self.paused_until, time.monotonic() + (retry_after or self.backoff_base))
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    last_error, last_status = f"{type(e).__name__}: {e}", None
+            if attempt < self.max_retries:
+                self.stats['retries'] += 1
+                get_metrics().inc('openai_retries_total')
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+        self.stats['failed'] += 1
+        raise OpenAIRequestError(f"OpenAI request failed after {attempt + 1} attempts: {last_error}", payload, last_status)
+
+    async def chat_completion(self, session, payload: Dict) -> Dict:
+        """POST a chat completion and return the decoded response body."""
+        self._bind_loop()
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+        if key in self._inflight:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(self._inflight[key])
+        future = self._loop.create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._post(session, '/chat/completions', payload)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved so an unshared failure is not logged as unhandled
+            raise
+        finally:
+            del self._inflight[key]
+
+
+def record_usage(result: Dict, model: Optional[str], span: Optional[Dict] = None):
+    """Count the tokens a response reports in `usage` (cached responses never get here, so they cost nothing)."""
+    usage = result.get('usage') if isinstance(result, dict) else None
+    if not usage:
+        return
+    metrics = get_metrics()
+    for kind in ('prompt', 'completion'):
+        count = usage.get(f'{kind}_tokens') or 0
+        metrics.inc('openai_tokens_total', count, type=kind, model=model)
+        if span is not None:
+            span[f'{kind}_tokens'] = count
+
+
+def parse_tool_arguments(result: Dict) -> Dict:
+    """Decode the first tool call's arguments, or return {"error": ...} if the response has none."""
+    if 'choices' in result and result['choices'] and 'message' in result['choices'][0] and 'tool_calls' in result['choices'][0]['message']:
+        try:
+            return json.loads(result['choices'][0]['message']['tool_calls'][0]['function']['arguments'])
+        except json.JSONDecodeError as e:
+            print(f"Error decoding JSON response from OpenAI: {e}")
+            return {"error": "Invalid JSON response from OpenAI"}
+    print(f"Unexpected response format from OpenAI: {result}")
+    return {"error": "Unexpected response format from OpenAI"}
+
+
+_client = None
+
+
+def get_openai_client() -> OpenAIClient:
+    """Process-wide OpenAIClient configured from config.py, so all callers share one set of limits."""
+    global _client
+    if _client is None:
+        _client = OpenAIClient(config.OPENAI_API_KEY)
+    return _client
+
+
+# Requests that failed after all retries (table created in initialize_db); a repeat failure bumps `attempts`
+UPSERT_DEAD_LETTER = '''
+INSERT INTO llm_dead_letter (kind, topic, ref, payload, context, error, created_at, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (kind, topic, ref) DO UPDATE SET
+    payload = excluded.payload, context = excluded.context, error = excluded.error,
+    attempts = attempts + 1, updated_at = excluded.updated_at
+'''
+
+
+def dead_letter_row(kind: str, topic: str, ref, payload: Dict, error: str, context: Optional[Dict] = None) -> tuple:
+    """UPSERT_DEAD_LETTER's parameters, for callers that write several dead letters in one executemany."""
+    now = time.time()
+    return kind, topic, str(ref), json.dumps(payload), json.dumps(context) if context is not None else None, error, now, now
+
+
+async def record_dead_letter(kind: str, topic: str, ref, payload: Dict, error: str, context: Optional[Dict] = None):
+    """Store a request that failed after all retries so the next run re-queues it."""
+    await get_database().write(UPSERT_DEAD_LETTER, dead_letter_row(kind, topic, ref, payload, error, context))
+
+
+async def get_dead_letters(kind: str, topic: str) -> List[Dict]:
+    rows = await get_database().fetch_all('''
+    SELECT ref, payload, context, error, attempts FROM llm_dead_letter WHERE kind = ? AND topic = ? ORDER BY id
+    ''', (kind, topic))
+    return [
+        {"ref": ref, "payload": json.loads(payload), "context": json.loads(context) if context else None,
+         "error": error, "attempts": attempts}
+        for ref, payload, context, error, attempts in rows
+    ]
+
+
+async def resolve_dead_letter(kind: str, topic: str, ref):
+    await get_database().write("DELETE FROM llm_dead_letter WHERE kind = ? AND topic = ? AND ref = ?", (kind, topic, str(ref)))
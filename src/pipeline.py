@@ -0,0 +1,259 @@
+import asyncio
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from src.GetWatchlist import generate_and_store_watchlist
+from src.ScrapeNews import (
+    SUMMARY_MODE,
+    ArticleFetcher,
+    get_urls_from_database,
+    mark_duplicate_body,
+    parse_html,
+    preload_parser,
+    queue_summary,
+    retry_dead_letters,
+    summarize_article,
+    update_database,
+)
+from src.SearchGdelt import GdeltSearcher
+from src.gdelt_ingest import GdeltIngester
+from src.metrics import DEPTH_BUCKETS, get_metrics
+from src.preprocess import get_preprocessor
+from src.seen_index import get_seen_index
+
+# Workers per stage; search and watchlist are per topic, the rest per article
+DEFAULT_CONCURRENCY = {
+    'search': 4,
+    'fetch': 32,
+    'parse': os.cpu_count() or 1,
+    'summarize': 16,
+    'persist': 16,  # writes wait for the group commit, so several workers keep batches full
+    'watchlist': 4,
+}
+DEFAULT_QUEUE_SIZE = 64  # max items waiting between two stages
+QUEUE_SAMPLE_SECONDS = 0.5  # how often queue depths are recorded
+
+
+class Pipeline:
+    """
+    Streaming search -> fetch -> parse -> summarize -> persist -> watchlist runner.
+
+    GDELT is queried incrementally for all topics at once (src.gdelt_ingest);
+    each topic's new articles are handed to a search worker (clean, rerank,
+    insert) as soon as they arrive. Stages are connected by bounded asyncio queues, so a fast stage blocks on
+    `put` instead of piling up work (backpressure), and every topic flows through
+    at the same time. Each topic counts its articles in flight; once its search
+    has finished and the last of them has been persisted (or has failed), the
+    topic's watchlist is queued straight away instead of waiting for the others.
+
+    With summary_mode='batch' parsed articles go straight to persist, which
+    stores the body and queues the summary for src.openai_batch; watchlists are
+    then left to the caller, to run once the batch has been applied.
+    """
+
+    def __init__(self, searcher: GdeltSearcher, concurrency: Optional[Dict[str, int]] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, summary_mode: str = SUMMARY_MODE):
+        self.searcher = searcher
+        self.summary_mode = summary_mode
+        self.concurrency = {**DEFAULT_CONCURRENCY, **(concurrency or {})}
+        self.queue_size = queue_size
+        self.counts = Counter()  # "<stage>_ok" / "<stage>_failed"
+        self.topic_timings = {}
+
+    def _start_topic(self, topic: str):
+        self.in_flight[topic] = 0
+        self.topic_started[topic] = time.time()
+
+    async def _finish_article(self, topic: str):
+        self.in_flight[topic] -= 1
+        if self.in_flight[topic] == 0 and topic in self.searched:
+            await self._finish_topic(topic)
+
+    async def _finish_topic(self, topic: str):
+        if self.summary_mode == 'batch':
+            self.topic_timings[topic] = time.time() - self.topic_started[topic]
+        else:
+            await self.queues['watchlist'].put(topic)
+
+    async def _ingest(self, topics: List[str]):
+        async for batch in self.ingester.stream(topics):
+            await self.queues['search'].put(batch)
+
+    async def _search_worker(self):
+        queue = self.queues['search']
+        while True:
+            batch = await queue.get()
+            topic = batch.topic
+            try:
+                try:
+                    if batch.error:
+                        raise batch.error
+                    # GdeltSearcher is synchronous (dedup, rerank, Cohere), keep it off the event loop
+                    await asyncio.to_thread(self.searcher.search_gdelt, topic, batch.articles)
+                    # Only move the watermark once the new articles are stored
+                    await asyncio.to_thread(self.ingester.advance, batch)
+                    self.counts['search_ok'] += 1
+                except Exception as e:
+                    print(f"Search failed for {topic}: {type(e).__name__}: {e}")
+                    self.counts['search_failed'] += 1
+                await self._queue_pending(topic)  # after a failed search too: drains leftovers from earlier runs
+            except Exception as e:
+                print(f"Queueing articles failed for {topic}: {type(e).__name__}: {e}")
+                self.counts['queue_failed'] += 1
+            finally:
+                # Whatever did reach the fetch queue still counts, so the topic gets its watchlist once that is done
+                self.searched.add(topic)
+                if self.in_flight[topic] == 0:
+                    await self._finish_topic(topic)
+                queue.task_done()
+
+    async def _queue_pending(self, topic: str):
+        """Queue the topic's articles still waiting to be scraped, bar those just retried from the dead letters."""
+        articles = await get_urls_from_database(topic)
+        dead_lettered = await retry_dead_letters(self.session, topic)
+        for article in articles:
+            if article['id'] not in dead_lettered:
+                self.in_flight[topic] += 1
+                await self.queues['fetch'].put((topic, article))
+
+    async def _stage_worker(self, stage: str, handler, next_stage: Optional[str]):
+        queue = self.queues[stage]
+        while True:
+            topic, item = await queue.get()
+            try:
+                with get_metrics().span(stage, topic=topic, article_id=item['id']):
+                    result = await handler(topic, item)
+            except Exception as e:
+                print(f"{stage} failed for article {item['id']} in {topic}: {type(e).__name__}: {e}")
+                result = None
+            if result is None:
+                self.counts[f"{stage}_failed"] += 1
+                await self._finish_article(topic)
+            else:
+                self.counts[f"{stage}_ok"] += 1
+                if next_stage:
+                    await self.queues[next_stage].put((topic, result))
+                else:
+                    await self._finish_article(topic)
+            queue.task_done()
+
+    async def _sample_queues(self):
+        """Record every queue's depth periodically: a full queue sits in front of the bottleneck stage."""
+        metrics = get_metrics()
+        while True:
+            for stage, queue in self.queues.items():
+                depth = queue.qsize()
+                metrics.set_gauge('queue_depth', depth, stage=stage)
+                metrics.observe('queue_depth_samples', depth, buckets=DEPTH_BUCKETS, stage=stage)
+            await asyncio.sleep(QUEUE_SAMPLE_SECONDS)
+
+    async def _fetch(self, topic: str, article: Dict):
+        article['html'] = await self.fetcher.fetch(article['url'])
+        return article
+
+    async def _parse(self, topic: str, article: Dict):
+        loop = asyncio.get_running_loop()
+        article['news_body'] = await loop.run_in_executor(self.parse_pool, parse_html, article['url'], article.pop('html'))
+        if get_seen_index().is_seen_body(topic, article['news_body']):
+            article['summaries'] = None  # persist stores the body without a summary
+        return article
+
+    async def _summarize(self, topic: str, article: Dict):
+        if 'summaries' not in article:
+            article['summaries'] = await summarize_article(self.session, topic, article['id'], article['news_body'],
+                                                          article['url'])
+            if not article['summaries'] or 'error' in article['summaries']:
+                return None
+        return article
+
+    async def _persist(self, topic: str, article: Dict):
+        if 'summaries' in article and article['summaries'] is None:  # near-duplicate body, see _parse
+            await mark_duplicate_body(topic, article['id'], article['news_body'])
+        elif self.summary_mode == 'batch':
+            await queue_summary(topic, article['id'], article['news_body'])
+            get_seen_index().register_body(topic, article['news_body'])
+        else:
+            await update_database(topic, article['id'], article['news_body'], article['summaries'])
+            get_seen_index().register_body(topic, article['news_body'])
+        return article
+
+    async def _watchlist_worker(self):
+        queue = self.queues['watchlist']
+        while True:
+            topic = await queue.get()
+            try:
+                await generate_and_store_watchlist(topic, self.run_date)
+                self.counts['watchlist_ok'] += 1
+            except Exception as e:
+                print(f"Watchlist failed for {topic}: {type(e).__name__}: {e}")
+                self.counts['watchlist_failed'] += 1
+            self.topic_timings[topic] = time.time() - self.topic_started[topic]
+            get_metrics().set_gauge('topic_seconds', self.topic_timings[topic], topic=topic)
+            print(f"Topic {topic} finished in {self.topic_timings[topic]:.1f}s")
+            queue.task_done()
+
+    async def run(self, topics: List[str], run_date: Optional[date] = None):
+        """Run the topics through every stage; their watchlists are for `run_date` (default: today)."""
+        start = time.time()
+        self.run_date = run_date or date.today()
+        self.in_flight = {}
+        self.topic_started = {}
+        self.searched = set()
+        self.queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in ('fetch', 'parse', 'summarize', 'persist')}
+        self.queues['search'] = asyncio.Queue()  # one batch per topic
+        self.queues['watchlist'] = asyncio.Queue()  # one entry per topic at most
+        for topic in topics:
+            self._start_topic(topic)
+
+        preload_parser()
+        if self.summary_mode != 'batch':
+            await asyncio.to_thread(get_preprocessor)  # may learn the boilerplate first, not on the event loop
+        with ProcessPoolExecutor(max_workers=self.concurrency['parse']) as self.parse_pool:
+            async with aiohttp.ClientSession() as self.session:
+                self.fetcher = ArticleFetcher(self.session, max_inflight=self.concurrency['fetch'])
+                self.ingester = GdeltIngester(self.session, self.searcher.get_gdelt_query_string)
+                stages = [
+                    ('fetch', self._fetch, 'parse'),
+                    ('parse', self._parse, 'persist' if self.summary_mode == 'batch' else 'summarize'),
+                    ('summarize', self._summarize, 'persist'),
+                    ('persist', self._persist, None),
+                ]
+                workers = [
+                    asyncio.create_task(self._stage_worker(stage, handler, next_stage))
+                    for stage, handler, next_stage in stages
+                    for _ in range(self.concurrency[stage])
+                ]
+                workers += [asyncio.create_task(self._search_worker()) for _ in range(self.concurrency['search'])]
+                workers += [asyncio.create_task(self._watchlist_worker()) for _ in range(self.concurrency['watchlist'])]
+                workers.append(asyncio.create_task(self._sample_queues()))
+
+                await self._ingest(topics)
+                # Items only move forward, so draining the queues in stage order drains the graph
+                for stage in ('search', 'fetch', 'parse', 'summarize', 'persist', 'watchlist'):
+                    await self.queues[stage].join()
+
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+        elapsed = time.time() - start
+        articles = self.counts['persist_ok']
+        print(f"Pipeline finished {len(topics)} topics in {elapsed:.1f}s, "
+              f"{articles} articles persisted ({articles / elapsed:.2f} articles/s)")
+        print("Stage counts: " + ", ".join(f"{k}={v}" for k, v in sorted(self.counts.items())))
+        for key, value in self.counts.items():
+            stage, outcome = key.rsplit('_', 1)
+            get_metrics().inc('pipeline_items_total', value, stage=stage, outcome=outcome)
+        return self.counts
+
+
+async def run_pipeline(topics: List[str], searcher: GdeltSearcher, concurrency: Optional[Dict[str, int]] = None,
+                       queue_size: int = DEFAULT_QUEUE_SIZE, summary_mode: str = SUMMARY_MODE,
+                       run_date: Optional[date] = None):
+    return await Pipeline(searcher, concurrency, queue_size, summary_mode).run(topics, run_date)
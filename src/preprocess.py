@@ -0,0 +1,346 @@
+"""
+Cut an article body down to what is worth sending to the summariser.
+
+newspaper's text still carries what the publisher puts around every story
+(cookie and newsletter notices, "Read more" and related-story lines, footers),
+and some bodies run to tens of thousands of tokens. Prompt tokens drive both
+the latency and the cost of a summary, so `get_completion` (and the batch
+path) sends `ArticlePreprocessor.prepare(body, topic, url).text` instead of
+the raw body:
+
+1. Boilerplate: paragraphs that recur in many of a domain's stored bodies are
+   learned from the corpus (`learn_boilerplate`, kept in the
+   `boilerplate_paragraphs` table and refreshed every
+   BOILERPLATE_REFRESH_HOURS) and dropped, together with a few notices every
+   site uses (BOILERPLATE_PATTERNS).
+2. Budget: a body still over SUMMARY_INPUT_TOKENS (estimated with
+   token_budget.estimate_tokens, no tokenizer) keeps its lead paragraphs and
+   then the paragraphs that best match the topic's question_string, in their
+   original order.
+
+`stats` counts the tokens going in and out; `record_request` fits the run's
+request latency against prompt size, so `report()` can say how much time the
+saved tokens were worth.
+
+    python src/preprocess.py --learn             # relearn the boilerplate now
+    python src/preprocess.py --preview 500       # savings on the last 500 stored bodies
+"""
+import argparse
+import hashlib
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+# Add the project root to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from src import config
+from src.metrics import get_metrics
+from src.seen_index import canonicalize_url
+from src.token_budget import estimate_tokens, truncate_to_tokens
+from src.topics import get_topic_registry
+
+SUMMARY_PREPROCESS_ENABLED = getattr(config, 'SUMMARY_PREPROCESS_ENABLED', True)
+SUMMARY_INPUT_TOKENS = getattr(config, 'SUMMARY_INPUT_TOKENS', 1200)  # article tokens per summary prompt
+SUMMARY_LEAD_PARAGRAPHS = getattr(config, 'SUMMARY_LEAD_PARAGRAPHS', 2)  # always kept while they fit
+BOILERPLATE_MIN_ARTICLES = getattr(config, 'BOILERPLATE_MIN_ARTICLES', 4)  # a paragraph must recur in this many...
+BOILERPLATE_MIN_SHARE = getattr(config, 'BOILERPLATE_MIN_SHARE', 0.2)  # ...and this share of a domain's articles
+BOILERPLATE_SAMPLE_ARTICLES = getattr(config, 'BOILERPLATE_SAMPLE_ARTICLES', 20000)  # newest bodies learned from
+BOILERPLATE_REFRESH_HOURS = getattr(config, 'BOILERPLATE_REFRESH_HOURS', 24)
+# Part of every summary's LLM cache key (see cache_version): bump it when a change here changes what prepare()
+# returns for the same body, so summaries of the old text are not served for the new one. Relearning the
+# boilerplate does not count; a summary of the same body stays valid.
+PREPROCESS_VERSION = 1
+
+# Notices with the same wording everywhere; only short paragraphs are matched, never story text
+BOILERPLATE_PATTERNS = re.compile(
+    r"^(advertisement|advert|sponsored|read more|read next|related( articles| stories| coverage)?|more on this story|"
+    r"share (this|on)|follow us|sign up|subscribe|newsletter|we use cookies|accept (all )?cookies|"
+    r"click here|watch:|listen:|image (source|caption)|photo:|copyright|©|all rights reserved)\b", re.IGNORECASE)
+BOILERPLATE_PATTERN_MAX_WORDS = 40
+
+_PARAGRAPH = re.compile(r'\s*\n\s*')
+_WORD = re.compile(r'\w+', re.UNICODE)
+_DIGITS = re.compile(r'\d+')
+_SPACE = re.compile(r'\s+')
+STEM_CHARS = 6  # 'ukraine' and 'ukrainian', 'elections' and 'election' share a stem
+QUERY_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the their this to was were what when "
+    "where which who will with about after also been but into more new news not over said says than they".split())
+
+
+class PreparedArticle(NamedTuple):
+    text: str
+    tokens_in: int
+    tokens_out: int
+    boilerplate: int  # paragraphs dropped as boilerplate
+    dropped: int  # paragraphs left out to fit the budget
+
+
+def split_paragraphs(text: str) -> List[str]:
+    return [p for p in _PARAGRAPH.split(text or '') if p]
+
+
+def paragraph_hash(paragraph: str) -> int:
+    """Signed 64-bit hash of a paragraph with case, spacing and numbers (dates, counts) normalised away."""
+    normalised = _DIGITS.sub('0', _SPACE.sub(' ', paragraph.strip().lower()))
+    return int.from_bytes(hashlib.blake2b(normalised.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def domain_of(url: Optional[str]) -> str:
+    return canonicalize_url(url).split('/', 1)[0] if url else ''
+
+
+def stems(text: str) -> List[str]:
+    return [word[:STEM_CHARS] for word in _WORD.findall(text.lower()) if word not in QUERY_STOPWORDS and len(word) > 2]
+
+
+class BoilerplateModel(NamedTuple):
+    paragraphs: Dict[str, FrozenSet[int]]  # domain -> paragraph hashes
+    learned_at: Optional[float]
+
+    def is_boilerplate(self, domain: str, paragraph: str) -> bool:
+        if len(paragraph.split()) <= BOILERPLATE_PATTERN_MAX_WORDS and BOILERPLATE_PATTERNS.match(paragraph):
+            return True
+        hashes = self.paragraphs.get(domain)
+        return bool(hashes) and paragraph_hash(paragraph) in hashes
+
+
+def load_boilerplate(db=None) -> BoilerplateModel:
+    from src.db import get_database
+    db = db or get_database()
+    paragraphs = defaultdict(set)
+    learned_at = None
+    for domain, paragraph, at in db.query("SELECT domain, hash, learned_at FROM boilerplate_paragraphs"):
+        paragraphs[domain].add(paragraph)
+        learned_at = at if learned_at is None else min(learned_at, at)
+    return BoilerplateModel({domain: frozenset(hashes) for domain, hashes in paragraphs.items()}, learned_at)
+
+
+def learn_boilerplate(db=None, limit: int = BOILERPLATE_SAMPLE_ARTICLES, min_articles: int = BOILERPLATE_MIN_ARTICLES,
+                      min_share: float = BOILERPLATE_MIN_SHARE) -> BoilerplateModel:
+    """
+    Count, per domain, the distinct articles among the newest `limit` stored
+    bodies that contain each paragraph, and store the paragraphs found in at
+    least `min_articles` and `min_share` of them as that domain's boilerplate.
+    """
+    from src.body_store import BodyStore
+    from src.db import get_database
+    db = db or get_database()
+    start = time.time()
+    rows = db.query("SELECT id, url FROM articles WHERE body_length IS NOT NULL ORDER BY id DESC LIMIT ?", (limit,))
+    articles = Counter()
+    counts: Dict[str, Counter] = defaultdict(Counter)
+    samples: Dict[Tuple[str, int], str] = {}
+    seen_urls: Set[str] = set()
+    bodies = BodyStore(db)
+    for chunk_start in range(0, len(rows), 500):
+        chunk = rows[chunk_start:chunk_start + 500]
+        texts = bodies.get_many([article_id for article_id, _ in chunk])
+        for article_id, url in chunk:
+            key = canonicalize_url(url)
+            if article_id not in texts or key in seen_urls:  # one story under several topics counts once
+                continue
+            seen_urls.add(key)
+            domain = domain_of(url)
+            articles[domain] += 1
+            hashes = {}
+            for paragraph in split_paragraphs(texts[article_id]):
+                hashes.setdefault(paragraph_hash(paragraph), paragraph)
+            counts[domain].update(hashes.keys())
+            for h, paragraph in hashes.items():
+                if counts[domain][h] == min_articles:  # only candidates keep a sample
+                    samples[domain, h] = paragraph[:200]
+
+    now = time.time()
+    learned = [(domain, h, n, samples[domain, h], now)
+               for domain, counter in counts.items() for h, n in counter.items()
+               if n >= min_articles and n >= min_share * articles[domain]]
+    db.execute("DELETE FROM boilerplate_paragraphs")
+    db.executemany("INSERT INTO boilerplate_paragraphs (domain, hash, articles, sample, learned_at) VALUES (?, ?, ?, ?, ?)",
+                   learned)
+    print(f"Learned {len(learned)} boilerplate paragraphs across {len({row[0] for row in learned})} of "
+          f"{len(articles)} domains from {sum(articles.values())} articles in {time.time() - start:.1f}s")
+    paragraphs = defaultdict(set)
+    for domain, h, *_ in learned:
+        paragraphs[domain].add(h)
+    return BoilerplateModel({domain: frozenset(hashes) for domain, hashes in paragraphs.items()}, now)
+
+
+class ArticlePreprocessor:
+    """Strips boilerplate and fits bodies into `budget_tokens`; safe to share between threads."""
+
+    def __init__(self, boilerplate: Optional[BoilerplateModel] = None, budget_tokens: int = SUMMARY_INPUT_TOKENS,
+                 lead_paragraphs: int = SUMMARY_LEAD_PARAGRAPHS, enabled: bool = SUMMARY_PREPROCESS_ENABLED):
+        self.boilerplate = boilerplate or BoilerplateModel({}, None)
+        self.budget_tokens = budget_tokens
+        self.lead_paragraphs = lead_paragraphs
+        self.enabled = enabled
+        self._queries: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.stats = {'articles': 0, 'tokens_in': 0, 'tokens_out': 0, 'boilerplate': 0, 'trimmed': 0, 'seconds': 0.0}
+        self._requests: List[Tuple[int, float]] = []  # (prompt tokens, seconds) of this run's summary requests
+
+    @property
+    def cache_version(self) -> str:
+        """What, besides the raw body, decides the prepared text: the code's version and the budget settings."""
+        if not self.enabled:
+            return 'off'
+        return f"{PREPROCESS_VERSION}:{self.budget_tokens}:{self.lead_paragraphs}"
+
+    def query_terms(self, topic: str) -> Set[str]:
+        if topic not in self._queries:
+            t = get_topic_registry().get(topic)
+            self._queries[topic] = set(stems(f"{t.question_string} {t.topic_name or ''}"))
+        return self._queries[topic]
+
+    def select_passages(self, paragraphs: Sequence[str], terms: Set[str], budget: int) -> List[int]:
+        """Indexes of the paragraphs to keep: the lead, then the best matches for `terms` (BM25) that fit."""
+        costs = [estimate_tokens(p) + 1 for p in paragraphs]  # +1 for the blank line between paragraphs
+        keep, used = set(), 0
+        for i in range(min(self.lead_paragraphs, len(paragraphs))):
+            if used + costs[i] > budget:
+                break
+            keep.add(i)
+            used += costs[i]
+
+        tokenized = [stems(p) for p in paragraphs]
+        average = sum(map(len, tokenized)) / max(len(tokenized), 1) or 1
+        df = Counter(term for words in tokenized for term in set(words) & terms)
+
+        def score(i: int) -> float:
+            tf = Counter(word for word in tokenized[i] if word in terms)
+            norm = 1.2 * (0.25 + 0.75 * len(tokenized[i]) / average)
+            return sum(math.log(1 + (len(paragraphs) - df[t] + 0.5) / (df[t] + 0.5)) * n * 2.2 / (n + norm)
+                       for t, n in tf.items())
+
+        # Ties (nothing matches) fall back to document order
+        for i in sorted(set(range(len(paragraphs))) - keep, key=lambda i: (-score(i), i)):
+            if used + costs[i] <= budget:
+                keep.add(i)
+                used += costs[i]
+        return sorted(keep)
+
+    def prepare(self, text: str, topic: str, url: Optional[str] = None) -> PreparedArticle:
+        start = time.perf_counter()
+        tokens_in = estimate_tokens(text)
+        prepared, boilerplate, dropped = text, 0, 0
+        if self.enabled:
+            prepared, boilerplate, dropped = self._prepare(text, topic, url)
+        tokens_out = estimate_tokens(prepared)
+        with self._lock:
+            self.stats['articles'] += 1
+            self.stats['tokens_in'] += tokens_in
+            self.stats['tokens_out'] += tokens_out
+            self.stats['boilerplate'] += boilerplate
+            self.stats['trimmed'] += tokens_out < tokens_in and (dropped > 0 or tokens_out >= self.budget_tokens)
+            self.stats['seconds'] += time.perf_counter() - start
+        metrics = get_metrics()
+        metrics.inc('summary_input_tokens_total', tokens_in, stage='raw')
+        metrics.inc('summary_input_tokens_total', tokens_out, stage='prepared')
+        metrics.inc('boilerplate_paragraphs_total', boilerplate)
+        return PreparedArticle(prepared, tokens_in, tokens_out, boilerplate, dropped)
+
+    def _prepare(self, text: str, topic: str, url: Optional[str]) -> Tuple[str, int, int]:
+        domain = domain_of(url)
+        paragraphs = split_paragraphs(text)
+        kept = [p for p in paragraphs if not self.boilerplate.is_boilerplate(domain, p)] or paragraphs
+        boilerplate = len(paragraphs) - len(kept)
+        dropped = 0
+        prepared = "\n\n".join(kept)
+        if estimate_tokens(prepared) > self.budget_tokens:
+            selected = self.select_passages(kept, self.query_terms(topic), self.budget_tokens)
+            dropped = len(kept) - len(selected)
+            # A lead paragraph longer than the whole budget is cut rather than lost
+            prepared = "\n\n".join(kept[i] for i in selected) if selected else truncate_to_tokens(kept[0], self.budget_tokens)
+        return prepared, boilerplate, dropped
+
+    def record_request(self, prompt_tokens: int, seconds: float):
+        """One summary request as it went to the API (cache hits excluded)."""
+        with self._lock:
+            self._requests.append((prompt_tokens, seconds))
+
+    def seconds_per_1k_tokens(self) -> Optional[float]:
+        """Slope of this run's request latency against prompt size (least squares), if it can be told apart."""
+        with self._lock:
+            requests = list(self._requests)
+        if len(requests) < 10:
+            return None
+        mean_tokens = sum(t for t, _ in requests) / len(requests)
+        mean_seconds = sum(s for _, s in requests) / len(requests)
+        spread = sum((t - mean_tokens) ** 2 for t, _ in requests)
+        if spread == 0:
+            return None
+        slope = sum((t - mean_tokens) * (s - mean_seconds) for t, s in requests) / spread
+        return max(slope, 0.0) * 1000
+
+    def report(self) -> str:
+        s = self.stats
+        saved = s['tokens_in'] - s['tokens_out']
+        line = (f"Pre-processing: {s['articles']} articles, {s['tokens_in']} -> {s['tokens_out']} estimated tokens "
+                f"({saved / max(s['tokens_in'], 1):.0%} saved), {s['boilerplate']} boilerplate paragraphs dropped, "
+                f"{s['trimmed']} articles cut to {self.budget_tokens} tokens, "
+                f"{1000 * s['seconds'] / max(s['articles'], 1):.2f} ms per article")
+        rate = self.seconds_per_1k_tokens()
+        if rate is not None and s['articles']:
+            line += (f"; at this run's {rate:.2f} s per 1k prompt tokens, about "
+                     f"{rate * saved / 1000 / s['articles']:.2f} s less per summary request")
+        return line
+
+
+_preprocessor = None
+
+
+def get_preprocessor() -> ArticlePreprocessor:
+    """
+    Process-wide ArticlePreprocessor over the learned boilerplate, which is
+    learned again first when it is older than BOILERPLATE_REFRESH_HOURS.
+    """
+    global _preprocessor
+    if _preprocessor is None:
+        boilerplate = None
+        if SUMMARY_PREPROCESS_ENABLED:
+            boilerplate = load_boilerplate()
+            if boilerplate.learned_at is None or time.time() - boilerplate.learned_at > BOILERPLATE_REFRESH_HOURS * 3600:
+                boilerplate = learn_boilerplate()
+        _preprocessor = ArticlePreprocessor(boilerplate)
+    return _preprocessor
+
+
+def preview(limit: int, db=None):
+    """What pre-processing would have made of the newest `limit` stored bodies."""
+    from src.body_store import BodyStore
+    from src.db import get_database
+    db = db or get_database()
+    preprocessor = ArticlePreprocessor(load_boilerplate(db))
+    rows = db.query("SELECT id, topic, url FROM articles WHERE body_length IS NOT NULL ORDER BY id DESC LIMIT ?", (limit,))
+    bodies = BodyStore(db).get_many([article_id for article_id, _, _ in rows])
+    for article_id, topic, url in rows:
+        if article_id in bodies and topic in get_topic_registry():
+            preprocessor.prepare(bodies[article_id], topic, url)
+    print(preprocessor.report())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Learn per-domain boilerplate and preview summary pre-processing.")
+    parser.add_argument("--learn", action="store_true", help="learn the boilerplate from the stored bodies now")
+    parser.add_argument("--limit", type=int, default=BOILERPLATE_SAMPLE_ARTICLES, help="newest bodies to learn from")
+    parser.add_argument("--preview", type=int, metavar="N", help="report the savings on the newest N stored bodies")
+    args = parser.parse_args(argv)
+    if args.learn:
+        learn_boilerplate(limit=args.limit)
+    if args.preview:
+        preview(args.preview)
+    if not (args.learn or args.preview):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Rebuild article bodies from the raw HTML store (src/html_store.py), without downloading anything.
+
+    python src/reparse.py --from 2026-10-01 --to 2026-10-07
+    python src/reparse.py --from 2026-10-01 --topics UK NATO --workers 8
+
+Every scraped article added in the date range (both ends included) whose page
+is in the store is parsed again in a process pool, and its stored body and
+body_length are replaced where the text came out different. Summaries are
+left as they are. Articles whose page was never stored count as missing, and
+a page that no longer parses, or parses to nothing, keeps its old body.
+Articles still waiting to be scraped are left to the scraper, which finds
+their pages in the store as well.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Add the project root to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from src.body_store import BodyStore
+from src.db import Database, get_database
+from src.html_store import HTML_STORE_DIR, HtmlStore, decode_html, get_html_store, read_blob
+from src.initialize_db import get_db_path, init_db
+from src.metrics import get_metrics
+from src.ScrapeNews import PARSE_WORKERS, ParseError, parse_html, preload_parser
+
+BATCH_SIZE = 200
+
+
+def reparse_page(job: Tuple[int, str, str, str]) -> Tuple[int, Optional[str], int]:
+    """
+    (article_id, text or None when the page does not parse, HTML bytes read) for
+    one (article_id, url, blob path, charset). Runs in the process pool.
+    """
+    article_id, url, path, encoding = job
+    html = read_blob(path)
+    try:
+        return article_id, parse_html(url, decode_html(html, encoding)) or None, len(html)
+    except ParseError:
+        return article_id, None, len(html)
+
+
+def select_articles(db: Database, start: str, end: str, topics: Optional[Sequence[str]] = None) -> List[Tuple[int, str]]:
+    sql = "SELECT id, url FROM articles WHERE body_length IS NOT NULL AND date_added BETWEEN ? AND ?"
+    params = [start, end]
+    if topics:
+        sql += f" AND topic IN ({', '.join('?' * len(topics))})"
+        params += list(topics)
+    return db.query(sql + " ORDER BY id", params)
+
+
+def write_changed(db: Database, bodies: BodyStore, results: List[Tuple[int, str]]) -> int:
+    """Store the bodies that differ from the current ones; unchanged rows are not rewritten (or re-indexed)."""
+    current = bodies.get_many([article_id for article_id, _ in results])
+    changed = [(article_id, text) for article_id, text in results if current.get(article_id) != text]
+    if changed:
+        bodies.put_many(changed)
+        db.executemany("UPDATE articles SET body_length = ? WHERE id = ?", [(len(text), article_id) for article_id, text in changed])
+    return len(changed)
+
+
+def reparse(start: str, end: str, topics: Optional[Sequence[str]] = None, workers: int = PARSE_WORKERS,
+            db: Optional[Database] = None, store: Optional[HtmlStore] = None, batch_size: int = BATCH_SIZE) -> Dict:
+    db = db or get_database()
+    store = store or get_html_store()
+    bodies = BodyStore(db)
+    rows = select_articles(db, start, end, topics)
+    jobs = []
+    for article_id, url in rows:
+        page = store.lookup(url)
+        if page is not None and os.path.exists(store.blob_path(page.sha256)):
+            jobs.append((article_id, url, store.blob_path(page.sha256), page.encoding))
+    report = {'articles': len(rows), 'missing': len(rows) - len(jobs), 'reparsed': 0, 'failed': 0, 'changed': 0,
+              'html_bytes': 0}
+
+    started = time.perf_counter()
+    with get_metrics().span('reparse', articles=len(jobs)) as span:
+        if jobs:
+            preload_parser()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                batch = []
+                chunksize = max(1, min(64, len(jobs) // (workers * 4)))
+                for article_id, text, size in pool.map(reparse_page, jobs, chunksize=chunksize):
+                    report['html_bytes'] += size
+                    if text is None:
+                        report['failed'] += 1
+                        continue
+                    report['reparsed'] += 1
+                    batch.append((article_id, text))
+                    if len(batch) >= batch_size:
+                        report['changed'] += write_changed(db, bodies, batch)
+                        batch = []
+                if batch:
+                    report['changed'] += write_changed(db, bodies, batch)
+        span['changed'] = report['changed']
+    report['seconds'] = time.perf_counter() - started
+
+    rate = len(jobs) / report['seconds'] if jobs else 0.0
+    print(f"Reparsed {report['reparsed']}/{report['articles']} articles added {start} to {end}: "
+          f"{report['changed']} bodies changed, {report['missing']} pages not in the HTML store, "
+          f"{report['failed']} did not parse")
+    print(f"{report['seconds']:.1f}s, {rate:.1f} articles/s, "
+          f"{report['html_bytes'] / 1e6 / max(report['seconds'], 1e-9):.1f} MB of HTML/s")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-extract article bodies from the raw HTML store.")
+    parser.add_argument("--from", dest="start", required=True, help="first date_added to reparse (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", default=date.today().isoformat(), help="last date_added (default: today)")
+    parser.add_argument("--topics", nargs="+", help="only these topics (default: all)")
+    parser.add_argument("--workers", type=int, default=PARSE_WORKERS)
+    parser.add_argument("--db", default=get_db_path(), help="database file (default: src/sensusmundi.db)")
+    parser.add_argument("--store", default=HTML_STORE_DIR, help="HTML store directory (default: src/html_store)")
+    args = parser.parse_args()
+    init_db(args.db)
+    db = Database(args.db)
+    reparse(args.start, args.end, args.topics, args.workers, db, HtmlStore(args.store))
+    db.close()
@@ -0,0 +1,201 @@
+import re
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional
+
+from src import config
+
+if TYPE_CHECKING:
+    import numpy as np  # imported by the local rerankers when they first score, not by every importer
+
+RERANK_BACKEND = getattr(config, 'RERANK_BACKEND', 'hybrid')
+RERANK_PREFILTER_K = getattr(config, 'RERANK_PREFILTER_K', 50)
+COHERE_RERANK_MODEL = getattr(config, 'COHERE_RERANK_MODEL', 'rerank-multilingual-v3.0')
+COHERE_BASE_URL = getattr(config, 'COHERE_BASE_URL', None)  # None = Cohere's production API
+
+RERANK_BACKENDS = ('cohere', 'bm25', 'tfidf', 'hybrid')
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class RerankResult(NamedTuple):
+    index: int  # position in the documents passed to rerank()
+    relevance_score: float
+
+
+class RerankResponse(NamedTuple):
+    """Same shape as Cohere's rerank response: `.results[i].index` / `.results[i].relevance_score`, best first."""
+    results: List[RerankResult]
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall((text or '').lower())
+
+
+class Reranker(ABC):
+    """Ranks documents against a query, best first."""
+
+    name = 'base'
+
+    @abstractmethod
+    def rerank(self, query: str, documents: List[str], top_n: Optional[int] = None) -> RerankResponse:
+        """The best `top_n` documents (all without it); `.results[i].index` refers to `documents`."""
+
+
+class LocalReranker(Reranker):
+    """Ranks in-process by a score per document; subclasses implement `scores`."""
+
+    @abstractmethod
+    def scores(self, query: str, documents: List[str]) -> 'np.ndarray':
+        """One score per document, higher is better."""
+
+    def rerank(self, query: str, documents: List[str], top_n: Optional[int] = None) -> RerankResponse:
+        if not documents:
+            return RerankResponse([])
+        import numpy as np
+        scores = self.scores(query, documents)
+        # Stable sort so equal scores keep their original order
+        order = np.argsort(-scores, kind='stable')[:top_n or len(documents)]
+        return RerankResponse([RerankResult(int(i), float(scores[i])) for i in order])
+
+
+class BM25Reranker(LocalReranker):
+    """
+    Okapi BM25 over the documents themselves, vectorized with NumPy: one
+    (documents x query terms) term-frequency matrix, no Python loop per pair.
+    Scores are divided by the best score any document could get for this
+    query, so they fall in [0, 1] like Cohere's.
+    """
+
+    name = 'bm25'
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+    def scores(self, query: str, documents: List[str]) -> 'np.ndarray':
+        import numpy as np
+        query_terms = {term: i for i, term in enumerate(dict.fromkeys(tokenize(query)))}
+        tokenized = [tokenize(doc) for doc in documents]
+        lengths = np.array([len(tokens) for tokens in tokenized], dtype=float)
+        if not query_terms or not lengths.any():
+            return np.zeros(len(documents))
+
+        doc_ids, term_ids = [], []
+        for doc_id, tokens in enumerate(tokenized):
+            for token in tokens:
+                term_id = query_terms.get(token)
+                if term_id is not None:
+                    doc_ids.append(doc_id)
+                    term_ids.append(term_id)
+        tf = np.zeros((len(documents), len(query_terms)))
+        np.add.at(tf, (np.array(doc_ids, dtype=int), np.array(term_ids, dtype=int)), 1)
+
+        n = len(documents)
+        df = (tf > 0).sum(axis=0)
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * lengths / lengths.mean())
+        weights = tf * (self.k1 + 1) / (tf + norm[:, None])
+        return weights @ idf / ((self.k1 + 1) * idf.sum())
+
+
+class TfidfReranker(LocalReranker):
+    """Cosine similarity between log-scaled, smoothed TF-IDF vectors of the query and each document."""
+
+    name = 'tfidf'
+
+    def scores(self, query: str, documents: List[str]) -> 'np.ndarray':
+        import numpy as np
+        tokenized = [tokenize(doc) for doc in documents]
+        vocabulary: Dict[str, int] = {}
+        for tokens in tokenized:
+            for token in tokens:
+                vocabulary.setdefault(token, len(vocabulary))
+        if not vocabulary:
+            return np.zeros(len(documents))
+
+        doc_ids = [doc_id for doc_id, tokens in enumerate(tokenized) for _ in tokens]
+        term_ids = [vocabulary[token] for tokens in tokenized for token in tokens]
+        tf = np.zeros((len(documents), len(vocabulary)))
+        np.add.at(tf, (np.array(doc_ids, dtype=int), np.array(term_ids, dtype=int)), 1)
+
+        df = (tf > 0).sum(axis=0)
+        idf = np.log((1 + len(documents)) / (1 + df)) + 1
+        matrix = np.log1p(tf) * idf
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+        query_vector = np.zeros(len(vocabulary))
+        for token in tokenize(query):
+            if token in vocabulary:
+                query_vector[vocabulary[token]] += 1
+        query_vector = np.log1p(query_vector) * idf
+        norm = np.linalg.norm(query_vector)
+        if norm == 0:
+            return np.zeros(len(documents))
+        return matrix @ (query_vector / norm)
+
+
+class CohereReranker(Reranker):
+    """Cohere's hosted rerank endpoint."""
+
+    name = 'cohere'
+
+    def __init__(self, client, model: str = COHERE_RERANK_MODEL):
+        self.client = client
+        self.model = model
+
+    def rerank(self, query: str, documents: List[str], top_n: Optional[int] = None) -> RerankResponse:
+        # Cohere rejects empty documents; send the rest and map indices back
+        kept = [i for i, doc in enumerate(documents) if doc.strip()]
+        if not kept:
+            return RerankResponse([])
+        response = self.client.rerank(
+            model=self.model,
+            query=query,
+            documents=[documents[i] for i in kept],
+            top_n=min(len(kept), top_n or len(kept)),
+        )
+        return RerankResponse([RerankResult(kept[r.index], r.relevance_score) for r in response.results])
+
+
+class HybridReranker(Reranker):
+    """
+    Ranks everything locally, then sends only the best `prefilter_k` documents
+    to the remote reranker. If the remote call fails the local order is used,
+    so a slow or unavailable Cohere no longer fails the search.
+    """
+
+    name = 'hybrid'
+
+    def __init__(self, local: LocalReranker, remote: Reranker, prefilter_k: int = RERANK_PREFILTER_K):
+        self.local = local
+        self.remote = remote
+        self.prefilter_k = prefilter_k
+
+    def rerank(self, query: str, documents: List[str], top_n: Optional[int] = None) -> RerankResponse:
+        shortlist = self.local.rerank(query, documents, max(self.prefilter_k, top_n or 0))
+        candidates = [r.index for r in shortlist.results]
+        try:
+            response = self.remote.rerank(query, [documents[i] for i in candidates], top_n)
+        except Exception as e:
+            print(f"Remote rerank failed ({type(e).__name__}: {e}), using the local ranking")
+            return RerankResponse(shortlist.results[:top_n or len(candidates)])
+        return RerankResponse([RerankResult(candidates[r.index], r.relevance_score) for r in response.results])
+
+
+def get_reranker(backend: str = RERANK_BACKEND, cohere_client=None) -> Reranker:
+    if backend == 'bm25':
+        return BM25Reranker()
+    if backend == 'tfidf':
+        return TfidfReranker()
+    if backend == 'cohere':
+        return CohereReranker(cohere_client)
+    if backend == 'hybrid':
+        return HybridReranker(BM25Reranker(), CohereReranker(cohere_client))
+    raise ValueError(f"Unknown rerank backend '{backend}', expected one of {RERANK_BACKENDS}")
+
+
+def ranking_overlap(a: RerankResponse, b: RerankResponse, k: int = 20) -> float:
+    """Fraction of the top-k documents two rankings have in common."""
+    top_a = {r.index for r in a.results[:k]}
+    top_b = {r.index for r in b.results[:k]}
+    return len(top_a & top_b) / max(min(k, len(top_a), len(top_b)), 1)
+
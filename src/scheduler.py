@@ -0,0 +1,738 @@
+"""
+Poll every topic on a cadence that follows its news volume, as one long-running process.
+
+    python src/scheduler.py                                   # run until stopped
+    python src/scheduler.py --topics UK NATO --max-concurrent 1
+    python src/scheduler.py --status                          # decisions and queue of the running scheduler
+    python src/scheduler.py --simulate 72                     # three synthetic days, no network
+
+daily_run.py treats every topic alike: one search a day, the query's
+maxrecords and the top 20 reranked articles. Quiet topics spend GDELT calls
+and summaries on leftovers while a breaking story is cut at 20. The scheduler
+keeps, per topic,
+
+- arrival rate:    new GDELT articles per hour, averaged over its polls; it
+                   rises quickly (SCHEDULER_RISE_HALF_LIFE_HOURS) and decays
+                   slowly (SCHEDULER_DECAY_HALF_LIFE_HOURS), so a burst is
+                   followed at once and a lull is not taken for the end of it
+- duplicate ratio: the share of those dropped as near duplicates or as
+                   already seen in earlier runs
+
+and after every poll replans all topics:
+
+- interval:   long enough to find SCHEDULER_TARGET_ARTICLES new, non-duplicate
+              articles, between SCHEDULER_MIN_INTERVAL_MINUTES and
+              SCHEDULER_MAX_INTERVAL_HOURS
+- maxrecords: the articles expected in that interval with headroom, 25 to 250
+              (the DOC API's limit), 250 after a window was truncated
+- top_n:      SCHEDULER_SELECT_SHARE of the new articles expected per poll,
+              between SCHEDULER_MIN_SELECT and SCHEDULER_MAX_SELECT
+
+The plan is then fitted to two global budgets: SCHEDULER_MAX_POLLS_PER_HOUR
+(intervals are stretched) and SCHEDULER_MAX_SUMMARIES_PER_HOUR, the LLM
+spend (top_n is cut, then intervals are stretched). At most
+SCHEDULER_MAX_CONCURRENT topics poll at once; due topics queue in order of
+the new articles they are expected to have waiting.
+
+A poll is daily_run.search_topic with the topic's maxrecords and top_n, then
+the scrape with per-article summaries; the first poll of a topic after
+SCHEDULER_WATCHLIST_HOUR (UTC) each day also generates its watchlist. What
+was learned is kept in `topic_schedule`, so a restarted scheduler carries
+on; a topic without it starts from its stored articles of the last week and
+is polled at once.
+
+Every decision is printed and kept; the scheduler writes them, the queue and
+every topic's plan to SCHEDULER_STATUS_PATH (JSON, read by --status) and
+sets the scheduler_* gauges of the run metrics, whose report it rewrites in
+METRICS_DIR every SCHEDULER_METRICS_MINUTES. `simulate` runs the same
+scheduler against SyntheticNews on a simulated clock.
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter, deque
+from datetime import date, datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# Add the project root to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from src import config
+from src.db import Database, get_database
+from src.gdelt_ingest import GDELT_MAX_LOOKBACK_HOURS, GDELT_MIN_WINDOW_MINUTES, parse_seendate, parse_timespan, query_param
+from src.metrics import METRICS_DIR, get_metrics
+from src.topics import get_topic_registry
+
+SCHEDULER_MIN_INTERVAL_MINUTES = getattr(config, 'SCHEDULER_MIN_INTERVAL_MINUTES', 15)
+SCHEDULER_MAX_INTERVAL_HOURS = getattr(config, 'SCHEDULER_MAX_INTERVAL_HOURS', 12)
+SCHEDULER_TARGET_ARTICLES = getattr(config, 'SCHEDULER_TARGET_ARTICLES', 40)  # new, non-duplicate articles per poll
+SCHEDULER_SELECT_SHARE = getattr(config, 'SCHEDULER_SELECT_SHARE', 0.3)  # of those, the share scraped and summarised
+SCHEDULER_MIN_SELECT = getattr(config, 'SCHEDULER_MIN_SELECT', 3)
+SCHEDULER_MAX_SELECT = getattr(config, 'SCHEDULER_MAX_SELECT', 60)
+SCHEDULER_MAX_CONCURRENT = getattr(config, 'SCHEDULER_MAX_CONCURRENT', 2)
+SCHEDULER_MAX_POLLS_PER_HOUR = getattr(config, 'SCHEDULER_MAX_POLLS_PER_HOUR', 30)
+SCHEDULER_MAX_SUMMARIES_PER_HOUR = getattr(config, 'SCHEDULER_MAX_SUMMARIES_PER_HOUR', 200)
+SCHEDULER_RISE_HALF_LIFE_HOURS = getattr(config, 'SCHEDULER_RISE_HALF_LIFE_HOURS', 1.0)
+SCHEDULER_DECAY_HALF_LIFE_HOURS = getattr(config, 'SCHEDULER_DECAY_HALF_LIFE_HOURS', 6.0)
+SCHEDULER_WATCHLIST_HOUR = getattr(config, 'SCHEDULER_WATCHLIST_HOUR', 18)  # UTC
+SCHEDULER_STATUS_PATH = getattr(config, 'SCHEDULER_STATUS_PATH', os.path.join(METRICS_DIR, 'scheduler.json'))
+SCHEDULER_METRICS_MINUTES = getattr(config, 'SCHEDULER_METRICS_MINUTES', 5)  # how often the metrics report is rewritten
+
+MAXRECORDS_MIN = 25
+MAXRECORDS_MAX = 250  # the DOC API returns at most 250 articles per request
+MAXRECORDS_HEADROOM = 1.5
+SEED_DAYS = 7
+DECISIONS_KEPT = 200
+
+
+class TopicPlan(NamedTuple):
+    interval: float  # seconds from the start of one poll to the next
+    maxrecords: int
+    top_n: int
+    reasons: Tuple[str, ...] = ()
+
+
+class PollResult(NamedTuple):
+    ingested: int  # new articles from GDELT
+    received: int  # of those, given to the search
+    candidates: int  # left after near duplicates and articles seen in earlier runs
+    selected: int  # stored for scraping and summaries
+    requests: int = 1
+    truncated: int = 0
+    window: Optional[float] = None  # seconds of news the poll covered; None: since the last poll started
+    watchlist_date: Optional[str] = None  # generated with this poll
+
+
+class TopicState:
+    __slots__ = ('topic', 'rate', 'duplicates', 'last_polled', 'next_due', 'polls', 'failures', 'truncated',
+                 'watchlist_date', 'plan', 'last')
+
+    def __init__(self, topic: str, rate: float = 0.0, duplicates: float = 0.0, last_polled: Optional[float] = None,
+                 next_due: float = 0.0, polls: int = 0, failures: int = 0, truncated: bool = False,
+                 watchlist_date: Optional[str] = None):
+        self.topic = topic
+        self.rate = rate  # articles per hour
+        self.duplicates = duplicates
+        self.last_polled = last_polled  # when the last successful poll started
+        self.next_due = next_due
+        self.polls = polls
+        self.failures = failures  # in a row
+        self.truncated = truncated
+        self.watchlist_date = watchlist_date
+        self.plan: Optional[TopicPlan] = None
+        self.last: Optional[PollResult] = None
+
+    @property
+    def fresh_rate(self) -> float:
+        """New, non-duplicate articles per hour."""
+        return self.rate * (1 - self.duplicates)
+
+
+def _minutes(seconds: float) -> str:
+    if seconds >= 5400:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / 60:.0f}min"
+
+
+def _ewma(old: float, new: float, hours: float, half_life: float) -> float:
+    """`old` moved towards `new` by as much as `hours` of decay at `half_life` allow."""
+    weight = 1 - 0.5 ** (hours / half_life)
+    return old + weight * (new - old)
+
+
+class Scheduler:
+    """
+    The scheduling decisions, apart from the polls themselves: `claim` hands out
+    the topics to poll now, `finish` takes their results, `next_wake` says
+    when to ask again. Every method takes the time, so the same object runs
+    on the wall clock (run_scheduler) and on a simulated one (simulate).
+    With `db`, what is learned is stored in `topic_schedule`. `fixed` plans
+    every topic alike, as daily_run.py does, for comparisons.
+    """
+
+    def __init__(self, topics: Sequence[str], db: Optional[Database] = None, clock: Callable[[], float] = time.time,
+                 max_concurrent: int = SCHEDULER_MAX_CONCURRENT,
+                 min_interval: float = SCHEDULER_MIN_INTERVAL_MINUTES * 60,
+                 max_interval: float = SCHEDULER_MAX_INTERVAL_HOURS * 3600,
+                 target_articles: float = SCHEDULER_TARGET_ARTICLES, select_share: float = SCHEDULER_SELECT_SHARE,
+                 min_select: int = SCHEDULER_MIN_SELECT, max_select: int = SCHEDULER_MAX_SELECT,
+                 max_polls_per_hour: float = SCHEDULER_MAX_POLLS_PER_HOUR,
+                 max_summaries_per_hour: float = SCHEDULER_MAX_SUMMARIES_PER_HOUR,
+                 watchlist_hour: Optional[int] = SCHEDULER_WATCHLIST_HOUR, fixed: Optional[TopicPlan] = None):
+        self.db = db
+        self.clock = clock
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_articles = target_articles
+        self.select_share = select_share
+        self.min_select = min_select
+        self.max_select = max_select
+        self.max_polls_per_hour = max_polls_per_hour
+        self.max_summaries_per_hour = max_summaries_per_hour
+        self.watchlist_hour = watchlist_hour
+        self.fixed = fixed
+        self.running: Dict[str, float] = {}  # topic -> when its poll started
+        self.decisions = deque(maxlen=DECISIONS_KEPT)
+        now = clock()
+        self.states = {topic: TopicState(topic, next_due=now) for topic in topics}
+        if db is not None:
+            self.load(now)
+        self.replan(now)
+
+    # --- state -----------------------------------------------------------------
+
+    def load(self, now: float):
+        """Take up the stored state; topics without any start from their articles of the last week."""
+        topics = list(self.states)
+        marks = ','.join('?' * len(topics))
+        rows = self.db.query(f'''
+        SELECT topic, arrival_rate, duplicate_ratio, last_polled, next_due, polls, failures, truncated, watchlist_date
+        FROM topic_schedule WHERE topic IN ({marks})
+        ''', topics)
+        for topic, rate, duplicates, last_polled, next_due, polls, failures, truncated, watchlist_date in rows:
+            self.states[topic] = TopicState(topic, rate, duplicates, last_polled, next_due, polls, failures,
+                                            bool(truncated), watchlist_date)
+        unseen = [topic for topic in topics if self.states[topic].polls == 0]
+        if unseen:
+            # Only the articles search kept were stored, so this is a lower bound the first polls correct
+            counts = dict(self.db.query(f'''
+            SELECT topic, COUNT(*) FROM articles
+            WHERE topic IN ({','.join('?' * len(unseen))}) AND date_added >= date('now', ?)
+            GROUP BY topic
+            ''', unseen + [f'-{SEED_DAYS} days']))
+            for topic in unseen:
+                self.states[topic].rate = counts.get(topic, 0) / (SEED_DAYS * 24)
+                self.states[topic].next_due = now
+
+    def save(self, state: TopicState, now: float):
+        if self.db is None:
+            return
+        self.db.execute('''
+        INSERT OR REPLACE INTO topic_schedule (topic, arrival_rate, duplicate_ratio, last_polled, next_due, polls,
+                                               failures, truncated, watchlist_date, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (state.topic, state.rate, state.duplicates, state.last_polled, state.next_due, state.polls,
+              state.failures, int(state.truncated), state.watchlist_date, now))
+
+    # --- planning --------------------------------------------------------------
+
+    def replan(self, now: float) -> Dict[str, TopicPlan]:
+        """Plan every topic from what is known now and move the waiting ones' next poll to match."""
+        plans = {topic: self.fixed for topic in self.states} if self.fixed else self._plan()
+        metrics = get_metrics()
+        for topic, plan in plans.items():
+            state = self.states[topic]
+            state.plan = plan
+            if state.last_polled is not None and not state.failures and topic not in self.running:
+                state.next_due = state.last_polled + plan.interval
+            metrics.set_gauge('scheduler_interval_seconds', plan.interval, topic=topic)
+            metrics.set_gauge('scheduler_maxrecords', plan.maxrecords, topic=topic)
+            metrics.set_gauge('scheduler_top_n', plan.top_n, topic=topic)
+            metrics.set_gauge('scheduler_arrival_rate', state.rate, topic=topic)
+        return plans
+
+    def _plan(self) -> Dict[str, TopicPlan]:
+        reasons = {topic: [] for topic in self.states}
+        intervals = {}
+        for topic, state in self.states.items():
+            fresh = state.fresh_rate
+            interval = self.target_articles / fresh * 3600 if fresh > 0 else self.max_interval
+            if interval <= self.min_interval:
+                reasons[topic].append('busy')
+            elif interval >= self.max_interval:
+                reasons[topic].append('quiet')
+            intervals[topic] = min(max(interval, self.min_interval), self.max_interval)
+
+        for topic in self._fit(intervals, dict.fromkeys(intervals, 1), self.max_polls_per_hour):
+            reasons[topic].append('poll budget')
+
+        def top_n(topic):
+            expected = self.states[topic].fresh_rate * intervals[topic] / 3600
+            return min(max(math.ceil(expected * self.select_share), self.min_select), self.max_select)
+
+        selects = {topic: top_n(topic) for topic in intervals}
+        summaries = sum(selects[topic] * 3600 / intervals[topic] for topic in intervals)
+        if summaries > self.max_summaries_per_hour:
+            share = self.max_summaries_per_hour / summaries
+            for topic in selects:
+                cut = max(int(selects[topic] * share), self.min_select)
+                if cut < selects[topic]:
+                    selects[topic] = cut
+                    reasons[topic].append('summary budget')
+            for topic in self._fit(intervals, selects, self.max_summaries_per_hour):
+                if 'summary budget' not in reasons[topic]:
+                    reasons[topic].append('summary budget')
+
+        plans = {}
+        for topic, state in self.states.items():
+            expected = state.rate * intervals[topic] / 3600 * MAXRECORDS_HEADROOM
+            maxrecords = min(max(math.ceil(expected / MAXRECORDS_MIN) * MAXRECORDS_MIN, MAXRECORDS_MIN), MAXRECORDS_MAX)
+            if state.truncated:
+                maxrecords = MAXRECORDS_MAX
+                reasons[topic].append('truncated')
+            plans[topic] = TopicPlan(intervals[topic], maxrecords, selects[topic], tuple(reasons[topic]))
+        return plans
+
+    def _fit(self, intervals: Dict[str, float], cost: Dict[str, float], budget: float) -> List[str]:
+        """
+        Stretch `intervals` (in place) until sum(cost / interval) per hour is
+        within `budget`; topics already at max_interval cannot give more.
+        Returns the topics stretched.
+        """
+        stretched = set()
+        for _ in range(len(intervals) + 1):
+            per_hour = {topic: cost[topic] * 3600 / intervals[topic] for topic in intervals}
+            total = sum(per_hour.values())
+            if total <= budget * 1.0001:
+                break
+            free = [topic for topic in intervals if intervals[topic] < self.max_interval]
+            if not free:
+                break
+            left = budget - (total - sum(per_hour[topic] for topic in free))
+            factor = sum(per_hour[topic] for topic in free) / left if left > 0 else math.inf
+            for topic in free:
+                intervals[topic] = min(intervals[topic] * factor, self.max_interval)
+                stretched.add(topic)
+        return sorted(stretched)
+
+    # --- the queue ---------------------------------------------------------------
+
+    def watchlist_due(self, state: TopicState, now: float) -> Optional[str]:
+        """Today's date (UTC) once the watchlist hour has passed and the topic has no watchlist for today."""
+        if self.watchlist_hour is None:
+            return None
+        today = datetime.fromtimestamp(now, timezone.utc)
+        if today.hour < self.watchlist_hour or state.watchlist_date == today.date().isoformat():
+            return None
+        return today.date().isoformat()
+
+    def _watchlist_time(self, state: TopicState, now: float) -> float:
+        if self.watchlist_hour is None:
+            return math.inf
+        today = datetime.fromtimestamp(now, timezone.utc).replace(hour=self.watchlist_hour, minute=0, second=0,
+                                                                 microsecond=0)
+        if state.watchlist_date == today.date().isoformat():
+            today += timedelta(days=1)
+        return today.timestamp()
+
+    def due(self, now: float) -> List[str]:
+        """Topics to poll now, most new articles waiting first."""
+        waiting = [state for topic, state in self.states.items()
+                   if topic not in self.running and (state.next_due <= now or self.watchlist_due(state, now))]
+
+        def backlog(state):
+            if state.last_polled is None:
+                return math.inf
+            return state.fresh_rate * (now - state.last_polled)
+
+        return [state.topic for state in sorted(waiting, key=backlog, reverse=True)]
+
+    def free_slots(self) -> int:
+        return max(self.max_concurrent - len(self.running), 0)
+
+    def claim(self, now: float) -> List[Tuple[str, TopicPlan, Optional[str]]]:
+        """Start the polls that are due, up to the free slots: (topic, plan, watchlist date or None)."""
+        claimed = []
+        due = self.due(now)
+        for topic in due[:self.free_slots()]:
+            state = self.states[topic]
+            self.running[topic] = now
+            claimed.append((topic, state.plan, self.watchlist_due(state, now)))
+        get_metrics().set_gauge('scheduler_queued_topics', len(due) - len(claimed))
+        return claimed
+
+    def next_wake(self, now: float) -> float:
+        """When the next waiting topic falls due (inf when every topic is polling)."""
+        return min((min(state.next_due, self._watchlist_time(state, now))
+                    for topic, state in self.states.items() if topic not in self.running), default=math.inf)
+
+    def finish(self, topic: str, now: float, result: Optional[PollResult] = None,
+               error: Optional[BaseException] = None):
+        """Learn from a finished poll (or its error), replan and decide when the topic polls next."""
+        started = self.running.pop(topic)
+        state = self.states[topic]
+        metrics = get_metrics()
+        if error is not None or result is None:
+            state.failures += 1
+            state.next_due = now + min(self.min_interval * 2 ** state.failures, self.max_interval)
+            self.replan(now)
+            self.save(state, now)
+            metrics.inc('scheduler_polls_total', topic=topic, outcome='failed')
+            self._decide(now, topic, f"poll failed ({type(error).__name__}: {error}), "
+                                     f"retry in {_minutes(state.next_due - now)}")
+            return
+
+        notes = []
+        window = result.window
+        if window is None and state.last_polled is not None:
+            window = started - state.last_polled
+        if window and window > 0:
+            hours = window / 3600
+            observed = result.ingested / hours
+            if result.truncated:
+                observed *= 2  # the windows that were cut had more than they returned
+            if state.polls == 0:
+                state.rate = observed
+            else:
+                rising = observed > state.rate
+                if rising and observed > 2 * state.rate + 1:
+                    notes.append('burst')
+                half_life = SCHEDULER_RISE_HALF_LIFE_HOURS if rising else SCHEDULER_DECAY_HALF_LIFE_HOURS
+                state.rate = _ewma(state.rate, observed, hours, half_life)
+            if result.received:
+                duplicates = 1 - result.candidates / result.received
+                state.duplicates = (duplicates if state.polls == 0 else
+                                    _ewma(state.duplicates, duplicates, hours, SCHEDULER_DECAY_HALF_LIFE_HOURS))
+        state.last_polled = started
+        state.polls += 1
+        state.failures = 0
+        state.truncated = bool(result.truncated)
+        state.last = result
+        if result.watchlist_date:
+            state.watchlist_date = result.watchlist_date
+            notes.append(f"watchlist {result.watchlist_date}")
+        old = state.plan
+        plan = self.replan(now)[topic]
+        state.next_due = max(started + plan.interval, now)
+        self.save(state, now)
+
+        metrics.inc('scheduler_polls_total', topic=topic, outcome='done')
+        metrics.inc('scheduler_selected_total', result.selected, topic=topic)
+        changed = '' if old is None or old[:3] == plan[:3] else (
+            f" (was every {_minutes(old.interval)}, maxrecords {old.maxrecords}, top {old.top_n})")
+        self._decide(now, topic,
+                     f"{result.ingested} new, {result.candidates} after dedup, {result.selected} kept in "
+                     f"{result.requests} request(s); {state.rate:.1f}/h at {state.duplicates:.0%} duplicates -> "
+                     f"every {_minutes(plan.interval)}, maxrecords {plan.maxrecords}, top {plan.top_n}{changed}"
+                     + (f" [{', '.join(notes + list(plan.reasons))}]" if notes or plan.reasons else ''))
+
+    def _decide(self, now: float, topic: str, text: str):
+        stamp = datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%d %H:%M')
+        self.decisions.append({'time': now, 'topic': topic, 'decision': text})
+        print(f"[{stamp}] {topic}: {text}")
+
+    # --- reporting -------------------------------------------------------------
+
+    def budget_use(self) -> Dict[str, float]:
+        plans = [state.plan for state in self.states.values()]
+        return {
+            'polls_per_hour': sum(3600 / plan.interval for plan in plans),
+            'max_polls_per_hour': self.max_polls_per_hour,
+            'summaries_per_hour': sum(plan.top_n * 3600 / plan.interval for plan in plans),
+            'max_summaries_per_hour': self.max_summaries_per_hour,
+        }
+
+    def status(self, now: float) -> Dict:
+        """Plans, queue and recent decisions as JSON-ready data."""
+        due = self.due(now)
+        topics = {}
+        for topic, state in sorted(self.states.items()):
+            plan = state.plan
+            topics[topic] = {
+                'state': 'polling' if topic in self.running else ('queued' if topic in due else 'waiting'),
+                'arrival_rate': round(state.rate, 2),
+                'duplicate_ratio': round(state.duplicates, 3),
+                'interval_minutes': round(plan.interval / 60, 1),
+                'maxrecords': plan.maxrecords,
+                'top_n': plan.top_n,
+                'reasons': list(plan.reasons),
+                'next_due_minutes': round((state.next_due - now) / 60, 1),
+                'polls': state.polls,
+                'failures': state.failures,
+                'watchlist_date': state.watchlist_date,
+                'last': state.last._asdict() if state.last else None,
+            }
+        return {
+            'time': now,
+            'running': {topic: round(now - started, 1) for topic, started in self.running.items()},
+            'queue': due,
+            'budgets': {name: round(value, 1) for name, value in self.budget_use().items()},
+            'topics': topics,
+            'decisions': list(self.decisions)[-50:],
+        }
+
+    def write_status(self, path: str = SCHEDULER_STATUS_PATH, now: Optional[float] = None):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.status(self.clock() if now is None else now), f, indent=2)
+        os.replace(tmp, path)
+
+
+def format_status(status: Dict) -> str:
+    budgets = status['budgets']
+    lines = [f"polls {budgets['polls_per_hour']}/h of {budgets['max_polls_per_hour']}, "
+             f"summaries {budgets['summaries_per_hour']}/h of {budgets['max_summaries_per_hour']}; "
+             f"polling: {', '.join(status['running']) or '-'}; queued: {', '.join(status['queue']) or '-'}",
+             f"{'topic':<20} {'state':>8} {'rate/h':>7} {'dup':>5} {'every':>7} {'maxrec':>6} {'top':>4} {'next in':>8}  reasons"]
+    for topic, t in status['topics'].items():
+        lines.append(f"{topic:<20} {t['state']:>8} {t['arrival_rate']:>7.1f} {t['duplicate_ratio']:>5.0%} "
+                     f"{_minutes(t['interval_minutes'] * 60):>7} {t['maxrecords']:>6} {t['top_n']:>4} "
+                     f"{_minutes(max(t['next_due_minutes'], 0) * 60):>8}  {', '.join(t['reasons'])}")
+    for decision in status['decisions'][-20:]:
+        stamp = datetime.fromtimestamp(decision['time'], timezone.utc).strftime('%Y-%m-%d %H:%M')
+        lines.append(f"[{stamp}] {decision['topic']}: {decision['decision']}")
+    return "\n".join(lines)
+
+
+# --- polling for real ------------------------------------------------------------
+
+def ingest_window(searcher, topic: str, now: datetime) -> float:
+    """Seconds of news the topic's next ingest covers: from its watermark, or its query's lookback."""
+    max_lookback = timedelta(hours=GDELT_MAX_LOOKBACK_HOURS)
+    rows = get_database().query("SELECT last_seendate FROM gdelt_watermarks WHERE topic = ?", (topic,))
+    if rows:
+        window = now - parse_seendate(rows[0][0])
+    else:
+        window = parse_timespan(query_param(searcher.get_gdelt_query_string(topic), 'timespan')) or max_lookback
+    return min(window, max_lookback).total_seconds()
+
+
+async def poll_topic(searcher, topic: str, plan: TopicPlan, watchlist_date: Optional[str] = None) -> PollResult:
+    """Search, scrape and summarise the topic with its plan, and make its watchlist when one is due."""
+    from src.daily_run import search_topic
+    from src.GetWatchlist import generate_and_store_watchlist
+    from src.ScrapeNews import run_news_scraper
+    with get_metrics().span('scheduled_poll', topic=topic, maxrecords=plan.maxrecords, top_n=plan.top_n):
+        window = await asyncio.to_thread(ingest_window, searcher, topic, datetime.now(timezone.utc))
+        stats = await search_topic(searcher, topic, plan.maxrecords, plan.top_n)
+        if stats.get('selected'):
+            await run_news_scraper(topic, 'realtime')
+        if watchlist_date:
+            await generate_and_store_watchlist(topic, date.fromisoformat(watchlist_date))
+    received = stats.get('received', 0)
+    candidates = received - stats.get('near_duplicates', 0) - stats.get('seen', 0)
+    return PollResult(stats['ingested'], received, max(candidates, 0), stats.get('selected', 0),
+                      stats['requests'], stats['truncated'], window, watchlist_date)
+
+
+async def run_scheduler(scheduler: Scheduler,
+                        poll: Callable[[str, TopicPlan, Optional[str]], Awaitable[PollResult]],
+                        until: Optional[float] = None, status_path: Optional[str] = SCHEDULER_STATUS_PATH,
+                        max_sleep: float = 60.0, metrics_dir: Optional[str] = METRICS_DIR,
+                        metrics_every: float = SCHEDULER_METRICS_MINUTES * 60) -> Counter:
+    """
+    Poll topics as they fall due, at most scheduler.max_concurrent at a time,
+    until `until` (on the scheduler's clock) or for ever. Polls still running
+    at the end are waited for. The metrics report (gauges, spans, counters)
+    is written to `metrics_dir` every `metrics_every` seconds and at the end.
+    Returns the polls made per topic.
+    """
+    clock = scheduler.clock
+    tasks: Dict[asyncio.Task, str] = {}
+    polls = Counter()
+    next_report = clock()
+
+    def finished(done):
+        for task in done:
+            topic = tasks.pop(task)
+            error = task.exception()
+            if error is not None:
+                print(f"Poll of {topic} failed: {type(error).__name__}: {error}")
+            scheduler.finish(topic, clock(), None if error else task.result(), error)
+            polls[topic] += 1
+
+    try:
+        while until is None or clock() < until:
+            for topic, plan, watchlist_date in scheduler.claim(clock()):
+                tasks[asyncio.create_task(poll(topic, plan, watchlist_date))] = topic
+            if status_path:
+                scheduler.write_status(status_path)
+            if metrics_dir and clock() >= next_report:
+                await asyncio.to_thread(get_metrics().write_report, metrics_dir)
+                next_report = clock() + metrics_every
+            now = clock()
+            timeout = max_sleep
+            if scheduler.free_slots():
+                timeout = min(timeout, max(scheduler.next_wake(now) - now, 0.0))
+            if until is not None:
+                timeout = min(timeout, max(until - now, 0.0))
+            if tasks:
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                finished(done)
+            else:
+                await asyncio.sleep(timeout)
+    finally:
+        if tasks:
+            done, _ = await asyncio.wait(tasks)
+            finished(done)
+        if status_path:
+            scheduler.write_status(status_path)
+        if metrics_dir:
+            get_metrics().write_report(metrics_dir)
+    return polls
+
+
+# --- simulation ------------------------------------------------------------------
+
+class Burst(NamedTuple):
+    topic: str
+    start_hour: float  # after the start of the simulation
+    hours: float
+    per_hour: float  # articles on top of the topic's base rate
+
+
+class SyntheticNews:
+    """
+    Articles arriving for each topic at `base_rates` per hour plus `bursts`,
+    a `duplicates` share of them near duplicates or already seen. `poll`
+    answers like poll_topic would, with the ingester's window splitting: a
+    window is only truncated when even the smallest windows overflow.
+    """
+
+    def __init__(self, base_rates: Dict[str, float], bursts: Iterable[Burst] = (), duplicates: float = 0.3,
+                 start: float = 0.0, lookback: float = 8 * 3600, min_window: float = GDELT_MIN_WINDOW_MINUTES * 60,
+                 seed: int = 0):
+        self.base_rates = base_rates
+        self.bursts = list(bursts)
+        self.duplicates = duplicates
+        self.start = start
+        self.min_window = min_window
+        self.rng = random.Random(seed)
+        self.polled = {topic: start - lookback for topic in base_rates}
+
+    def rate(self, topic: str, t: float) -> float:
+        hour = (t - self.start) / 3600
+        return self.base_rates[topic] + sum(b.per_hour for b in self.bursts
+                                            if b.topic == topic and b.start_hour <= hour < b.start_hour + b.hours)
+
+    def expected(self, topic: str, t0: float, t1: float) -> Tuple[float, float]:
+        """(articles expected in [t0, t1], their summed wait until t1 in seconds)."""
+        steps = max(int((t1 - t0) / 300), 1)
+        dt = (t1 - t0) / steps
+        articles = wait = 0.0
+        for i in range(steps):
+            t = t0 + (i + 0.5) * dt
+            n = self.rate(topic, t) * dt / 3600
+            articles += n
+            wait += n * (t1 - t)
+        return articles, wait
+
+    def poisson(self, mean: float) -> int:
+        if mean > 50:
+            return max(int(round(self.rng.gauss(mean, math.sqrt(mean)))), 0)
+        limit, k, p = math.exp(-mean), 0, self.rng.random()
+        while p > limit:
+            k += 1
+            p *= self.rng.random()
+        return k
+
+    def poll(self, topic: str, plan: TopicPlan, now: float) -> Tuple[PollResult, float]:
+        """The poll's result and the summed wait of the articles it found."""
+        t0, self.polled[topic] = self.polled[topic], now
+        mean, wait = self.expected(topic, t0, now)
+        arrived = self.poisson(mean)
+        windows = max(math.ceil((now - t0) / self.min_window), 1)
+        ingested = min(arrived, plan.maxrecords * windows)
+        requests = 1 if arrived < plan.maxrecords else min(2 * math.ceil(arrived / plan.maxrecords) - 1, 2 * windows - 1)
+        candidates = sum(self.rng.random() >= self.duplicates for _ in range(ingested))
+        result = PollResult(ingested, ingested, candidates, min(plan.top_n, candidates), requests,
+                            int(arrived > ingested), now - t0)
+        return result, wait * ingested / arrived if arrived else 0.0
+
+
+def simulate(scheduler: Scheduler, news: SyntheticNews, hours: float, start: float = 0.0,
+             poll_seconds: float = 60.0) -> Dict:
+    """
+    Run `scheduler` for `hours` on a simulated clock starting at `start`,
+    each poll taking `poll_seconds`; polls still running at the end are
+    finished. Returns per topic the polls, requests,
+    articles ingested, candidates, selected, truncated windows and the mean
+    wait of an article until it was ingested, and the most polls ever running at once.
+    """
+    end = start + hours * 3600
+    now = start
+    in_flight = []  # (done at, sequence, topic, result)
+    totals = {topic: Counter() for topic in scheduler.states}
+    most_running = sequence = 0
+    while True:
+        if now < end:
+            for topic, plan, watchlist_date in scheduler.claim(now):
+                result, wait = news.poll(topic, plan, now)
+                heapq.heappush(in_flight, (now + poll_seconds, sequence, topic, result._replace(watchlist_date=watchlist_date)))
+                sequence += 1
+                totals[topic]['wait'] += wait
+            most_running = max(most_running, len(scheduler.running))
+        wake = scheduler.next_wake(now) if scheduler.free_slots() and now < end else math.inf
+        now = min(in_flight[0][0] if in_flight else math.inf, wake)
+        if now == math.inf or (now >= end and not in_flight):
+            break
+        while in_flight and in_flight[0][0] <= now:
+            _, _, topic, result = heapq.heappop(in_flight)
+            scheduler.finish(topic, now, result)
+            counts = totals[topic]
+            counts['polls'] += 1
+            counts['empty_polls'] += result.candidates == 0
+            counts['watchlists'] += bool(result.watchlist_date)
+            for field in ('requests', 'ingested', 'candidates', 'selected', 'truncated'):
+                counts[field] += getattr(result, field)
+    topics = {}
+    for topic, counts in totals.items():
+        topics[topic] = dict(counts)
+        topics[topic]['mean_wait_minutes'] = counts['wait'] / counts['ingested'] / 60 if counts['ingested'] else None
+        topics[topic].pop('wait', None)
+    return {'hours': hours, 'topics': topics, 'most_running': most_running}
+
+
+def demo_news(topics: Sequence[str], hours: float, start: float, seed: int = 0) -> SyntheticNews:
+    """A few busy topics, the rest quiet, and a breaking story in the first two topics (or the given ones)."""
+    rng = random.Random(seed)
+    rates = {topic: round(rng.lognormvariate(math.log(3), 1.0), 2) for topic in topics}
+    breaking = [topic for topic in ('Russia_Ukraine', 'Israel_Palestine') if topic in rates] or list(topics[:2])
+    bursts = [Burst(topic, hours * (0.3 + 0.2 * i), 6, 150) for i, topic in enumerate(breaking)]
+    return SyntheticNews(rates, bursts, start=start, seed=seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Poll every topic on a cadence that follows its news volume.")
+    parser.add_argument("--topics", nargs="+", help="topics to schedule (default: all in query_parameters.json)")
+    parser.add_argument("--max-concurrent", type=int, default=SCHEDULER_MAX_CONCURRENT, help="topics polled at once")
+    parser.add_argument("--summaries-per-hour", type=float, default=SCHEDULER_MAX_SUMMARIES_PER_HOUR,
+                        help="LLM budget: articles summarised per hour over all topics")
+    parser.add_argument("--polls-per-hour", type=float, default=SCHEDULER_MAX_POLLS_PER_HOUR,
+                        help="GDELT budget: topic polls per hour over all topics")
+    parser.add_argument("--status", action="store_true", help="print the running scheduler's plans, queue and decisions")
+    parser.add_argument("--status-path", default=SCHEDULER_STATUS_PATH)
+    parser.add_argument("--simulate", type=float, metavar="HOURS",
+                        help="run against synthetic news on a simulated clock instead (no network, nothing stored)")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        if not os.path.exists(args.status_path):
+            print(f"No scheduler status at {args.status_path}")
+            return
+        with open(args.status_path) as f:
+            print(format_status(json.load(f)))
+        return
+
+    topics = args.topics or get_topic_registry().names()
+    budgets = dict(max_concurrent=args.max_concurrent, max_polls_per_hour=args.polls_per_hour,
+                   max_summaries_per_hour=args.summaries_per_hour)
+    if args.simulate:
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+        scheduler = Scheduler(topics, clock=lambda: start, **budgets)
+        result = simulate(scheduler, demo_news(topics, args.simulate, start), args.simulate, start)
+        print(format_status(scheduler.status(start + args.simulate * 3600)))
+        print(json.dumps(result['topics'], indent=2))
+        return
+
+    from src.config import COHERE_API_KEY, QUERY_PARAMS_PATH
+    from src.SearchGdelt import GdeltSearcher
+    searcher = GdeltSearcher(QUERY_PARAMS_PATH, COHERE_API_KEY)
+    scheduler = Scheduler(topics, db=get_database(), **budgets)
+    print(format_status(scheduler.status(time.time())))
+    asyncio.run(run_scheduler(scheduler, lambda topic, plan, watchlist_date:
+                              poll_topic(searcher, topic, plan, watchlist_date), status_path=args.status_path))
+
+
+if __name__ == "__main__":
+    main()
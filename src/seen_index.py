@@ -0,0 +1,248 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+if TYPE_CHECKING:
+    from src.dedup import NearDuplicateIndex  # imported when titles are first checked, not by every importer
+
+SEEN_INDEX_NAME = 'seen_index.db'
+
+# Query parameters that only identify the referrer/campaign, never the article.
+TRACKING_PARAMS = {'fbclid', 'gclid', 'ocid', 'cmpid', 'ref', 'ref_src', 'smid', 'mc_cid', 'mc_eid', 'ito', 'at_medium', 'at_campaign'}
+BODY_BANDS = 4  # 64-bit simhash split into 4 x 16-bit bands
+
+
+def get_seen_index_path() -> str:
+    """The seen index lives next to the SQLite database in src/."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), SEEN_INDEX_NAME)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Reduce a URL to a key that is stable across syndication and tracking variants:
+    scheme and "www."/"m."/"amp." host prefixes are dropped, tracking parameters
+    are removed, the remaining query is sorted and trailing slashes or "/amp" are stripped.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    for prefix in ('www.', 'm.', 'amp.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    path = parts.path or '/'
+    if path.endswith('/amp'):
+        path = path[:-len('/amp')]
+    path = path.rstrip('/') or '/'
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith('utm_') and k.lower() not in TRACKING_PARAMS
+    )
+    return f"{host}{path}" + (f"?{urlencode(query)}" if query else '')
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """64-bit simhash over word shingles of the normalized text, as a signed int so SQLite can store it."""
+    from src.dedup import normalize_title
+    words = normalize_title(text).split()
+    shingles = [' '.join(words[i:i + shingle_size]) for i in range(max(len(words) - shingle_size + 1, 1))]
+    vector = [0] * 64
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(64):
+            vector[bit] += 1 if h >> bit & 1 else -1
+    value = sum(1 << bit for bit in range(64) if vector[bit] > 0)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _bands(signature: int) -> List[int]:
+    unsigned = signature & ((1 << 64) - 1)
+    return [(unsigned >> (16 * b)) & 0xFFFF for b in range(BODY_BANDS)]
+
+
+class SeenIndex:
+    """
+    Persistent per-topic memory of articles from earlier runs.
+
+    Three signatures are kept per topic: the canonical URL, the original title
+    (matched with the same fuzz.ratio >= 80 rule as GdeltSearcher.clean_articles)
+    and a simhash of the scraped body (near-duplicate if within `body_distance`
+    bits). Entries older than `max_age_days` are evicted, and each table is capped
+    at `max_entries` rows, oldest first. `stats` counts how many articles were
+    suppressed by each signature since the last `reset_stats()`; `checked` counts
+    every lookup, so an article consulted by both search and insert counts twice.
+
+    Titles are matched against a NearDuplicateIndex per topic that is built
+    once from the stored titles and then only catches up on rows added since
+    (by this process or another one), so a lookup costs a few candidate
+    comparisons per incoming title however many titles are remembered.
+    `evict` drops the in-memory indexes; they are rebuilt on next use.
+
+    One lock serialises every method, so the scheduler's concurrent polls can
+    search from worker threads (asyncio.to_thread) through the same instance.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_age_days: float = 14, max_entries: int = 200000,
+                 title_threshold: int = 80, body_distance: int = 3, clock=time.time):
+        self.path = path or get_seen_index_path()
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        self.title_threshold = title_threshold
+        self.body_distance = body_distance
+        self.clock = clock
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._title_indexes: Dict[str, Tuple['NearDuplicateIndex', int]] = {}  # topic -> (index, last seen_titles id)
+        self._create_tables()
+        self.reset_stats()
+        self.evict()
+
+    def _create_tables(self):
+        self.conn.executescript('''
+        CREATE TABLE IF NOT EXISTS seen_urls (
+            topic TEXT NOT NULL,
+            url_key TEXT NOT NULL,
+            seen_at REAL NOT NULL,
+            PRIMARY KEY (topic, url_key)
+        );
+        CREATE TABLE IF NOT EXISTS seen_titles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic TEXT NOT NULL,
+            title TEXT NOT NULL,
+            seen_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_seen_titles_topic ON seen_titles (topic, seen_at);
+        CREATE TABLE IF NOT EXISTS seen_bodies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic TEXT NOT NULL,
+            signature INTEGER NOT NULL,
+            band0 INTEGER NOT NULL,
+            band1 INTEGER NOT NULL,
+            band2 INTEGER NOT NULL,
+            band3 INTEGER NOT NULL,
+            seen_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_seen_bodies_band0 ON seen_bodies (topic, band0);
+        CREATE INDEX IF NOT EXISTS idx_seen_bodies_band1 ON seen_bodies (topic, band1);
+        CREATE INDEX IF NOT EXISTS idx_seen_bodies_band2 ON seen_bodies (topic, band2);
+        CREATE INDEX IF NOT EXISTS idx_seen_bodies_band3 ON seen_bodies (topic, band3);
+        ''')
+        self.conn.commit()
+
+    def reset_stats(self):
+        self.stats = {'checked': 0, 'url': 0, 'title': 0, 'body': 0}
+
+    def report(self) -> str:
+        suppressed = self.stats['url'] + self.stats['title'] + self.stats['body']
+        return (f"Seen index suppressed {suppressed} of {self.stats['checked']} articles "
+                f"(url: {self.stats['url']}, title: {self.stats['title']}, body: {self.stats['body']})")
+
+    def evict(self):
+        """Drop entries older than max_age_days, then trim every table to max_entries."""
+        with self._lock:
+            cutoff = self.clock() - self.max_age_days * 86400
+            for table in ('seen_urls', 'seen_titles', 'seen_bodies'):
+                self.conn.execute(f"DELETE FROM {table} WHERE seen_at < ?", (cutoff,))
+                self.conn.execute(f'''
+                DELETE FROM {table} WHERE rowid IN (
+                    SELECT rowid FROM {table} ORDER BY seen_at DESC LIMIT -1 OFFSET ?
+                )''', (self.max_entries,))
+            self.conn.commit()
+            self._title_indexes.clear()
+
+    def _title_index(self, topic: str) -> 'NearDuplicateIndex':
+        """The topic's title index, with every title stored since it was last brought up to date."""
+        from src.dedup import NearDuplicateIndex
+        index, last_id = self._title_indexes.get(topic) or (None, 0)
+        rows = self.conn.execute("SELECT id, title FROM seen_titles WHERE id > ? AND topic = ? ORDER BY id",
+                                 (last_id, topic)).fetchall()
+        if index is None:
+            index = NearDuplicateIndex(threshold=self.title_threshold)
+            index.build([title for _, title in rows])
+        else:
+            for _, title in rows:
+                index.add(title)
+        if rows:
+            last_id = rows[-1][0]
+        self._title_indexes[topic] = (index, last_id)
+        return index
+
+    def filter_new(self, topic: str, records: List[Dict], url_key: str = 'url', title_key: str = 'title') -> List[bool]:
+        """
+        Return a keep-mask for `records`: False for articles whose canonical URL
+        or title was already seen for this topic in an earlier run. Nothing is registered.
+        """
+        with self._lock:
+            self.stats['checked'] += len(records)
+            keep = []
+            for record in records:
+                key = canonicalize_url(record.get(url_key) or '')
+                row = self.conn.execute("SELECT 1 FROM seen_urls WHERE topic = ? AND url_key = ?", (topic, key)).fetchone()
+                keep.append(row is None)
+            self.stats['url'] += keep.count(False)
+
+            titles = self._title_index(topic)
+            if len(titles):
+                # Only matches against an earlier run count; in-batch pairs are clean_articles' job.
+                for i, k in enumerate(keep):
+                    if k and titles.match(records[i].get(title_key) or '') is not None:
+                        keep[i] = False
+                        self.stats['title'] += 1
+            return keep
+
+    def register(self, topic: str, records: Iterable[Dict], url_key: str = 'url', title_key: str = 'title'):
+        """Remember the URL and title of every record for later runs."""
+        with self._lock:
+            now = self.clock()
+            records = list(records)
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO seen_urls (topic, url_key, seen_at) VALUES (?, ?, ?)",
+                [(topic, canonicalize_url(r.get(url_key) or ''), now) for r in records]
+            )
+            self.conn.executemany(
+                "INSERT INTO seen_titles (topic, title, seen_at) VALUES (?, ?, ?)",
+                [(topic, r.get(title_key), now) for r in records if r.get(title_key)]
+            )
+            self.conn.commit()
+
+    def is_seen_body(self, topic: str, body: str) -> bool:
+        """True if a body within `body_distance` simhash bits was seen for this topic before."""
+        signature = simhash(body)
+        bands = _bands(signature)
+        with self._lock:
+            self.stats['checked'] += 1
+            rows = self.conn.execute('''
+            SELECT signature FROM seen_bodies
+            WHERE topic = ? AND (band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?)
+            ''', (topic, *bands))
+            for (other,) in rows:
+                if bin((signature ^ other) & ((1 << 64) - 1)).count('1') <= self.body_distance:
+                    self.stats['body'] += 1
+                    return True
+            return False
+
+    def register_body(self, topic: str, body: str):
+        signature = simhash(body)
+        with self._lock:
+            self.conn.execute('''
+            INSERT INTO seen_bodies (topic, signature, band0, band1, band2, band3, seen_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (topic, signature, *_bands(signature), self.clock()))
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+_seen_index = None
+
+
+def get_seen_index() -> SeenIndex:
+    """Process-wide SeenIndex stored next to the database, created on first use."""
+    global _seen_index
+    if _seen_index is None:
+        _seen_index = SeenIndex()
+    return _seen_index
@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import unittest
+
+from fastapi.testclient import TestClient
+
+from src.api import create_app, fts_query
+from src.db import Database
+from src.initialize_db import create_database_and_tables
+
+
+class TestApi(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "test.db")
+        create_database_and_tables(path)
+        self.db = Database(path)
+        self.db.executemany('''
+        INSERT INTO articles (topic, url, title, relevance_score, date_added, summary_en) VALUES (?, ?, ?, ?, ?, ?)
+        ''', [("UK", f"http://uk/{i}", f"UK story {i}", i / 100, "2024-05-01", f"Summary {i}") for i in range(45)] +
+             [("NATO", "http://nato/1", "Summit in Vilnius", 0.5, "2024-05-01", "Leaders meet about air defence")])
+        self.db.execute("INSERT INTO watchlist (country, date_added, watchlist, urls_used) VALUES (?, ?, ?, ?)",
+                        ("UK", "2024-05-01", "Quiet day", json.dumps(["http://uk/1"])))
+        self.client = TestClient(create_app(self.db, cache_ttl_seconds=60))
+
+    def tearDown(self):
+        self.client.close()
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_latest_watchlist(self):
+        response = self.client.get("/topics/UK/watchlist/latest")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"country": "UK", "date": "2024-05-01", "watchlist": "Quiet day",
+                                           "urls": ["http://uk/1"]})
+        self.assertEqual(self.client.get("/topics/France/watchlist/latest").status_code, 404)
+
+    def test_articles_are_paginated_by_relevance(self):
+        page = self.client.get("/topics/UK/articles", params={"date": "2024-05-01", "page": 3, "page_size": 20}).json()
+        self.assertEqual(page["total"], 45)
+        self.assertEqual([item["url"] for item in page["items"]], [f"http://uk/{i}" for i in range(4, -1, -1)])
+        self.assertNotIn("news_body", page["items"][0])
+        self.assertEqual(self.client.get("/topics/UK/articles", params={"page_size": 500}).status_code, 422)
+
+    def test_search_follows_updates(self):
+        self.assertEqual(self.client.get("/search", params={"q": "vilnius"}).json()["items"][0]["url"], "http://nato/1")
+        self.assertEqual(self.client.get("/search", params={"q": "ceasefire"}).json()["items"], [])
+        self.db.execute("UPDATE articles SET news_body = ? WHERE url = ?", ("Talks on a ceasefire resumed", "http://uk/7"))
+        items = self.client.get("/search", params={"q": "ceasefire talks", "topic": "UK"}).json()["items"]
+        self.assertEqual([item["url"] for item in items], ["http://uk/7"])
+        self.assertIn("[ceasefire]", items[0]["snippet"].lower())
+        self.assertEqual(self.client.get("/search", params={"q": "ceasefire", "topic": "NATO"}).json()["items"], [])
+
+    def test_search_input_is_not_fts_syntax(self):
+        self.assertEqual(fts_query('summit" OR NEAR(x'), '"summit" "OR" "NEAR" "x"')
+        self.assertEqual(self.client.get("/search", params={"q": 'summit" OR ('}).status_code, 200)
+        self.assertEqual(self.client.get("/search", params={"q": '"*"'}).status_code, 400)
+
+    def test_etag_and_invalidation_on_write(self):
+        first = self.client.get("/topics/UK/watchlist/latest")
+        etag = first.headers["etag"]
+        self.assertEqual(self.client.get("/topics/UK/watchlist/latest", headers={"If-None-Match": etag}).status_code, 304)
+
+        self.db.execute("INSERT INTO watchlist (country, date_added, watchlist, urls_used) VALUES (?, ?, ?, ?)",
+                        ("UK", "2024-05-02", "Busy day", "[]"))
+        response = self.client.get("/topics/UK/watchlist/latest", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["watchlist"], "Busy day")
+        self.assertNotEqual(response.headers["etag"], etag)
+
+
+if __name__ == '__main__':
+    unittest.main()
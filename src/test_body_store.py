@@ -0,0 +1,113 @@
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+
+from src.api import search_articles
+from src.body_store import BodyStore, deflate_body, inflate_body, train_zlib_dictionary
+from src.db import Database
+from src.initialize_db import create_database_and_tables
+from src.migrate_bodies import migrate_bodies
+
+WORDS = "government minister talks border economy election court protest summit trade ceasefire".split()
+BOILERPLATE = ("Sign up for our morning newsletter to get the day's top stories in your inbox. "
+               "We use cookies to improve your experience on our site. Read more about our policy.")
+
+
+def body(rng, words=150):
+    return " ".join(rng.choices(WORDS, k=words)).capitalize() + ". " + BOILERPLATE
+
+
+class TestBodyStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "test.db")
+        create_database_and_tables(self.path)
+        self.db = Database(self.path)
+        self.store = BodyStore(self.db, codec='zlib')
+        self.rng = random.Random(3)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def add_articles(self, n, inline=False):
+        self.db.executemany(
+            "INSERT INTO articles (topic, url, title, summary_en, news_body, body_length) VALUES (?, ?, ?, ?, ?, ?)",
+            [("UK", f"http://uk/{i}", f"Story {i}", "", *((text, len(text)) if inline else (None, None)))
+             for i, text in ((i, body(self.rng)) for i in range(n))])
+        return [row[0] for row in self.db.query("SELECT id FROM articles ORDER BY id")]
+
+    def search(self, term):
+        return [(item["id"], item["snippet"]) for item in search_articles(self.db, term, limit=100)]
+
+    def assert_index_consistent(self):
+        self.db.execute("INSERT INTO articles_fts (articles_fts, rank) VALUES ('integrity-check', 1)")
+        self.db.execute("INSERT INTO article_bodies_fts (article_bodies_fts, rank) VALUES ('integrity-check', 1)")
+
+    def test_dictionary_shrinks_short_bodies(self):
+        samples = [body(self.rng) for _ in range(50)]
+        dictionary = train_zlib_dictionary(samples)
+        text = body(self.rng, words=40)
+        plain, primed = deflate_body(text, 'zlib'), deflate_body(text, 'zlib', dictionary)
+        self.assertLess(len(primed), len(plain) * 0.8)
+        self.assertEqual(inflate_body('zlib', dictionary, primed), text)
+        self.assertIsNone(inflate_body(None, None, None))
+
+    def test_bodies_are_stored_compressed_and_searchable(self):
+        ids = self.add_articles(30)
+        self.store.put_many((article_id, body(self.rng)) for article_id in ids[:-1])
+        self.assertIsNotNone(self.store.train())
+        self.store.put(ids[-1], "Ceasefire talks resumed in Geneva. " + BOILERPLATE)
+        self.assertIsNone(self.db.query("SELECT news_body FROM articles WHERE id = ?", (ids[-1],))[0][0])
+        self.assertTrue(self.store.get(ids[-1]).startswith("Ceasefire talks resumed"))
+        self.assertEqual([row[0] for row in self.search("geneva")], [ids[-1]])
+        self.assertIn("[Geneva]", self.search("geneva")[0][1])
+        self.assertEqual([row[0] for row in self.search(f"geneva story {len(ids) - 1}")], [ids[-1]])  # title and body
+
+        # Summaries and replaced bodies keep the index in step
+        self.db.execute("UPDATE articles SET summary_en = 'Talks in Geneva' WHERE id = ?", (ids[-1],))
+        self.store.put(ids[-1], "Talks moved to Doha.")
+        self.assertEqual([row[0] for row in self.search("doha")], [ids[-1]])
+        self.assertEqual([row[0] for row in self.search("resumed")], [])
+        self.db.execute("DELETE FROM articles WHERE id = ?", (ids[-1],))
+        self.assertEqual(self.search("doha"), [])
+        self.assertEqual(self.db.query("SELECT COUNT(*) FROM article_bodies WHERE article_id = ?", (ids[-1],))[0][0], 0)
+        self.assert_index_consistent()
+
+    def test_writes_need_no_python_functions(self):
+        ids = self.add_articles(3)
+        self.store.put_many((article_id, body(self.rng)) for article_id in ids)
+        self.store.put(ids[0], "Flooding closed the Danube ports.")
+        conn = sqlite3.connect(self.path)
+        with conn:
+            conn.execute("UPDATE articles SET summary_en = 'Ports closed' WHERE id = ?", (ids[0],))
+            conn.execute("INSERT INTO articles (topic, url, title, news_body) VALUES ('UK', 'http://uk/x', 'Inline', 'Danube')")
+            conn.execute("DELETE FROM articles WHERE id = ?", (ids[1],))
+        conn.close()
+        self.assertEqual(sorted(row[0] for row in self.search("danube")), [ids[0], ids[-1] + 1])
+        self.assertEqual(self.search("ports closed")[0][0], ids[0])
+        self.assert_index_consistent()
+
+    def test_migration_moves_inline_bodies(self):
+        ids = self.add_articles(40, inline=True)
+        original = {row[0]: row[1] for row in self.db.query("SELECT id, news_body FROM articles")}
+        self.db.close()
+
+        report = migrate_bodies(self.path)
+        self.assertEqual(report['moved'], 40)
+        self.assertEqual(migrate_bodies(self.path)['moved'], 0)
+        self.db = Database(self.path)
+        self.store = BodyStore(self.db, codec='zlib')
+        self.assertEqual(self.db.query("SELECT COUNT(*) FROM articles WHERE news_body IS NOT NULL")[0][0], 0)
+        self.assertEqual(self.db.query("SELECT dict_id FROM article_bodies GROUP BY dict_id"), [(1,)])
+        self.assertEqual(self.store.get_many(ids), original)
+        self.assertLess(report['stored_bytes'], report['raw_chars'] / 4)
+        self.assertEqual(len(self.search("newsletter")), 40)
+        self.assert_index_consistent()
+
+
+if __name__ == '__main__':
+    unittest.main()
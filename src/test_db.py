@@ -0,0 +1,62 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+from src.db import Database
+
+
+class TestDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmpdir.name, "test.db"), batch_size=50, flush_interval_ms=20)
+        self.db.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT NOT NULL)")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def test_wal_mode(self):
+        self.assertEqual(self.db.query("PRAGMA journal_mode")[0][0], "wal")
+
+    def test_executemany_is_one_commit(self):
+        before = self.db.stats['commits']
+        self.db.executemany("INSERT INTO t (id, v) VALUES (?, ?)", [(i, str(i)) for i in range(100)])
+        self.assertEqual(self.db.stats['commits'] - before, 1)
+        self.assertEqual(self.db.query("SELECT COUNT(*) FROM t")[0][0], 100)
+
+    def test_concurrent_writes_are_group_committed(self):
+        async def main():
+            before = self.db.stats['commits']
+            await asyncio.gather(*[self.db.write("INSERT INTO t (id, v) VALUES (?, ?)", (i, "x")) for i in range(200)])
+            rows = await self.db.fetch_all("SELECT COUNT(*) FROM t")
+            return self.db.stats['commits'] - before, rows[0][0]
+
+        commits, count = asyncio.run(main())
+        self.assertEqual(count, 200)
+        self.assertLessEqual(commits, 8)
+
+    def test_failing_write_only_fails_itself(self):
+        async def main():
+            return await asyncio.gather(
+                self.db.write("INSERT INTO t (id, v) VALUES (?, ?)", (1, "a")),
+                self.db.write("INSERT INTO t (id, v) VALUES (?, ?)", (2, None)),  # NOT NULL violation
+                self.db.write("INSERT INTO t (id, v) VALUES (?, ?)", (3, "c")),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(main())
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], sqlite3.IntegrityError)
+        self.assertIsNone(results[2])
+        self.assertEqual(self.db.query("SELECT id FROM t ORDER BY id"), [(1,), (3,)])
+
+    def test_usable_across_event_loops(self):
+        asyncio.run(self.db.write("INSERT INTO t (id, v) VALUES (1, 'a')"))
+        asyncio.run(self.db.write("INSERT INTO t (id, v) VALUES (2, 'b')"))
+        self.assertEqual(self.db.query("SELECT COUNT(*) FROM t")[0][0], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
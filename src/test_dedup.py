@@ -0,0 +1,113 @@
+import random
+import unittest
+
+from fuzzywuzzy import fuzz
+
+from src.dedup import (
+    NearDuplicateIndex,
+    find_near_duplicates,
+    find_near_duplicates_bruteforce,
+    normalize_title,
+)
+from src.SearchGdelt import GdeltSearcher
+from src.gdelt_records import GdeltArticle
+
+
+def synthetic_titles(n_base: int, n_variants: int, seed: int = 7):
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9))) for _ in range(800)]
+    base = [" ".join(rng.choice(words) for _ in range(rng.randint(6, 12))).capitalize() for _ in range(n_base)]
+    variants = []
+    for _ in range(n_variants):
+        tokens = rng.choice(base).split()
+        tokens[rng.randrange(len(tokens))] = rng.choice(words)
+        if rng.random() < 0.5:
+            tokens.append("- Reuters")
+        variants.append(" ".join(tokens))
+    titles = base + variants
+    rng.shuffle(titles)
+    return titles
+
+
+def edited_titles(n_base: int, seed: int = 11):
+    """Titles with one variant each: one to three character typos, or words split or run together."""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = ["".join(rng.choice(letters) for _ in range(rng.randint(2, 10))) for _ in range(500)]
+    titles = []
+    for _ in range(n_base):
+        base = " ".join(rng.choice(words) for _ in range(rng.randint(2, 11))).capitalize()
+        chars = list(base)
+        for _ in range(rng.randint(1, 3)):
+            i = rng.randrange(len(chars))
+            edit = rng.choice(("substitute", "insert", "delete", "split", "join"))
+            if edit == "substitute":
+                chars[i] = rng.choice(letters)
+            elif edit == "insert":
+                chars.insert(i, rng.choice(letters))
+            elif edit == "split":
+                chars.insert(i, " ")
+            elif len(chars) > 1 and (edit == "delete" or chars[i] == " "):
+                del chars[i]
+        titles += [base, "".join(chars)]
+    rng.shuffle(titles)
+    return titles
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+
+    def test_normalize_title(self):
+        self.assertEqual(normalize_title("  UK: Sunak's   'plan' -- Reuters "), "uk sunak s plan reuters")
+
+    def test_matches_bruteforce(self):
+        titles = synthetic_titles(60, 30)
+        expected = {p.dropped for p in find_near_duplicates_bruteforce(titles)}
+        got = {p.dropped for p in find_near_duplicates(titles)}
+        self.assertEqual(got, expected)
+        self.assertGreater(len(expected), 0)
+
+    def test_same_pairs_as_bruteforce_for_character_edits(self):
+        titles = ["Heatwave hits Europe", "Heat wave hits Europe", "Heatwave hit Europe"] + edited_titles(40)
+        for threshold in (80, 90):
+            with self.subTest(threshold=threshold):
+                expected = find_near_duplicates_bruteforce(titles, threshold)
+                self.assertEqual(find_near_duplicates(titles, threshold), expected)
+                self.assertEqual(expected[:2], [(1, 0, 98), (2, 0, 97)])
+
+    def test_match_and_add_after_build(self):
+        titles = edited_titles(30, seed=5)
+        index = NearDuplicateIndex()
+        index.build(titles[:20])
+        for title in titles[20:]:
+            expected = next(((i, score) for i, other in enumerate(index.titles)
+                             if (score := fuzz.ratio(other, title)) >= 80), None)
+            self.assertEqual(index.match(title), expected)
+            index.add(title)
+
+    def test_later_row_is_dropped(self):
+        titles = ["Storm hits the northern coast of Scotland", "Unrelated budget news", "Storm hits northern coast of Scotland"]
+        pairs = find_near_duplicates(titles)
+        self.assertEqual(len(pairs), 1)
+        self.assertEqual((pairs[0].dropped, pairs[0].kept), (2, 0))
+        self.assertGreaterEqual(pairs[0].score, 80)
+
+    def test_far_fewer_comparisons_than_pairs(self):
+        titles = synthetic_titles(300, 50)
+        index = NearDuplicateIndex()
+        index.find_duplicates(titles)
+        self.assertLess(index.comparisons, len(titles) * 2)
+
+
+class TestCleanArticles(unittest.TestCase):
+
+    def test_report_uses_original_positions(self):
+        titles = ["Storm hits the northern coast of Scotland", "", "Storm hits northern coast of Scotland",
+                  "Budget vote delayed", "Budget vote delayed"]
+        articles = [GdeltArticle(url=f"http://example.com/{i}", title=title) for i, title in enumerate(titles)]
+        cleaned, report = GdeltSearcher.clean_articles(articles, return_report=True)
+        self.assertEqual([a.url for a in cleaned], ["http://example.com/0", "http://example.com/3"])
+        self.assertEqual(report, [{"dropped": 2, "kept": 0, "score": report[0]["score"]}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from src.db import Database
+from src.export_static import export_static
+from src.initialize_db import create_database_and_tables
+
+
+class TestExportStatic(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "test.db")
+        create_database_and_tables(path)
+        self.db = Database(path)
+        self.out = os.path.join(self.tmp.name, "data")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def add(self, country, day, text, urls):
+        self.db.execute("INSERT INTO watchlist (country, date_added, watchlist, urls_used) VALUES (?, ?, ?, ?)",
+                        (country, day, text, json.dumps(urls)))
+
+    def read(self, relative):
+        with open(os.path.join(self.out, relative)) as f:
+            return json.load(f)
+
+    def test_manifest_points_at_the_latest_watchlist(self):
+        self.add("UK", "2024-05-01", "old", ["http://a"])
+        self.add("UK", "2024-05-02", "first draft", ["http://b"])
+        self.add("UK", "2024-05-02", "regenerated", ["http://b", "http://c"])
+        self.add("NATO", "2024-05-01", "nato", ["http://n"])
+        manifest = export_static(self.out, self.db)
+
+        self.assertEqual(set(manifest["countries"]), {"UK", "NATO"})
+        uk = manifest["countries"]["UK"]
+        self.assertEqual(uk["date"], "2024-05-02")
+        latest = self.read(uk["latest"])
+        self.assertEqual(latest, {"country": "UK", "date": "2024-05-02", "watchlist": "regenerated",
+                                  "urls": ["http://b", "http://c"]})
+        self.assertEqual(self.read("manifest.json")["countries"], manifest["countries"])
+        self.assertEqual(set(self.read(uk["index"])["dates"]), {"2024-05-01", "2024-05-02"})
+
+        with open(os.path.join(self.out, uk["latest"]), "rb") as raw, \
+                gzip.open(os.path.join(self.out, uk["latest"] + ".gz")) as compressed:
+            self.assertEqual(raw.read(), compressed.read())
+
+    def test_file_names_change_only_with_content(self):
+        self.add("UK", "2024-05-01", "text", ["http://a"])
+        first = export_static(self.out, self.db)["countries"]["UK"]["latest"]
+        self.assertEqual(export_static(self.out, self.db)["countries"]["UK"]["latest"], first)
+        self.add("UK", "2024-05-01", "updated text", ["http://a"])
+        second = export_static(self.out, self.db)["countries"]["UK"]["latest"]
+        self.assertNotEqual(second, first)
+        self.assertTrue(second.startswith("UK/2024-05-01."))
+
+    def test_comma_separated_urls_from_old_rows(self):
+        self.db.execute("INSERT INTO watchlist (country, date_added, watchlist, urls_used) VALUES (?, ?, ?, ?)",
+                        ("UK", "2024-05-01", "text", "http://a, http://b"))
+        manifest = export_static(self.out, self.db)
+        self.assertEqual(self.read(manifest["countries"]["UK"]["latest"])["urls"], ["http://a", "http://b"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import aiohttp
+from aiohttp import web
+
+from src.db import Database
+from src.gdelt_ingest import GdeltIngester, SEENDATE_FORMAT, window_url
+from src.initialize_db import create_database_and_tables
+
+NOW = datetime(2024, 5, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+
+class FakeGdelt:
+    """DOC API stand-in: serves the stored articles inside [startdatetime, enddatetime], capped at maxrecords."""
+
+    def __init__(self):
+        self.articles = []
+        self.requests = []
+        self.refuse_after = None  # answer windows starting after this seendate with GDELT's plain-text rate-limit notice
+
+    def add(self, topic, count, start, spacing=timedelta(minutes=1)):
+        for i in range(count):
+            seen = start + i * spacing
+            self.articles.append({"topic": topic, "url": f"http://{topic}/{seen:%H%M}/{i}", "title": f"{topic} {i}",
+                                  "seendate": seen.strftime(SEENDATE_FORMAT)})
+
+    async def handle(self, request):
+        query = request.query
+        self.requests.append(dict(query))
+        start = datetime.strptime(query['startdatetime'], '%Y%m%d%H%M%S').strftime(SEENDATE_FORMAT)
+        end = datetime.strptime(query['enddatetime'], '%Y%m%d%H%M%S').strftime(SEENDATE_FORMAT)
+        if self.refuse_after and start > self.refuse_after:
+            return web.Response(text="Please limit requests to one every 5 seconds or contact kalev.leetaru5@gmail.com.")
+        matches = [a for a in self.articles if a['topic'] == query['query']
+                   and (not a['seendate'] or start <= a['seendate'] <= end)]  # undated ones come in every window
+        return web.json_response({"articles": matches[:int(query.get('maxrecords', 75))]})
+
+
+class TestGdeltIngester(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "test.db")
+        create_database_and_tables(path)
+        self.db = Database(path)
+        self.gdelt = FakeGdelt()
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def run_ingest(self, topics, advance=True, clock=lambda: NOW):
+        async def main():
+            app = web.Application()
+            app.router.add_get('/api/v2/doc/doc', self.gdelt.handle)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+
+            def query_url_for(topic):
+                if topic == "Unknown":
+                    raise ValueError(f"Topic '{topic}' not found in the query parameters.")
+                return f"http://127.0.0.1:{port}/api/v2/doc/doc?query={topic}&mode=ArtList&maxrecords=10&format=json&timespan=8h"
+
+            batches = {}
+            try:
+                async with aiohttp.ClientSession() as session:
+                    ingester = GdeltIngester(session, query_url_for, db=self.db, clock=clock)
+                    async for batch in ingester.stream(topics):
+                        batches[batch.topic] = batch
+                        if advance:
+                            ingester.advance(batch)
+            finally:
+                await runner.cleanup()
+            return batches
+        return asyncio.run(main())
+
+    def test_window_url_replaces_timespan(self):
+        url = window_url("https://x/doc?query=a%20b&timespan=8h&format=json", NOW - timedelta(hours=1), NOW)
+        self.assertEqual(url, "https://x/doc?query=a%20b&format=json&startdatetime=20240501110000&enddatetime=20240501120000")
+
+    def test_full_windows_are_split_until_nothing_is_truncated(self):
+        self.gdelt.add("UK", 45, NOW - timedelta(hours=6), spacing=timedelta(minutes=5))
+        self.gdelt.add("UK", 5, NOW - timedelta(hours=12))  # outside the 8h timespan
+        batch = self.run_ingest(["UK"])["UK"]
+        self.assertIsNone(batch.error)
+        self.assertEqual(len(batch.articles), 45)
+        self.assertEqual(len({a.url for a in batch.articles}), 45)
+        self.assertGreater(batch.requests, 1)
+        self.assertEqual(batch.truncated, 0)
+        self.assertEqual(batch.watermark, max(a.seendate for a in batch.articles))
+
+    def test_a_failed_half_window_fails_the_batch(self):
+        self.gdelt.add("UK", 45, NOW - timedelta(hours=6), spacing=timedelta(minutes=5))
+        self.gdelt.refuse_after = (NOW - timedelta(hours=3)).strftime(SEENDATE_FORMAT)
+        batch = self.run_ingest(["UK"])["UK"]
+        self.assertIsNotNone(batch.error)
+        self.assertEqual(batch.articles, [])
+        self.assertIsNone(self.db.query("SELECT last_seendate FROM gdelt_watermarks WHERE topic = 'UK'") or None)
+
+        self.gdelt.refuse_after = None
+        batch = self.run_ingest(["UK"])["UK"]
+        self.assertEqual(len(batch.articles), 45)
+
+    def test_next_run_only_requests_the_new_window(self):
+        self.gdelt.add("UK", 5, NOW - timedelta(hours=2))
+        self.run_ingest(["UK"])
+        self.gdelt.add("UK", 3, NOW + timedelta(minutes=30))
+        self.gdelt.requests.clear()
+        batch = self.run_ingest(["UK"], clock=lambda: NOW + timedelta(hours=1))["UK"]
+        self.assertEqual([a.title for a in batch.articles], ["UK 0", "UK 1", "UK 2"])
+        self.assertEqual(len(self.gdelt.requests), 1)
+        self.assertNotIn('timespan', self.gdelt.requests[0])
+        self.assertEqual(self.gdelt.requests[0]['startdatetime'], (NOW - timedelta(hours=2) + timedelta(minutes=4, seconds=1)).strftime('%Y%m%d%H%M%S'))
+
+    def test_articles_without_a_seendate_are_kept(self):
+        self.gdelt.add("UK", 3, NOW - timedelta(hours=2))
+        self.run_ingest(["UK"])
+        self.gdelt.articles.append({"topic": "UK", "url": "http://UK/undated", "title": "UK undated", "seendate": ""})
+        batch = self.run_ingest(["UK"], clock=lambda: NOW + timedelta(hours=1))["UK"]
+        self.assertEqual([a.url for a in batch.articles], ["http://UK/undated"])
+        self.assertEqual(batch.watermark, (NOW - timedelta(hours=2) + timedelta(minutes=2)).strftime(SEENDATE_FORMAT))
+
+    def test_watermark_only_moves_when_advanced(self):
+        self.gdelt.add("UK", 5, NOW - timedelta(hours=2))
+        self.run_ingest(["UK"], advance=False)
+        batch = self.run_ingest(["UK"])["UK"]
+        self.assertEqual(len(batch.articles), 5)
+
+    def test_stream_covers_all_topics_and_reports_failures(self):
+        self.gdelt.add("UK", 4, NOW - timedelta(hours=1))
+        self.gdelt.add("NATO", 2, NOW - timedelta(hours=1))
+        batches = self.run_ingest(["UK", "NATO", "Unknown"])
+        self.assertEqual(len(batches["UK"].articles), 4)
+        self.assertEqual(len(batches["NATO"].articles), 2)
+        self.assertIsInstance(batches["Unknown"].error, ValueError)
+        self.assertEqual(batches["Unknown"].articles, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
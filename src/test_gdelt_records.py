@@ -0,0 +1,67 @@
+import json
+import unittest
+
+from src.gdelt_records import ArticleStreamParser, GdeltArticle, as_articles, parse_articles
+
+ARTICLES = [
+    {"url": "http://example.com/1", "url_mobile": "", "title": "Zürich talks – day one", "seendate": "20240101T000000Z",
+     "socialimage": "", "domain": "example.com", "language": "German", "sourcecountry": "Switzerland"},
+    {"url": "http://example.com/2", "title": "Brackets ] and { braces } in a title", "seendate": "20240101T000100Z",
+     "domain": "example.com", "language": "English", "sourcecountry": "United Kingdom"},
+]
+
+
+def chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestArticleStreamParser(unittest.TestCase):
+
+    def test_any_chunking_gives_the_same_records(self):
+        body = json.dumps({"articles": ARTICLES}, ensure_ascii=False, indent=1).encode('utf-8')
+        expected = as_articles(ARTICLES)
+        for size in (1, 2, 7, 64, len(body)):
+            self.assertEqual(parse_articles(chunked(body, size)), expected, f"chunk size {size}")
+
+    def test_articles_are_returned_as_their_objects_complete(self):
+        body = json.dumps({"articles": ARTICLES}).encode('utf-8')
+        first_end = body.index(b'}') + 1
+        parser = ArticleStreamParser()
+        self.assertEqual(parser.feed(body[:first_end - 1]), [])
+        self.assertEqual([a.url for a in parser.feed(body[first_end - 1:first_end + 1])], ["http://example.com/1"])
+        self.assertEqual([a.url for a in parser.feed(body[first_end + 1:])], ["http://example.com/2"])
+        self.assertEqual(parser.close(), [])
+        self.assertEqual((parser.articles, parser.bytes), (2, len(body)))
+
+    def test_empty_answers_and_raw_control_characters(self):
+        self.assertEqual(parse_articles([b'']), [])
+        self.assertEqual(parse_articles([b'{}']), [])
+        self.assertEqual(parse_articles([b' { }\n']), [])
+        self.assertEqual(parse_articles([b'{"articles": []}']), [])
+        articles = parse_articles([b'{"articles": [{"url": "u", "title": "Line\x01break"}]}'])
+        self.assertEqual(articles[0].title, "Line\x01break")
+
+    def test_truncated_body_raises(self):
+        body = json.dumps({"articles": ARTICLES}).encode('utf-8')
+        with self.assertRaises(json.JSONDecodeError):
+            parse_articles([body[:-10]])
+
+    def test_body_without_articles_raises(self):
+        for body in (b"Please limit requests to one every 5 seconds or contact kalev.leetaru5@gmail.com.",
+                     b"<!DOCTYPE html><html><body><h1>503 Service Unavailable</h1></body></html>",
+                     b'{"status": "error"}'):
+            with self.subTest(body=body[:20]), self.assertRaises(json.JSONDecodeError):
+                parse_articles(chunked(body, 7))
+
+    def test_record_is_compact_and_reads_like_a_dict(self):
+        article = as_articles(ARTICLES)[0]
+        self.assertFalse(hasattr(article, '__dict__'))
+        self.assertEqual(article.get('domain'), "example.com")
+        self.assertEqual(article.get('summary_en', ''), '')
+        self.assertNotIn('url_mobile', article.to_dict())
+        self.assertIs(as_articles([article])[0], article)
+        self.assertEqual(GdeltArticle.from_json(article.to_dict()), article)
+
+
+if __name__ == '__main__':
+    unittest.main()
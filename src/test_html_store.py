@@ -0,0 +1,100 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import aiohttp
+
+from src.ScrapeNews import ArticleFetcher
+from src.db import Database
+from src.fake_servers import FakeNewsFarm, ServerThread
+from src.html_store import HtmlStore
+from src.initialize_db import create_database_and_tables
+from src.reparse import reparse
+
+
+class TestHtmlStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = HtmlStore(os.path.join(self.tmp.name, 'html'))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_pages_are_content_addressed_by_canonical_url(self):
+        html = ("<html><body>" + "<p>Ceasefire talks resume — in Geneva</p>" * 20 + "</body></html>").encode('utf-8')
+        self.store.put("https://www.news.example/world/1/?utm_source=tw", html, 'utf-8', etag='"v1"')
+        page = self.store.lookup("http://news.example/world/1")
+        self.assertEqual((page.etag, page.size), ('"v1"', len(html)))
+        self.assertEqual(self.store.conditional_headers(page), {'If-None-Match': '"v1"'})
+        self.assertIn("resume — in Geneva", self.store.read(page))
+        self.assertIsNone(self.store.lookup("http://news.example/world/2"))
+
+        # The same page syndicated under another URL shares the blob
+        self.store.put("https://wire.example/story", html, 'utf-8')
+        self.assertEqual(self.store.stats['deduplicated'], 1)
+        blobs = [name for _, _, files in os.walk(os.path.join(self.store.root, 'objects')) for name in files]
+        self.assertEqual(len(blobs), 1)
+        self.assertLess(os.path.getsize(self.store.blob_path(page.sha256)), len(html))
+
+    def test_fetcher_revalidates_stored_pages(self):
+        farm = FakeNewsFarm(sites=1)
+
+        async def fetch_three_times(url):
+            async with aiohttp.ClientSession() as session:
+                fetcher = ArticleFetcher(session, store=self.store)
+                self.store.fresh_seconds = 0
+                pages = [await fetcher.fetch(url), await fetcher.fetch(url)]
+                self.store.fresh_seconds = 3600
+                pages.append(await fetcher.fetch(url))
+                return fetcher, pages
+
+        with ServerThread(farm):
+            fetcher, pages = asyncio.run(fetch_three_times(farm.article_url('news.example', 1)))
+        self.assertEqual(len(set(pages)), 1)
+        self.assertEqual((farm.requests, farm.not_modified), (2, 1))  # the third fetch never left the store
+        self.assertEqual(fetcher.bytes_fetched, len(pages[0]))
+        self.assertEqual((self.store.stats['downloaded'], self.store.stats['not_modified'], self.store.stats['fresh']),
+                         (1, 1, 1))
+        self.assertEqual(self.store.stats['bytes_saved'], 2 * len(pages[0]))
+        self.assertAlmostEqual(self.store.hit_rate(), 2 / 3)
+
+
+class TestReparse(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmp.name, 'test.db')
+        create_database_and_tables(db_path)
+        self.db = Database(db_path)
+        self.store = HtmlStore(os.path.join(self.tmp.name, 'html'))
+
+    def tearDown(self):
+        self.store.close()
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_bodies_are_rebuilt_from_stored_pages_only(self):
+        farm = FakeNewsFarm(sites=1)  # only its page generator; nothing is served
+        urls = [f"https://news.example/world/{i}" for i in range(4)]
+        self.db.executemany("INSERT INTO articles (topic, url, title, body_length) VALUES (?, ?, ?, ?)",
+                            [("UK", url, f"Story {i}", None if i == 3 else 3) for i, url in enumerate(urls)])
+        for url in urls[:2] + urls[3:]:
+            self.store.put(url, farm.page(url).encode('utf-8'), 'utf-8')
+
+        report = reparse('2000-01-01', '2100-01-01', workers=2, db=self.db, store=self.store)
+        # url 2 was never stored; url 3 was not scraped yet, so it is the scraper's
+        self.assertEqual({k: report[k] for k in ('articles', 'missing', 'reparsed', 'failed', 'changed')},
+                         {'articles': 3, 'missing': 1, 'reparsed': 2, 'failed': 0, 'changed': 2})
+        rows = dict(self.db.query("SELECT url, body_length FROM articles"))
+        self.assertGreater(rows[urls[0]], 1000)
+        self.assertEqual((rows[urls[2]], rows[urls[3]]), (3, None))
+
+        self.assertEqual(reparse('2000-01-01', '2100-01-01', ['UK'], workers=2, db=self.db, store=self.store)['changed'], 0)
+        self.assertEqual(reparse('2000-01-01', '2100-01-01', ['NATO'], workers=2, db=self.db, store=self.store)['articles'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
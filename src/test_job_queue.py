@@ -0,0 +1,184 @@
+import asyncio
+import os
+import signal
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from src.job_queue import JobQueue
+from src.workers import Worker, start_workers
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def record_effect(db_path, key):
+    conn = sqlite3.connect(db_path, timeout=60)
+    with conn:
+        conn.execute("INSERT INTO effects (key, pid) VALUES (?, ?)", (key, os.getpid()))
+    conn.close()
+
+
+async def slow_effect(worker, job):
+    await asyncio.sleep(0.1)
+    await asyncio.to_thread(record_effect, worker.queue.db_path, job.key)
+
+
+def effect_worker(db_path):
+    """A worker process whose fetch jobs each record one side effect."""
+    queue = JobQueue(db_path, lease_seconds=1)
+    asyncio.run(Worker(queue, slots=2, poll_seconds=0.05, handlers={'fetch': slow_effect}).run())
+    queue.close()
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.queue = JobQueue(os.path.join(self.tmp.name, 'test.db'), lease_seconds=60, max_attempts=2,
+                              retry_seconds=10, clock=self.clock)
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmp.cleanup()
+
+    def test_enqueue_is_idempotent(self):
+        self.assertTrue(self.queue.enqueue('fetch', 1, 'UK', {'id': 1, 'url': 'http://a/1'}))
+        self.assertFalse(self.queue.enqueue('fetch', 1, 'UK'))
+        self.assertEqual(self.queue.enqueue_many('fetch', [(1, 'UK', None), (2, 'UK', None)]), 1)
+        job = self.queue.claim('w1')
+        self.assertEqual((job.key, job.payload, job.attempts), ('1', {'id': 1, 'url': 'http://a/1'}, 1))
+        self.assertTrue(self.queue.complete(job, 'w1'))
+        self.assertFalse(self.queue.complete(job, 'w1'))
+        self.assertFalse(self.queue.enqueue('fetch', 1, 'UK'))  # done stays done
+        with self.assertRaises(ValueError):
+            self.queue.enqueue('scrape', 1, 'UK')
+
+    def test_expired_lease_is_taken_over(self):
+        self.queue.enqueue('fetch', 1, 'UK')
+        job = self.queue.claim('w1')
+        self.assertIsNone(self.queue.claim('w2'))
+        self.clock.now += 50
+        self.assertTrue(self.queue.heartbeat(job, 'w1'))
+        self.clock.now += 50
+        self.assertIsNone(self.queue.claim('w2'))  # the heartbeat extended the lease
+
+        self.clock.now += 61  # w1 died
+        taken = self.queue.claim('w2')
+        self.assertEqual((taken.id, taken.attempts), (job.id, 2))
+        self.assertFalse(self.queue.heartbeat(job, 'w1'))
+        self.assertFalse(self.queue.complete(job, 'w1'))
+        self.assertIsNone(self.queue.fail(job, 'w1', 'stalled'))
+        self.assertTrue(self.queue.complete(taken, 'w2'))
+        self.assertEqual(self.queue.counts(), {'fetch': {'pending': 0, 'leased': 0, 'done': 1, 'failed': 0}})
+
+    def test_failed_attempts_back_off_then_fail(self):
+        self.queue.enqueue('summarize', 7, 'UK')
+        job = self.queue.claim('w1')
+        self.assertEqual(self.queue.fail(job, 'w1', 'RuntimeError: boom'), 'pending')
+        self.assertIsNone(self.queue.claim('w1'))
+        self.clock.now += 10
+        job = self.queue.claim('w1')
+        self.assertEqual(self.queue.fail(job, 'w1', 'RuntimeError: boom again'), 'failed')
+        self.clock.now += 3600
+        self.assertIsNone(self.queue.claim('w1'))
+        self.assertEqual(self.queue.unfinished(), 0)
+        self.assertEqual(self.queue.failures(), [('summarize', '7', 'UK', 'RuntimeError: boom again')])
+
+        self.assertEqual(self.queue.retry_failed(['fetch']), 0)
+        self.assertEqual(self.queue.retry_failed(), 1)
+        self.assertEqual(self.queue.claim('w1').attempts, 1)
+
+    def test_worker_dying_on_its_last_attempt_fails_the_job(self):
+        self.queue.enqueue('fetch', 1, 'UK', max_attempts=1)
+        self.queue.claim('w1')
+        self.clock.now += 61
+        self.assertIsNone(self.queue.claim('w2'))
+        self.assertEqual(self.queue.failures(), [('fetch', '1', 'UK', 'lease expired')])
+
+    def test_watchlist_waits_for_its_topic(self):
+        self.queue.enqueue('watchlist', 'UK/2024-01-01', 'UK')
+        self.queue.enqueue('watchlist', 'NATO/2024-01-01', 'NATO')
+        self.queue.enqueue('search', 'UK/2024-01-01', 'UK')
+        self.queue.enqueue('fetch', 1, 'UK')
+        claimed = [self.queue.claim('w1', ['watchlist', 'search']), self.queue.claim('w1', ['watchlist', 'search'])]
+        self.assertEqual([(job.kind, job.topic) for job in claimed], [('watchlist', 'NATO'), ('search', 'UK')])
+        self.assertIsNone(self.queue.claim('w1', ['watchlist']))
+        self.queue.complete(claimed[1], 'w1')
+        self.assertIsNone(self.queue.claim('w1', ['watchlist']))  # the fetch is still pending
+        self.queue.complete(self.queue.claim('w1'), 'w1')
+        self.assertEqual(self.queue.claim('w1').key, 'UK/2024-01-01')
+
+    def test_worker_drains_follow_up_jobs(self):
+        ran = []
+
+        async def search(worker, job):
+            ran.append(job.kind)
+            worker.queue.enqueue_many('fetch', [(i, job.topic, None) for i in range(3)])
+
+        async def fetch(worker, job):
+            ran.append(job.kind)
+            if job.key == '2' and job.attempts == 1:
+                raise RuntimeError("connection reset")
+
+        async def watchlist(worker, job):
+            ran.append(job.kind)
+
+        self.queue.retry_seconds = 0
+        self.queue.enqueue('search', 'UK/2024-01-01', 'UK')
+        self.queue.enqueue('watchlist', 'UK/2024-01-01', 'UK')
+        worker = Worker(self.queue, slots=3, poll_seconds=0.01,
+                        handlers={'search': search, 'fetch': fetch, 'watchlist': watchlist})
+        counts = asyncio.run(worker.run())
+        self.assertEqual(ran, ['search', 'fetch', 'fetch', 'fetch', 'fetch', 'watchlist'])
+        self.assertEqual(dict(counts), {'search_done': 1, 'fetch_done': 3, 'fetch_retry': 1, 'watchlist_done': 1})
+        self.assertEqual(self.queue.unfinished(), 0)
+
+
+class TestKilledWorkers(unittest.TestCase):
+
+    def test_run_resumes_after_workers_are_killed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'test.db')
+            queue = JobQueue(db_path, lease_seconds=1)
+            conn = sqlite3.connect(db_path)
+            conn.execute("CREATE TABLE effects (key TEXT, pid INTEGER)")
+            conn.commit()
+            queue.enqueue_many('fetch', [(i, 'UK', None) for i in range(60)])
+
+            workers = start_workers(3, effect_worker, (db_path,))
+            deadline = time.time() + 60
+            while queue.counts()['fetch']['done'] < 10 and time.time() < deadline:
+                time.sleep(0.02)
+            for process in workers[:2]:
+                os.kill(process.pid, signal.SIGKILL)
+            for process in workers[:2]:
+                process.join()
+            done_before = {key for key, in conn.execute("SELECT key FROM jobs WHERE state = 'done'")}
+            in_flight = {key for key, in conn.execute("SELECT key FROM jobs WHERE state = 'leased'")}
+
+            workers += start_workers(2, effect_worker, (db_path,))
+            for process in workers[2:]:
+                process.join(60)
+                self.assertEqual(process.exitcode, 0)
+
+            self.assertEqual(queue.counts()['fetch'], {'pending': 0, 'leased': 0, 'done': 60, 'failed': 0})
+            effects = dict(conn.execute("SELECT key, COUNT(*) FROM effects GROUP BY key"))
+            self.assertEqual(set(effects), {str(i) for i in range(60)})
+            self.assertGreaterEqual(len(done_before), 10)
+            self.assertTrue(all(effects[key] == 1 for key in done_before))  # completed work never runs again
+            repeated = {key for key, count in effects.items() if count > 1}
+            self.assertLessEqual(repeated, in_flight)  # only jobs the killed workers were holding
+            conn.close()
+            queue.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from src.llm_cache import CacheMissError, LLMCache
+
+TOOLS = [{"type": "function", "function": {"name": "Summarizer"}}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLLMCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.db")
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_cache(self, **kwargs):
+        cache = LLMCache(self.path, clock=self.clock, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_key_ignores_whitespace_but_not_prompt_inputs(self):
+        key = LLMCache.make_key("gpt-4o-mini", "T {x}", TOOLS, "Some  article\n text", topic="UK")
+        self.assertEqual(key, LLMCache.make_key("gpt-4o-mini", "T {x}", TOOLS, " Some article text ", topic="UK"))
+        self.assertNotEqual(key, LLMCache.make_key("gpt-4o", "T {x}", TOOLS, "Some article text", topic="UK"))
+        self.assertNotEqual(key, LLMCache.make_key("gpt-4o-mini", "T2 {x}", TOOLS, "Some article text", topic="UK"))
+        self.assertNotEqual(key, LLMCache.make_key("gpt-4o-mini", "T {x}", TOOLS, "Some article text", topic="NATO"))
+
+    def test_hit_miss_and_persistence(self):
+        cache = self.make_cache()
+        self.assertIsNone(cache.get("k"))
+        cache.put("k", {"summary_en": "s"})
+        self.assertEqual(cache.get("k"), {"summary_en": "s"})
+        self.assertEqual((cache.stats["hits"], cache.stats["misses"]), (1, 1))
+        reopened = self.make_cache()
+        self.assertEqual(reopened.get("k"), {"summary_en": "s"})
+
+    def test_ttl(self):
+        cache = self.make_cache(ttl_seconds=60)
+        cache.put("k", {"v": 1})
+        self.clock.now += 61
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.stats["expired"], 1)
+
+    def test_lru_eviction_under_size_cap(self):
+        cache = self.make_cache(max_bytes=130)  # room for three 39-byte entries
+        for key in ("a", "b", "c"):
+            self.clock.now += 1
+            cache.put(key, {"v": "x" * 30})
+        self.clock.now += 1
+        cache.get("a")  # a is now the most recently used
+        self.clock.now += 1
+        cache.put("d", {"v": "x" * 30})
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertGreaterEqual(cache.stats["evictions"], 1)
+
+    def test_stored_bytes_follow_replacements_expiry_and_evictions(self):
+        cache = self.make_cache(max_bytes=130)
+        stored = lambda: cache.conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        cache.put("a", {"v": "x" * 30})
+        cache.put("a", {"v": "x" * 10})  # replaced, not added
+        self.assertEqual(cache.stored_bytes, stored())
+        self.assertEqual(cache.stored_bytes, 19)
+        for key in ("b", "c", "d", "e"):
+            self.clock.now += 1
+            cache.put(key, {"v": "x" * 30})
+        self.assertEqual(cache.stored_bytes, stored())
+        self.assertLessEqual(cache.stored_bytes, 130 * 0.9)  # evicted down to the low-water mark
+        self.clock.now += 31 * 86400
+        cache.get("e")
+        self.assertEqual(cache.stats["expired"], 1)
+        self.assertEqual(cache.stored_bytes, stored())
+        self.assertEqual(self.make_cache().stored_bytes, stored())  # loaded when the file is opened
+
+    def test_replay_mode(self):
+        self.make_cache().put("k", {"v": 1})
+        replay = self.make_cache(mode="replay")
+        self.assertEqual(replay.get("k"), {"v": 1})
+        with self.assertRaises(CacheMissError):
+            replay.get("missing")
+        replay.put("new", {"v": 2})
+        self.assertIsNone(self.make_cache().get("new"))
+
+
+if __name__ == '__main__':
+    unittest.main()
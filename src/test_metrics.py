@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from src.metrics import Histogram, Metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.metrics = Metrics(clock=self.clock)
+
+    def test_spans_feed_histograms_and_traces(self):
+        with self.metrics.span('fetch', topic='UK', article_id=7) as span:
+            self.clock.now += 0.2
+            span['bytes'] = 1024
+        with self.assertRaises(ValueError):
+            with self.metrics.span('fetch', topic='UK', article_id=8):
+                self.clock.now += 3
+                raise ValueError("boom")
+
+        report = self.metrics.report()
+        first, second = report['spans']
+        self.assertEqual((first['stage'], first['topic'], first['seconds']), ('fetch', 'UK', 0.2))
+        self.assertEqual(first['attrs'], {'article_id': 7, 'bytes': 1024})
+        self.assertEqual(second['error'], 'ValueError')
+        histogram, = report['histograms']
+        self.assertEqual((histogram['name'], histogram['labels'], histogram['count']),
+                         ('stage_seconds', {'stage': 'fetch', 'topic': 'UK'}, 2))
+        self.assertEqual(report['counters'], [{'name': 'stage_errors_total', 'value': 1,
+                                              'labels': {'error': 'ValueError', 'stage': 'fetch', 'topic': 'UK'}}])
+
+    def test_nested_spans_follow_tasks(self):
+        async def article(i):
+            with self.metrics.span('persist', article_id=i):
+                await asyncio.sleep(0)
+                with self.metrics.span('db_commit'):
+                    await asyncio.sleep(0)
+
+        async def run():
+            with self.metrics.span('scrape', topic='UK'):
+                await asyncio.gather(article(1), article(2))
+
+        asyncio.run(run())
+        spans = {s['id']: s for s in self.metrics.report()['spans']}
+        scrape = next(s for s in spans.values() if s['stage'] == 'scrape')
+        for commit in (s for s in spans.values() if s['stage'] == 'db_commit'):
+            persist = spans[commit['parent']]
+            self.assertEqual(persist['stage'], 'persist')
+            self.assertEqual(persist['parent'], scrape['id'])
+
+    def test_prometheus_text_format(self):
+        self.metrics.inc('openai_tokens_total', 120, type='prompt', model='gpt-4o-mini')
+        self.metrics.set_gauge('queue_depth', 3, stage='fetch')
+        self.metrics.observe('stage_seconds', 0.3, stage='parse', topic='Say "hi"')
+        text = self.metrics.prometheus()
+        self.assertIn('# TYPE sensusmundi_openai_tokens_total counter', text)
+        self.assertIn('sensusmundi_openai_tokens_total{model="gpt-4o-mini",type="prompt"} 120', text)
+        self.assertIn('sensusmundi_queue_depth{stage="fetch"} 3', text)
+        self.assertIn('sensusmundi_stage_seconds_bucket{stage="parse",topic="Say \\"hi\\"",le="0.25"} 0', text)
+        self.assertIn('sensusmundi_stage_seconds_bucket{stage="parse",topic="Say \\"hi\\"",le="+Inf"} 1', text)
+        self.assertIn('sensusmundi_stage_seconds_count{stage="parse",topic="Say \\"hi\\""} 1', text)
+
+    def test_quantiles_and_report_files(self):
+        histogram = Histogram(buckets=(1, 2, 4))
+        for value in (0.5, 1.5, 1.5, 3, 10):
+            histogram.observe(value)
+        self.assertAlmostEqual(histogram.quantile(0.5), 1.75)
+        self.assertEqual(histogram.quantile(0.99), 4)
+
+        self.metrics.observe('stage_seconds', 0.1, stage='search', topic='UK')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self.metrics.write_report(tmp)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['histograms'][0]['count'], 1)
+            self.assertTrue(os.path.exists(os.path.join(tmp, 'metrics.prom')))
+
+    def test_disabled_and_bounded(self):
+        off = Metrics(enabled=False)
+        with off.span('fetch') as span:
+            span['bytes'] = 1
+        off.inc('x_total')
+        self.assertEqual((off.report()['spans'], off.report()['counters']), ([], []))
+
+        bounded = Metrics(max_spans=2)
+        for _ in range(5):
+            with bounded.span('parse'):
+                pass
+        self.assertEqual((len(bounded.report()['spans']), bounded.spans_dropped), (2, 3))
+        self.assertEqual(bounded.report()['histograms'][0]['count'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
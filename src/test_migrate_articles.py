@@ -0,0 +1,81 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from src.initialize_db import create_database_and_tables
+from src.migrate_articles import migrate
+from src.openai_client import UPSERT_DEAD_LETTER, dead_letter_row
+
+LEGACY_SCHEMA = '''
+CREATE TABLE {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT,
+    seendate TEXT,
+    domain TEXT,
+    language TEXT,
+    sourcecountry TEXT,
+    relevance_score REAL,
+    date_added DATE DEFAULT CURRENT_DATE,
+    news_body TEXT,
+    short_title_en TEXT,
+    summary_en TEXT,
+    sentiment TEXT
+)
+'''
+
+
+class TestMigrateArticles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmpdir.name, "legacy.db")
+        create_database_and_tables(self.db)  # for llm_dead_letter; migrate() starts the same way
+        conn = sqlite3.connect(self.db)
+        for table in ("UK", "NATO"):
+            conn.execute(LEGACY_SCHEMA.format(table=table))
+        rows = [
+            ("UK", "https://a", "A", None, "", "2024-05-01"),
+            ("UK", "https://a", "A", "body", "summary of a", "2024-05-01"),  # duplicate, summarised copy wins
+            ("UK", "https://b", "B", None, "", "2024-05-02"),
+            ("NATO", "https://a", "A", None, "", "2024-05-01"),  # same URL under another topic is kept
+        ]
+        for table, url, title, body, summary, day in rows:
+            conn.execute(f"INSERT INTO {table} (url, title, news_body, summary_en, date_added) VALUES (?, ?, ?, ?, ?)",
+                         (url, title, body, summary, day))
+        conn.execute(UPSERT_DEAD_LETTER, dead_letter_row('summary', 'UK', 3, {"model": "m"}, "HTTP 429", {"news_body": "b"}))
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_migrate(self):
+        migrate(self.db)
+        migrate(self.db)  # already-migrated tables are skipped, dead letters are not re-pointed twice
+        conn = sqlite3.connect(self.db)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM migrated_legacy_tables").fetchone()[0], 2)
+        rows = conn.execute("SELECT topic, url, summary_en FROM articles ORDER BY topic, url").fetchall()
+        self.assertEqual(rows, [("NATO", "https://a", ""), ("UK", "https://a", "summary of a"), ("UK", "https://b", "")])
+        new_id = conn.execute("SELECT id FROM articles WHERE topic = 'UK' AND url = 'https://b'").fetchone()[0]
+        self.assertEqual(conn.execute("SELECT ref FROM llm_dead_letter").fetchall(), [(str(new_id),)])
+        conn.close()
+
+    def test_drop_legacy_and_indexes_used(self):
+        migrate(self.db, drop_legacy=True)
+        conn = sqlite3.connect(self.db)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertNotIn("UK", tables)
+        plan = " ".join(str(r) for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id, url FROM articles WHERE topic = 'UK' AND body_length IS NULL"))
+        self.assertIn("idx_articles_unscraped", plan)
+        plan = " ".join(str(r) for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM articles WHERE topic = 'UK' AND date_added = '2024-05-01'"))
+        self.assertIn("idx_articles_topic_date", plan)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import aiohttp
+
+from src import body_store as body_store_module
+from src import db as db_module
+from src import llm_cache as llm_cache_module
+from src import openai_client as openai_client_module
+from src import preprocess as preprocess_module
+from src.db import Database
+from src.fake_openai import FakeOpenAIServer
+from src.initialize_db import create_database_and_tables
+from src.llm_cache import LLMCache
+from src.openai_batch import BatchClient, summarize_in_batches
+from src.openai_client import OpenAIClient, get_dead_letters, record_dead_letter
+from src.ScrapeNews import queue_summary, retry_dead_letters
+
+
+class TestBatchSummaries(unittest.TestCase):
+    """summarize_in_batches against FakeOpenAIServer's Files and Batches endpoints."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'test.db')
+        create_database_and_tables(self.db_path)
+        self.db = Database(self.db_path)
+        self.cache = LLMCache(os.path.join(self.tmp.name, 'cache.db'))
+        self.patches = [mock.patch.object(db_module, '_database', self.db),
+                        mock.patch.object(llm_cache_module, '_llm_cache', self.cache),
+                        mock.patch.object(body_store_module, '_body_store', None),
+                        mock.patch.object(preprocess_module, '_preprocessor', None)]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.cache.close()
+        self.db.close()
+        self.tmp.cleanup()
+
+    def queue(self, topic: str, count: int):
+        self.db.executemany("INSERT INTO articles (topic, url, title) VALUES (?, ?, ?)",
+                            [(topic, f"http://{topic}/{i}", f"title {i}") for i in range(count)])
+        ids = [row[0] for row in self.db.query("SELECT id FROM articles WHERE topic = ? ORDER BY id", (topic,))]
+
+        async def main():
+            for article_id in ids:
+                await queue_summary(topic, article_id, f"Body of article {article_id} about {topic}. " * 20)
+        asyncio.run(main())
+        return ids
+
+    def run_batches(self, server: FakeOpenAIServer, **kwargs):
+        async def main():
+            await server.start()
+            try:
+                client = BatchClient('test-key', base_url=server.base_url)
+                return await summarize_in_batches(client, poll_seconds=0.01, **kwargs)
+            finally:
+                await server.stop()
+        return asyncio.run(main())
+
+    def summarized(self):
+        return self.db.query("SELECT COUNT(*) FROM articles WHERE summary_en IS NOT NULL AND summary_en != ''")[0][0]
+
+    def test_all_topics_go_into_one_batch_and_failures_are_resubmitted(self):
+        self.queue('UK', 6)
+        self.queue('NATO', 4)
+        server = FakeOpenAIServer(batch_error_every=3)
+        stats = self.run_batches(server, max_wait_minutes=1)
+        self.assertEqual(stats['submitted'], 13)  # 10, then the 3 that failed once
+        self.assertEqual(stats['summarized'], 10)
+        self.assertEqual(stats['retried'], 3)
+        self.assertEqual(stats['queued'], 0)
+        self.assertEqual(len(server.batches), 2)
+        self.assertEqual(self.summarized(), 10)
+        self.assertEqual(server.completed, 10)
+        self.assertEqual(server.requests, 0)  # nothing went through the real-time endpoint
+
+        # A second run finds every summary in the LLM cache and submits nothing
+        self.db.execute("UPDATE articles SET summary_en = NULL")
+        self.db.executemany("INSERT INTO summary_queue (article_id, topic, queued_at) VALUES (?, ?, 0)",
+                            self.db.query("SELECT id, topic FROM articles"))
+        server = FakeOpenAIServer()
+        stats = self.run_batches(server, max_wait_minutes=1)
+        self.assertEqual(stats['cached'], 10)
+        self.assertNotIn('submitted', stats)
+        self.assertFalse(server.batches)
+        self.assertEqual(self.summarized(), 10)
+
+    def test_persistent_failures_are_dead_lettered(self):
+        ids = self.queue('UK', 3)
+        server = FakeOpenAIServer(batch_error_every=1, batch_error_attempts=10)
+        stats = self.run_batches(server, max_wait_minutes=1, max_attempts=2)
+        self.assertEqual(stats['submitted'], 6)
+        self.assertEqual(stats['dead_lettered'], 3)
+        self.assertEqual(stats['queued'], 0)
+        letters = asyncio.run(get_dead_letters('summary', 'UK'))
+        self.assertEqual([int(letter['ref']) for letter in letters], ids)
+        self.assertIn('failed 2 times', letters[0]['error'])
+        self.assertIn('HTTP 500', letters[0]['error'])
+        self.assertTrue(letters[0]['context']['news_body'].startswith(f"Body of article {ids[0]}"))
+
+    def test_unfinished_batch_is_picked_up_by_the_next_run(self):
+        self.queue('UK', 3)
+        server = FakeOpenAIServer(batch_seconds=60)
+        stats = self.run_batches(server, max_wait_minutes=0)
+        self.assertEqual(stats['open_batches'], 1)
+        self.assertEqual(stats['queued'], 3)
+        self.assertEqual(self.summarized(), 0)
+
+        # The next run polls the batch it left open instead of submitting the articles again
+        server.batch_seconds = 0
+        stats = self.run_batches(server, max_wait_minutes=1)
+        self.assertNotIn('submitted', stats)
+        self.assertEqual(stats['summarized'], 3)
+        self.assertEqual(stats['open_batches'], 0)
+        self.assertEqual(len(server.batches), 1)
+        self.assertEqual(self.summarized(), 3)
+
+    def retry_dead_letters(self, server: FakeOpenAIServer, topic: str = 'UK'):
+        async def main():
+            await server.start()
+            try:
+                client = OpenAIClient('test-key', base_url=server.base_url, backoff_base=0.01)
+                with mock.patch.object(openai_client_module, '_client', client):
+                    async with aiohttp.ClientSession() as session:
+                        return await retry_dead_letters(session, topic)
+            finally:
+                await server.stop()
+        return asyncio.run(main())
+
+    def test_dead_letter_retries_go_through_the_cache(self):
+        ids = self.queue('UK', 2)
+        self.run_batches(FakeOpenAIServer(batch_error_every=1, batch_error_attempts=10), max_wait_minutes=1, max_attempts=1)
+        letters = asyncio.run(get_dead_letters('summary', 'UK'))
+        self.assertEqual(len(letters), 2)
+
+        server = FakeOpenAIServer()
+        self.assertEqual(self.retry_dead_letters(server), set(ids))
+        self.assertEqual((server.requests, self.summarized()), (2, 2))
+        self.assertEqual(asyncio.run(get_dead_letters('summary', 'UK')), [])
+
+        # Replay mode answers from what the live retries cached and sends nothing; a miss stays dead-lettered
+        self.db.execute("UPDATE articles SET summary_en = NULL")
+        unknown = dict(letters[0], ref=99, context={'news_body': "Never summarised"})
+
+        async def dead_letter(letters):
+            for letter in letters:
+                await record_dead_letter('summary', 'UK', letter['ref'], letter['payload'], "HTTP 500", letter['context'])
+        asyncio.run(dead_letter(letters + [unknown]))
+        replay = LLMCache(os.path.join(self.tmp.name, 'cache.db'), mode='replay')
+        with mock.patch.object(llm_cache_module, '_llm_cache', replay):
+            server = FakeOpenAIServer()
+            self.assertEqual(self.retry_dead_letters(server), set(ids) | {99})
+        replay.close()
+        self.assertEqual((server.requests, self.summarized()), (0, 2))
+        self.assertEqual([letter['ref'] for letter in asyncio.run(get_dead_letters('summary', 'UK'))], ['99'])
+
+
+if __name__ == '__main__':
+    unittest.main()
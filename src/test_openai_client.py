@@ -0,0 +1,135 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+import aiohttp
+from src import db as db_module
+from src.db import Database
+from src.fake_openai import FakeOpenAIServer
+from src.initialize_db import create_database_and_tables
+from src.openai_client import (
+    OpenAIClient,
+    OpenAIRequestError,
+    TokenBucket,
+    get_dead_letters,
+    parse_tool_arguments,
+    record_dead_letter,
+    resolve_dead_letter,
+)
+
+PAYLOAD = {
+    "model": "gpt-4o-mini",
+    "max_tokens": 10,
+    "messages": [{"role": "user", "content": "Summarise: hello"}],
+    "tools": [{"type": "function", "function": {"name": "Summarizer", "parameters": {
+        "type": "object", "properties": {"summary_en": {"type": "string"}}, "required": ["summary_en"]}}}],
+}
+
+
+def with_content(i):
+    return {**PAYLOAD, "messages": [{"role": "user", "content": f"Summarise: article {i}"}]}
+
+
+class TestOpenAIClient(unittest.TestCase):
+
+    def run_against(self, server: FakeOpenAIServer, coro_factory, **client_kwargs):
+        async def main():
+            await server.start()
+            try:
+                client = OpenAIClient("test-key", base_url=server.base_url, backoff_base=0.01, **client_kwargs)
+                async with aiohttp.ClientSession() as session:
+                    return client, await coro_factory(client, session)
+            finally:
+                await server.stop()
+        return asyncio.run(main())
+
+    def test_rate_limited_requests_are_retried(self):
+        server = FakeOpenAIServer(rate_limit_first=3, retry_after=0.05)
+
+        async def go(client, session):
+            return await asyncio.gather(*[client.chat_completion(session, with_content(i)) for i in range(5)])
+
+        client, results = self.run_against(server, go)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all('summary_en' in parse_tool_arguments(r) for r in results))
+        self.assertEqual(client.stats['rate_limited'], 3)
+        self.assertEqual(server.completed, 5)
+
+    def test_persistent_server_errors_raise_with_payload(self):
+        server = FakeOpenAIServer(server_error_every=1)
+
+        async def go(client, session):
+            with self.assertRaises(OpenAIRequestError) as ctx:
+                await client.chat_completion(session, PAYLOAD)
+            return ctx.exception
+
+        client, error = self.run_against(server, go, max_retries=2)
+        self.assertEqual(error.status, 500)
+        self.assertEqual(error.payload, PAYLOAD)
+        self.assertEqual(server.requests, 3)
+
+    def test_identical_inflight_requests_are_coalesced(self):
+        server = FakeOpenAIServer(latency=0.05)
+
+        async def go(client, session):
+            return await asyncio.gather(*[client.chat_completion(session, PAYLOAD) for _ in range(4)])
+
+        client, results = self.run_against(server, go)
+        self.assertEqual(server.requests, 1)
+        self.assertEqual(client.stats['coalesced'], 3)
+        self.assertEqual(len({str(r) for r in results}), 1)
+
+    def test_requests_per_minute_limit(self):
+        server = FakeOpenAIServer()
+
+        async def go(client, session):
+            client.request_bucket = TokenBucket(per_minute=600, capacity=1)  # 10 requests/s, no burst
+            start = time.monotonic()
+            await asyncio.gather(*[client.chat_completion(session, with_content(i)) for i in range(5)])
+            return time.monotonic() - start
+
+        _, elapsed = self.run_against(server, go)
+        self.assertGreaterEqual(elapsed, 0.35)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_wait_time(self):
+        now = [0.0]
+        bucket = TokenBucket(per_minute=60, capacity=2, clock=lambda: now[0])
+        self.assertEqual(bucket.wait_time(2), 0)
+        bucket.take(2)
+        self.assertAlmostEqual(bucket.wait_time(1), 1.0)
+        now[0] = 0.5
+        self.assertAlmostEqual(bucket.wait_time(1), 0.5)
+
+
+class TestDeadLetters(unittest.TestCase):
+
+    def test_record_retry_resolve(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "test.db")
+            create_database_and_tables(path)
+            db = Database(path)
+
+            async def main():
+                await record_dead_letter('summary', 'UK', 7, PAYLOAD, "HTTP 429", {"news_body": "body"})
+                await record_dead_letter('summary', 'UK', 7, PAYLOAD, "HTTP 500", {"news_body": "body"})
+                letters = await get_dead_letters('summary', 'UK')
+                await resolve_dead_letter('summary', 'UK', 7)
+                return letters, await get_dead_letters('summary', 'UK')
+
+            with mock.patch.object(db_module, '_database', db):
+                letters, resolved = asyncio.run(main())
+            db.close()
+            self.assertEqual(len(letters), 1)
+            self.assertEqual(letters[0]['attempts'], 2)
+            self.assertEqual(letters[0]['context'], {"news_body": "body"})
+            self.assertEqual(letters[0]['payload'], PAYLOAD)
+            self.assertEqual(resolved, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
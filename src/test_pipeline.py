@@ -0,0 +1,129 @@
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from unittest import mock
+from src import pipeline
+from src.gdelt_ingest import IngestBatch
+
+
+class FakeSearcher:
+    def __init__(self):
+        self.searched = []
+
+    def get_gdelt_query_string(self, topic):
+        return f"http://gdelt.test/?query={topic}"
+
+    def search_gdelt(self, topic, articles=None):
+        self.searched.append(topic)
+
+
+class FakeIngester:
+    advanced = []
+
+    def __init__(self, session, query_url_for):
+        self.query_url_for = query_url_for
+
+    async def stream(self, topics):
+        for topic in topics:
+            self.query_url_for(topic)
+            yield IngestBatch(topic, [{"url": f"http://{topic}/new", "title": "new"}], "20240101T000000Z")
+
+    def advance(self, batch):
+        self.advanced.append(batch.topic)
+
+
+class FakeFetcher:
+    def __init__(self, session, max_inflight=None):
+        pass
+
+    async def fetch(self, url):
+        await asyncio.sleep(0.001)
+        if url.endswith("broken"):
+            raise ValueError("404")
+        return f"<html>{url}</html>"
+
+
+class TestPipeline(unittest.TestCase):
+
+    def run_pipeline(self, articles_by_topic, retry_dead_letters=None, run_date=None):
+        events = []
+        self.watchlist_dates = set()
+
+        async def get_urls(topic):
+            return [dict(a) for a in articles_by_topic[topic]]
+
+        async def summarize_article(session, topic, article_id, body, url=None):
+            return {"short_title_en": "t", "summary_en": body, "sentiment": "neutral"}
+
+        async def update_database(topic, article_id, body, summaries):
+            events.append(("persist", topic, article_id))
+
+        async def watchlist(topic, target_date):
+            events.append(("watchlist", topic))
+            self.watchlist_dates.add(target_date)
+
+        seen = mock.Mock()
+        seen.is_seen_body.return_value = False
+        with mock.patch.multiple(
+            pipeline,
+            ArticleFetcher=FakeFetcher,
+            GdeltIngester=FakeIngester,
+            ProcessPoolExecutor=ThreadPoolExecutor,
+            parse_html=lambda url, html: html.upper(),
+            get_urls_from_database=get_urls,
+            summarize_article=summarize_article,
+            retry_dead_letters=retry_dead_letters or mock.AsyncMock(return_value=set()),
+            update_database=update_database,
+            generate_and_store_watchlist=watchlist,
+            get_seen_index=lambda: seen,
+            get_preprocessor=lambda: events.append(("preprocessor", None)),
+        ):
+            searcher = FakeSearcher()
+            counts = asyncio.run(pipeline.run_pipeline(list(articles_by_topic), searcher, {"parse": 2}, queue_size=2,
+                                                         run_date=run_date))
+        return searcher, counts, events
+
+    def test_every_topic_gets_a_watchlist_after_its_articles(self):
+        articles = {
+            "UK": [{"id": i, "url": f"http://uk/{i}"} for i in range(10)],
+            "NATO": [{"id": 1, "url": "http://nato/1"}, {"id": 2, "url": "http://nato/broken"}],
+            "Climate": [],
+        }
+        FakeIngester.advanced = []
+        searcher, counts, events = self.run_pipeline(articles)
+        self.assertEqual(sorted(searcher.searched), ["Climate", "NATO", "UK"])
+        self.assertEqual(sorted(FakeIngester.advanced), ["Climate", "NATO", "UK"])
+        self.assertEqual(counts["persist_ok"], 11)
+        self.assertEqual(counts["fetch_failed"], 1)
+        for topic in articles:
+            watchlist_at = events.index(("watchlist", topic))
+            persisted = [i for i, e in enumerate(events) if e[0] == "persist" and e[1] == topic]
+            self.assertTrue(all(i < watchlist_at for i in persisted))
+        self.assertEqual(sum(1 for e in events if e[0] == "watchlist"), 3)
+        self.assertEqual(events[0], ("preprocessor", None))  # warmed up in a thread before any summary
+        self.assertEqual(self.watchlist_dates, {date.today()})
+
+    def test_watchlists_are_for_the_run_date(self):
+        _, _, events = self.run_pipeline({"UK": [{"id": 1, "url": "http://uk/1"}]}, run_date=date(2024, 3, 1))
+        self.assertIn(("watchlist", "UK"), events)
+        self.assertEqual(self.watchlist_dates, {date(2024, 3, 1)})
+
+    def test_a_topic_that_fails_to_queue_its_articles_still_drains(self):
+        async def retry_dead_letters(session, topic):
+            if topic == "NATO":
+                raise RuntimeError("database is locked")
+            return set()
+
+        articles = {
+            "UK": [{"id": i, "url": f"http://uk/{i}"} for i in range(3)],
+            "NATO": [{"id": 1, "url": "http://nato/1"}],
+        }
+        _, counts, events = self.run_pipeline(articles, retry_dead_letters)
+        self.assertEqual(counts["queue_failed"], 1)
+        self.assertEqual(counts["persist_ok"], 3)
+        self.assertEqual(sorted(e[1] for e in events if e[0] == "watchlist"), ["NATO", "UK"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from src import llm_cache as llm_cache_module
+from src.ScrapeNews import build_summary_payload, summary_cache_key
+from src.body_store import BodyStore
+from src.db import Database
+from src.initialize_db import create_database_and_tables
+from src.llm_cache import LLMCache
+from src.preprocess import (ArticlePreprocessor, BoilerplateModel, learn_boilerplate, load_boilerplate, paragraph_hash,
+                            split_paragraphs)
+from src.token_budget import estimate_tokens
+
+FILLER = "weather sport garden recipe travel music film fashion market holiday".split()
+FOOTER = "You can support our journalism from as little as 1 a month. Every contribution, however small, helps."
+
+
+def filler(rng, words=60):
+    return " ".join(rng.choices(FILLER, k=words)).capitalize() + "."
+
+
+class TestBoilerplate(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "test.db")
+        create_database_and_tables(path)
+        self.db = Database(path)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_paragraphs_recurring_across_a_domain_are_learned(self):
+        rng = random.Random(1)
+        rows = [("UK", f"https://www.paper.example/uk/{i}", f"{filler(rng)}\n\n{FOOTER}") for i in range(6)]
+        rows += [("NATO", "https://paper.example/uk/0", rows[0][2])]  # the same story under another topic counts once
+        rows += [("UK", f"https://wire.example/{i}", f"{filler(rng)}\n\n{FOOTER}") for i in range(3)]
+        self.db.executemany("INSERT INTO articles (topic, url, title, body_length) VALUES (?, ?, 'Story', 1)",
+                            [(topic, url) for topic, url, _ in rows])
+        BodyStore(self.db, codec='zlib').put_many([(i + 1, text) for i, (_, _, text) in enumerate(rows)])
+
+        model = learn_boilerplate(self.db, min_articles=4, min_share=0.5)
+        self.assertEqual(set(model.paragraphs), {'paper.example'})  # wire.example has too few articles
+        self.assertTrue(model.is_boilerplate('paper.example', FOOTER.replace('1', '2')))  # numbers do not matter
+        self.assertFalse(model.is_boilerplate('wire.example', FOOTER))
+        self.assertFalse(model.is_boilerplate('paper.example', rows[0][2].split("\n\n")[0]))
+        self.assertTrue(model.is_boilerplate('wire.example', "Advertisement"))
+        self.assertEqual(load_boilerplate(self.db).paragraphs, model.paragraphs)
+        self.assertEqual(self.db.query("SELECT articles, sample FROM boilerplate_paragraphs"), [(6, FOOTER)])
+
+
+class TestArticlePreprocessor(unittest.TestCase):
+
+    def test_long_bodies_keep_the_lead_and_the_passages_on_topic(self):
+        rng = random.Random(2)
+        lead = "The prime minister faced questions in parliament about the strike by rail workers."
+        on_topic = "Labour and the trade unions said the economy could not take another strike this winter."
+        paragraphs = [lead] + [filler(rng) for _ in range(40)]
+        paragraphs[25] = on_topic
+        body = "\n\n".join(paragraphs + ["Read more: our full coverage of the story", FOOTER])
+        model = BoilerplateModel({'paper.example': frozenset()}, None)
+        preprocessor = ArticlePreprocessor(model, budget_tokens=200, lead_paragraphs=1)
+
+        prepared = preprocessor.prepare(body, 'UK', 'https://paper.example/uk/1')
+        kept = split_paragraphs(prepared.text)
+        self.assertEqual(kept[0], lead)
+        self.assertIn(on_topic, kept)
+        self.assertNotIn("Read more: our full coverage of the story", kept)
+        self.assertLessEqual(prepared.tokens_out, 200)
+        self.assertEqual((prepared.tokens_in, prepared.boilerplate), (estimate_tokens(body), 1))
+        self.assertEqual([p for p in paragraphs + [FOOTER] if p in kept], kept)  # original order
+
+        short = "Parliament voted on the budget.\n\nAdvertisement\n\nThe vote passed."
+        self.assertEqual(preprocessor.prepare(short, 'UK').text, "Parliament voted on the budget.\n\nThe vote passed.")
+        self.assertEqual(preprocessor.stats['articles'], 2)
+        self.assertEqual(preprocessor.stats['trimmed'], 1)
+        self.assertIn("2 articles", preprocessor.report())
+
+    def test_a_single_paragraph_over_budget_is_cut(self):
+        body = " ".join(["word"] * 2000)
+        prepared = ArticlePreprocessor(budget_tokens=100).prepare(body, 'UK')
+        self.assertLessEqual(prepared.tokens_out, 100)
+        self.assertTrue(body.startswith(prepared.text))
+
+    def test_disabled_passes_bodies_through(self):
+        body = "Advertisement\n\n" + " ".join(["word"] * 2000)
+        preprocessor = ArticlePreprocessor(budget_tokens=100, enabled=False)
+        self.assertEqual(preprocessor.prepare(body, 'UK').text, body)
+        self.assertEqual(preprocessor.stats['tokens_in'], preprocessor.stats['tokens_out'])
+
+    def test_summary_cache_key_survives_relearned_boilerplate(self):
+        body = f"Rail workers walked out again.\n\n{FOOTER}"
+        before = ArticlePreprocessor(BoilerplateModel({}, None))
+        after = ArticlePreprocessor(BoilerplateModel({'paper.example': frozenset([paragraph_hash(FOOTER)])}, None))
+        url = 'https://paper.example/uk/1'
+        self.assertNotEqual(before.prepare(body, 'UK', url).text, after.prepare(body, 'UK', url).text)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = LLMCache(os.path.join(tmp, 'cache.db'))
+            with mock.patch.object(llm_cache_module, '_llm_cache', cache):
+                def key(preprocessor):
+                    payload = build_summary_payload(preprocessor.prepare(body, 'UK', url).text, 'UK')
+                    return summary_cache_key(payload, body, 'UK', preprocessor.cache_version)
+                self.assertEqual(key(before), key(after))
+                self.assertNotEqual(key(before), key(ArticlePreprocessor(budget_tokens=300)))
+                self.assertNotEqual(key(before), key(ArticlePreprocessor(enabled=False)))
+            cache.close()
+
+    def test_request_latency_is_fitted_against_prompt_tokens(self):
+        preprocessor = ArticlePreprocessor()
+        self.assertIsNone(preprocessor.seconds_per_1k_tokens())
+        for tokens in range(500, 5500, 500):
+            preprocessor.record_request(tokens, 0.2 + 0.3 * tokens / 1000)
+        self.assertAlmostEqual(preprocessor.seconds_per_1k_tokens(), 0.3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from types import SimpleNamespace
+
+from src.rerank import (
+    BM25Reranker,
+    CohereReranker,
+    HybridReranker,
+    LocalReranker,
+    Reranker,
+    RerankResult,
+    TfidfReranker,
+    get_reranker,
+    ranking_overlap,
+)
+
+QUERY = "UK politics, UK parliament, UK elections, labour, trade unions"
+DOCS = [
+    "Local bakery wins regional bread award",
+    "Labour leads polls ahead of UK elections",
+    "Trade unions call strike over pay in UK parliament row",
+    "New species of frog found in rainforest",
+    "Parliament debates election date as Labour and trade unions meet",
+    "",
+]
+
+
+class FakeCohere:
+    """Ranks by document length, like a remote model we cannot predict; records what it was sent."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def rerank(self, model, query, documents, top_n):
+        self.calls.append(documents)
+        if self.fail:
+            raise TimeoutError("cohere timed out")
+        order = sorted(range(len(documents)), key=lambda i: -len(documents[i]))[:top_n]
+        return SimpleNamespace(results=[SimpleNamespace(index=i, relevance_score=1.0 / (rank + 1)) for rank, i in enumerate(order)])
+
+
+class TestLocalRerankers(unittest.TestCase):
+
+    def test_relevant_titles_rank_first(self):
+        for reranker in (BM25Reranker(), TfidfReranker()):
+            with self.subTest(reranker=reranker.name):
+                response = reranker.rerank(QUERY, DOCS, top_n=3)
+                self.assertEqual(len(response.results), 3)
+                self.assertEqual({r.index for r in response.results}, {1, 2, 4})
+                scores = [r.relevance_score for r in response.results]
+                self.assertEqual(scores, sorted(scores, reverse=True))
+                self.assertTrue(all(0 <= s <= 1 for s in scores))
+
+    def test_no_matching_terms_scores_zero(self):
+        response = BM25Reranker().rerank("cryptocurrency", DOCS)
+        self.assertEqual([r.index for r in response.results], list(range(len(DOCS))))
+        self.assertTrue(all(r.relevance_score == 0 for r in response.results))
+        self.assertEqual(TfidfReranker().rerank(QUERY, []).results, [])
+
+    def test_bases_cannot_be_instantiated(self):
+        for base in (Reranker, LocalReranker):
+            with self.subTest(base=base.__name__), self.assertRaises(TypeError):
+                base()
+
+    def test_ranking_overlap(self):
+        a = SimpleNamespace(results=[RerankResult(i, 1.0) for i in (1, 2, 3)])
+        b = SimpleNamespace(results=[RerankResult(i, 1.0) for i in (3, 2, 9)])
+        self.assertAlmostEqual(ranking_overlap(a, b, k=3), 2 / 3)
+
+
+class TestRemoteRerankers(unittest.TestCase):
+
+    def test_cohere_skips_empty_documents_and_keeps_indices(self):
+        client = FakeCohere()
+        response = CohereReranker(client).rerank(QUERY, DOCS, top_n=2)
+        self.assertNotIn("", client.calls[0])
+        self.assertEqual([r.index for r in response.results], [4, 2])
+
+    def test_hybrid_sends_only_the_shortlist_and_maps_indices_back(self):
+        client = FakeCohere()
+        response = HybridReranker(BM25Reranker(), CohereReranker(client), prefilter_k=3).rerank(QUERY, DOCS, top_n=2)
+        self.assertEqual(len(client.calls[0]), 3)
+        self.assertEqual([r.index for r in response.results], [4, 2])
+
+    def test_hybrid_falls_back_to_local_ranking(self):
+        client = FakeCohere(fail=True)
+        response = HybridReranker(BM25Reranker(), CohereReranker(client), prefilter_k=3).rerank(QUERY, DOCS, top_n=2)
+        self.assertEqual(response.results, BM25Reranker().rerank(QUERY, DOCS, top_n=2).results)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_reranker("word2vec")
+
+
+if __name__ == '__main__':
+    unittest.main()
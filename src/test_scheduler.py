@@ -0,0 +1,184 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+from src.db import Database
+from src import daily_run, metrics
+from src.initialize_db import create_database_and_tables
+from src.scheduler import Burst, PollResult, Scheduler, SyntheticNews, TopicPlan, run_scheduler, simulate
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+HOUR = 3600
+
+
+def scheduler_for(topics, **kwargs):
+    kwargs.setdefault('watchlist_hour', None)
+    return Scheduler(topics, clock=lambda: START, **kwargs)
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_busy_topics_poll_often_and_quiet_ones_back_off(self):
+        scheduler = scheduler_for(['Busy', 'Quiet'], watchlist_hour=18)
+        news = SyntheticNews({'Busy': 120, 'Quiet': 0.5}, start=START)
+        result = simulate(scheduler, news, 48, START)
+
+        busy, quiet = scheduler.states['Busy'].plan, scheduler.states['Quiet'].plan
+        self.assertLess(busy.interval, HOUR)
+        self.assertEqual(quiet.interval, scheduler.max_interval)
+        self.assertIn('quiet', quiet.reasons)
+        self.assertGreater(busy.maxrecords, quiet.maxrecords)
+        self.assertGreater(busy.top_n, quiet.top_n)
+        self.assertGreater(result['topics']['Busy']['polls'], 4 * result['topics']['Quiet']['polls'])
+        self.assertLessEqual(result['topics']['Busy']['truncated'], 1)  # only the first poll, sized blind
+        self.assertEqual([t['watchlists'] for t in result['topics'].values()], [2, 2])  # one a day each
+
+    def test_a_burst_is_followed_and_then_released(self):
+        scheduler = scheduler_for(['Breaking', 'Steady'], max_interval=6 * HOUR)  # polled at least once in the burst
+        news = SyntheticNews({'Breaking': 2, 'Steady': 10}, [Burst('Breaking', 24, 8, 400)], start=START)
+        simulate(scheduler, news, 24, START)
+        before = scheduler.states['Breaking'].plan
+        self.assertEqual(before.interval, scheduler.max_interval)
+
+        simulate(scheduler, news, 8, START + 24 * HOUR)
+        during = scheduler.states['Breaking'].plan
+        self.assertLessEqual(during.interval, 30 * 60)
+        self.assertGreater(during.maxrecords, before.maxrecords)
+        self.assertGreater(during.top_n, before.top_n)
+        self.assertTrue(any('burst' in d['decision'] for d in scheduler.decisions if d['topic'] == 'Breaking'))
+
+        simulate(scheduler, news, 36, START + 32 * HOUR)
+        self.assertGreater(scheduler.states['Breaking'].plan.interval, 3 * HOUR)
+
+    def test_budgets_and_concurrency_hold(self):
+        topics = [f"T{i}" for i in range(12)]
+        scheduler = scheduler_for(topics, max_concurrent=2, max_polls_per_hour=10, max_summaries_per_hour=60)
+        news = SyntheticNews({topic: 20 + 10 * i for i, topic in enumerate(topics)}, start=START)
+        result = simulate(scheduler, news, 48, START, poll_seconds=600)
+
+        use = scheduler.budget_use()
+        self.assertLessEqual(use['polls_per_hour'], 10.01)
+        self.assertLessEqual(use['summaries_per_hour'], 60.01)
+        self.assertLessEqual(result['most_running'], 2)
+        selected = sum(t['selected'] for t in result['topics'].values())
+        self.assertLessEqual(selected / 48, 60 * 1.1)
+        self.assertTrue(any('summary budget' in state.plan.reasons for state in scheduler.states.values()))
+
+    def test_full_slots_queue_the_topics_with_most_waiting(self):
+        scheduler = scheduler_for(['A', 'B', 'C'], max_concurrent=1)
+        for topic, rate in (('A', 5), ('B', 50), ('C', 20)):
+            state = scheduler.states[topic]
+            state.rate, state.last_polled, state.polls, state.next_due = rate, START - 2 * HOUR, 1, START
+        self.assertEqual([topic for topic, _, _ in scheduler.claim(START)], ['B'])
+        status = scheduler.status(START)
+        self.assertEqual(status['queue'], ['C', 'A'])
+        self.assertEqual(status['topics']['B']['state'], 'polling')
+        self.assertEqual(scheduler.next_wake(START), START)
+
+        scheduler.finish('B', START + 60, error=RuntimeError("GDELT down"))
+        self.assertEqual(scheduler.states['B'].failures, 1)
+        self.assertEqual(scheduler.states['B'].next_due, START + 60 + 2 * scheduler.min_interval)
+        self.assertIn("GDELT down", scheduler.decisions[-1]['decision'])
+
+    def test_fixed_plan(self):
+        fixed = TopicPlan(24 * HOUR, 75, 20)
+        scheduler = scheduler_for(['A', 'B'], fixed=fixed)
+        result = simulate(scheduler, SyntheticNews({'A': 100, 'B': 1}, start=START), 72, START)
+        self.assertEqual([t['polls'] for t in result['topics'].values()], [3, 3])
+        self.assertEqual(scheduler.states['A'].plan, fixed)
+
+
+class TestSchedulerState(unittest.TestCase):
+
+    def test_state_is_seeded_from_articles_and_stored(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'test.db')
+            create_database_and_tables(path)
+            db = Database(path)
+            db.executemany("INSERT INTO articles (topic, url, title) VALUES ('UK', ?, 'Story')",
+                           [(f"https://a.example/{i}",) for i in range(84)])
+            scheduler = Scheduler(['UK', 'NATO'], db=db, clock=lambda: START)
+            self.assertAlmostEqual(scheduler.states['UK'].rate, 0.5)
+            self.assertEqual(scheduler.due(START), ['UK', 'NATO'])
+
+            scheduler.claim(START)
+            scheduler.finish('UK', START + 60, PollResult(40, 40, 30, 9, window=4 * HOUR, watchlist_date='2024-01-01'))
+            scheduler.finish('NATO', START + 60, error=TimeoutError())
+
+            restarted = Scheduler(['UK', 'NATO'], db=db, clock=lambda: START + HOUR)
+            uk, nato = restarted.states['UK'], restarted.states['NATO']
+            self.assertEqual((uk.rate, uk.duplicates, uk.polls, uk.watchlist_date), (10.0, 0.25, 1, '2024-01-01'))
+            self.assertEqual(uk.next_due, START + uk.plan.interval)
+            self.assertEqual((nato.polls, nato.failures), (0, 1))
+            db.close()
+
+
+class TestRunScheduler(unittest.TestCase):
+
+    def test_polls_on_the_wall_clock(self):
+        running, most, polled = set(), [0], []
+
+        async def poll(topic, plan, watchlist_date):
+            running.add(topic)
+            most[0] = max(most[0], len(running))
+            await asyncio.sleep(0.02)
+            running.discard(topic)
+            polled.append(topic)
+            if topic == 'Broken':
+                raise ConnectionError("refused")
+            return PollResult(5, 5, 4, min(plan.top_n, 4), window=plan.interval)
+
+        scheduler = Scheduler(['UK', 'NATO', 'Broken'], max_concurrent=2, min_interval=0.1, max_interval=0.2,
+                              watchlist_hour=None)
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(metrics, '_metrics', metrics.Metrics()):
+            status_path = os.path.join(tmp, 'scheduler.json')
+            polls = asyncio.run(run_scheduler(scheduler, poll, until=time.time() + 0.7, status_path=status_path,
+                                              metrics_dir=tmp))
+            with open(status_path) as f:
+                status = json.load(f)
+            with open(os.path.join(tmp, 'metrics.prom')) as f:
+                prom = f.read()
+
+        self.assertLessEqual(most[0], 2)
+        self.assertGreaterEqual(polls['UK'], 3)
+        self.assertEqual(sum(polls.values()), len(polled))
+        self.assertEqual(set(status['topics']), {'UK', 'NATO', 'Broken'})
+        self.assertGreater(status['topics']['Broken']['failures'], 0)
+        self.assertTrue(status['decisions'])
+        self.assertIn('sensusmundi_scheduler_interval_seconds{topic="UK"}', prom)
+
+    def test_search_runs_off_the_event_loop(self):
+        batch = SimpleNamespace(error=None, articles=[{'title': 'Story'}], requests=1, truncated=False)
+
+        class Ingester:
+            def __init__(self, session, query_url_for):
+                pass
+
+            async def ingest_topic(self, topic):
+                return batch
+
+            def advance(self, batch):
+                pass
+
+        threads = []
+
+        def search_gdelt(topic, articles, top_n, stats):
+            threads.append(threading.current_thread())
+            stats.update(received=1, selected=1)
+
+        searcher = SimpleNamespace(get_gdelt_query_string=lambda topic: '', search_gdelt=search_gdelt)
+        with mock.patch.object(daily_run, 'GdeltIngester', Ingester):
+            stats = asyncio.run(daily_run.search_topic(searcher, 'UK', 50, 5))
+        self.assertEqual(stats, {'ingested': 1, 'requests': 1, 'truncated': False, 'received': 1, 'selected': 1})
+        self.assertIsNot(threads[0], threading.main_thread())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+import aiohttp
+
+from src import ScrapeNews
+from src.ScrapeNews import ArticleFetcher, ParseError, parse_html, preload_parser
+from src.fake_servers import FakeNewsFarm, ServerThread
+from src.html_store import HtmlStore, decode_html
+from src.seen_index import SeenIndex
+
+
+class BlankPageFarm(FakeNewsFarm):
+    """Serves an empty page under /blank/, which newspaper refuses to parse."""
+
+    def page(self, path: str) -> str:
+        return '' if path.startswith('/blank/') else super().page(path)
+
+
+class TestArticleFetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = HtmlStore(os.path.join(self.tmp.name, 'html'))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def fetch_all(self, farm, n, **limits):
+        """Fetch n articles spread over every site of the farm; returns their URLs and pages."""
+        async def main(urls):
+            async with aiohttp.ClientSession() as session:
+                fetcher = ArticleFetcher(session, store=self.store, **limits)
+                return await asyncio.gather(*(fetcher.fetch(url) for url in urls))
+
+        with ServerThread(farm):
+            urls = [f"http://{farm.hosts[i % len(farm.hosts)]}:{farm.ports[i % len(farm.hosts)]}/world/{i}"
+                    for i in range(n)]
+            return urls, asyncio.run(main(urls))
+
+    def test_concurrency_stays_within_the_global_and_per_host_limits(self):
+        farm = FakeNewsFarm(sites=3, latency=0.05, words=60)
+        _, pages = self.fetch_all(farm, 24, max_inflight=4, per_host=2)
+        self.assertEqual(len(set(pages)), 24)
+        self.assertEqual(farm.requests, 24)
+        self.assertEqual(farm.most_inflight, 4)
+        self.assertEqual(set(farm.most_inflight_per_site.values()), {2})
+        self.assertEqual(len(farm.most_inflight_per_site), 3)
+
+    def test_per_host_limit_applies_to_a_single_publisher(self):
+        farm = FakeNewsFarm(sites=1, latency=0.05, words=60)
+        self.fetch_all(farm, 10, max_inflight=8, per_host=3)
+        self.assertEqual(farm.most_inflight, 3)
+
+    def test_unknown_charset_is_decoded_as_utf8(self):
+        self.assertEqual(decode_html("Café — Zürich".encode('utf-8'), 'x-unknown'), "Café — Zürich")
+        farm = FakeNewsFarm(sites=1, words=60, charset='x-unknown')
+        urls, pages = self.fetch_all(farm, 1)
+        self.assertEqual(pages[0], farm.page('/world/0'))
+        # The copy kept in the store decodes the same way
+        self.assertEqual(self.store.read(self.store.lookup(urls[0])), pages[0])
+
+
+class TestParsePool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = HtmlStore(os.path.join(self.tmp.name, 'html'))
+        self.seen = SeenIndex(os.path.join(self.tmp.name, 'seen.db'))
+
+    def tearDown(self):
+        self.seen.close()
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_parse_error_in_a_worker_fails_only_its_article(self):
+        with self.assertRaises(ParseError):
+            parse_html('http://news.example/blank/1', '')
+        farm = BlankPageFarm(sites=1)
+        queued = []
+
+        async def queue_summary(country, article_id, news_body):
+            queued.append(article_id)
+
+        async def main(articles):
+            preload_parser()
+            with ProcessPoolExecutor(max_workers=2) as parse_pool:
+                async with aiohttp.ClientSession() as session:
+                    fetcher = ArticleFetcher(session, store=self.store)
+                    return await asyncio.gather(*(ScrapeNews.process_article(session, 'UK', article, fetcher,
+                                                                             parse_pool, 'batch')
+                                                  for article in articles))
+
+        with ServerThread(farm), \
+                mock.patch.object(ScrapeNews, 'get_seen_index', return_value=self.seen), \
+                mock.patch.object(ScrapeNews, 'queue_summary', queue_summary):
+            articles = [{'id': i, 'url': farm.article_url('blank' if i == 2 else 'world', i)} for i in range(1, 5)]
+            results = asyncio.run(main(articles))
+        self.assertEqual(results, [True, False, True, True])
+        self.assertEqual(sorted(queued), [1, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
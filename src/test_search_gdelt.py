@@ -1,55 +1,105 @@
+import json
+import os
+import tempfile
 import unittest
-import pandas as pd
+from unittest import mock
+
+from src import db as db_module
+from src import seen_index as seen_index_module
 from src.SearchGdelt import GdeltSearcher
-import os
-import json
+from src.db import Database
+from src.fake_servers import FakeCohereServer, FakeGdeltServer, FakeNewsFarm, ServerThread, synthetic_gdelt_articles
+from src.gdelt_records import GdeltArticle
+from src.initialize_db import create_database_and_tables
+from src.seen_index import SeenIndex
+
+QUERY_PARAMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_parameters.json')
+
 
 class TestGdeltSearcher(unittest.TestCase):
+    """Runs against local GDELT and Cohere stand-ins (src/fake_servers.py), never the live APIs."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.gdelt = FakeGdeltServer()
+        cls.cohere = FakeCohereServer()
+        cls.farm = FakeNewsFarm(sites=2)
+        cls.servers = ServerThread(cls.gdelt, cls.cohere, cls.farm)
+        cls.servers.__enter__()
+        cls.gdelt.add('UK', synthetic_gdelt_articles('UK', 60, cls.farm.article_url))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servers.__exit__(None, None, None)
 
     def setUp(self):
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(current_dir)
-        query_params_path = os.path.join(project_root, 'app/query_parameters.json')
-        self.searcher = GdeltSearcher(query_params_path, 'YOUR_COHERE_API_KEY')
+        self.tmp = tempfile.TemporaryDirectory()
+        with open(QUERY_PARAMS_PATH) as f:
+            params = json.load(f)
+        for topic in params['topics']:
+            topic['gdelt_query_string'] = self.gdelt.query_url(topic['topic'])
+        self.params_path = os.path.join(self.tmp.name, 'query_parameters.json')
+        with open(self.params_path, 'w') as f:
+            json.dump(params, f)
+
+        db_path = os.path.join(self.tmp.name, 'test.db')
+        create_database_and_tables(db_path)
+        self.db = Database(db_path)
+        self.seen = SeenIndex(os.path.join(self.tmp.name, 'seen.db'))
+        self.patches = [mock.patch.object(db_module, '_database', self.db),
+                        mock.patch.object(seen_index_module, '_seen_index', self.seen)]
+        for patch in self.patches:
+            patch.start()
+        self.searcher = GdeltSearcher(self.params_path, 'test-key', 'cohere', cohere_base_url=self.cohere.base_url)
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.db.close()
+        self.seen.close()
+        self.tmp.cleanup()
 
     def test_load_query_parameters(self):
-        self.assertIsInstance(self.searcher.query_params, dict)
-        self.assertIn('topics', self.searcher.query_params)
+        searcher = GdeltSearcher(QUERY_PARAMS_PATH, 'test-key', 'bm25')
+        self.assertIsInstance(searcher.query_params, dict)
+        self.assertIn('topics', searcher.query_params)
 
     def test_get_gdelt_query_string(self):
-        for topic in self.searcher.query_params['topics']:
-            query_string = self.searcher.get_gdelt_query_string(topic['topic'])
+        searcher = GdeltSearcher(QUERY_PARAMS_PATH, 'test-key', 'bm25')
+        for topic in searcher.query_params['topics']:
+            query_string = searcher.get_gdelt_query_string(topic['topic'])
             self.assertEqual(query_string, topic['gdelt_query_string'])
 
     def test_search_gdelt(self):
-        for topic in self.searcher.query_params['topics']:
-            with self.subTest(topic=topic['topic']):
-                result = self.searcher.search_gdelt(topic['topic'])
-                self.assertIsInstance(result, pd.DataFrame)
-                self.assertGreater(len(result), 0)
-                self.assertIn('title', result.columns)
-                self.assertIn('content', result.columns)
-                # Check for other expected columns
-                expected_columns = ['url', 'url_mobile', 'title', 'seendate', 'socialimage', 'domain', 'language', 'sourcecountry']
-                for col in expected_columns:
-                    if col not in result.columns:
-                        print(f"Warning: Expected column '{col}' not found in result for topic '{topic['topic']}'")
+        result = self.searcher.search_gdelt('UK')
+        self.assertEqual(len(result), 20)
+        self.assertTrue(all(isinstance(a, GdeltArticle) and a.url and a.title and a.seendate for a in result))
+        scores = [a.relevance_score for a in result]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        stored = self.db.query("SELECT COUNT(*) FROM articles WHERE topic = 'UK' AND body_length IS NULL")[0][0]
+        self.assertEqual(stored, 20)
 
-    def test_rerank_documents(self):
-        topic = self.searcher.query_params['topics'][0]
-        df = self.searcher.search_gdelt(topic['topic'])
-        documents = df['content'].tolist()[:10]  # Use the first 10 documents for testing
-        query = topic['question_string']
+        # The same GDELT answer again: the 20 stored articles are skipped as seen, the rest are still new
+        second = self.searcher.search_gdelt('UK')
+        self.assertEqual(len(second), 20)
+        self.assertFalse({a.url for a in second} & {a.url for a in result})
+        self.searcher.search_gdelt('UK')
+        self.assertEqual(self.searcher.search_gdelt('UK'), [])
 
-        result = self.searcher.rerank_documents(query, documents)
+    def test_search_gdelt_without_results(self):
+        self.assertEqual(self.searcher.search_gdelt('NATO'), [])
 
-        self.assertIsInstance(result, dict)
-        self.assertIn('ranked_documents', result)
-        self.assertLessEqual(len(result['ranked_documents']), min(len(documents), 30))
+    def test_rerank_documents(self):
+        query = self.searcher.get_question_string('UK')
+        documents = ["weather and sport", "UK parliament votes on the UK economy", "UK politics"]
+        result = self.searcher.rerank_documents(query, documents)
+        self.assertEqual([r.index for r in result.results], [1, 2, 0])
+        self.assertEqual(self.cohere.documents, 3)
 
     def test_invalid_topic(self):
         with self.assertRaises(ValueError):
             self.searcher.search_gdelt("InvalidTopic")
 
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
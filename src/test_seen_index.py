@@ -0,0 +1,100 @@
+import os
+import random
+import tempfile
+import unittest
+from src.seen_index import SeenIndex, canonicalize_url, simhash
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestCanonicalizeUrl(unittest.TestCase):
+
+    def test_tracking_and_host_variants_collapse(self):
+        a = canonicalize_url("https://www.bbc.co.uk/news/uk-123/?utm_source=tw&b=2&a=1#comments")
+        b = canonicalize_url("http://m.bbc.co.uk/news/uk-123/amp?a=1&b=2&fbclid=xyz")
+        self.assertEqual(a, b)
+        self.assertEqual(a, "bbc.co.uk/news/uk-123?a=1&b=2")
+
+    def test_different_articles_differ(self):
+        self.assertNotEqual(canonicalize_url("https://bbc.co.uk/news/1"), canonicalize_url("https://bbc.co.uk/news/2"))
+
+
+class TestSeenIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.index = SeenIndex(os.path.join(self.tmpdir.name, "seen.db"), max_age_days=7, clock=self.clock)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmpdir.cleanup()
+
+    def test_repeat_url_and_near_repeat_title_are_suppressed(self):
+        self.index.register("UK", [{"url": "https://www.example.com/a?utm_medium=x", "title": "Sunak announces snap general election for July"}])
+        records = [
+            {"url": "https://example.com/a", "title": "Completely different headline"},
+            {"url": "https://other.com/b", "title": "Sunak announces snap general election in July"},
+            {"url": "https://other.com/c", "title": "Labour unveils manifesto"},
+        ]
+        self.assertEqual(self.index.filter_new("UK", records), [False, False, True])
+        self.assertEqual(self.index.stats["url"], 1)
+        self.assertEqual(self.index.stats["title"], 1)
+        # Other topics keep their own memory
+        self.assertEqual(self.index.filter_new("NATO", records), [True, True, True])
+
+    def test_titles_are_looked_up_in_a_kept_index(self):
+        rng = random.Random(4)
+        words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9))) for _ in range(500)]
+        titles = [" ".join(rng.choices(words, k=8)).capitalize() for _ in range(400)]
+        self.index.register("UK", [{"url": f"https://example.com/{i}", "title": t} for i, t in enumerate(titles)])
+        records = [{"url": "https://other.com/1", "title": titles[123] + "!"},
+                   {"url": "https://other.com/2", "title": "Labour unveils manifesto"}]
+        self.assertEqual(self.index.filter_new("UK", records), [False, True])
+        index = self.index._title_index("UK")
+        index.comparisons = 0
+        self.assertEqual(self.index.filter_new("UK", records), [False, True])
+        self.assertLess(index.comparisons, 10)
+
+        # Titles registered since, here or by another process, are picked up without a rebuild
+        other = SeenIndex(self.index.path, max_age_days=7, clock=self.clock)
+        other.register("UK", [{"url": "https://other.com/2", "title": "Labour unveils its manifesto"}])
+        other.close()
+        self.assertEqual(self.index.filter_new("UK", records[1:] + [{"url": "https://x.com/3", "title": "Labour unveils manifesto"}]),
+                         [False, False])
+        self.assertIs(self.index._title_index("UK"), index)
+        self.assertEqual(len(index), 401)
+
+    def test_near_duplicate_body(self):
+        body = " ".join(f"word{i}" for i in range(400))
+        edited = body.replace("word200", "changed")
+        self.index.register_body("UK", body)
+        self.assertTrue(self.index.is_seen_body("UK", edited))
+        self.assertFalse(self.index.is_seen_body("UK", " ".join(f"other{i}" for i in range(400))))
+        self.assertLessEqual(bin((simhash(body) ^ simhash(edited)) & (2 ** 64 - 1)).count("1"), 3)
+
+    def test_age_eviction(self):
+        self.index.register("UK", [{"url": "https://example.com/a", "title": "Old story about budget"}])
+        self.clock.now += 8 * 86400
+        self.index.evict()
+        self.assertEqual(self.index.filter_new("UK", [{"url": "https://example.com/a", "title": "Old story about budget"}]), [True])
+
+    def test_size_cap(self):
+        self.index.max_entries = 5
+        for i in range(10):
+            self.clock.now += 1
+            self.index.register("UK", [{"url": f"https://example.com/{i}", "title": f"Story {i}"}])
+        self.index.evict()
+        count = self.index.conn.execute("SELECT COUNT(*) FROM seen_urls").fetchone()[0]
+        self.assertEqual(count, 5)
+        self.assertEqual(self.index.filter_new("UK", [{"url": "https://example.com/9", "title": "x"}]), [False])
+
+
+if __name__ == '__main__':
+    unittest.main()
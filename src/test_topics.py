@@ -0,0 +1,88 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from src import initialize_db
+from src import topics as topics_module
+from src.ScrapeNews import build_summary_payload
+from src.topics import TopicRegistry
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestTopicRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.query_params = os.path.join(self.tmp.name, 'query_parameters.json')
+        self.topic_params = os.path.join(self.tmp.name, 'topic_params.json')
+        with open(self.query_params, 'w') as f:
+            json.dump({"topics": [
+                {"topic": "UK", "gdelt_query_string": "http://gdelt/?query=UK", "question_string": "UK politics"},
+                {"topic": "NATO", "gdelt_query_string": "http://gdelt/?query=NATO"},
+            ]}, f)
+        with open(self.topic_params, 'w') as f:
+            json.dump({"topics": [{"topic": "UK", "topic_name": "British Politics", "prompt": "Summarise."}]}, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_merges_both_files_in_query_order(self):
+        registry = TopicRegistry(self.query_params, self.topic_params)
+        self.assertEqual(registry.names(), ['UK', 'NATO'])
+        uk = registry.get('UK')
+        self.assertEqual((uk.gdelt_query_string, uk.question_string, uk.topic_name),
+                         ("http://gdelt/?query=UK", "UK politics", "British Politics"))
+        nato = registry.get('NATO')
+        self.assertEqual(nato.question_string, 'NATO')
+        self.assertIsNone(nato.topic_name)
+        self.assertIn('NATO', registry)
+        with self.assertRaises(ValueError):
+            registry.get('Mars')
+
+    def test_summary_payloads_do_not_reread_the_files(self):
+        registry = TopicRegistry(self.query_params, self.topic_params)
+        with mock.patch.object(topics_module, '_topic_registry', registry), \
+                mock.patch('builtins.open', side_effect=AssertionError("file opened")):
+            payload = build_summary_payload("Some article", 'UK')
+            with self.assertRaises(ValueError):
+                build_summary_payload("Some article", 'NATO')  # no summary prompt
+        self.assertIn("British Politics", payload['messages'][0]['content'])
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_stage_modules_import_without_heavy_dependencies(self):
+        heavy = ('pandas', 'numpy', 'newspaper', 'cohere', 'requests', 'fuzzywuzzy')
+        code = f"import sys, src.daily_run, src.api; print('loaded:', *[m for m in {heavy} if m in sys.modules])"
+        try:
+            import fastapi  # noqa: F401
+        except ImportError:
+            code = code.replace(", src.api", "")
+        result = subprocess.run([sys.executable, '-W', 'ignore', '-c', code], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], 'loaded:')
+
+    def test_seen_index_loads_the_title_matcher_on_first_use(self):
+        code = "import sys, src.seen_index; print('src.dedup' in sys.modules)"
+        result = subprocess.run([sys.executable, '-W', 'ignore', '-c', code], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], 'False')
+
+    def test_init_db_creates_the_schema_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'test.db')
+            with mock.patch.object(initialize_db, 'create_database_and_tables',
+                                   wraps=initialize_db.create_database_and_tables) as create:
+                initialize_db.init_db(path)
+                initialize_db.init_db(path)
+            create.assert_called_once_with(path)
+            self.assertTrue(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import aiohttp
+
+from src import GetWatchlist
+from src.fake_openai import FakeOpenAIServer
+from src.llm_cache import LLMCache
+from src.openai_client import OpenAIClient, OpenAIRequestError
+from src.token_budget import chunk_by_budget, estimate_tokens, truncate_to_tokens
+
+
+def make_summaries(n, words=60):
+    return [{"id": i, "url": f"http://news/{i}", "summary": " ".join(f"story{i}" for _ in range(words))} for i in range(n)]
+
+
+class TestTokenBudget(unittest.TestCase):
+
+    def test_chunks_stay_within_budget_and_keep_order(self):
+        items = [5, 3, 4, 9, 1, 1, 12]
+        chunks = chunk_by_budget(items, 10, cost=lambda x: x)
+        self.assertEqual(chunks, [[5, 3], [4], [9, 1], [1], [12]])
+        self.assertEqual([x for chunk in chunks for x in chunk], items)
+
+    def test_estimate_and_truncate(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("abcde"), 2)
+        text = "word " * 100
+        self.assertLessEqual(estimate_tokens(truncate_to_tokens(text, 10)), 10)
+        self.assertEqual(truncate_to_tokens("short", 10), "short")
+
+
+class TestMapReduceWatchlist(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = LLMCache(os.path.join(self.tmp.name, "cache.db"), mode='off')
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def generate(self, summaries, prompt_tokens, server=None):
+        server = server or FakeOpenAIServer(completion_chars=400)
+
+        async def main():
+            await server.start()
+            try:
+                client = OpenAIClient("test-key", base_url=server.base_url)
+                with mock.patch.object(GetWatchlist, 'get_openai_client', return_value=client), \
+                        mock.patch.object(GetWatchlist, 'get_llm_cache', return_value=self.cache):
+                    async with aiohttp.ClientSession() as session:
+                        return await GetWatchlist.generate_watchlist(session, "UK", summaries, prompt_tokens)
+            finally:
+                await server.stop()
+        return asyncio.run(main()), server
+
+    def test_small_days_use_a_single_call(self):
+        summaries = make_summaries(5)
+        result, server = self.generate(summaries, prompt_tokens=12000)
+        self.assertIn('watchlist', result)
+        self.assertEqual(server.completed, 1)
+        self.assertEqual(result['urls'], [s['url'] for s in summaries])
+
+    def test_large_days_are_reduced_under_the_budget(self):
+        summaries = make_summaries(200)
+        budget = 2000
+        result, server = self.generate(summaries, prompt_tokens=budget)
+        self.assertIn('watchlist', result)
+        self.assertGreater(server.completed, 1)
+        tool_names = [p['tools'][0]['function']['name'] for p in server.payloads]
+        self.assertEqual(tool_names[-1], 'WatchlistGenerator')
+        self.assertTrue(all(name == 'KeyPointsExtractor' for name in tool_names[:-1]))
+        for payload in server.payloads:
+            template_tokens = estimate_tokens(GetWatchlist.WATCHLIST_MAP_PROMPT_TEMPLATE)
+            self.assertLessEqual(estimate_tokens(payload['messages'][0]['content']), budget + template_tokens + 10)
+        # Every source is still attributed after the reduce levels
+        self.assertEqual(sorted(result['urls']), sorted(s['url'] for s in summaries))
+
+    def test_notes_left_over_the_level_limit_are_cut_to_the_budget(self):
+        summaries = make_summaries(50)
+        budget = 500
+        with mock.patch.object(GetWatchlist, 'WATCHLIST_MAX_LEVELS', 0):
+            result, server = self.generate(summaries, prompt_tokens=budget)
+        self.assertIn('watchlist', result)
+        self.assertEqual(server.completed, 1)
+        template_tokens = estimate_tokens(GetWatchlist.WATCHLIST_PROMPT_TEMPLATE)
+        self.assertLessEqual(estimate_tokens(server.payloads[0]['messages'][0]['content']), budget + template_tokens + 10)
+
+    def test_single_shot_overflows_a_small_context(self):
+        summaries = make_summaries(300)
+        with self.assertRaises(OpenAIRequestError):
+            self.generate(summaries, prompt_tokens=10 ** 9, server=FakeOpenAIServer(context_tokens=16000))
+        result, _ = self.generate(summaries, prompt_tokens=8000, server=FakeOpenAIServer(context_tokens=16000))
+        self.assertIn('watchlist', result)
+
+
+if __name__ == '__main__':
+    unittest.main()
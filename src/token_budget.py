@@ -0,0 +1,40 @@
+from typing import Callable, List, Sequence, TypeVar
+
+CHARS_PER_TOKEN = 4  # OpenAI's rule of thumb for English text; errs high for other scripts
+
+T = TypeVar('T')
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of `text`, without loading a tokenizer."""
+    return (len(text or '') + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` to roughly `max_tokens`, at a word boundary when there is one."""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(' ', 0, limit)
+    return text[:cut if cut > limit // 2 else limit]
+
+
+def chunk_by_budget(items: Sequence[T], budget: int, cost: Callable[[T], int]) -> List[List[T]]:
+    """
+    Split `items` into consecutive chunks whose summed `cost` stays within
+    `budget`. Order is kept; an item that alone exceeds the budget gets a chunk
+    of its own (callers truncate it).
+    """
+    chunks: List[List[T]] = []
+    current: List[T] = []
+    used = 0
+    for item in items:
+        item_cost = cost(item)
+        if current and used + item_cost > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += item_cost
+    if current:
+        chunks.append(current)
+    return chunks
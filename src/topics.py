@@ -0,0 +1,65 @@
+"""
+The topics a run covers, read once from query_parameters.json (GDELT query
+and the question search results are ranked against) and topic_params.json
+(how summaries describe the topic).
+"""
+import json
+import os
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from src import config
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+QUERY_PARAMS_PATH = getattr(config, 'QUERY_PARAMS_PATH', os.path.join(SRC_DIR, 'query_parameters.json'))
+TOPIC_PARAMS_PATH = getattr(config, 'TOPIC_PARAMS_PATH', os.path.join(SRC_DIR, 'topic_params.json'))
+
+
+class Topic(NamedTuple):
+    topic: str
+    gdelt_query_string: str
+    question_string: str  # falls back to the topic itself
+    topic_name: Optional[str]  # None when topic_params.json has no entry, so the topic cannot be summarised
+    prompt: Optional[str]
+
+
+class TopicRegistry:
+    """Topics by name, in the order query_parameters.json lists them."""
+
+    def __init__(self, query_params_path: str = QUERY_PARAMS_PATH, topic_params_path: str = TOPIC_PARAMS_PATH):
+        with open(query_params_path) as f:
+            self.query_params: Dict = json.load(f)
+        summary_params = {}
+        if os.path.exists(topic_params_path):
+            with open(topic_params_path) as f:
+                summary_params = {t['topic']: t for t in json.load(f)['topics']}
+        self._topics = {}
+        for t in self.query_params['topics']:
+            summary = summary_params.get(t['topic'], {})
+            self._topics[t['topic']] = Topic(t['topic'], t['gdelt_query_string'], t.get('question_string') or t['topic'],
+                                             summary.get('topic_name'), summary.get('prompt'))
+
+    def names(self) -> List[str]:
+        return list(self._topics)
+
+    def get(self, name: str) -> Topic:
+        try:
+            return self._topics[name]
+        except KeyError:
+            raise ValueError(f"Topic '{name}' not found in the query parameters.") from None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._topics
+
+    def __iter__(self) -> Iterator[Topic]:
+        return iter(self._topics.values())
+
+
+_topic_registry = None
+
+
+def get_topic_registry() -> TopicRegistry:
+    """Process-wide TopicRegistry for the configured parameter files."""
+    global _topic_registry
+    if _topic_registry is None:
+        _topic_registry = TopicRegistry()
+    return _topic_registry
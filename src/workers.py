@@ -0,0 +1,258 @@
+"""
+Run the pipeline as durable jobs (src/job_queue.py), drained by worker processes.
+
+    python src/workers.py --enqueue --workers 4     # queue today's run for every topic, then drain it
+    python src/workers.py --workers 4               # drain what is queued, e.g. after a crash
+    python src/workers.py --enqueue --topics UK NATO --workers 0
+    python src/workers.py --status
+    python src/workers.py --retry-failed --workers 2
+
+Jobs and what each one queues next:
+
+- search (topic, date):  ingest and rank the topic's new GDELT articles, then
+                         queue a fetch for every article of the topic not scraped yet
+- fetch (article id):    download (through the raw HTML store), parse, store the
+                         body and queue its summary; a near-duplicate body is stored
+                         without one
+- summarize (article id): summarise the stored body (LLM cache first) and store it
+- watchlist (topic, date): runs once the topic has no search, fetch or summarize
+                         job left pending or leased
+
+Every worker process runs `--slots` jobs at a time, each under its own lease,
+and exits once nothing is pending or leased. Kill a worker, or the whole
+run, at any point: its leases run out and the remaining workers, or the next
+`python src/workers.py`, take those jobs over; completed jobs are never run
+again. A failed attempt is retried after a backoff; a job out of attempts is
+left `failed` with its error (--status lists them), and --retry-failed gives
+those another round. Summaries are always made per article here; the OpenAI
+batch mode stays with daily_run.py. Each worker process writes its run
+metrics (job spans, jobs_total) to METRICS_DIR/worker-<pid> when it exits.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence
+
+import aiohttp
+
+# Add the project root to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from src import config
+from src.body_store import get_body_store
+from src.db import get_database
+from src.job_queue import JOB_KINDS, JOB_LEASE_SECONDS, Job, JobQueue, worker_id
+from src.metrics import METRICS_DIR, get_metrics
+from src.seen_index import get_seen_index
+from src.topics import get_topic_registry
+
+JOB_SLOTS = getattr(config, 'JOB_SLOTS', 8)  # jobs one worker process runs at a time
+JOB_POLL_SECONDS = getattr(config, 'JOB_POLL_SECONDS', 1.0)  # wait before asking again when nothing is runnable
+
+
+class JobError(Exception):
+    """A job that ran but did not get its work done; it is retried like any other failure."""
+
+
+async def run_search(worker: 'Worker', job: Job):
+    from src.daily_run import search_topic
+    from src.ScrapeNews import get_urls_from_database
+    await search_topic(worker.searcher, job.topic)
+    articles = await get_urls_from_database(job.topic)
+    jobs = [(article['id'], job.topic, article) for article in articles]
+    await asyncio.to_thread(worker.queue.enqueue_many, 'fetch', jobs)
+
+
+async def run_fetch(worker: 'Worker', job: Job):
+    from src.ScrapeNews import mark_duplicate_body, parse_html, store_body
+    article_id, url = job.payload['id'], job.payload['url']
+    html = await worker.fetcher.fetch(url)
+    news_body = await asyncio.to_thread(parse_html, url, html)
+    if await asyncio.to_thread(get_seen_index().is_seen_body, job.topic, news_body):
+        await mark_duplicate_body(job.topic, article_id, news_body)
+        return
+    await store_body(article_id, news_body)
+    await get_database().write("UPDATE articles SET body_length = ? WHERE id = ?", (len(news_body), article_id))
+    await asyncio.to_thread(worker.queue.enqueue, 'summarize', article_id, job.topic, {'id': article_id, 'url': url})
+
+
+async def run_summarize(worker: 'Worker', job: Job):
+    from src.ScrapeNews import get_completion
+    article_id = job.payload['id']
+    news_body = await asyncio.to_thread(get_body_store().get, article_id)
+    if news_body is None:
+        raise JobError(f"article {article_id} has no stored body")
+    summaries = await get_completion(worker.session, news_body, job.topic, job.payload.get('url'))
+    if not summaries or 'error' in summaries:
+        raise JobError(f"no summary: {summaries.get('error') if summaries else 'empty response'}")
+    await get_database().write("UPDATE articles SET short_title_en = ?, summary_en = ?, sentiment = ? WHERE id = ?", (
+        summaries.get('short_title_en', ''), summaries.get('summary_en', ''), summaries.get('sentiment', ''), article_id))
+    await asyncio.to_thread(get_seen_index().register_body, job.topic, news_body)
+
+
+async def run_watchlist(worker: 'Worker', job: Job):
+    from src.GetWatchlist import generate_and_store_watchlist
+    await generate_and_store_watchlist(job.topic, date.fromisoformat(job.payload['date']))
+
+
+HANDLERS = {'search': run_search, 'fetch': run_fetch, 'summarize': run_summarize, 'watchlist': run_watchlist}
+
+
+def enqueue_run(queue: JobQueue, topics: Sequence[str], run_date: Optional[date] = None) -> int:
+    """Queue the search and the watchlist of every topic for `run_date` (default: today); returns the new jobs."""
+    day = (run_date or date.today()).isoformat()
+    jobs = [(f"{topic}/{day}", topic, {'date': day}) for topic in topics]
+    return queue.enqueue_many('search', jobs) + queue.enqueue_many('watchlist', jobs)
+
+
+class Worker:
+    """
+    Claims and runs jobs in `slots` concurrent loops until nothing is pending or
+    leased anywhere (`exit_when_idle`), renewing each lease every third of its length.
+    """
+
+    def __init__(self, queue: JobQueue, slots: int = JOB_SLOTS, kinds: Optional[Sequence[str]] = None,
+                 poll_seconds: float = JOB_POLL_SECONDS, handlers: Optional[Dict[str, Callable]] = None,
+                 exit_when_idle: bool = True):
+        self.queue = queue
+        self.slots = slots
+        self.kinds = kinds
+        self.poll_seconds = poll_seconds
+        self.handlers = handlers or HANDLERS
+        self.exit_when_idle = exit_when_idle
+        self.counts = Counter()  # "<kind>_<done|retry|failed|lost>"
+        self.session = None
+        self._fetcher = None
+        self._searcher = None
+
+    @property
+    def fetcher(self):
+        if self._fetcher is None:
+            from src.ScrapeNews import ArticleFetcher
+            self._fetcher = ArticleFetcher(self.session)
+        return self._fetcher
+
+    @property
+    def searcher(self):
+        if self._searcher is None:
+            from src.SearchGdelt import GdeltSearcher
+            from src.config import COHERE_API_KEY, QUERY_PARAMS_PATH
+            self._searcher = GdeltSearcher(QUERY_PARAMS_PATH, COHERE_API_KEY)
+        return self._searcher
+
+    async def run(self) -> Counter:
+        if self.handlers.get('summarize') is run_summarize and (self.kinds is None or 'summarize' in self.kinds):
+            from src.preprocess import get_preprocessor
+            await asyncio.to_thread(get_preprocessor)  # may learn the boilerplate first, not on the event loop
+        async with aiohttp.ClientSession() as self.session:
+            await asyncio.gather(*[self._slot(worker_id(slot)) for slot in range(self.slots)])
+        return self.counts
+
+    async def _slot(self, owner: str):
+        while True:
+            job = await asyncio.to_thread(self.queue.claim, owner, self.kinds)
+            if job is None:
+                if self.exit_when_idle and await asyncio.to_thread(self.queue.unfinished) == 0:
+                    return
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            await self._run(job, owner)
+
+    async def _run(self, job: Job, owner: str):
+        keep_leased = asyncio.create_task(self._keep_leased(job, owner))
+        try:
+            with get_metrics().span(f"job_{job.kind}", topic=job.topic, key=job.key, attempt=job.attempts):
+                await self.handlers[job.kind](self, job)
+        except Exception as e:
+            state = await asyncio.to_thread(self.queue.fail, job, owner, f"{type(e).__name__}: {e}")
+            outcome = {'pending': 'retry', 'failed': 'failed', None: 'lost'}[state]
+            print(f"{job.kind} job {job.key} ({job.topic}) attempt {job.attempts}/{job.max_attempts} failed, "
+                  f"{outcome}: {type(e).__name__}: {e}")
+        else:
+            outcome = 'done' if await asyncio.to_thread(self.queue.complete, job, owner) else 'lost'
+        finally:
+            keep_leased.cancel()
+        self.counts[f"{job.kind}_{outcome}"] += 1
+        get_metrics().inc('jobs_total', kind=job.kind, outcome=outcome)
+
+    async def _keep_leased(self, job: Job, owner: str):
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            if not await asyncio.to_thread(self.queue.heartbeat, job, owner):
+                print(f"Lost the lease on {job.kind} job {job.key}; another worker has taken it over")
+                return
+
+
+def run_worker(db_path: Optional[str] = None, slots: int = JOB_SLOTS, kinds: Optional[Sequence[str]] = None,
+               lease_seconds: float = JOB_LEASE_SECONDS):
+    """Body of one worker process."""
+    queue = JobQueue(db_path, lease_seconds=lease_seconds)
+    start = time.time()
+    try:
+        counts = asyncio.run(Worker(queue, slots, kinds).run())
+    finally:
+        get_metrics().write_report(os.path.join(METRICS_DIR, f"worker-{os.getpid()}"))
+    print(f"Worker {os.getpid()} finished in {time.time() - start:.1f}s: "
+          + (", ".join(f"{k}={v}" for k, v in sorted(counts.items())) or "no jobs"))
+    queue.close()
+
+
+def start_workers(n: int, target: Callable = run_worker, args: tuple = ()) -> List[multiprocessing.Process]:
+    # spawn: a fresh interpreter per worker, no sockets or SQLite handles inherited from the parent
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=target, args=args, name=f"worker-{i}") for i in range(n)]
+    for process in processes:
+        process.start()
+    return processes
+
+
+def run_workers(n: int, db_path: Optional[str] = None, slots: int = JOB_SLOTS, kinds: Optional[Sequence[str]] = None,
+                lease_seconds: float = JOB_LEASE_SECONDS) -> List[int]:
+    """Start `n` worker processes and wait for all of them; returns their exit codes."""
+    processes = start_workers(n, run_worker, (db_path, slots, kinds, lease_seconds))
+    for process in processes:
+        process.join()
+    return [process.exitcode for process in processes]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drain the pipeline's job queue with worker processes.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes to start (0: none)")
+    parser.add_argument("--slots", type=int, default=JOB_SLOTS, help="jobs each worker runs at a time")
+    parser.add_argument("--kinds", nargs="+", choices=JOB_KINDS, help="only run these kinds of job (default: all)")
+    parser.add_argument("--enqueue", action="store_true", help="queue today's search and watchlist jobs first")
+    parser.add_argument("--topics", nargs="+", help="topics to queue (default: all in query_parameters.json)")
+    parser.add_argument("--retry-failed", action="store_true", help="give failed jobs another set of attempts first")
+    parser.add_argument("--status", action="store_true", help="print the job counts and recent failures, and exit")
+    parser.add_argument("--lease-seconds", type=float, default=JOB_LEASE_SECONDS)
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(lease_seconds=args.lease_seconds)
+    if args.status:
+        print(queue.report())
+        for kind, key, topic, error in queue.failures():
+            print(f"  failed {kind} {key} ({topic}): {error}")
+        return
+    if args.retry_failed:
+        print(f"{queue.retry_failed(args.kinds)} failed jobs queued again")
+    if args.enqueue:
+        print(f"{enqueue_run(queue, args.topics or get_topic_registry().names())} jobs queued")
+    queue.close()
+    if args.workers:
+        start = time.time()
+        codes = run_workers(args.workers, None, args.slots, args.kinds, args.lease_seconds)
+        print(f"{args.workers} workers finished in {time.time() - start:.1f}s (exit codes {codes})")
+        queue = JobQueue()
+        print(queue.report())
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,43 @@
+// Watchlists are exported as static JSON by src/export_static.py: the small manifest
+// points at the latest content-hashed file, so only that file is downloaded.
+const DATA_DIR = 'data';
+
 document.addEventListener('DOMContentLoaded', function() {
-    initSqlJs({ locateFile: file => `https://cdnjs.cloudflare.com/ajax/libs/sql.js/1.6.2/${file}` })
-        .then(SQL => {
-            fetch('../src/sensusmundi.db')
-                .then(response => response.arrayBuffer())
-                .then(buffer => {
-                    const db = new SQL.Database(new Uint8Array(buffer));
-                    const result = db.exec(`
-                        SELECT watchlist, country, date_added, urls_used
-                        FROM watchlist
-                        WHERE country = 'UK'
-                        ORDER BY date_added DESC
-                        LIMIT 1
-                    `);
-                    if (result[0] && result[0].values.length > 0) {
-                        displayWatchlist(result[0].values[0]);
-                    } else {
-                        displayNoData();
-                    }
-                })
-                .catch(error => {
-                    console.error('Error fetching database:', error);
-                    displayError();
-                });
+    performance.mark('watchlist-fetch-start');
+    fetch(`${DATA_DIR}/manifest.json`, { cache: 'no-cache' })
+        .then(response => response.json())
+        .then(manifest => {
+            const entry = manifest.countries['UK'];
+            if (!entry) {
+                return null;
+            }
+            return fetch(`${DATA_DIR}/${entry.latest}`).then(response => response.json());
+        })
+        .then(watchlistData => {
+            if (watchlistData) {
+                displayWatchlist(watchlistData);
+            } else {
+                displayNoData();
+            }
+            reportTiming();
         })
         .catch(error => {
-            console.error('Error initializing SQL.js:', error);
+            console.error('Error fetching watchlist:', error);
             displayError();
         });
 });
 
+function reportTiming() {
+    performance.mark('watchlist-rendered');
+    const render = performance.measure('watchlist-render', 'watchlist-fetch-start', 'watchlist-rendered');
+    const bytes = performance.getEntriesByType('resource')
+        .filter(entry => entry.name.includes(`/${DATA_DIR}/`))
+        .reduce((total, entry) => total + entry.transferSize, 0);
+    console.info(`Watchlist rendered ${render.duration.toFixed(0)} ms after DOMContentLoaded, ${bytes} bytes transferred`);
+}
+
 function displayWatchlist(watchlistData) {
-    const [watchlist, country, date_added, urls_used] = watchlistData;
+    const { watchlist, date: date_added, urls } = watchlistData;
     const container = document.getElementById('watchlist-container');
     container.innerHTML = '';
 
@@ -48,7 +55,7 @@ function displayWatchlist(watchlistData) {
         <div class="watchlist-content">${formattedWatchlist}</div>
         <h3>Sources</h3>
         <ul class="sources-list">
-            ${urls_used.split(',').map(url => `<li><a href="${url.trim()}" target="_blank">${url.trim()}</a></li>`).join('')}
+            ${urls.map(url => `<li><a href="${url}" target="_blank">${url}</a></li>`).join('')}
         </ul>
     `;
 }